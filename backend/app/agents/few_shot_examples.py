@@ -701,6 +701,9 @@ def add_example(example: FewShotExample) -> bool:
         return False
     
     EXAMPLES.append(example)
+
+    from app.agents.prompts import invalidate_compiled_prompts
+    invalidate_compiled_prompts()
     return True
 
 
@@ -4,7 +4,18 @@ Prompts optimized for:
 - Primary: gemini-3-flash (250K context, fast inference)
 - Fallback: gemini-2.5-flash-lite (shorter prompts for lower TPM)
 - Lightweight: gemma-3-27b (use concise prompts, 15K TPM limit)
+
+Rendered prompts are memoized in a compiled prompt registry keyed by
+(PROMPT_VERSION, prompt level, incident type, compact) so per-turn prompt
+builds are a dictionary lookup with a precomputed token count.
 """
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+# Bump whenever prompt text or few-shot formatting changes so stale compiled
+# prompts are never served.
+PROMPT_VERSION = "2"
 
 SYSTEM_PROMPT = """You are Detective Ray, a police detective. The person talking to you is a witness or victim who is reporting a crime or incident to you. Your ONLY job is to listen to their account and ask them questions to gather details. You are RECEIVING their report — you are NOT telling a story.
 
@@ -163,6 +174,11 @@ LEGAL SENSITIVITY:
 
 INITIAL_GREETING = """Hi, I'm Detective Ray. I'm here to take your report. Start wherever it makes sense, and tell me what happened."""
 
+TEMPLATE_GREETING = (
+    "Hi, I'm Detective Ray. I understand you'd like to report a {template_name}. "
+    "Start wherever it makes sense, and tell me what happened."
+)
+
 CLARIFICATION_PROMPTS = {
     "position": "Where exactly was {element} positioned in the scene?",
     "color": "What color was {element}?",
@@ -251,13 +267,43 @@ Return a JSON object with these fields:
 Be thorough - extract every detail mentioned, even minor ones. Rate confidence based on specificity and consistency."""
 
 
-def build_scene_extraction_prompt(
+SCENE_CONFIDENCE_GUIDELINES = """CONFIDENCE SCORING GUIDELINES (0.0-1.0):
+- 0.9-1.0: Very specific details with exact values (e.g., "red Honda Civic", "6 feet tall")
+- 0.7-0.9: Clear descriptions with some specifics (e.g., "dark colored sedan", "about 30 years old")
+- 0.5-0.7: General descriptions lacking details (e.g., "a car", "a man")
+- 0.3-0.5: Vague or uncertain mentions (e.g., "I think there was a car", "maybe someone")
+- 0.0-0.3: Highly uncertain or contradicted information
+
+Rate each element and timeline event confidence based on specificity and witness certainty.
+Items with confidence below 0.7 will be flagged for review."""
+
+# Prompt for updating an existing scene from only the newest conversation turns
+SCENE_EXTRACTION_DELTA_PROMPT = """You are updating the structured scene for an ongoing witness interview.
+
+Current scene (elements are identified by "ref"):
+{current_scene}
+
+New conversation turns since the scene was last updated:
+{new_turns}
+
+Return a JSON patch describing ONLY what the new turns change:
+- "elements": new elements (ref null) and existing elements whose details changed or were added (use their ref; include all fields for that element)
+- "removed_elements": refs of elements the witness retracted or corrected away
+- "timeline": only events newly described in these turns
+- "scene_description": an updated description if the scene changed, otherwise null
+- "contradictions": conflicts between the new turns and the current scene
+Do not repeat unchanged elements.
+
+""" + SCENE_CONFIDENCE_GUIDELINES
+
+
+def _render_scene_extraction_prompt(
     include_examples: bool = True,
     incident_type: str = None,
     tags: list = None,
     compact: bool = False
 ) -> str:
-    """Build a scene extraction prompt with optional few-shot examples.
+    """Render a scene extraction prompt with optional few-shot examples.
     
     Args:
         include_examples: Whether to include few-shot examples
@@ -308,6 +354,32 @@ def build_scene_extraction_prompt(
     
     return base_prompt
 
+def build_scene_extraction_prompt(
+    include_examples: bool = True,
+    incident_type: str = None,
+    tags: list = None,
+    compact: bool = False
+) -> str:
+    """Build a scene extraction prompt with optional few-shot examples.
+    
+    Served from the compiled prompt registry; see get_compiled_extraction_prompt().
+    
+    Args:
+        include_examples: Whether to include few-shot examples
+        incident_type: Optional incident type to filter examples (e.g., 'traffic_accident')
+        tags: Optional list of tags to filter examples (e.g., ['weapon', 'vehicle'])
+        compact: Use compact format for examples (saves tokens)
+        
+    Returns:
+        Complete extraction prompt string with examples if requested
+    """
+    return get_compiled_extraction_prompt(
+        include_examples=include_examples,
+        incident_type=incident_type,
+        tags=tags,
+        compact=compact,
+    ).text
+
 # Optimized prompt (moderate compression - ~40% token reduction)
 SYSTEM_PROMPT_OPTIMIZED = """You are Detective Ray, a police detective. The person talking to you is a witness or victim reporting a crime or incident to you. Your ONLY job is to listen and ask questions to gather details about THEIR account. You are RECEIVING their report.
 
@@ -361,4 +433,109 @@ PROMPT_VARIANTS = {
 
 def get_system_prompt(level: str = "full") -> str:
     """Get system prompt by compression level: full, optimized, or compact."""
-    return PROMPT_VARIANTS.get(level, SYSTEM_PROMPT)
+    return get_compiled_system_prompt(level).text
+
+
+# ── Compiled prompt registry ─────────────────────────────
+
+PromptKey = Tuple[str, str, str, bool]
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """A fully rendered prompt with its token count computed once."""
+    key: PromptKey
+    text: str
+    token_count: int
+
+
+_compiled_prompts: Dict[PromptKey, CompiledPrompt] = {}
+_compiled_lock = threading.Lock()
+_compiled_lookups = 0
+_compiled_builds = 0
+
+
+def _compile(key: PromptKey, render, cache_kind: Optional[str] = None) -> CompiledPrompt:
+    """Return the compiled prompt for key, rendering it on first use.
+
+    With cache_kind set, the prompt is also registered as a Gemini cached-content
+    prefix (see app.services.prompt_cache).
+    """
+    global _compiled_lookups, _compiled_builds
+    compiled = _compiled_prompts.get(key)
+    _compiled_lookups += 1
+    if compiled is not None:
+        return compiled
+
+    from app.services.token_estimator import estimate_tokens
+
+    text = render()
+    compiled = CompiledPrompt(key=key, text=text, token_count=estimate_tokens(text))
+    if cache_kind:
+        from app.services.prompt_cache import register_prompt_prefix
+
+        label = key[1] if not key[2] else f"{key[1]}:{key[2]}"
+        register_prompt_prefix(text, label=label, kind=cache_kind, token_count=compiled.token_count)
+    with _compiled_lock:
+        _compiled_builds += 1
+        return _compiled_prompts.setdefault(key, compiled)
+
+
+def get_compiled_system_prompt(level: str = "full") -> CompiledPrompt:
+    """Get the compiled chat system prompt for a model prompt level."""
+    level = level if level in PROMPT_VARIANTS else "full"
+    return _compile(
+        (PROMPT_VERSION, level, "", False),
+        lambda: PROMPT_VARIANTS[level],
+        cache_kind="system_instruction",
+    )
+
+
+def get_compiled_extraction_prompt(
+    include_examples: bool = True,
+    incident_type: Optional[str] = None,
+    tags: Optional[list] = None,
+    compact: bool = False,
+) -> CompiledPrompt:
+    """Get the compiled scene extraction prompt, few-shot examples included."""
+    level = "extraction" if include_examples else "extraction_base"
+    if include_examples and tags:
+        level += ":" + ",".join(sorted(tags))
+    incident_key = (incident_type or "").lower() if include_examples else ""
+    return _compile(
+        (PROMPT_VERSION, level, incident_key, bool(compact) and include_examples),
+        lambda: _render_scene_extraction_prompt(
+            include_examples=include_examples,
+            incident_type=incident_type,
+            tags=tags,
+            compact=compact,
+        ),
+        cache_kind="contents",
+    )
+
+
+def invalidate_compiled_prompts() -> None:
+    """Drop all compiled prompts (e.g. after few-shot examples change)."""
+    with _compiled_lock:
+        _compiled_prompts.clear()
+
+
+def get_compiled_prompt_stats() -> Dict[str, object]:
+    """Registry size, hit counts, and token cost of each compiled prompt."""
+    with _compiled_lock:
+        prompts = list(_compiled_prompts.values())
+    return {
+        "prompt_version": PROMPT_VERSION,
+        "compiled": len(prompts),
+        "lookups": _compiled_lookups,
+        "builds": _compiled_builds,
+        "prompts": [
+            {
+                "level": p.key[1],
+                "incident_type": p.key[2] or None,
+                "compact": p.key[3],
+                "tokens": p.token_count,
+            }
+            for p in prompts
+        ],
+    }
@@ -2,29 +2,51 @@ import logging
 import json
 import asyncio
 import re
+import time
+from collections import OrderedDict
 from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 
 from app.config import settings
-from app.models.schemas import SceneElement, WitnessStatement, SceneVersion, SceneExtractionResponse
+from app.models.schemas import (
+    SceneElement,
+    WitnessStatement,
+    SceneVersion,
+    SceneExtractionResponse,
+    SceneExtractionPatch,
+)
 from app.services.usage_tracker import usage_tracker
 from app.services.response_cache import response_cache
-from app.services.token_estimator import token_estimator, TokenEstimate, QuotaCheckResult
+from app.services.token_estimator import (
+    token_estimator, TokenEstimate, QuotaCheckResult, TokenLedger, count_special_chars,
+)
 from app.services.interview_branching import interview_branching
-from app.services.prompt_optimizer import prompt_optimizer
+from app.services.conversation_context import RollingContext, summary_text
 from app.services.timeline_disambiguator import timeline_disambiguator
 from app.services.api_key_manager import get_genai_client
+from app.services.state_backend import get_state_backend, SESSION_STATE_TTL_SECONDS
+from app.services.executors import llm_io
+from app.services.cancellation import OperationCancelled, raise_if_cancelled
 from google.genai import types
-from app.services.model_selector import model_selector, call_with_retry, is_retryable_model_error
+from app.services.model_selector import (
+    model_selector,
+    call_with_retry,
+    hedged_call,
+    hedging_enabled,
+    is_retryable_model_error,
+)
 from typing import AsyncIterator
 from app.agents.prompts import (
     SYSTEM_PROMPT,
     SYSTEM_PROMPT_OPTIMIZED,
     SYSTEM_PROMPT_COMPACT,
     INITIAL_GREETING,
+    TEMPLATE_GREETING,
     CLARIFICATION_PROMPTS,
+    SCENE_CONFIDENCE_GUIDELINES,
+    SCENE_EXTRACTION_DELTA_PROMPT,
     CONTRADICTION_FOLLOW_UP,
-    get_system_prompt,
+    get_compiled_system_prompt,
     build_scene_extraction_prompt,
 )
 
@@ -39,6 +61,7 @@ class SceneReconstructionAgent:
     Includes memory context from prior sessions for returning witnesses.
     """
     MAX_MODEL_STATEMENT_CHARS = 12_000
+    FULL_EXTRACTION_INTERVAL = 5  # Every Nth scene extraction re-reads the whole conversation
     
     def __init__(self, session_id: str):
         self.session_id = session_id
@@ -60,6 +83,11 @@ class SceneReconstructionAgent:
         self._pending_completion_after_required_detail: bool = False
         self.last_response_kind: str = "interview"
         self.last_response_text: str = ""
+        self.state_revision: int = 0  # Bumped each time state is published to the backend
+        self._scene_extracted_through: Optional[str] = None  # Timestamp of last turn covered by extraction
+        self._extractions_since_full: int = 0
+        self._token_ledger = TokenLedger()  # Running token total of conversation_history
+        self._rolling_context = RollingContext()  # Background summaries of older turns
         self._initialize_model()
     
     def _log_structured(self, event: str, **kwargs):
@@ -107,11 +135,21 @@ class SceneReconstructionAgent:
         if model_name:
             self._current_prompt_level = self._get_prompt_level_for_model(model_name)
 
-        selected_prompt = get_system_prompt(self._current_prompt_level)
+        selected_prompt = get_compiled_system_prompt(self._current_prompt_level).text
         if self.memory_context:
             selected_prompt = f"{selected_prompt}\n{self.memory_context}"
+        conversation_summary = summary_text(self.conversation_history)
+        if conversation_summary:
+            selected_prompt = f"{selected_prompt}\n\nEARLIER IN THIS INTERVIEW (summary):\n{conversation_summary}"
         return selected_prompt
 
+    def _selected_prompt_tokens(self) -> int:
+        """Token count of the current system prompt, using the compiled count."""
+        tokens = get_compiled_system_prompt(self._current_prompt_level).token_count
+        if self.memory_context:
+            tokens += token_estimator.estimate_tokens(self.memory_context)
+        return tokens
+
     def _extract_chat_history(self) -> List[Any]:
         """Read the SDK chat history so rebuilt chats keep prior witness context."""
         if not self.chat:
@@ -129,8 +167,20 @@ class SceneReconstructionAgent:
             return list(curated_history)
         return []
 
-    def _create_chat_session(self, model_name: str):
-        """Create a chat session with the right prompt and any existing history."""
+    def _history_from_conversation(self) -> List[Any]:
+        """Rebuild SDK chat history from stored turns (used after rehydration and summaries)."""
+        history = []
+        for msg in self.conversation_history:
+            content = msg.get("content")
+            # The rolling summary travels in the system instruction instead
+            if not content or msg.get("role") == "system":
+                continue
+            role = "model" if msg.get("role") == "assistant" else "user"
+            history.append(types.Content(role=role, parts=[types.Part.from_text(text=content)]))
+        return history
+
+    def _build_chat(self, model_name: str, history: Optional[List[Any]] = None):
+        """Build a chat session with the right prompt and the given (or existing) history."""
         create_kwargs: Dict[str, Any] = {
             "model": model_name,
             "config": {
@@ -138,12 +188,70 @@ class SceneReconstructionAgent:
                 "temperature": 0.4,
             },
         }
-        history = self._extract_chat_history()
+        if history is None:
+            history = self._extract_chat_history() if self.chat else self._history_from_conversation()
         if history:
             create_kwargs["history"] = history
-        self.chat = self.client.chats.create(**create_kwargs)
+        return self.client.chats.create(**create_kwargs)
+
+    def _create_chat_session(self, model_name: str):
+        """Create a chat session with the right prompt and any existing history."""
+        self.chat = self._build_chat(model_name)
         return self.chat
 
+    async def _send_chat_message_hedged(self, message: str, model_name: str):
+        """
+        Send a chat turn, hedging onto the next chat model if this one runs past
+        its p90 latency. If the hedge wins, its chat session (which now holds
+        the turn) replaces the current one.
+        """
+        candidates = await model_selector.get_candidate_models_for_task("chat")
+        hedge_model = next((m for m in candidates if m != model_name), None)
+        history = self._extract_chat_history() if hedge_model else None
+        hedge_chat: Dict[str, Any] = {}
+
+        def start_hedge():
+            hedge_chat["chat"] = self._build_chat(hedge_model, history=history)
+            return llm_io.run(hedge_chat["chat"].send_message, message)
+
+        response, used_model = await hedged_call(
+            "chat",
+            (model_name, lambda: llm_io.run(self.chat.send_message, message)),
+            (hedge_model, start_hedge) if hedge_model else None,
+        )
+        if used_model != model_name:
+            self.chat = hedge_chat["chat"]
+            self._log_structured("model_hedged", old_model=model_name, new_model=used_model)
+        return response
+
+    def _apply_history_summary(self) -> bool:
+        """Swap in a finished background summary and rebuild the chat on the bounded history."""
+        summarized = self._rolling_context.apply(self.conversation_history)
+        if summarized is None:
+            return False
+        folded = len(self.conversation_history) - len(summarized) + 1
+        self.conversation_history = summarized
+        if self.chat and self.client:
+            model_name = getattr(self.chat, '_model', None) or getattr(self.chat, 'model', settings.gemini_model)
+            self.chat = self._build_chat(model_name, history=self._history_from_conversation())
+        self._log_structured("history_summary_applied", messages_folded=folded,
+                             history_messages=len(summarized))
+        return True
+
+    def _schedule_history_summary(self, model_name: Optional[str]):
+        """Summarize older turns in the background once the history passes the model's budget."""
+        if not self.client:
+            return
+        task = self._rolling_context.schedule(
+            self.conversation_history,
+            self._summarize_messages,
+            history_tokens=self._token_ledger.sync(self.conversation_history),
+            model_name=model_name,
+        )
+        if task is not None:
+            self._log_structured("history_summary_scheduled", model=model_name,
+                                 history_messages=len(self.conversation_history))
+
     @staticmethod
     def _normalize_text(text: str) -> str:
         """Lowercase and normalize text for lightweight turn heuristics."""
@@ -720,10 +828,7 @@ class SceneReconstructionAgent:
             return INITIAL_GREETING
         
         template_name = str(self.template.get("name", "incident")).strip().lower()
-        return (
-            f"Hi, I'm Detective Ray. I understand you'd like to report a {template_name}. "
-            "Start wherever it makes sense, and tell me what happened."
-        )
+        return TEMPLATE_GREETING.format(template_name=template_name)
     
     async def load_witness_memories(self, witness_id: str, context_hint: str = "") -> str:
         """
@@ -880,6 +985,9 @@ class SceneReconstructionAgent:
                                      model=chat_model,
                                      prompt_level=self._current_prompt_level)
             
+            # Fold in a background summary of older turns if one finished
+            self._apply_history_summary()
+
             # Add context if this is a correction
             if is_correction:
                 statement = f"[CORRECTION] {statement}"
@@ -892,23 +1000,13 @@ class SceneReconstructionAgent:
             # Get current prompt for quota estimation
             current_prompt = self._build_selected_prompt(current_model)
             
-            # Optimize history if needed (compress older messages)
-            optimized_history = self.conversation_history
-            if len(self.conversation_history) > 6:
-                optimized_history, hist_stats = prompt_optimizer.summarize_history(
-                    self.conversation_history,
-                    max_messages=6
-                )
-                if hist_stats.tokens_saved > 0:
-                    self._log_structured("history_compressed",
-                                         tokens_saved=hist_stats.tokens_saved)
-            
             # Pre-check token quota before sending request
             quota_check, token_estimate = usage_tracker.precheck_request(
                 model_name=current_model,
                 prompt=statement_for_model,
                 system_prompt=current_prompt,
-                history=optimized_history,
+                system_prompt_tokens=self._selected_prompt_tokens(),
+                history_tokens=self._token_ledger.sync(self.conversation_history),
                 task_type="chat",
                 enforce=settings.enforce_rate_limits,
             )
@@ -939,13 +1037,23 @@ class SceneReconstructionAgent:
             
             for attempt in range(3):
                 try:
-                    response = await call_with_retry(
-                        asyncio.to_thread,
-                        self.chat.send_message,
-                        statement_for_model,
-                        model_name=current_model,
-                        task_type="chat",
-                    )
+                    if hedging_enabled("chat"):
+                        # hedged_call records quota/latency for the model that answered and
+                        # failures and rate limits for every attempt
+                        response = await call_with_retry(
+                            self._send_chat_message_hedged,
+                            statement_for_model,
+                            current_model,
+                            task_type="chat",
+                        )
+                    else:
+                        response = await call_with_retry(
+                            llm_io.run,
+                            self.chat.send_message,
+                            statement_for_model,
+                            model_name=current_model,
+                            task_type="chat",
+                        )
                     break
                 except Exception as e:
                     if self._is_retryable_model_error(e):
@@ -1033,9 +1141,8 @@ class SceneReconstructionAgent:
                 "timestamp": datetime.utcnow().isoformat()
             })
             
-            # Optimize token usage: summarize history when it gets long
-            if len(self.conversation_history) > 16:
-                await self._summarize_history()
+            # Keep the chat context bounded: summarize older turns off the reply path
+            self._schedule_history_summary(current_model)
             
             should_generate_candidate = self._should_generate_image(agent_response)
 
@@ -1150,6 +1257,8 @@ class SceneReconstructionAgent:
                                      model=chat_model,
                                      has_memory_context=bool(self.memory_context))
             
+            self._apply_history_summary()
+
             if is_correction:
                 statement = f"[CORRECTION] {statement}"
             # Wrap user input in structured boundary to prevent prompt injection
@@ -1164,7 +1273,8 @@ class SceneReconstructionAgent:
                 model_name=current_model,
                 prompt=statement_for_model,
                 system_prompt=current_prompt,
-                history=self.conversation_history,
+                system_prompt_tokens=self._selected_prompt_tokens(),
+                history_tokens=self._token_ledger.sync(self.conversation_history),
                 task_type="chat",
                 enforce=settings.enforce_rate_limits,
             )
@@ -1194,21 +1304,22 @@ class SceneReconstructionAgent:
             full_response = ""
             
             for attempt in range(3):
+                if attempt:
+                    raise_if_cancelled("chat retry")  # The witness left while we were backing off
                 try:
                     # Prefer native streaming when available; fall back to non-streaming.
                     if hasattr(self.chat, "send_message_stream"):
-                        response_stream = await asyncio.to_thread(
+                        # Chunks are read on the llm-io pool, which stops reading (and
+                        # closes the stream) once this turn's cancellation token fires
+                        async for chunk in llm_io.iterate(
                             self.chat.send_message_stream,
                             statement_for_model,
-                        )
-
-                        # Yield chunks as they arrive
-                        for chunk in response_stream:
+                        ):
                             if hasattr(chunk, 'text') and chunk.text:
                                 full_response += chunk.text
                                 yield chunk.text, False, False, None
                     else:
-                        response = await asyncio.to_thread(
+                        response = await llm_io.run(
                             self.chat.send_message,
                             statement_for_model,
                         )
@@ -1295,8 +1406,7 @@ class SceneReconstructionAgent:
                 "timestamp": datetime.utcnow().isoformat()
             })
             
-            if len(self.conversation_history) > 16:
-                await self._summarize_history()
+            self._schedule_history_summary(current_model)
             
             should_generate_candidate = self._should_generate_image(full_response)
 
@@ -1314,6 +1424,10 @@ class SceneReconstructionAgent:
             # Yield final signal with token info
             yield "", True, should_generate, token_info
         
+        except OperationCancelled:
+            # Nobody is listening any more; skip the error reply and the rest of the turn
+            self._log_structured("statement_cancelled")
+            raise
         except Exception as e:
             if self._is_retryable_model_error(e):
                 self.last_response_kind = "error"
@@ -1389,47 +1503,35 @@ class SceneReconstructionAgent:
         )
         return high_confidence_elements >= 2 or len(self.current_elements) >= 4
     
-    async def _summarize_history(self):
-        """Summarize conversation history to optimize token usage."""
-        if not self.client or len(self.conversation_history) <= 8:
-            return
-        try:
-            # Keep last 8 messages, summarize the rest
-            old_messages = self.conversation_history[:-8]
-            summary_text = "\n".join([f"{m['role']}: {m['content']}" for m in old_messages])
-            prompt = f"Summarize this witness interview conversation in 3-4 bullet points, keeping all key facts, descriptions, and details:\n\n{summary_text}"
-            
-            # Check response cache first
-            cached = await response_cache.get(prompt, context_key="summarize", threshold=0.92)
-            if cached:
-                summary, similarity = cached
-                self._log_structured("history_summarize_cached", similarity=similarity)
-            else:
-                lightweight_model = await model_selector.get_best_model_for_task("lightweight")
-                self._log_structured("history_summarize", model=lightweight_model,
-                                     messages_to_summarize=len(old_messages))
-                response = await call_with_retry(
-                    asyncio.to_thread,
-                    self.client.models.generate_content,
-                    model=lightweight_model,
-                    contents=prompt,
-                    config={"temperature": 0.1},
-                    model_name=lightweight_model,
-                    task_type="lightweight",
-                )
-                
-                summary = response.text.strip()
-                # Cache the response for similar future queries
-                await response_cache.set(prompt, summary, context_key="summarize", ttl_seconds=1800)
-            
-            # Replace old messages with summary
-            self.conversation_history = [
-                {"role": "system", "content": f"[Previous conversation summary]: {summary}", "timestamp": datetime.utcnow().isoformat()}
-            ] + self.conversation_history[-8:]
-            
-            logger.info(f"Summarized {len(old_messages)} messages into conversation summary")
-        except Exception as e:
-            logger.warning(f"Failed to summarize history: {e}")
+    async def _summarize_messages(self, messages: List[Dict[str, Any]]) -> str:
+        """Summarize older interview turns (including any earlier summary) for the rolling context."""
+        transcript = "\n".join([f"{m['role']}: {m['content']}" for m in messages])
+        prompt = f"Summarize this witness interview conversation in 3-4 bullet points, keeping all key facts, descriptions, and details:\n\n{transcript}"
+        
+        # Check response cache first
+        cached = await response_cache.get(prompt, context_key="summarize", threshold=0.92)
+        if cached:
+            summary, similarity = cached
+            self._log_structured("history_summarize_cached", similarity=similarity)
+            return summary
+        
+        lightweight_model = await model_selector.get_best_model_for_task("lightweight")
+        self._log_structured("history_summarize", model=lightweight_model,
+                             messages_to_summarize=len(messages))
+        response = await call_with_retry(
+            llm_io.run,
+            self.client.models.generate_content,
+            model=lightweight_model,
+            contents=prompt,
+            config={"temperature": 0.1},
+            model_name=lightweight_model,
+            task_type="lightweight",
+        )
+        
+        summary = response.text.strip()
+        # Cache the response for similar future queries
+        await response_cache.set(prompt, summary, context_key="summarize", ttl_seconds=1800)
+        return summary
     
     async def assess_confidence(self) -> Dict[str, Any]:
         """Assess overall witness confidence and testimony reliability.
@@ -1507,77 +1609,222 @@ class SceneReconstructionAgent:
         
         return None
     
-    async def _extract_scene_information(self):
+    def _format_turns(self, messages: List[Dict[str, Any]]) -> str:
+        return "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+
+    def _turns_since_last_extraction(self) -> List[Dict[str, Any]]:
+        """Conversation turns appended after the last scene extraction."""
+        marker = self._scene_extracted_through
+        return [
+            msg for msg in self.conversation_history
+            if msg.get("role") != "system" and (marker is None or msg.get("timestamp", "") > marker)
+        ]
+
+    def _should_extract_incrementally(self) -> bool:
+        """Incremental mode needs a prior scene and is periodically replaced by a full pass."""
+        return (
+            settings.incremental_scene_extraction_enabled
+            and self._scene_extracted_through is not None
+            and bool(self.current_elements or self.scene_description)
+            and self._extractions_since_full < self.FULL_EXTRACTION_INTERVAL - 1
+        )
+
+    def _build_full_extraction_prompt(self) -> Tuple[str, str]:
+        """Build the whole-conversation extraction prompt.
+        
+        Returns:
+            Tuple of (prompt, cache_payload) where cache_payload is only the
+            session-specific part of the prompt
+        """
+        conversation_text = self._format_turns(self.conversation_history)
+        
+        # Detect incident type hints from conversation for selecting relevant examples
+        detected_incident_type = self._detect_incident_type_from_conversation(conversation_text)
+        
+        # Build extraction prompt with few-shot examples
+        base_prompt = build_scene_extraction_prompt(
+            include_examples=True,
+            incident_type=detected_incident_type,
+            compact=False  # Use full examples for better accuracy
+        )
+        
+        prompt = f"""{base_prompt}
+
+Analyze this witness interview and extract all scene information.
+
+Conversation:
+{conversation_text}
+
+Extract every detail mentioned: people, vehicles, objects, locations, timeline, environmental conditions.
+
+{SCENE_CONFIDENCE_GUIDELINES}"""
+        return prompt, f"{detected_incident_type or ''}\n{conversation_text}"
+
+    def _build_incremental_extraction_prompt(self, new_turns: List[Dict[str, Any]]) -> Tuple[str, str]:
+        """Build a prompt holding the current structured scene plus only the new turns."""
+        current_scene = {
+            "scene_description": self.scene_description,
+            "elements": [
+                {
+                    "ref": f"e{i}",
+                    "type": elem.type,
+                    "description": elem.description,
+                    "position": elem.position,
+                    "color": elem.color,
+                    "size": elem.size,
+                    "confidence": elem.confidence,
+                }
+                for i, elem in enumerate(self.current_elements)
+            ],
+        }
+        current_scene_json = json.dumps(current_scene, separators=(",", ":"))
+        new_turns_text = self._format_turns(new_turns)
+        prompt = SCENE_EXTRACTION_DELTA_PROMPT.format(
+            current_scene=current_scene_json,
+            new_turns=new_turns_text,
+        )
+        return prompt, f"{current_scene_json}\n{new_turns_text}"
+
+    def _next_element_index(self) -> int:
+        indices = [
+            int(elem.id.rsplit("_", 1)[-1])
+            for elem in self.current_elements
+            if elem.id.rsplit("_", 1)[-1].isdigit()
+        ]
+        return max(indices, default=-1) + 1
+
+    def _apply_scene_patch(self, patch: SceneExtractionPatch) -> Dict[str, Any]:
+        """Merge an incremental extraction into the current scene.
+        
+        Returns:
+            Scene dict containing only the touched elements, for contradiction checks
+        """
+        if patch.scene_description:
+            self.scene_description = patch.scene_description
+        
+        by_ref = {f"e{i}": elem for i, elem in enumerate(self.current_elements)}
+        removed = {by_ref[ref].id for ref in patch.removed_elements if ref in by_ref}
+        next_index = self._next_element_index()
+        
+        for elem_data in patch.elements:
+            confidence = elem_data.confidence
+            needs_review = confidence < settings.confidence_threshold
+            existing = by_ref.get(elem_data.ref or "")
+            if existing is not None:
+                existing.type = elem_data.type or existing.type
+                existing.description = elem_data.description or existing.description
+                existing.position = elem_data.position or existing.position
+                existing.color = elem_data.color or existing.color
+                existing.size = elem_data.size or existing.size
+                existing.confidence = confidence
+                existing.needs_review = needs_review
+                existing.timestamp = datetime.utcnow()
+                removed.discard(existing.id)
+                continue
+            self.current_elements.append(SceneElement(
+                id=f"elem_{self.session_id}_{next_index}",
+                type=elem_data.type,
+                description=elem_data.description,
+                position=elem_data.position,
+                color=elem_data.color,
+                size=elem_data.size,
+                confidence=confidence,
+                needs_review=needs_review,
+                relationships=[],
+                evidence_tags=[]
+            ))
+            next_index += 1
+        
+        if removed:
+            self.current_elements = [e for e in self.current_elements if e.id not in removed]
+        
+        return {"elements": [e.model_dump(exclude={"ref"}) for e in patch.elements]}
+
+    def _replace_scene(self, scene_data: SceneExtractionResponse):
+        """Rebuild the scene from a full extraction."""
+        self.scene_description = scene_data.scene_description
+        
+        # Update elements from structured response with confidence thresholds
+        self.current_elements = []
+        for i, elem_data in enumerate(scene_data.elements):
+            confidence = elem_data.confidence
+            # Flag for review if below confidence threshold
+            needs_review = confidence < settings.confidence_threshold
+            element = SceneElement(
+                id=f"elem_{self.session_id}_{i}",
+                type=elem_data.type,
+                description=elem_data.description,
+                position=elem_data.position,
+                color=elem_data.color,
+                size=elem_data.size,
+                confidence=confidence,
+                needs_review=needs_review,
+                relationships=[],
+                evidence_tags=[]
+            )
+            self.current_elements.append(element)
+
+    async def _extract_scene_information(self, force_full: bool = False):
         """
         Extract structured scene information from the conversation.
         Uses Gemini's structured JSON output mode with Pydantic schema for
         reliable, parseable responses that reduce token waste.
+        
+        Between periodic full passes only the turns added since the last
+        extraction are sent, together with the current structured scene, and
+        the returned element patch is merged in.
         Uses response cache for similar conversations to reduce API calls.
         """
         if not self.client:
             return
         
         try:
-            # Create a summary of the conversation
-            conversation_text = "\n".join([
-                f"{msg['role']}: {msg['content']}"
-                for msg in self.conversation_history
-            ])
-            
-            # Detect incident type hints from conversation for selecting relevant examples
-            detected_incident_type = self._detect_incident_type_from_conversation(conversation_text)
+            new_turns = self._turns_since_last_extraction()
+            incremental = not force_full and self._should_extract_incrementally()
+            if incremental and not new_turns:
+                return
             
-            # Build extraction prompt with few-shot examples
-            base_prompt = build_scene_extraction_prompt(
-                include_examples=True,
-                incident_type=detected_incident_type,
-                compact=False  # Use full examples for better accuracy
+            if incremental:
+                extraction_prompt, cache_payload = self._build_incremental_extraction_prompt(new_turns)
+                response_schema = SceneExtractionPatch
+            else:
+                extraction_prompt, cache_payload = self._build_full_extraction_prompt()
+                response_schema = SceneExtractionResponse
+            mode = "incremental" if incremental else "full"
+            cache_context = f"scene_extraction:{mode}"
+            extracted_through = max(
+                (msg.get("timestamp", "") for msg in new_turns),
+                default=self._scene_extracted_through,
             )
             
-            extraction_prompt = f"""{base_prompt}
-
-Analyze this witness interview and extract all scene information.
-
-Conversation:
-{conversation_text}
-
-Extract every detail mentioned: people, vehicles, objects, locations, timeline, environmental conditions.
-
-CONFIDENCE SCORING GUIDELINES (0.0-1.0):
-- 0.9-1.0: Very specific details with exact values (e.g., "red Honda Civic", "6 feet tall")
-- 0.7-0.9: Clear descriptions with some specifics (e.g., "dark colored sedan", "about 30 years old")
-- 0.5-0.7: General descriptions lacking details (e.g., "a car", "a man")
-- 0.3-0.5: Vague or uncertain mentions (e.g., "I think there was a car", "maybe someone")
-- 0.0-0.3: Highly uncertain or contradicted information
-
-Rate each element and timeline event confidence based on specificity and witness certainty.
-Items with confidence below 0.7 will be flagged for review."""
-            
-            # Check response cache first for similar scene extraction requests
+            # Check response cache using only the session-specific payload, not the shared preamble
             cached = await response_cache.get(
-                extraction_prompt, 
-                context_key="scene_extraction", 
-                threshold=0.93
+                cache_payload, 
+                context_key=cache_context, 
+                threshold=0.98
             )
             
             if cached:
                 response_text, similarity = cached
-                self._log_structured("scene_extraction_cached", similarity=similarity)
+                self._log_structured("scene_extraction_cached", similarity=similarity, extraction=mode)
             else:
                 # Use best model for scene extraction
                 scene_model = await model_selector.get_best_model_for_task("scene")
-                self._log_structured("scene_extraction_started", model=scene_model, mode="structured_output")
+                extraction_tokens_in = self._estimate_tokens(extraction_prompt)
+                self._log_structured("scene_extraction_started", model=scene_model, mode="structured_output",
+                                     extraction=mode, prompt_tokens=extraction_tokens_in,
+                                     new_turns=len(new_turns))
                 
                 # Use structured JSON output mode with Pydantic schema
                 response = await call_with_retry(
-                    asyncio.to_thread,
+                    llm_io.run,
                     self.client.models.generate_content,
                     model=scene_model,
                     contents=extraction_prompt,
                     config=types.GenerateContentConfig(
                         temperature=0.3,
                         response_mime_type="application/json",
-                        response_json_schema=SceneExtractionResponse,
+                        response_json_schema=response_schema,
                     ),
                     model_name=scene_model,
                     task_type="scene",
@@ -1590,7 +1837,6 @@ Items with confidence below 0.7 will be flagged for review."""
                 response_text = response.text
                 
                 # Track usage for extraction
-                extraction_tokens_in = self._estimate_tokens(extraction_prompt)
                 extraction_tokens_out = self._estimate_tokens(response_text)
                 usage_tracker.record_request(
                     model_name=scene_model,
@@ -1600,45 +1846,32 @@ Items with confidence below 0.7 will be flagged for review."""
                 
                 # Cache the response for similar future extractions
                 await response_cache.set(
-                    extraction_prompt, 
+                    cache_payload, 
                     response_text, 
-                    context_key="scene_extraction", 
+                    context_key=cache_context, 
                     ttl_seconds=3600
                 )
             
             # Parse structured response - guaranteed valid JSON matching schema
             try:
-                scene_data = SceneExtractionResponse.model_validate_json(response_text)
-                
-                # Update scene description
-                self.scene_description = scene_data.scene_description
-                
-                # Update elements from structured response with confidence thresholds
-                self.current_elements = []
-                for i, elem_data in enumerate(scene_data.elements):
-                    confidence = elem_data.confidence
-                    # Flag for review if below confidence threshold
-                    needs_review = confidence < settings.confidence_threshold
-                    element = SceneElement(
-                        id=f"elem_{self.session_id}_{i}",
-                        type=elem_data.type,
-                        description=elem_data.description,
-                        position=elem_data.position,
-                        color=elem_data.color,
-                        size=elem_data.size,
-                        confidence=confidence,
-                        needs_review=needs_review,
-                        relationships=[],
-                        evidence_tags=[]
-                    )
-                    self.current_elements.append(element)
+                if incremental:
+                    patch = SceneExtractionPatch.model_validate_json(response_text)
+                    contradiction_input = self._apply_scene_patch(patch)
+                    self._extractions_since_full += 1
+                else:
+                    scene_data = SceneExtractionResponse.model_validate_json(response_text)
+                    self._replace_scene(scene_data)
+                    contradiction_input = scene_data.model_dump()
+                    self._extractions_since_full = 0
+                self._scene_extracted_through = extracted_through
                 
                 # Log elements flagged for review
                 review_count = sum(1 for e in self.current_elements if e.needs_review)
                 self._log_structured("scene_updated",
                                      elements_count=len(self.current_elements),
                                      needs_review_count=review_count,
-                                     mode="structured_output")
+                                     mode="structured_output",
+                                     extraction=mode)
                 
                 # Auto-detect relationships from latest statement
                 if self.conversation_history:
@@ -1657,7 +1890,7 @@ Items with confidence below 0.7 will be flagged for review."""
                             relationship_tracker.add_relationship(rel)
                             # Link relationship IDs to elements
                             for elem in self.current_elements:
-                                if elem.id == rel.element_a_id or elem.id == rel.element_b_id:
+                                if (elem.id == rel.element_a_id or elem.id == rel.element_b_id) and rel.id not in elem.relationships:
                                     elem.relationships.append(rel.id)
                         
                         logger.info(f"Detected {len(detected_rels)} relationships")
@@ -1671,7 +1904,7 @@ Items with confidence below 0.7 will be flagged for review."""
                         logger.info(f"Auto-tagged {len(self.current_elements)} elements with evidence categories")
                 
                 # Detect contradictions using structured data
-                await self._detect_contradictions(scene_data.model_dump())
+                await self._detect_contradictions(contradiction_input)
             
             except Exception as e:
                 logger.warning(f"Failed to parse structured scene extraction: {e}")
@@ -1859,7 +2092,7 @@ Items with confidence below 0.7 will be flagged for review."""
         word_count = len(words)
         
         # Count special characters that typically become separate tokens
-        special_chars = sum(1 for c in text if c in "{}[]()<>.,;:!?\"'`@#$%^&*")
+        special_chars = count_special_chars(text)
         
         # Estimate: ~0.75 tokens per word + special chars
         # This is more accurate than the 1 token per 4 characters rule
@@ -1874,6 +2107,8 @@ Items with confidence below 0.7 will be flagged for review."""
                              elements_count=len(self.current_elements),
                              branching_path=interview_branching.get_branching_path(self.session_id))
         self.conversation_history = []
+        self._token_ledger.reset()
+        self._rolling_context.reset()
         self.current_elements = []
         self.scene_description = ""
         self.contradictions = []
@@ -1890,7 +2125,52 @@ Items with confidence below 0.7 will be flagged for review."""
         timeline_disambiguator.reset_session(self.session_id)
         self._pending_timeline_clarification = None
         self._timeline_events = []
+        self._scene_extracted_through = None
+        self._extractions_since_full = 0
     
+    def export_state(self) -> Dict[str, Any]:
+        """Serialize interview state so another worker can rehydrate this agent."""
+        return {
+            "revision": self.state_revision,
+            "conversation_history": self.conversation_history,
+            "current_elements": [elem.model_dump(mode="json") for elem in self.current_elements],
+            "scene_description": self.scene_description,
+            "contradictions": self.contradictions,
+            "key_facts": self.key_facts,
+            "template": self.template,
+            "detected_topics": self.detected_topics,
+            "memory_context": self.memory_context,
+            "active_witness_id": self.active_witness_id,
+            "prompt_level": self._current_prompt_level,
+            "timeline_events": self._timeline_events,
+            "pending_completion": self._pending_completion_after_required_detail,
+            "last_response_kind": self.last_response_kind,
+            "last_response_text": self.last_response_text,
+            "scene_extracted_through": self._scene_extracted_through,
+            "extractions_since_full": self._extractions_since_full,
+        }
+
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        """Load state produced by ``export_state``; the chat is rebuilt lazily from history."""
+        self.state_revision = int(state.get("revision", 0))
+        self.conversation_history = list(state.get("conversation_history") or [])
+        self.current_elements = [SceneElement(**elem) for elem in state.get("current_elements") or []]
+        self.scene_description = state.get("scene_description", "")
+        self.contradictions = list(state.get("contradictions") or [])
+        self.key_facts = dict(state.get("key_facts") or {})
+        self.template = state.get("template")
+        self.detected_topics = list(state.get("detected_topics") or [])
+        self.memory_context = state.get("memory_context", "")
+        self.active_witness_id = state.get("active_witness_id")
+        self._current_prompt_level = state.get("prompt_level", "full")
+        self._timeline_events = list(state.get("timeline_events") or [])
+        self._pending_completion_after_required_detail = bool(state.get("pending_completion"))
+        self.last_response_kind = state.get("last_response_kind", "interview")
+        self.last_response_text = state.get("last_response_text", "")
+        self._scene_extracted_through = state.get("scene_extracted_through")
+        self._extractions_since_full = int(state.get("extractions_since_full", 0))
+        self.chat = None
+
     def get_timeline_disambiguation_prompt(self) -> Optional[Dict[str, Any]]:
         """
         Check if timeline disambiguation is needed and return a clarifying question.
@@ -2029,18 +2309,228 @@ Items with confidence below 0.7 will be flagged for review."""
         self.reset()
 
 
-# Agent instance cache
-_agent_cache: Dict[str, SceneReconstructionAgent] = {}
-
-
-def get_agent(session_id: str) -> SceneReconstructionAgent:
-    """Get or create an agent for a session."""
-    if session_id not in _agent_cache:
-        _agent_cache[session_id] = SceneReconstructionAgent(session_id)
-    return _agent_cache[session_id]
+# Agent instance cache (per worker), least recently used first. When the state
+# backend is shared, each agent's interview state is also published there so any
+# worker can rehydrate it. The cache is bounded by count, idle time and an
+# approximate memory budget; evicted agents are serialized into their session
+# record (metadata["agent_state"]) and rehydrated on the next lookup.
+_agent_cache: "OrderedDict[str, SceneReconstructionAgent]" = OrderedDict()
+_agent_last_used: Dict[str, float] = {}
+_pinned_agents: set = set()
+_evicted_snapshots: Dict[str, Dict[str, Any]] = {}  # awaiting persistence
+_agent_registry_stats = {"created": 0, "rehydrated": 0, "evicted": 0, "persisted": 0, "dropped": 0}
+AGENT_STATE_NAMESPACE = "scene_agent_state"
+SESSION_AGENT_STATE_KEY = "agent_state"
+SNAPSHOT_PERSIST_ATTEMPTS = 4
+SNAPSHOT_RETRY_BASE_SECONDS = 1.0
+AGENT_BASE_BYTES = 16 * 1024  # model handles, branching state, bookkeeping
+AGENT_ELEMENT_BYTES = 512
+
+
+def _estimate_agent_bytes(agent: SceneReconstructionAgent) -> int:
+    """Rough in-memory footprint of an agent, dominated by conversation text."""
+    history_bytes = sum(len(str(msg.get("content", ""))) for msg in agent.conversation_history)
+    if agent.chat is not None:
+        history_bytes *= 2  # the chat session keeps its own copy of the turns
+    return (
+        AGENT_BASE_BYTES
+        + history_bytes
+        + len(agent.scene_description)
+        + len(agent.memory_context)
+        + AGENT_ELEMENT_BYTES * (len(agent.current_elements) + len(agent.contradictions))
+    )
+
+
+def _snapshot_from_session(session: Any) -> Optional[Dict[str, Any]]:
+    if getattr(session, "status", "active") != "active":
+        return None  # completed/archived interviews are not resumed
+    metadata = getattr(session, "metadata", None) or {}
+    snapshot = metadata.get(SESSION_AGENT_STATE_KEY)
+    return snapshot if isinstance(snapshot, dict) else None
+
+
+def _evict_agent(session_id: str) -> None:
+    agent = _agent_cache.pop(session_id, None)
+    _agent_last_used.pop(session_id, None)
+    if agent is None:
+        return
+    _agent_registry_stats["evicted"] += 1
+    if not agent.conversation_history:
+        return  # nothing worth keeping
+    snapshot = agent.export_state()
+    _evicted_snapshots[session_id] = snapshot
+    # Bounded like the cache: if the store stays unreachable, the oldest pending
+    # snapshots are dropped rather than accumulating without limit.
+    while len(_evicted_snapshots) > settings.agent_cache_max_agents:
+        _evicted_snapshots.pop(next(iter(_evicted_snapshots)))
+        _agent_registry_stats["dropped"] += 1
+    try:
+        asyncio.get_running_loop().create_task(_persist_evicted_state(session_id, snapshot))
+    except RuntimeError:
+        pass  # No loop (scripts/tests): the snapshot stays in memory until rehydrated
+
+
+async def _persist_evicted_state(session_id: str, snapshot: Dict[str, Any]) -> None:
+    """Write an evicted agent's state into its session record, retrying with backoff."""
+    from app.services.firestore import firestore_service
+
+    for attempt in range(SNAPSHOT_PERSIST_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(SNAPSHOT_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+        if _evicted_snapshots.get(session_id) is not snapshot:
+            return  # rehydrated, removed or evicted again before we got here
+        try:
+            # Only this key is written, so a concurrent update to the session is not lost
+            persisted = await firestore_service.update_session_metadata(
+                session_id, SESSION_AGENT_STATE_KEY, snapshot
+            )
+        except Exception as e:
+            logger.warning(f"Failed to persist evicted agent state for {session_id}: {e}")
+            continue
+        if _evicted_snapshots.get(session_id) is snapshot:
+            del _evicted_snapshots[session_id]
+        if persisted:
+            _agent_registry_stats["persisted"] += 1
+        return
+    if _evicted_snapshots.get(session_id) is snapshot:
+        del _evicted_snapshots[session_id]
+        _agent_registry_stats["dropped"] += 1
+        logger.warning(f"Dropped evicted agent state for {session_id} after {SNAPSHOT_PERSIST_ATTEMPTS} attempts")
+
+
+async def _clear_persisted_state(session_id: str) -> None:
+    """Drop ``metadata["agent_state"]`` from a session that no longer has an agent."""
+    try:
+        from app.services.firestore import firestore_service
+
+        await firestore_service.remove_session_metadata_key(session_id, SESSION_AGENT_STATE_KEY)
+    except Exception as e:
+        logger.warning(f"Failed to clear persisted agent state for {session_id}: {e}")
+
+
+def _enforce_agent_limits(keep: str) -> None:
+    """Evict least recently used agents until the count and memory budget fit."""
+    max_agents = settings.agent_cache_max_agents
+    budget = settings.agent_cache_memory_budget_mb * 1024 * 1024
+    sizes = {sid: _estimate_agent_bytes(agent) for sid, agent in _agent_cache.items()}
+    total = sum(sizes.values())
+    for sid in list(_agent_cache):
+        if len(_agent_cache) <= max_agents and total <= budget:
+            break
+        if sid == keep or sid in _pinned_agents:
+            continue
+        total -= sizes[sid]
+        _evict_agent(sid)
+
+
+def evict_idle_agents(now: Optional[float] = None) -> int:
+    """Evict unpinned agents idle longer than the configured TTL; returns how many."""
+    cutoff = (now if now is not None else time.monotonic()) - settings.agent_cache_idle_ttl_seconds
+    idle = [
+        sid for sid in _agent_cache
+        if sid not in _pinned_agents and _agent_last_used.get(sid, 0) <= cutoff
+    ]
+    for sid in idle:
+        _evict_agent(sid)
+    if idle:
+        logger.info(f"Evicted {len(idle)} idle scene agents ({len(_agent_cache)} cached)")
+    return len(idle)
+
+
+def get_agent(session_id: str, session: Any = None) -> SceneReconstructionAgent:
+    """Get or create an agent for a session, refreshing from shared state if newer.
+
+    An agent that was evicted is rehydrated from its pending snapshot or, when
+    the caller passes the session record, from ``metadata["agent_state"]``.
+    """
+    agent = _agent_cache.get(session_id)
+    inserted = agent is None
+    backend = get_state_backend()
+    if backend.shared:
+        snapshot = backend.get(AGENT_STATE_NAMESPACE, session_id)
+        if snapshot and (agent is None or snapshot.get("revision", 0) > agent.state_revision):
+            agent = agent or SceneReconstructionAgent(session_id)
+            agent.restore_state(snapshot)
+            _agent_cache[session_id] = agent
+    if agent is None:
+        agent = SceneReconstructionAgent(session_id)
+        snapshot = _evicted_snapshots.pop(session_id, None) or _snapshot_from_session(session)
+        if snapshot:
+            agent.restore_state(snapshot)
+            _agent_registry_stats["rehydrated"] += 1
+        else:
+            _agent_registry_stats["created"] += 1
+        _agent_cache[session_id] = agent
+    _agent_cache.move_to_end(session_id)
+    _agent_last_used[session_id] = time.monotonic()
+    if inserted:
+        _enforce_agent_limits(keep=session_id)
+    return agent
+
+
+async def load_agent(session_id: str, session: Any = None) -> SceneReconstructionAgent:
+    """Like ``get_agent``, but loads the session record when the agent was evicted."""
+    if session is None and session_id not in _agent_cache and session_id not in _evicted_snapshots:
+        from app.services.firestore import firestore_service
+
+        session = await firestore_service.get_session(session_id)
+    return get_agent(session_id, session=session)
+
+
+def pin_agent(agent: SceneReconstructionAgent) -> None:
+    """Keep an agent cached while something (e.g. a live WebSocket) holds it."""
+    _pinned_agents.add(agent.session_id)
+    _agent_cache[agent.session_id] = agent
+    _agent_last_used[agent.session_id] = time.monotonic()
+
+
+def get_agent_registry_stats() -> Dict[str, Any]:
+    """Cache size, estimated memory and eviction counters."""
+    return {
+        "cached_agents": len(_agent_cache),
+        "pinned_agents": len(_pinned_agents),
+        "pending_snapshots": len(_evicted_snapshots),
+        "estimated_bytes": sum(_estimate_agent_bytes(agent) for agent in _agent_cache.values()),
+        "max_agents": settings.agent_cache_max_agents,
+        "memory_budget_mb": settings.agent_cache_memory_budget_mb,
+        "idle_ttl_seconds": settings.agent_cache_idle_ttl_seconds,
+        **_agent_registry_stats,
+    }
+
+
+def save_agent_state(agent: SceneReconstructionAgent) -> None:
+    """Publish an agent's interview state after a turn (no-op for the in-process backend)."""
+    backend = get_state_backend()
+    if not backend.shared:
+        return
+    try:
+        agent.state_revision += 1
+        backend.set(
+            AGENT_STATE_NAMESPACE,
+            agent.session_id,
+            agent.export_state(),
+            ttl_seconds=SESSION_STATE_TTL_SECONDS,
+        )
+    except Exception as e:
+        logger.warning(f"Failed to publish agent state for {agent.session_id}: {e}")
 
 
 def remove_agent(session_id: str):
-    """Remove an agent from the cache."""
-    if session_id in _agent_cache:
-        del _agent_cache[session_id]
+    """Remove an agent from the cache and forget its persisted interview state.
+
+    Called when a session is completed, closed or deleted, so a later lookup
+    starts a fresh interview instead of rehydrating the old transcript.
+    """
+    agent = _agent_cache.pop(session_id, None)
+    if agent is not None:
+        agent._rolling_context.reset()
+    _agent_last_used.pop(session_id, None)
+    _pinned_agents.discard(session_id)
+    _evicted_snapshots.pop(session_id, None)
+    backend = get_state_backend()
+    if backend.shared:
+        backend.delete(AGENT_STATE_NAMESPACE, session_id)
+    try:
+        asyncio.get_running_loop().create_task(_clear_persisted_state(session_id))
+    except RuntimeError:
+        pass  # No loop: nothing was persisted by this process
@@ -2,26 +2,27 @@
 Admin authentication module
 Simple password-based authentication for admin portal
 """
-import asyncio
 import os
 import secrets
 import time
 import bcrypt
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Optional
-from fastapi import HTTPException, Header
+from fastapi import HTTPException, Header, Response
 import logging
 
 from app.config import settings
+from app.services.state_backend import get_state_backend, run_state_io
+from app.services.executors import crypto
 
 logger = logging.getLogger(__name__)
 
-# Session store: token → {user_id, username, role, created_at}
-active_sessions: Dict[str, Dict] = {}
-_session_lock = asyncio.Lock()
+# Session store namespace: token → {user_id, username, role, created_at}
+SESSION_NAMESPACE = "admin_sessions"
 
 # Session expiry
 SESSION_EXPIRY_HOURS = 24
+SESSION_TTL_SECONDS = SESSION_EXPIRY_HOURS * 3600
 
 # Bcrypt hashed password (hashed on first use from settings)
 _hashed_password = None
@@ -59,55 +60,48 @@ def check_rate_limit(client_ip: str) -> bool:
 async def create_session(user_id: str = "superadmin", username: str = "admin", role: str = "admin") -> str:
     """Create a new session token with user info."""
     token = secrets.token_urlsafe(32)
-    async with _session_lock:
-        active_sessions[token] = {
-            "user_id": user_id,
-            "username": username,
-            "role": role,
-            "created_at": datetime.now(timezone.utc),
-        }
+    await run_state_io(get_state_backend().set, SESSION_NAMESPACE, token, {
+        "user_id": user_id,
+        "username": username,
+        "role": role,
+        "created_at": datetime.now(timezone.utc),
+    }, ttl_seconds=SESSION_TTL_SECONDS)
     logger.info(f"Created session for {username}: {token[:8]}...")
     return token
 
 
 async def validate_session(token: str) -> Optional[Dict]:
     """Validate session. Returns session dict with user info, or None."""
-    async with _session_lock:
-        if token not in active_sessions:
-            return None
-        session = active_sessions[token]
-        if datetime.now(timezone.utc) - session["created_at"] > timedelta(hours=SESSION_EXPIRY_HOURS):
-            del active_sessions[token]
-            logger.info(f"Session expired: {token[:8]}...")
-            return None
-        # Keep-alive
-        session["created_at"] = datetime.now(timezone.utc)
-        return session
-
-
-async def _revoke_session_locked(token: str) -> bool:
-    async with _session_lock:
-        if token in active_sessions:
-            del active_sessions[token]
-            logger.info(f"Revoked session: {token[:8]}...")
-            return True
-    return False
+    return await run_state_io(_validate_session, token)
+
+
+def _validate_session(token: str) -> Optional[Dict]:
+    backend = get_state_backend()
+    session = backend.get(SESSION_NAMESPACE, token)
+    if session is None:
+        return None
+    if datetime.now(timezone.utc) - session["created_at"] > timedelta(hours=SESSION_EXPIRY_HOURS):
+        backend.delete(SESSION_NAMESPACE, token)
+        logger.info(f"Session expired: {token[:8]}...")
+        return None
+    # Keep-alive
+    session["created_at"] = datetime.now(timezone.utc)
+    backend.set(SESSION_NAMESPACE, token, session, ttl_seconds=SESSION_TTL_SECONDS)
+    return session
 
 
 def revoke_session(token: str) -> bool:
     """Revoke an admin session."""
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        return asyncio.run(_revoke_session_locked(token))
-    existed = token in active_sessions
-    loop.create_task(_revoke_session_locked(token))
+    existed = get_state_backend().delete(SESSION_NAMESPACE, token)
+    if existed:
+        logger.info(f"Revoked session: {token[:8]}...")
     return existed
 
 
 async def authenticate(password: str) -> Optional[str]:
     """Legacy: authenticate with just admin password (superadmin fallback)."""
-    if bcrypt.checkpw(password.encode('utf-8'), _get_hashed_password()):
+    hashed = await crypto.run(_get_hashed_password)
+    if await crypto.run(bcrypt.checkpw, password.encode('utf-8'), hashed):
         return await create_session(user_id="superadmin", username="admin", role="admin")
     return None
 
@@ -123,15 +117,10 @@ async def authenticate_user_credentials(username: str, password: str) -> Optiona
 
 
 async def cleanup_expired_sessions():
-    """Remove expired sessions from memory."""
-    now = datetime.now(timezone.utc)
-    async with _session_lock:
-        expired = [token for token, session in active_sessions.items()
-                   if (now - session.get("created_at", now)).total_seconds() > SESSION_EXPIRY_HOURS * 3600]
-        for token in expired:
-            del active_sessions[token]
+    """Remove expired sessions from the state backend."""
+    expired = await run_state_io(get_state_backend().purge_expired, SESSION_NAMESPACE)
     if expired:
-        logger.info(f"Cleaned up {len(expired)} expired sessions")
+        logger.info(f"Cleaned up {expired} expired sessions")
 
 
 async def require_admin_auth(authorization: Optional[str] = Header(None)) -> Dict:
@@ -149,10 +138,7 @@ async def require_admin_auth(authorization: Optional[str] = Header(None)) -> Dic
 
 
 # ─── Per-API-key rate limiter ─────────────────────────────
-_api_key_requests: Dict[str, list] = {}  # key_id -> [timestamps]
-
-
-async def require_api_key(x_api_key: Optional[str] = Header(None)) -> Dict:
+async def require_api_key(response: Response, x_api_key: Optional[str] = Header(None)) -> Dict:
     """Dependency that validates an X-API-Key header and enforces per-key rate limits."""
     if not x_api_key:
         raise HTTPException(status_code=401, detail="Missing X-API-Key header")
@@ -163,19 +149,19 @@ async def require_api_key(x_api_key: Optional[str] = Header(None)) -> Dict:
     if key_meta is None:
         raise HTTPException(status_code=401, detail="Invalid or revoked API key")
 
-    # Per-key rate limiting
-    key_id = key_meta["id"]
-    rpm = key_meta.get("rate_limit_rpm", 30)
-    now = time.time()
-    window = _api_key_requests.setdefault(key_id, [])
-    cutoff = now - 60
-    _api_key_requests[key_id] = [t for t in window if t > cutoff]
-    if len(_api_key_requests[key_id]) >= rpm:
+    # Per-key token bucket
+    limit = api_key_service.consume_rate_limit(key_meta["id"], key_meta.get("rate_limit_rpm", 30))
+    headers = {
+        "X-RateLimit-Limit": str(limit["limit"]),
+        "X-RateLimit-Remaining": str(limit["remaining"]),
+        "X-RateLimit-Reset": str(limit["reset"]),
+    }
+    if not limit["allowed"]:
         raise HTTPException(
             status_code=429,
             detail="API key rate limit exceeded",
-            headers={"Retry-After": "60"},
+            headers={**headers, "Retry-After": str(limit["retry_after"])},
         )
-    _api_key_requests[key_id].append(now)
+    response.headers.update(headers)
 
     return key_meta
@@ -68,19 +68,32 @@ from app.services.image_gen import image_service
 from app.services.usage_tracker import usage_tracker
 from app.services.token_estimator import token_estimator, TokenEstimate, QuotaCheckResult
 from app.services.case_manager import case_manager
+from app.services.orphan_assignment import orphan_assignment_pipeline
 from app.services.priority_scoring import priority_scoring_service
 from app.services.interview_templates import get_all_templates, get_template, get_templates_by_category
 from app.services.tts_service import tts_service
 from app.services.custody_chain import custody_chain_service
 from app.services.spatial_validation import spatial_validator, validate_scene_spatial, get_spatial_corrections
 from app.services.model_selector import generate_content_with_fallback, model_selector
+from app.services.executors import get_executor_stats, llm_io
+from app.services.cancellation import get_cancellation_stats
+from app.services.enrichment_scheduler import enrichment_scheduler
+from app.services.conversation_context import get_context_stats
+from app.services.state_journal import state_journal
 from app.services.imagen_service import imagen_service
 from app.services.api_key_manager import get_genai_client, get_key_manager
-from app.agents.scene_agent import get_agent, remove_agent
+from app.agents.scene_agent import (
+    SESSION_AGENT_STATE_KEY,
+    get_agent_registry_stats,
+    load_agent,
+    remove_agent,
+    save_agent_state,
+)
 from app.config import settings
 from app.api.auth import authenticate, require_admin_auth, revoke_session, check_rate_limit, require_api_key, authenticate_user_credentials
 from app.api.auth import create_session as create_auth_session
 from app.services.api_key_service import api_key_service
+from app.services.state_backend import get_state_backend, run_state_io
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -165,6 +178,16 @@ def _is_empty_session_noise(session: ReconstructionSession) -> bool:
     return True
 
 
+def _public_metadata(metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Session metadata minus internal keys (the evicted agent's interview state)."""
+    return {k: v for k, v in (metadata or {}).items() if k != SESSION_AGENT_STATE_KEY}
+
+
+def _public_session(session: ReconstructionSession) -> ReconstructionSession:
+    """Copy of a session that is safe to return from the API."""
+    return session.model_copy(update={"metadata": _public_metadata(session.metadata)})
+
+
 async def _resolve_generated_image_record(
     entity_type: str,
     entity_id: str,
@@ -403,7 +426,7 @@ async def _generate_report_summary_text(session: ReconstructionSession) -> Tuple
         try:
             client = get_genai_client()
             model = await model_selector.get_best_model_for_task("analysis")
-            response = await asyncio.to_thread(
+            response = await llm_io.run(
                 client.models.generate_content,
                 model=model,
                 contents=_build_report_summary_prompt(report_text),
@@ -647,10 +670,12 @@ async def run_background_task(task_id: str, coro, task_type: Optional[str] = Non
 # ── SSE event system ──────────────────────────────────────
 
 _sse_subscribers: List[asyncio.Queue] = []
+_SSE_CHANNEL = "sse"
+_sse_relay_task: Optional[asyncio.Task] = None
 
-async def publish_event(event_type: str, data: dict):
-    """Publish an event to all SSE subscribers."""
-    message = f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _fan_out_sse(message: str):
+    """Deliver a formatted SSE message to this worker's subscribers."""
     for queue in _sse_subscribers[:]:
         try:
             queue.put_nowait(message)
@@ -658,6 +683,37 @@ async def publish_event(event_type: str, data: dict):
             _sse_subscribers.remove(queue)
 
 
+async def publish_event(event_type: str, data: dict):
+    """Publish an event to all SSE subscribers (on every worker when state is shared)."""
+    message = f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+    backend = get_state_backend()
+    if backend.shared:
+        backend.publish(_SSE_CHANNEL, message)
+    else:
+        _fan_out_sse(message)
+
+
+async def _sse_relay_loop():
+    """Relay events published by any worker to this worker's SSE subscribers."""
+    backend = get_state_backend()
+    last_id = backend.latest_event_id(_SSE_CHANNEL)
+    while _sse_subscribers:
+        await asyncio.sleep(0.5)
+        try:
+            for event_id, message in backend.read_events(_SSE_CHANNEL, last_id):
+                last_id = event_id
+                _fan_out_sse(message)
+        except Exception as e:
+            logger.debug(f"SSE relay read failed: {e}")
+
+
+def _ensure_sse_relay():
+    """Start the cross-worker SSE relay when the state backend is shared."""
+    global _sse_relay_task
+    if get_state_backend().shared and (_sse_relay_task is None or _sse_relay_task.done()):
+        _sse_relay_task = asyncio.create_task(_sse_relay_loop())
+
+
 # ─── Authentication ───────────────────────────────────────
 from app.services.user_service import user_service
 
@@ -1042,7 +1098,7 @@ async def oauth_login(request: OAuthLoginRequest):
 @router.post("/auth/logout")
 async def logout(request: LogoutRequest):
     """Logout and revoke session."""
-    revoke_session(request.token)
+    await run_state_io(revoke_session, request.token)
     return {"message": "Logged out successfully"}
 
 
@@ -1457,7 +1513,7 @@ async def list_sessions(limit: int = 50):
         for session in sessions:
             if _is_empty_session_noise(session):
                 continue
-            session_metadata = dict(getattr(session, 'metadata', {}) or {})
+            session_metadata = _public_metadata(getattr(session, 'metadata', {}))
             report_image_url = await _resolve_report_image_url(session, session_metadata)
             if report_image_url and not session_metadata.get("report_scene_image_url"):
                 session_metadata["report_scene_image_url"] = report_image_url
@@ -1530,34 +1586,27 @@ async def list_orphan_reports(limit: int = 50):
 
 
 @router.post("/reports/orphans/auto-assign")
-async def auto_assign_orphan_reports(limit: int = 50, _auth=Depends(require_admin_auth)):
-    """Auto-assign orphan reports to existing/new cases."""
+async def auto_assign_orphan_reports(limit: int = 50, background: bool = False, _auth=Depends(require_admin_auth)):
+    """Auto-assign orphan reports to existing/new cases.
+
+    Runs the bulk assignment pipeline. With background=true, returns the job
+    immediately; poll /reports/orphans/auto-assign/{job_id} for progress.
+    """
     try:
         limit = _guard_limit(limit)
-        orphan_sessions = await firestore_service.list_orphan_sessions(limit=limit)
-
-        assigned = 0
-        failures = []
-
-        for session in orphan_sessions:
-            try:
-                case_id = await case_manager.assign_report_to_case(session)
-                if not case_id:
-                    failures.append({"report_id": session.id, "error": "No case assignment returned"})
-                    continue
-
-                session.case_id = case_id
-                session.updated_at = datetime.utcnow()
-                await firestore_service.update_session(session)
-                assigned += 1
-            except Exception as assign_error:
-                failures.append({"report_id": session.id, "error": str(assign_error)})
+        job = orphan_assignment_pipeline.start(limit=limit)
+        if background:
+            return job.to_dict()
 
+        job = await orphan_assignment_pipeline.wait(job.job_id)
+        if job.status == "failed":
+            raise RuntimeError(job.error)
         return {
-            "processed": len(orphan_sessions),
-            "assigned": assigned,
-            "failed": len(failures),
-            "failures": failures,
+            "processed": job.total,
+            "assigned": job.assigned,
+            "failed": len(job.failures),
+            "failures": job.failures,
+            "job": job.to_dict(),
         }
     except Exception as e:
         logger.error(f"Error auto-assigning orphan reports: {e}")
@@ -1567,6 +1616,18 @@ async def auto_assign_orphan_reports(limit: int = 50, _auth=Depends(require_admi
         )
 
 
+@router.get("/reports/orphans/auto-assign/{job_id}")
+async def get_orphan_auto_assign_job(job_id: str, _auth=Depends(require_admin_auth)):
+    """Progress of a bulk orphan assignment run ("latest" for the most recent)."""
+    job = (
+        orphan_assignment_pipeline.latest_job() if job_id == "latest"
+        else orphan_assignment_pipeline.get_job(job_id)
+    )
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Auto-assign job not found")
+    return job.to_dict()
+
+
 
 @router.post("/sessions", response_model=ReconstructionSession, status_code=status.HTTP_201_CREATED)
 async def create_session(session_data: SessionCreate):
@@ -1583,7 +1644,7 @@ async def create_session(session_data: SessionCreate):
                 )
         
         # Store template info in metadata
-        metadata = session_data.metadata or {}
+        metadata = _public_metadata(session_data.metadata)
         if session_data.is_anonymous:
             metadata['is_anonymous'] = True
         if template:
@@ -1611,9 +1672,10 @@ async def create_session(session_data: SessionCreate):
             )
 
         # Initialize agent for this session with template context
-        agent = get_agent(session.id)
+        agent = await load_agent(session.id, session=session)
         if template:
             agent.set_template(template)
+            save_agent_state(agent)
         greeting = await agent.start_interview()
         
         logger.info(f"Created session {session.id}" + (f" with template {template['id']}" if template else ""))
@@ -1918,7 +1980,7 @@ async def export_session_json(session_id: str):
         custody_events = await custody_chain_service.get_all_custody_for_session(session_id)
         
         # Convert to JSON with proper datetime handling
-        session_data = session.model_dump(mode='json')
+        session_data = _public_session(session).model_dump(mode='json')
         session_data['custody_chain'] = [e.model_dump(mode='json') if hasattr(e, 'model_dump') else e for e in custody_events]
         json_str = json.dumps(session_data, indent=2, default=str)
         
@@ -2165,9 +2227,8 @@ async def get_session_insights(session_id: str):
             )
         
         # Get agent for this session to access state
-        from app.agents.scene_agent import get_agent
         from app.config import settings
-        agent = get_agent(session_id)
+        agent = await load_agent(session_id, session=session)
         scene_summary = agent.get_scene_summary()
         
         # Calculate insights
@@ -2382,7 +2443,7 @@ async def get_timeline_disambiguation(session_id: str):
     Returns clarity scores, vague references, and suggested clarifying questions.
     """
     try:
-        agent = get_agent(session_id)
+        agent = await load_agent(session_id)
         
         # Get clarity analysis
         analysis = agent.get_timeline_clarity_analysis()
@@ -2416,7 +2477,7 @@ async def get_clarified_timeline(session_id: str):
     Shows which events have clear timing and which need clarification.
     """
     try:
-        agent = get_agent(session_id)
+        agent = await load_agent(session_id)
         
         # Build the disambiguated timeline
         timeline_events = agent.build_disambiguated_timeline()
@@ -2457,7 +2518,7 @@ async def apply_timeline_clarification(session_id: str, request: TimelineClarifi
     Updates the event with clearer temporal positioning.
     """
     try:
-        agent = get_agent(session_id)
+        agent = await load_agent(session_id)
         
         clarification = {}
         if request.offset_description:
@@ -3952,7 +4013,7 @@ For each element, identify:
         image_base64 = base64.b64encode(image_data).decode('utf-8')
         
         response = await call_with_retry(
-            asyncio.to_thread,
+            llm_io.run,
             client.models.generate_content,
             model=vision_model,
             contents=[
@@ -4000,7 +4061,7 @@ async def get_session(session_id: str):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Session not found"
             )
-        return session
+        return _public_session(session)
     except HTTPException:
         raise
     except Exception as e:
@@ -4029,7 +4090,9 @@ async def update_session(session_id: str, update_data: SessionUpdate):
         if update_data.status is not None:
             session.status = update_data.status
         if update_data.metadata is not None:
-            session.metadata.update(update_data.metadata)
+            session.metadata.update(_public_metadata(update_data.metadata))
+        if session.status != "active":
+            session.metadata.pop(SESSION_AGENT_STATE_KEY, None)  # the interview is over
         
         success = await firestore_service.update_session(session)
         if not success:
@@ -4038,7 +4101,7 @@ async def update_session(session_id: str, update_data: SessionUpdate):
                 detail="Failed to update session"
             )
         
-        return session
+        return _public_session(session)
     
     except HTTPException:
         raise
@@ -4085,7 +4148,7 @@ async def close_session_on_client_exit(session_id: str, reason: str = "tab_close
                 "case_id": None,
             }
 
-        metadata = dict(latest_session.metadata or {})
+        metadata = _public_metadata(latest_session.metadata)
         metadata.update(close_metadata)
         latest_session.metadata = metadata
 
@@ -4256,7 +4319,7 @@ async def search_sessions_by_element(
                     status=session.status,
                     statement_count=len(session.witness_statements),
                     version_count=len(session.scene_versions),
-                    metadata=getattr(session, 'metadata', {})
+                    metadata=_public_metadata(getattr(session, 'metadata', {}))
                 ))
                 
                 if len(matching_sessions) >= limit:
@@ -4320,7 +4383,7 @@ async def list_models():
         # List models from Gemini API in thread pool
         models_list = []
         try:
-            api_models = await asyncio.to_thread(fetch_models)
+            api_models = await llm_io.run(fetch_models)
             for model in api_models:
                 model_info = ModelInfo(
                     name=model.name,
@@ -5309,7 +5372,7 @@ async def get_admin_cases(
                 source_type=getattr(session, 'source_type', 'chat'),
                 report_number=getattr(session, 'report_number', ''),
                 case_id=getattr(session, 'case_id', None),
-                metadata=getattr(session, 'metadata', {})
+                metadata=_public_metadata(getattr(session, 'metadata', {}))
             )
             
             status_key = session.status if session.status in cases_by_status else "active"
@@ -6051,7 +6114,7 @@ async def get_witness_confidence(session_id: str):
                 detail=f"Session {session_id} not found"
             )
         
-        agent = get_agent(session_id)
+        agent = await load_agent(session_id, session=session)
         confidence = await agent.assess_confidence()
         
         return {
@@ -7956,7 +8019,13 @@ async def get_compression_stats():
     """
     try:
         from app.services.prompt_optimizer import prompt_optimizer
-        return prompt_optimizer.get_savings_stats()
+        from app.agents.prompts import get_compiled_prompt_stats
+        from app.services.api_key_manager import get_key_manager
+        stats = prompt_optimizer.get_savings_stats()
+        stats["compiled_prompts"] = get_compiled_prompt_stats()
+        manager = get_key_manager()
+        stats["prompt_cache"] = manager.prompt_cache.get_stats() if manager else {"enabled": False}
+        return stats
     except Exception as e:
         logger.error(f"Error getting compression stats: {e}")
         raise HTTPException(
@@ -8173,6 +8242,7 @@ async def sse_events(request: Request):
     """Server-Sent Events endpoint for real-time updates."""
     queue = asyncio.Queue(maxsize=50)
     _sse_subscribers.append(queue)
+    _ensure_sse_relay()
 
     async def event_generator():
         try:
@@ -8501,7 +8571,8 @@ async def get_queued_request_status(request_id: str):
         request_id: The unique ID of the queued request (returned when request was queued)
     
     Returns:
-        Status of the queued request or 404 if not found
+        Status of the queued request (with queue position and ETA while pending)
+        or 404 if not found
     """
     from app.services.request_queue import request_queue
     
@@ -8512,7 +8583,11 @@ async def get_queued_request_status(request_id: str):
             detail=f"Queued request {request_id} not found"
         )
     
-    return queued.to_dict()
+    result = queued.to_dict()
+    eta = request_queue.get_request_eta(request_id)
+    if eta:
+        result.update(eta)
+    return result
 
 
 @router.get("/queue/pending")
@@ -8873,7 +8948,7 @@ async def get_conversation_summary(session_id: str):
 
     statements = list(getattr(session, "witness_statements", []) or [])
     statement_count = len(statements)
-    agent = get_agent(session_id)
+    agent = await load_agent(session_id, session=session)
     history = list(getattr(agent, "conversation_history", []) or [])
     turns = len([m for m in history if isinstance(m, dict) and m.get("role") == "user"]) or statement_count
 
@@ -8937,7 +9012,7 @@ async def get_scene_preview(session_id: str):
     resolved_image_url = await _resolve_report_image_url(session, metadata)
     resolved_description = _resolve_report_scene_description(session, metadata)
     if not resolved_description:
-        resolved_description = str(get_agent(session_id).get_scene_summary().get("description", "") or "").strip()
+        resolved_description = str((await load_agent(session_id, session=session)).get_scene_summary().get("description", "") or "").strip()
     if latest_scene:
         return {
             "session_id": session_id,
@@ -10374,9 +10449,12 @@ async def get_model_metrics():
     - Optimization hints
     """
     from app.services.model_metrics import model_metrics
+    from app.services.model_selector import get_hedging_stats
     
     try:
-        return model_metrics.get_dashboard_data()
+        dashboard = model_metrics.get_dashboard_data()
+        dashboard["hedging"] = get_hedging_stats()
+        return dashboard
     except Exception as e:
         logger.error(f"Error getting model metrics: {e}")
         raise HTTPException(
@@ -10779,7 +10857,7 @@ async def load_session_memories(
     )
     
     # Get the agent and update its context
-    agent = get_agent(session_id)
+    agent = await load_agent(session_id)
     
     # Get memory stats for response
     memories = await memory_service.get_witness_memories(witness_id, limit=10)
@@ -10993,6 +11071,20 @@ class TranslateResponse(BaseModel):
     target_language: str
 
 
+class TranslateBatchRequest(BaseModel):
+    """Request model for batch translation."""
+    texts: List[str]
+    target_language: str
+    source_language: str = "en"
+
+
+class TranslateBatchResponse(BaseModel):
+    """Response model for batch translation."""
+    translations: List[str]
+    source_language: str
+    target_language: str
+
+
 class DetectLanguageRequest(BaseModel):
     """Request model for language detection."""
     text: str
@@ -11029,7 +11121,7 @@ async def detect_language(request: DetectLanguageRequest):
     """
     Detect the language of the given text.
     
-    Uses Gemini to analyze text and determine language.
+    Uses the offline identifier, falling back to Gemini for uncertain text.
     """
     from app.services.translation_service import translation_service, SUPPORTED_LANGUAGES
     
@@ -11078,6 +11170,48 @@ async def translate_text(request: TranslateRequest):
     )
 
 
+@router.post("/translation/translate-batch", response_model=TranslateBatchResponse)
+async def translate_text_batch(request: TranslateBatchRequest):
+    """
+    Translate several strings in one model call.
+    
+    Strings already in the translation memory are not sent to the model.
+    """
+    from app.services.translation_service import translation_service
+    
+    if not request.texts or len(request.texts) > MAX_LIST_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Provide between 1 and {MAX_LIST_LIMIT} texts"
+        )
+    
+    translations = await translation_service.translate_batch(
+        request.texts,
+        target_language=request.target_language,
+        source_language=request.source_language,
+    )
+    
+    return TranslateBatchResponse(
+        translations=translations,
+        source_language=request.source_language,
+        target_language=request.target_language
+    )
+
+
+@router.get("/translation/memory/stats")
+async def get_translation_memory_stats():
+    """Get translation memory hit rates for the in-memory and SQLite tiers."""
+    from app.services.translation_memory import translation_memory
+    return translation_memory.get_stats()
+
+
+@router.get("/translation/detection/stats")
+async def get_language_detection_stats():
+    """Get how many language detections were answered offline vs by Gemini."""
+    from app.services.translation_service import translation_service
+    return translation_service.get_detection_stats()
+
+
 @router.put("/sessions/{session_id}/witnesses/{witness_id}/language")
 async def set_witness_language(
     session_id: str,
@@ -11844,7 +11978,7 @@ async def api_create_session(data: dict = {}, api_key=Depends(require_api_key)):
             success = await firestore_service.create_session(session)
         if not success:
             raise HTTPException(status_code=500, detail="Failed to create session")
-        agent = get_agent(session.id)
+        agent = await load_agent(session.id, session=session)
         greeting = await agent.start_interview()
         return {
             "id": session.id,
@@ -11868,7 +12002,7 @@ async def api_get_session(session_id: str, api_key=Depends(require_api_key)):
     session = await firestore_service.get_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    return session
+    return _public_session(session)
 
 
 @router.post("/v1/sessions/{session_id}/message", tags=["Public API"])
@@ -11888,7 +12022,7 @@ async def api_send_message(session_id: str, data: dict, api_key=Depends(require_
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    agent = get_agent(session_id)
+    agent = await load_agent(session_id, session=session)
     is_correction = data.get("is_correction", False)
 
     try:
@@ -11897,6 +12031,7 @@ async def api_send_message(session_id: str, data: dict, api_key=Depends(require_
             is_correction=is_correction,
             report_number=getattr(session, "report_number", ""),
         )
+        save_agent_state(agent)
     except Exception as e:
         logger.error(f"API message processing error: {e}")
         raise HTTPException(status_code=500, detail="AI processing failed")
@@ -11968,12 +12103,13 @@ async def api_send_audio(session_id: str, data: dict, api_key=Depends(require_ap
         raise HTTPException(status_code=500, detail="Audio transcription failed")
 
     # Process transcription through agent
-    agent = get_agent(session_id)
+    agent = await load_agent(session_id)
     try:
         agent_response, should_generate_image, token_info = await agent.process_statement(
             transcription,
             report_number=getattr(session, "report_number", ""),
         )
+        save_agent_state(agent)
     except Exception as e:
         logger.error(f"API audio message processing error: {e}")
         raise HTTPException(status_code=500, detail="AI processing failed")
@@ -12017,7 +12153,7 @@ async def api_get_scene(session_id: str, version: int = None, api_key=Depends(re
         return versions[-1]
 
     # Fall back to agent in-memory scene summary
-    agent = get_agent(session_id)
+    agent = await load_agent(session_id)
     return agent.get_scene_summary()
 
 
@@ -12040,7 +12176,7 @@ async def api_get_transcript(session_id: str, api_key=Depends(require_api_key)):
             "timestamp": s.timestamp.isoformat() if hasattr(s, "timestamp") and s.timestamp else None,
         })
 
-    agent = get_agent(session_id)
+    agent = await load_agent(session_id)
     return {
         "session_id": session_id,
         "statements": statements,
@@ -12595,14 +12731,11 @@ async def export_case(case_id: str, format: str = "json", auth=Depends(require_a
 @router.get("/admin/rate-limits")
 async def get_rate_limit_stats(auth=Depends(require_admin_auth)):
     """Get current API quota usage stats."""
-    import time
     from datetime import timezone
-    from app.api.auth import _api_key_requests
-    stats = {}
-    now = time.time()
-    for key_hash, requests in _api_key_requests.items():
-        active = [r for r in requests if (now - r) < 60]
-        stats[key_hash[:8] + "..."] = {"requests_last_minute": len(active), "total_tracked": len(requests)}
+    stats = {
+        key_id[:8] + "...": bucket
+        for key_id, bucket in api_key_service.get_rate_limit_snapshot().items()
+    }
     return {"api_key_stats": stats, "timestamp": datetime.now(timezone.utc).isoformat()}
 
 
@@ -13438,8 +13571,7 @@ async def admin_get_session_transcript(session_id: str, auth=Depends(require_adm
     if not session:
         raise HTTPException(404, "Session not found")
 
-    from app.agents.scene_agent import get_agent
-    agent = get_agent(session_id)
+    agent = await load_agent(session_id, session=session)
 
     statements = []
     for s in session.witness_statements:
@@ -13511,8 +13643,7 @@ async def generate_investigation_report(session_id: str):
     if not session:
         raise HTTPException(404, "Session not found")
 
-    from app.agents.scene_agent import get_agent
-    agent = get_agent(session_id)
+    agent = await load_agent(session_id, session=session)
 
     statements = session.witness_statements
     meta = getattr(session, "metadata", {}) or {}
@@ -16730,6 +16861,7 @@ async def get_performance_metrics(auth=Depends(require_admin_auth)):
         mem_pct = 0
 
     elapsed = round((time.time() - start) * 1000, 2)
+    key_manager = get_key_manager()
 
     return {
         "endpoints": {k: v for k, v in sorted_eps[:20]},
@@ -16740,6 +16872,15 @@ async def get_performance_metrics(auth=Depends(require_admin_auth)):
             "this_request_ms": elapsed,
         },
         "slowest_endpoints": [{"endpoint": k, "avg_ms": v["avg_ms"], "count": v["count"]} for k, v in sorted_eps[:10]],
+        "executors": get_executor_stats(),
+        "scene_agents": get_agent_registry_stats(),
+        "enrichment": enrichment_scheduler.get_stats(),
+        "conversation_context": get_context_stats(),
+        "case_assignment": case_manager.get_assignment_stats(),
+        "state_journal": state_journal.get_stats(),
+        "gemini_concurrency": key_manager.limiter.get_stats() if key_manager else {"enabled": False},
+        "api_key_validation": api_key_service.get_validation_stats(),
+        "cancellation": get_cancellation_stats(),
     }
 
 
@@ -18279,13 +18420,15 @@ async def get_rate_limiter(auth=Depends(require_admin_auth)):
             if len(recent) >= limit:
                 throttled += 1
 
+    from app.services.admission_control import admission_controller
     return {
         "config": _rate_limit_config,
         "status": {
             "active_clients": active_clients,
             "throttled_clients": throttled,
             "tracking_entries": len(_rate_tracker)
-        }
+        },
+        "admission": admission_controller.get_stats(),
     }
 
 @router.post("/admin/rate-limiter")
@@ -18299,6 +18442,9 @@ async def update_rate_limiter(data: dict, auth=Depends(require_admin_auth)):
         _rate_limit_config["endpoint_limits"].update(data["endpoint_limits"])
     if "blocked_ips" in data and isinstance(data["blocked_ips"], list):
         _rate_limit_config["blocked_ips"] = data["blocked_ips"]
+    if "admission_enabled" in data:
+        from app.services.admission_control import admission_controller
+        admission_controller.enabled = bool(data["admission_enabled"])
 
     return {"status": "updated", "config": _rate_limit_config}
 
@@ -23,9 +23,12 @@ from app.services.imagen_service import imagen_service
 from app.services.embedding_service import embedding_service
 from app.services.translation_service import translation_service
 from app.services.case_manager import case_manager
+from app.services.enrichment_scheduler import EnrichmentStage, enrichment_scheduler
+from app.services.admission_control import AdmissionTier, admission_controller
+from app.services.cancellation import CancellationToken, OperationCancelled, cancellation_scope
 from app.services.api_key_manager import get_genai_client
 from app.services.tts_service import tts_service
-from app.agents.scene_agent import get_agent, remove_agent
+from app.agents.scene_agent import get_agent, pin_agent, remove_agent, save_agent_state
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -46,10 +49,10 @@ async def shutdown_active_session_handler(session_id: str, reason: str = "client
 class WebSocketHandler:
     """Handles WebSocket connections for real-time voice streaming."""
     
-    def __init__(self, websocket: WebSocket, session_id: str):
+    def __init__(self, websocket: WebSocket, session_id: str, session=None):
         self.websocket = websocket
         self.session_id = session_id
-        self.agent = get_agent(session_id)
+        self.agent = get_agent(session_id, session=session)
         self.is_connected = False
         self.version_counter = 0
         self.witness_language = "en"  # Current witness's preferred language
@@ -67,6 +70,8 @@ class WebSocketHandler:
         self._last_auto_transcript_at = 0.0
         self._shutdown_reason = ""
         self._disconnect_complete = False
+        # Fired on disconnect; in-flight Gemini work for this socket stops at the next chunk or attempt
+        self.cancel_token = CancellationToken()
 
     def _elapsed_seconds(self) -> int:
         """Seconds elapsed since websocket connect."""
@@ -159,6 +164,7 @@ class WebSocketHandler:
         self._heartbeat_task = asyncio.create_task(self._heartbeat())
         active_connections.add(self.session_id)
         active_handlers[self.session_id] = self
+        pin_agent(self.agent)
         logger.info(f"WebSocket connected for session {self.session_id}")
         
         # Send opening greeting only once per session to avoid repeated reconnect prompts.
@@ -321,14 +327,15 @@ class WebSocketHandler:
                             all_text = " ".join([s.text for s in session.witness_statements if s.text])
                             scene_description = all_text[:500]  # Use first 500 chars for image prompt
                             if imagen_service and imagen_service.client:
-                                img_result = await asyncio.to_thread(
-                                    imagen_service.generate_scene, scene_description
+                                # generate_scene already runs on the llm_io/cpu_render pools
+                                image_url = await imagen_service.regenerate_scene(
+                                    "report", self.session_id, scene_description
                                 )
-                                if img_result:
+                                if image_url:
                                     scene_version = SceneVersion(
-                                        id=str(uuid.uuid4()),
+                                        version=1,
                                         description=scene_description[:200],
-                                        image_url=img_result.get("url", ""),
+                                        image_url=image_url,
                                         elements=[]
                                     )
                                     session.scene_versions.append(scene_version)
@@ -356,24 +363,28 @@ class WebSocketHandler:
 
     def _track_background_task(self, coro):
         """Track cancellable background tasks tied to this socket lifecycle."""
-        task = asyncio.create_task(coro)
+        with cancellation_scope(self.cancel_token):
+            task = asyncio.create_task(coro)
         self._background_tasks.add(task)
         task.add_done_callback(self._background_tasks.discard)
         return task
 
     def _track_message_task(self, coro):
         """Track the currently running request task so it can be cancelled on client exit."""
-        task = asyncio.create_task(coro)
+        with cancellation_scope(self.cancel_token):
+            task = asyncio.create_task(coro)
         self._active_message_tasks.add(task)
         task.add_done_callback(self._active_message_tasks.discard)
         return task
 
     async def _cancel_runtime_tasks(self):
         """Cancel socket-scoped runtime tasks."""
+        self.cancel_token.cancel(self._shutdown_reason or "client_disconnected")
         if hasattr(self, '_heartbeat_task'):
             self._heartbeat_task.cancel()
         for task in list(self._background_tasks):
             task.cancel()
+        enrichment_scheduler.cancel(self.session_id)
         for task in list(self._active_message_tasks):
             task.cancel()
         self._background_tasks.clear()
@@ -408,6 +419,15 @@ class WebSocketHandler:
             except Exception:
                 break
 
+    def _note_send_failure(self, error: Exception):
+        """A send to a closed socket means the client is gone mid-turn: stop its LLM work."""
+        closed = isinstance(error, WebSocketDisconnect) or type(error).__name__ in {
+            "ClientDisconnected", "ConnectionClosed", "ConnectionClosedError", "ConnectionClosedOK",
+        } or (isinstance(error, RuntimeError) and "close" in str(error).lower())
+        if closed:
+            self.is_connected = False
+            self.cancel_token.cancel("client_disconnected")
+
     async def send_message(self, message_type: str, data: dict):
         """Send a message to the client."""
         if not self.is_connected:
@@ -418,6 +438,7 @@ class WebSocketHandler:
             await self.websocket.send_json(message.model_dump(mode='json'))
         except Exception as e:
             logger.error(f"Error sending WebSocket message: {e}")
+            self._note_send_failure(e)
     
     async def send_streaming_chunk(
         self, 
@@ -453,6 +474,7 @@ class WebSocketHandler:
             await self.websocket.send_json(message.model_dump(mode='json'))
         except Exception as e:
             logger.error(f"Error sending streaming chunk: {e}")
+            self._note_send_failure(e)
 
     async def _stream_agent_tts(
         self,
@@ -553,6 +575,8 @@ class WebSocketHandler:
             else:
                 logger.warning(f"Unknown message type: {message_type}")
         
+        except OperationCancelled as e:
+            logger.info(f"Stopped {message_type} message for session {self.session_id}: {e}")
         except Exception as e:
             logger.error(f"Error handling WebSocket message: {e}")
             await self.send_message("error", {"message": str(e)})
@@ -779,6 +803,7 @@ class WebSocketHandler:
                         token_info = tok_info
                 is_completion_response = self.agent.last_response_kind == "completion"
                 spoken_response = (self.agent.last_response_text or full_response or "").strip()
+                save_agent_state(self.agent)
                 
                 # Translate full response if witness language is not English
                 if self.witness_language != "en" and spoken_response:
@@ -877,11 +902,9 @@ class WebSocketHandler:
                 # Non-critical automation runs in background to keep websocket responsive
                 auto_scene_summary = self.agent.get_scene_summary()
                 statement_count = len(session.witness_statements)
-                self._track_background_task(
-                    self._run_non_critical_scene_automation(
-                        statement_count=statement_count,
-                        scene_summary=auto_scene_summary,
-                    )
+                self._schedule_scene_automation(
+                    statement_count=statement_count,
+                    scene_summary=auto_scene_summary,
                 )
             
             # Generate image if needed
@@ -1009,205 +1032,257 @@ class WebSocketHandler:
         self._last_auto_transcript_at = now
         return False
 
-    async def _run_non_critical_scene_automation(self, statement_count: int, scene_summary: dict):
-        """Background auto-generation for report and case scene images."""
-        try:
-            session = await firestore_service.get_session(self.session_id)
-            if not session:
-                return
+    def _schedule_scene_automation(self, statement_count: int, scene_summary: dict):
+        """Queue report/case scene refresh; a newer turn supersedes work not yet started."""
+        admitted, _ = admission_controller.admit(
+            AdmissionTier.BULK, source="ws:scene_automation", uses_quota=True
+        )
+        if not admitted:
+            logger.info("Scene automation shed for session %s under load", self.session_id)
+            return None
+        stages = [
+            EnrichmentStage(
+                "prepare",
+                lambda _: self._prepare_scene_automation(statement_count, scene_summary),
+            ),
+            EnrichmentStage("report_scene", self._auto_generate_report_scene, ("prepare",)),
+            EnrichmentStage("case_scene", self._auto_refresh_case_scene, ("prepare",)),
+        ]
+        return enrichment_scheduler.schedule(self.session_id, stages)
+
+    async def _prepare_scene_automation(self, statement_count: int, scene_summary: dict) -> Optional[dict]:
+        """Build the report scene description shared by the image stages."""
+        session = await firestore_service.get_session(self.session_id)
+        if not session:
+            return None
 
-            metadata = dict(session.metadata or {})
-            metadata_changed = False
-
-            elements = scene_summary.get("elements", []) or [
-                elem.model_dump() for elem in (getattr(session, "current_scene_elements", []) or [])[:12]
-            ]
-            statement_fragments = [
-                (getattr(statement, "original_text", None) or getattr(statement, "text", None) or "").strip()
-                for statement in (getattr(session, "witness_statements", []) or [])
-            ]
-            latest_scene_description = (
-                (session.scene_versions[-1].description if session.scene_versions else "") or ""
-            ).strip()
-            description = imagen_service.build_report_scene_description(
-                primary_description=(scene_summary.get("description") or "").strip(),
-                statements=statement_fragments,
-                elements=elements,
-                title=session.title or "",
-                ai_summary=str(metadata.get("ai_summary", "") or ""),
-                latest_scene_description=latest_scene_description,
+        metadata = dict(session.metadata or {})
+        elements = scene_summary.get("elements", []) or [
+            elem.model_dump() for elem in (getattr(session, "current_scene_elements", []) or [])[:12]
+        ]
+        statement_fragments = [
+            (getattr(statement, "original_text", None) or getattr(statement, "text", None) or "").strip()
+            for statement in (getattr(session, "witness_statements", []) or [])
+        ]
+        latest_scene_description = (
+            (session.scene_versions[-1].description if session.scene_versions else "") or ""
+        ).strip()
+        description = imagen_service.build_report_scene_description(
+            primary_description=(scene_summary.get("description") or "").strip(),
+            statements=statement_fragments,
+            elements=elements,
+            title=session.title or "",
+            ai_summary=str(metadata.get("ai_summary", "") or ""),
+            latest_scene_description=latest_scene_description,
+        )
+        if not description:
+            return None
+        return {
+            "session": session,
+            "metadata": metadata,
+            "elements": elements,
+            "description": description,
+            "statement_count": statement_count,
+        }
+
+    async def _auto_generate_report_scene(self, results: dict) -> dict:
+        """Report image generation stage; records its metadata updates and returns them."""
+        prep = results.get("prepare")
+        if not prep:
+            return {}
+        metadata, updates = prep["metadata"], {}
+        statement_count, description, elements = prep["statement_count"], prep["description"], prep["elements"]
+
+        # Report image generation (quota-aware + throttled)
+        last_report_gen_count = metadata.get("report_scene_statement_count", 0)
+        try:
+            last_report_gen_count = int(last_report_gen_count or 0)
+        except Exception:
+            last_report_gen_count = 0
+
+        has_report_scene = bool(metadata.get("report_scene_image_url"))
+        should_generate_report_scene = (
+            statement_count >= 1
+            and (
+                not has_report_scene
+                or statement_count >= (last_report_gen_count + 3)
             )
-            if not description:
-                return
+        )
 
-            # Report image generation (quota-aware + throttled)
-            last_report_gen_count = metadata.get("report_scene_statement_count", 0)
+        if should_generate_report_scene:
             try:
-                last_report_gen_count = int(last_report_gen_count or 0)
-            except Exception:
-                last_report_gen_count = 0
-
-            has_report_scene = bool(metadata.get("report_scene_image_url"))
-            should_generate_report_scene = (
-                statement_count >= 1
-                and (
-                    not has_report_scene
-                    or statement_count >= (last_report_gen_count + 3)
+                report_result = await imagen_service.generate_report_scene_with_fallback(
+                    self.session_id,
+                    description,
+                    elements,
+                    quality="standard",
                 )
-            )
-
-            if should_generate_report_scene:
-                try:
-                    report_result = await imagen_service.generate_report_scene_with_fallback(
-                        self.session_id,
-                        description,
-                        elements,
-                        quality="standard",
-                    )
-                    report_path = report_result.get("path")
-                    if report_path:
-                        metadata["report_scene_image_url"] = report_path
-                        metadata["report_scene_statement_count"] = statement_count
-                        metadata["report_scene_updated_at"] = datetime.utcnow().isoformat()
-                        metadata_changed = True
-                        await firestore_service.save_generated_image({
+                report_path = report_result.get("path")
+                if report_path:
+                    updates["report_scene_image_url"] = report_path
+                    updates["report_scene_statement_count"] = statement_count
+                    updates["report_scene_updated_at"] = datetime.utcnow().isoformat()
+                    await asyncio.shield(self._record_scene_image(
+                        updates,
+                        {
                             "id": f"auto-scene-report-{self.session_id}-{uuid.uuid4().hex[:8]}",
                             "entity_type": "report",
                             "entity_id": self.session_id,
                             "image_path": report_path,
                             "model_used": report_result.get("model_used") or "ai_generated",
                             "prompt": (report_result.get("prompt") or description)[:500],
-                        })
-                except Exception as e:
-                    if self._is_quota_error(e):
-                        logger.warning(
-                            "Auto report scene generation skipped for session %s due to quota/rate-limit",
-                            self.session_id,
-                        )
-                    else:
-                        logger.warning("Auto report scene generation failed for session %s: %s", self.session_id, e)
+                        },
+                    ))
+            except Exception as e:
+                if self._is_quota_error(e):
+                    logger.warning(
+                        "Auto report scene generation skipped for session %s due to quota/rate-limit",
+                        self.session_id,
+                    )
+                else:
+                    logger.warning("Auto report scene generation failed for session %s: %s", self.session_id, e)
 
-            # Case image generation/update (quota-aware + throttled)
-            if session.case_id:
-                try:
-                    case = await firestore_service.get_case(session.case_id)
-                    if case:
-                        last_case_gen_count = metadata.get("case_scene_statement_count", 0)
-                        try:
-                            last_case_gen_count = int(last_case_gen_count or 0)
-                        except Exception:
-                            last_case_gen_count = 0
+        return updates
 
-                        should_generate_case_scene = (
-                            not case.scene_image_url
-                            or statement_count >= (last_case_gen_count + 4)
-                        )
+    async def _auto_refresh_case_scene(self, results: dict) -> dict:
+        """Case image refresh stage; records its metadata updates and returns them."""
+        prep = results.get("prepare")
+        if not prep:
+            return {}
+        metadata, updates = prep["metadata"], {}
+        statement_count, case_id = prep["statement_count"], prep["session"].case_id
 
-                        if should_generate_case_scene:
-                            report_fragments = []
-                            case_elements = []
-                            seen_case_elements = set()
-                            for report_id in case.report_ids[:8]:
-                                report = await firestore_service.get_session(report_id)
-                                if not report:
-                                    continue
-                                report_metadata = dict(getattr(report, "metadata", {}) or {})
-                                latest_report_scene = (
-                                    (report.scene_versions[-1].description if report.scene_versions else "") or ""
+        # Case image generation/update (quota-aware + throttled)
+        if case_id:
+            try:
+                case = await firestore_service.get_case(case_id)
+                if case:
+                    last_case_gen_count = metadata.get("case_scene_statement_count", 0)
+                    try:
+                        last_case_gen_count = int(last_case_gen_count or 0)
+                    except Exception:
+                        last_case_gen_count = 0
+
+                    should_generate_case_scene = (
+                        not case.scene_image_url
+                        or statement_count >= (last_case_gen_count + 4)
+                    )
+
+                    if should_generate_case_scene:
+                        report_fragments = []
+                        case_elements = []
+                        seen_case_elements = set()
+                        for report_id in case.report_ids[:8]:
+                            report = await firestore_service.get_session(report_id)
+                            if not report:
+                                continue
+                            report_metadata = dict(getattr(report, "metadata", {}) or {})
+                            latest_report_scene = (
+                                (report.scene_versions[-1].description if report.scene_versions else "") or ""
+                            ).strip()
+                            if latest_report_scene:
+                                report_fragments.append(latest_report_scene)
+                            ai_summary = str(report_metadata.get("ai_summary", "") or "").strip()
+                            if ai_summary:
+                                report_fragments.append(ai_summary)
+                            for statement in (getattr(report, "witness_statements", []) or []):
+                                text = (
+                                    getattr(statement, "original_text", None)
+                                    or getattr(statement, "text", None)
+                                    or ""
                                 ).strip()
-                                if latest_report_scene:
-                                    report_fragments.append(latest_report_scene)
-                                ai_summary = str(report_metadata.get("ai_summary", "") or "").strip()
-                                if ai_summary:
-                                    report_fragments.append(ai_summary)
-                                for statement in (getattr(report, "witness_statements", []) or []):
-                                    text = (
-                                        getattr(statement, "original_text", None)
-                                        or getattr(statement, "text", None)
-                                        or ""
-                                    ).strip()
-                                    if text:
-                                        report_fragments.append(text)
-
-                                latest_scene_elements = (
-                                    list(getattr(report.scene_versions[-1], "elements", []) or [])
-                                    if getattr(report, "scene_versions", None)
-                                    else []
-                                )
-                                for candidate in latest_scene_elements + list(getattr(report, "current_scene_elements", []) or []):
-                                    if isinstance(candidate, dict):
-                                        elem_type = str(candidate.get("type", "") or "").strip().lower()
-                                        description = str(candidate.get("description", "") or "").strip().lower()
-                                        position = str(candidate.get("position", "") or "").strip().lower()
-                                        color = str(candidate.get("color", "") or "").strip().lower()
-                                    else:
-                                        elem_type = str(getattr(candidate, "type", "") or "").strip().lower()
-                                        description = str(getattr(candidate, "description", "") or "").strip().lower()
-                                        position = str(getattr(candidate, "position", "") or "").strip().lower()
-                                        color = str(getattr(candidate, "color", "") or "").strip().lower()
-
-                                    dedupe_key = "|".join((elem_type, description, position, color))
-                                    if not dedupe_key.strip("|") or dedupe_key in seen_case_elements:
-                                        continue
-                                    seen_case_elements.add(dedupe_key)
-                                    case_elements.append(candidate)
-                                    if len(case_elements) >= 16:
-                                        break
-                                if len(case_elements) >= 16:
-                                    break
+                                if text:
+                                    report_fragments.append(text)
 
-                            case_summary = (case.summary or case.title or "").strip()
-                            case_scene_description = imagen_service.build_case_scene_description(
-                                case_summary=case_summary,
-                                scene_description=str(((case.metadata or {}).get("scene_description", "") or "")).strip(),
-                                report_fragments=report_fragments,
-                                title=case.title or "",
+                            latest_scene_elements = (
+                                list(getattr(report.scene_versions[-1], "elements", []) or [])
+                                if getattr(report, "scene_versions", None)
+                                else []
                             )
-                            if imagen_service._is_low_information_text(case_summary):
-                                case_summary = case_scene_description or case.title or ""
-
-                            case_result = await imagen_service.generate_case_scene_with_fallback(
-                                case.id,
-                                case_summary,
-                                case_scene_description,
-                                elements=case_elements,
-                                quality="standard",
-                            )
-                            case_path = case_result.get("path")
-                            if case_path:
-                                case.scene_image_url = case_path
-                                await firestore_service.update_case(case)
-                                metadata["case_scene_statement_count"] = statement_count
-                                metadata["case_scene_updated_at"] = datetime.utcnow().isoformat()
-                                metadata_changed = True
-                                await firestore_service.save_generated_image({
+                            for candidate in latest_scene_elements + list(getattr(report, "current_scene_elements", []) or []):
+                                if isinstance(candidate, dict):
+                                    elem_type = str(candidate.get("type", "") or "").strip().lower()
+                                    description = str(candidate.get("description", "") or "").strip().lower()
+                                    position = str(candidate.get("position", "") or "").strip().lower()
+                                    color = str(candidate.get("color", "") or "").strip().lower()
+                                else:
+                                    elem_type = str(getattr(candidate, "type", "") or "").strip().lower()
+                                    description = str(getattr(candidate, "description", "") or "").strip().lower()
+                                    position = str(getattr(candidate, "position", "") or "").strip().lower()
+                                    color = str(getattr(candidate, "color", "") or "").strip().lower()
+
+                                dedupe_key = "|".join((elem_type, description, position, color))
+                                if not dedupe_key.strip("|") or dedupe_key in seen_case_elements:
+                                    continue
+                                seen_case_elements.add(dedupe_key)
+                                case_elements.append(candidate)
+                                if len(case_elements) >= 16:
+                                    break
+                            if len(case_elements) >= 16:
+                                break
+
+                        case_summary = (case.summary or case.title or "").strip()
+                        case_scene_description = imagen_service.build_case_scene_description(
+                            case_summary=case_summary,
+                            scene_description=str(((case.metadata or {}).get("scene_description", "") or "")).strip(),
+                            report_fragments=report_fragments,
+                            title=case.title or "",
+                        )
+                        if imagen_service._is_low_information_text(case_summary):
+                            case_summary = case_scene_description or case.title or ""
+
+                        case_result = await imagen_service.generate_case_scene_with_fallback(
+                            case.id,
+                            case_summary,
+                            case_scene_description,
+                            elements=case_elements,
+                            quality="standard",
+                        )
+                        case_path = case_result.get("path")
+                        if case_path:
+                            case.scene_image_url = case_path
+                            updates["case_scene_statement_count"] = statement_count
+                            updates["case_scene_updated_at"] = datetime.utcnow().isoformat()
+                            await asyncio.shield(self._record_scene_image(
+                                updates,
+                                {
                                     "id": f"auto-scene-case-{case.id}-{uuid.uuid4().hex[:8]}",
                                     "entity_type": "case",
                                     "entity_id": case.id,
                                     "image_path": case_path,
                                     "model_used": case_result.get("model_used") or "ai_generated",
                                     "prompt": (case_result.get("prompt") or case_scene_description)[:500],
-                                })
-                except Exception as e:
-                    if self._is_quota_error(e):
-                        logger.warning(
-                            "Auto case scene generation skipped for case %s due to quota/rate-limit",
-                            session.case_id,
-                        )
-                    else:
-                        logger.warning(
-                            "Auto case scene generation failed for case %s: %s",
-                            session.case_id,
-                            e,
-                        )
+                                },
+                                case=case,
+                            ))
+            except Exception as e:
+                if self._is_quota_error(e):
+                    logger.warning(
+                        "Auto case scene generation skipped for case %s due to quota/rate-limit",
+                        case_id,
+                    )
+                else:
+                    logger.warning(
+                        "Auto case scene generation failed for case %s: %s",
+                        case_id,
+                        e,
+                    )
 
-            if metadata_changed:
-                session.metadata = metadata
-                await firestore_service.update_session(session)
+        return updates
+
+    async def _record_scene_image(self, updates: dict, image_record: dict, case=None):
+        """Write a generated scene image together with the session bookkeeping that throttles it.
+
+        Each metadata key is written on its own, so the other image stage's keys
+        (and concurrent session updates) are left alone. Callers shield this so
+        a disconnect cannot land between the image write and its bookkeeping.
+        """
+        if case is not None:
+            await firestore_service.update_case(case)
+        for key, value in updates.items():
+            await firestore_service.update_session_metadata(self.session_id, key, value)
+        await firestore_service.save_generated_image(image_record)
 
-        except Exception as e:
-            logger.warning("Non-critical scene automation failed for session %s: %s", self.session_id, e)
-    
     async def handle_correction(self, data: dict):
         """Handle a correction from the user."""
         data["is_correction"] = True
@@ -1286,6 +1361,13 @@ class WebSocketHandler:
     
     async def generate_and_send_scene_image(self):
         """Generate a scene image and send it to the client."""
+        admitted, _ = admission_controller.admit(
+            AdmissionTier.BACKGROUND, source="ws:scene_image", uses_quota=True
+        )
+        if not admitted:
+            logger.info("Scene image shed for session %s under load", self.session_id)
+            await self._set_status("ready", "Scene image postponed while the service is busy.")
+            return
         try:
             await self._set_status("generating", "Generating scene reconstruction...")
             
@@ -1387,7 +1469,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
         await websocket.close(code=4004, reason="Session not found")
         return
     
-    handler = WebSocketHandler(websocket, session_id)
+    handler = WebSocketHandler(websocket, session_id, session=session)
     
     try:
         await handler.connect()
@@ -67,6 +67,47 @@ class Settings(BaseSettings):
     rpd_budget_exceed_action: str = "reject"  # reject, queue, or allow
     rpd_budget_windows: str = ""  # JSON array of window configs (optional)
     
+    # Gemini Account Balancing
+    gemini_account_balancing: str = "p2c"  # priority, p2c (power of two choices) or wrr (weighted round-robin)
+
+    # Outbound Gemini Concurrency (adaptive AIMD limit per account/model; excess calls queue by priority)
+    gemini_concurrency_enabled: bool = True
+    gemini_concurrency_initial_limit: int = 4
+    gemini_concurrency_min_limit: int = 1
+    gemini_concurrency_max_limit: int = 32
+    gemini_concurrency_backoff_ratio: float = 0.5  # Multiplicative decrease on a 429
+    gemini_concurrency_latency_tolerance: float = 2.5  # Shrink when a call is this many times slower than usual
+    gemini_concurrency_queue_timeout_seconds: float = 30.0
+
+    # Admission Control (shed low-priority work with 503 when the process or the RPD budget is saturated)
+    admission_control_enabled: bool = True
+    admission_loop_lag_ms: float = 100.0  # Event-loop lag that sheds bulk work; 2x sheds background, 4x interactive
+    admission_executor_backlog: float = 1.0  # Queued jobs per worker (llm-io/cpu-render) with the same 1x/2x/4x steps
+    admission_budget_reserve: float = 0.2  # Shed quota-using bulk work below this share of the RPD window
+    admission_sample_interval_seconds: float = 0.5
+    admission_hold_seconds: float = 5.0  # Keep shedding this long after load drops, to avoid flapping
+    admission_retry_after_seconds: int = 5  # Multiplied by the shed level
+
+    # Quota / Key-Rotation State Persistence (journal + periodic snapshot)
+    state_journal_flush_seconds: float = 1.0  # Max state lost on a crash
+    state_snapshot_interval_seconds: float = 60.0
+    state_journal_max_entries: int = 5000  # Snapshot early once the journal holds this many deltas
+
+    # Latency Hedging (send a backup request to the next model once the primary passes its p90)
+    hedging_task_types: str = "transcription,chat"  # Comma-separated; empty disables hedging
+    hedging_min_samples: int = 20  # Successful requests needed before a model's p90 is trusted
+    hedging_min_delay_ms: int = 500  # Never hedge earlier than this
+    hedging_budget_reserve: float = 0.25  # Keep this share of the RPD window free of hedges
+
+    # Prompt Prefix Caching (Gemini cached content for the system prompt / few-shot preamble)
+    prompt_cache_enabled: bool = True
+    prompt_cache_models: str = "gemini-2.5-flash,gemini-2.5-pro"  # Comma-separated model substrings
+    prompt_cache_min_tokens: int = 1024  # API minimum for explicit caching
+    prompt_cache_ttl_seconds: int = 3600
+    prompt_cache_refresh_margin_seconds: int = 300  # Extend in-use caches this long before expiry
+    prompt_cache_retry_seconds: float = 30.0  # First back-off after creating a cache fails; doubles per failure
+    prompt_cache_retry_max_seconds: float = 3600.0  # Back-off cap (a model that never supports caching ends up here)
+
     # Multi-Model Verification
     multi_model_verification_enabled: bool = True  # Enable cross-model verification
     
@@ -84,6 +125,24 @@ class Settings(BaseSettings):
     batch_classification_wait_ms: int = 150  # Max wait time for batch to fill
     batch_classification_enabled: bool = True  # Enable classification batching
     
+    # Response Cache
+    response_cache_preload_entries: int = 200  # Hottest entries loaded at startup (0 = none)
+    response_cache_flush_interval_seconds: float = 5.0  # Max delay before new entries hit SQLite
+
+    # Translation
+    translation_prewarm_enabled: bool = True  # Pre-translate greetings/quick phrases at startup
+    language_id_confidence_threshold: float = 0.85  # Below this, ask Gemini to detect the language
+
+    # Blocking-work thread pools (workers / max jobs waiting for a worker)
+    executor_llm_io_workers: int = 32
+    executor_llm_io_queue_limit: int = 256
+    executor_cpu_render_workers: int = 2
+    executor_cpu_render_queue_limit: int = 16
+    executor_crypto_workers: int = 4
+    executor_crypto_queue_limit: int = 64
+    executor_disk_workers: int = 4
+    executor_disk_queue_limit: int = 128
+
     # Admin Configuration
     admin_password: str = "change_this_password_immediately"
     admin_public_base_url: str = ""
@@ -92,13 +151,43 @@ class Settings(BaseSettings):
     admin_github_client_id: str = ""
     admin_github_client_secret: str = ""
     
+    # Public API Keys
+    api_key_index_secret: str = ""  # HMAC key for the key lookup index (keys carry 256 random bits either way)
+    api_key_cache_ttl_seconds: float = 60.0  # How long a verified key skips the database and bcrypt
+    api_key_usage_flush_seconds: float = 10.0  # Usage counters are written to SQLite in batches this often
+
     # Database Configuration
     database_path: str = "/app/data/witnessreplay.db"
-    
+
+    # Shared State Backend ("memory" for one worker, "sqlite" to share state across --workers)
+    state_backend: str = "memory"
+    state_backend_path: str = "/app/data/state.db"
+
     # Session Configuration
     session_timeout_minutes: int = 60
     max_session_size_mb: int = 100
     
+    # Scene Agent Cache (per worker)
+    agent_cache_max_agents: int = 500
+    agent_cache_idle_ttl_seconds: int = 1800  # Evict agents untouched this long
+    agent_cache_memory_budget_mb: int = 256  # Approximate, estimated from conversation size
+
+    # Interview Context (chat history sent to the model)
+    context_keep_turns: int = 4  # Most recent witness/agent exchanges kept verbatim
+    context_history_budget_tokens: int = 6000  # Summarize older turns past this
+    context_history_budget_overrides: str = "gemma=3000"  # Comma-separated model-substring=tokens
+
+    # Post-turn Enrichment
+    enrichment_debounce_seconds: float = 2.0  # Wait for the witness to pause before scene image work
+    enrichment_max_debounce_seconds: float = 10.0  # Upper bound on that wait while turns keep arriving
+
+    # Orphan Report Auto-Assignment
+    orphan_assign_concurrency: int = 4  # Parallel profile builds / LLM batches / case commits
+    orphan_assign_llm_batch_size: int = 5  # Ambiguous reports adjudicated per Gemini call
+
+    # Scene Extraction
+    incremental_scene_extraction_enabled: bool = True  # Send only new turns between periodic full extractions
+
     # AI Confidence Thresholds
     confidence_threshold: float = 0.7  # Minimum confidence for auto-acceptance
     low_confidence_threshold: float = 0.4  # Below this is flagged as low confidence
@@ -1,7 +1,6 @@
 import logging
 from contextlib import asynccontextmanager
-from collections import defaultdict
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 import uuid as uuid_lib
 from fastapi import FastAPI, WebSocket, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -13,12 +12,19 @@ from pathlib import Path
 import os
 import asyncio
 import time as time_module
+from typing import Tuple
 
 from app.config import settings
 from app.api.routes import router as api_router
 from app.api.websocket import websocket_endpoint
 from app.api.auth import cleanup_expired_sessions
 from app.middleware.request_logging import RequestLoggingMiddleware, request_metrics
+from app.middleware.admission import AdmissionControlMiddleware
+from app.services.state_backend import get_state_backend, run_state_io
+from app.services.executors import shutdown_executors
+from app.services.cancellation import cancellation_scope
+from app.services.rate_counter import sliding_window_estimate
+from app.agents.scene_agent import evict_idle_agents
 
 # Configure logging
 logging.basicConfig(
@@ -31,20 +37,19 @@ logger = logging.getLogger(__name__)
 # ── Per-IP API rate limiter ───────────────────────────────
 
 class APIRateLimiter:
-    """Simple per-IP rate limiter for API endpoints."""
+    """Per-IP fixed-window rate limiter for API endpoints, shared across workers."""
+
+    NAMESPACE = "rate:api_ip"
 
     def __init__(self, requests_per_minute: int = 60):
-        self._requests: dict = defaultdict(list)
         self._rpm = requests_per_minute
 
-    def check(self, client_ip: str) -> bool:
-        now = datetime.utcnow()
-        cutoff = now - timedelta(minutes=1)
-        self._requests[client_ip] = [t for t in self._requests[client_ip] if t > cutoff]
-        if len(self._requests[client_ip]) >= self._rpm:
-            return False
-        self._requests[client_ip].append(now)
-        return True
+    async def check(self, client_ip: str) -> bool:
+        window = int(time_module.time() // 60)
+        count = await run_state_io(
+            get_state_backend().incr, self.NAMESPACE, f"{client_ip}:{window}", ttl_seconds=120
+        )
+        return count <= self._rpm
 
 api_rate_limiter = APIRateLimiter(requests_per_minute=60)
 
@@ -69,6 +74,16 @@ async def lifespan(app: FastAPI):
     else:
         logger.info("Gemini API key not configured")
     
+    # Shared state backend (admin sessions, rate limits, caches, interview state)
+    state_backend = get_state_backend()
+    worker_count = int(os.getenv("WEB_CONCURRENCY", "1") or 1)
+    if worker_count > 1 and not state_backend.shared:
+        logger.warning(
+            "Running %s workers with the in-process state backend; set STATE_BACKEND=sqlite "
+            "so sessions, rate limits and caches are shared", worker_count,
+        )
+    logger.info(f"State backend: {state_backend.name} (shared={state_backend.shared})")
+    
     # Initialize SQLite database
     from app.services.database import DatabaseService
     db = DatabaseService()
@@ -92,15 +107,16 @@ async def lifespan(app: FastAPI):
     from app.services.cache import cache
     from app.services.response_cache import response_cache
     
-    # Load cached responses from database
+    # Preload only the hottest cached responses; the rest are read from SQLite on demand
     await response_cache.load_from_db()
-    logger.info(f"Response cache loaded ({response_cache.get_stats()['entries']} entries)")
+    logger.info(f"Response cache warmed ({response_cache.get_stats()['entries']} hot entries)")
     
     async def cleanup_cache_periodically():
         while True:
             await asyncio.sleep(300)  # Run every 5 minutes
             await cache.cleanup_expired()
             await response_cache.cleanup_expired()
+            await run_state_io(get_state_backend().purge_expired)
     
     cleanup_task = asyncio.create_task(cleanup_cache_periodically())
     logger.info("Started cache cleanup background task")
@@ -109,10 +125,18 @@ async def lifespan(app: FastAPI):
         while True:
             await asyncio.sleep(300)  # Every 5 minutes
             await cleanup_expired_sessions()
+            evict_idle_agents()
     
     asyncio.create_task(_session_cleanup_loop())
     logger.info("Started session cleanup background task")
     
+    # Pre-translate recurring agent phrases in the background
+    from app.services.translation_service import translation_service
+    if settings.translation_prewarm_enabled and translation_service.client:
+        from app.api.routes import VOICE_QUICK_PHRASES
+        asyncio.create_task(translation_service.prewarm(VOICE_QUICK_PHRASES))
+        logger.info("Started translation memory pre-warm task")
+    
     # Start request queue processor
     from app.services.request_queue import request_queue
     await request_queue.start()
@@ -123,13 +147,30 @@ async def lifespan(app: FastAPI):
     await quota_alert_service.start()
     logger.info("Started quota alert service")
     
+    # Persist quota / key-rotation state off the request path
+    from app.services.state_journal import state_journal
+    await state_journal.start()
+    logger.info("Started quota state journal")
+    
+    # Batch public API key usage counters into SQLite
+    await api_key_service.start()
+    
+    # Sample event-loop lag, executor backlog and RPD budget for load shedding
+    from app.services.admission_control import admission_controller
+    await admission_controller.start()
+    
     # Startup
     yield
     
     # Shutdown
     cleanup_task.cancel()
+    await response_cache.flush()
     await request_queue.stop()
     await quota_alert_service.stop()
+    await state_journal.stop()
+    await api_key_service.stop()
+    await admission_controller.stop()
+    shutdown_executors()
     logger.info("Shutting down WitnessReplay application")
 
 
@@ -254,10 +295,28 @@ app.add_middleware(
 )
 
 # Global rate limiting middleware (after CORS)
-_request_counts = defaultdict(list)
+_RATE_NAMESPACE = "rate:global_ip"
 _RATE_LIMIT = 100  # requests per minute
 _RATE_WINDOW = 60  # seconds
 
+def _set_rate_limit_headers(response, limit, remaining, reset=None):
+    """Add X-RateLimit-* unless an inner layer (the per-API-key bucket) already set them."""
+    if "X-RateLimit-Limit" in response.headers:
+        return
+    response.headers["X-RateLimit-Limit"] = str(limit)
+    response.headers["X-RateLimit-Remaining"] = str(remaining)
+    if reset is not None:
+        response.headers["X-RateLimit-Reset"] = str(reset)
+
+
+def _count_global_request(client_ip: str, window: int) -> Tuple[int, int]:
+    """Bump this window's counter and read the previous one (one trip to the state backend)."""
+    backend = get_state_backend()
+    current = backend.incr(_RATE_NAMESPACE, f"{client_ip}:{window}", ttl_seconds=_RATE_WINDOW * 2)
+    previous = int(backend.get(_RATE_NAMESPACE, f"{client_ip}:{window - 1}", 0) or 0)
+    return current, previous
+
+
 class RateLimitMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request, call_next):
         # Skip rate limiting for static files and health checks
@@ -267,22 +326,23 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         
         client_ip = request.client.host if request.client else "unknown"
         now = time_module.time()
+        window = int(now // _RATE_WINDOW)
+        # Sliding window over two fixed-window counters, so a client cannot burst
+        # twice the limit across a window boundary
+        current, previous = await run_state_io(_count_global_request, client_ip, window)
+        request_count = int(sliding_window_estimate(previous, current, _RATE_WINDOW, now))
         
-        # Clean old entries
-        _request_counts[client_ip] = [t for t in _request_counts[client_ip] if now - t < _RATE_WINDOW]
-        
-        if len(_request_counts[client_ip]) >= _RATE_LIMIT:
+        if request_count > _RATE_LIMIT:
             from fastapi.responses import JSONResponse
+            retry_after = max(1, int(_RATE_WINDOW - now % _RATE_WINDOW))
             return JSONResponse(
                 status_code=429,
-                content={"detail": "Too many requests. Please try again later.", "retry_after": _RATE_WINDOW},
-                headers={"Retry-After": str(_RATE_WINDOW)}
+                content={"detail": "Too many requests. Please try again later.", "retry_after": retry_after},
+                headers={"Retry-After": str(retry_after)}
             )
         
-        _request_counts[client_ip].append(now)
         response = await call_next(request)
-        response.headers["X-RateLimit-Limit"] = str(_RATE_LIMIT)
-        response.headers["X-RateLimit-Remaining"] = str(_RATE_LIMIT - len(_request_counts[client_ip]))
+        _set_rate_limit_headers(response, _RATE_LIMIT, max(0, _RATE_LIMIT - request_count))
         return response
 
 app.add_middleware(RateLimitMiddleware)
@@ -437,9 +497,11 @@ async def rate_limit_middleware(request: Request, call_next):
                     endpoint=str(request.url.path),
                     method=request.method,
                     client_ip=client_ip,
+                    model=current_model,
                 )
                 
                 if success and queued:
+                    eta = request_queue.get_request_eta(queued.id) or {}
                     # Return 202 Accepted with queue info
                     return JSONResponse(
                         status_code=202,
@@ -448,11 +510,12 @@ async def rate_limit_middleware(request: Request, call_next):
                             "queue_id": queued.id,
                             "queue_status_url": f"/api/queue/status/{queued.id}",
                             "expires_at": queued.expires_at.isoformat(),
+                            "eta_seconds": eta.get("eta_seconds"),
                             "reason": reason,
                         },
                         headers={
                             "X-Queue-ID": queued.id,
-                            "Retry-After": "60",
+                            "Retry-After": str(max(1, int(eta.get("eta_seconds", 60)))),
                             "X-RateLimit-Limit": str(usage["limits"]["requests_per_minute"]),
                             "X-RateLimit-Remaining": "0",
                             "X-RateLimit-Reset": str(int(usage.get("next_reset_timestamp", 0)))
@@ -489,6 +552,7 @@ async def rate_limit_middleware(request: Request, call_next):
                     endpoint=str(request.url.path),
                     method=request.method,
                     client_ip=client_ip,
+                    model=current_model,
                 )
                 
                 if success and queued:
@@ -533,9 +597,12 @@ async def rate_limit_middleware(request: Request, call_next):
     rpd_budget.record_request(current_model)
     
     # Add rate limit headers to response
-    response.headers["X-RateLimit-Limit"] = str(usage["limits"]["requests_per_minute"])
-    response.headers["X-RateLimit-Remaining"] = str(usage["remaining"]["requests_per_minute"])
-    response.headers["X-RateLimit-Reset"] = str(int(usage.get("next_reset_timestamp", 0)))
+    _set_rate_limit_headers(
+        response,
+        usage["limits"]["requests_per_minute"],
+        usage["remaining"]["requests_per_minute"],
+        int(usage.get("next_reset_timestamp", 0)),
+    )
     
     # Add budget headers
     try:
@@ -563,7 +630,7 @@ async def api_ip_rate_limit(request: Request, call_next):
     """Per-IP rate limiting for all API endpoints."""
     if request.url.path.startswith("/api/"):
         client_ip = request.client.host if request.client else "unknown"
-        if not api_rate_limiter.check(client_ip):
+        if not await api_rate_limiter.check(client_ip):
             return JSONResponse(
                 status_code=429,
                 content={"detail": "Rate limit exceeded. Try again shortly."},
@@ -665,17 +732,20 @@ async def timeout_middleware(request: Request, call_next):
         timeout_seconds = 10.0
     else:
         timeout_seconds = 60.0
-    try:
-        return await asyncio.wait_for(call_next(request), timeout=timeout_seconds)
-    except asyncio.TimeoutError:
-        logger.error(f"Request timeout ({timeout_seconds}s): {request.method} {request.url}")
-        return JSONResponse(
-            status_code=504,
-            content={
-                "detail": "Request timeout - server took too long to respond",
-                "path": str(request.url.path)
-            }
-        )
+    # The handler task copies this context, so its Gemini calls see the token
+    with cancellation_scope() as cancel_token:
+        try:
+            return await asyncio.wait_for(call_next(request), timeout=timeout_seconds)
+        except asyncio.TimeoutError:
+            cancel_token.cancel("request_timeout")
+            logger.error(f"Request timeout ({timeout_seconds}s): {request.method} {request.url}")
+            return JSONResponse(
+                status_code=504,
+                content={
+                    "detail": "Request timeout - server took too long to respond",
+                    "path": str(request.url.path)
+                }
+            )
 
 
 @app.middleware("http")
@@ -689,6 +759,10 @@ async def add_response_timing_headers(request: Request, call_next):
     return response
 
 
+# Admission control runs first (registered last) so shed requests skip all other work
+app.add_middleware(AdmissionControlMiddleware)
+
+
 
 if __name__ == "__main__":
     import uvicorn
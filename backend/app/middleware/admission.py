@@ -0,0 +1,37 @@
+"""Admission control middleware: fast 503s for tiers shed under load."""
+
+from typing import Callable
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.services.admission_control import admission_controller, classify_path, route_uses_quota
+
+
+class AdmissionControlMiddleware(BaseHTTPMiddleware):
+    """
+    Turn away API requests whose priority tier is currently being shed,
+    before they reach auth, logging or the handler.
+    """
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        path = request.url.path
+        if not path.startswith("/api/"):
+            return await call_next(request)
+
+        tier = classify_path(path)
+        admitted, retry_after = admission_controller.admit(
+            tier, source=f"{request.method} {path}", uses_quota=route_uses_quota(path)
+        )
+        if admitted:
+            return await call_next(request)
+        return JSONResponse(
+            status_code=503,
+            content={
+                "detail": "Server is busy; please retry shortly.",
+                "tier": tier.name.lower(),
+                "retry_after": retry_after,
+            },
+            headers={"Retry-After": str(retry_after)},
+        )
@@ -656,6 +656,28 @@ class SceneExtractionResponse(BaseModel):
     next_question: Optional[str] = Field(default=None, description="The most important follow-up question")
 
 
+class SceneElementPatch(SceneElementExtracted):
+    """An element added or updated by an incremental scene extraction."""
+    ref: Optional[str] = Field(default=None, description="Ref of the existing element to update (e.g. 'e2'), or null for a new element")
+
+
+class SceneExtractionPatch(BaseModel):
+    """Structured response for incremental scene extraction.
+    
+    Describes only what the new conversation turns change relative to the
+    current scene, so the prompt and the reply stay small as interviews grow.
+    """
+    scene_description: Optional[str] = Field(default=None, description="Updated 3-4 sentence scene description, or null if unchanged")
+    incident_type: Optional[str] = Field(default=None, description="Type if newly known or changed: accident, crime, incident, or other")
+    incident_subtype: Optional[str] = Field(default=None, description="Specific subtype if newly known or changed")
+    elements: List[SceneElementPatch] = Field(default_factory=list, description="New elements, and existing elements whose details changed")
+    removed_elements: List[str] = Field(default_factory=list, description="Refs of elements the witness retracted")
+    timeline: List[TimelineEventExtracted] = Field(default_factory=list, description="New events described in the new turns")
+    contradictions: List[str] = Field(default_factory=list, description="Contradictions between the new turns and the current scene")
+    ambiguities: List[str] = Field(default_factory=list, description="Things that need clarification")
+    next_question: Optional[str] = Field(default=None, description="The most important follow-up question")
+
+
 class IncidentClassificationResponse(BaseModel):
     """Structured response for incident type classification."""
     type: str = Field(description="Incident type: accident, crime, incident, or other")
@@ -700,6 +722,17 @@ class CaseMatchResponse(BaseModel):
     reasoning: str = Field(default="", description="Brief explanation of match decision")
 
 
+class BatchCaseMatchItem(BaseModel):
+    """One report's decision within a batched case matching call."""
+    report: str = Field(description="Report label, e.g. R1")
+    case: int = Field(default=0, description="Matched case number, or 0 for no match")
+
+
+class BatchCaseMatchResponse(BaseModel):
+    """Structured response for matching several reports to cases in one call."""
+    matches: List[BatchCaseMatchItem] = Field(default_factory=list)
+
+
 # ============================================================================
 # Case Linking Schemas
 # ============================================================================
@@ -0,0 +1,256 @@
+"""
+Budget-aware admission control and load shedding.
+
+Once the process is saturated, admin dashboards, bulk exports and pattern
+analysis compete with live interviews for the single event loop, the
+blocking-call pools and the Gemini quota, and every request slows down
+together. ``AdmissionController`` samples three signals in the background:
+
+- event-loop lag: how late a short ``asyncio.sleep`` wakes up (smoothed);
+- executor backlog: jobs waiting per worker in the ``llm-io`` and
+  ``cpu-render`` pools;
+- RPD budget: share of the current ``rpd_budget`` window still unused.
+
+Each signal maps to a shed level from 0 to 3. At level N every tier numbered
+above ``3 - N`` is turned away: level 1 sheds bulk work, level 2 also sheds
+background work, level 3 also sheds interactive requests. The live tier
+(WebSocket turns, health checks, auth, TTS and the admin views that show
+this controller) is never shed. The budget signal only counts against routes
+listed in ``_QUOTA_ROUTES`` as spending Gemini quota, so a low budget sheds
+pattern analysis but not a dashboard read or a plain export.
+
+Decisions are O(1) reads of the last sample; shed HTTP requests get a fast
+``503`` with ``Retry-After`` from ``AdmissionControlMiddleware``.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionTier(IntEnum):
+    """Lower values are more important and are shed last."""
+    LIVE = 0
+    INTERACTIVE = 1
+    BACKGROUND = 2
+    BULK = 3
+
+
+MAX_SHED_LEVEL = 3
+
+# Checked in order; the first match wins and anything else is INTERACTIVE.
+_API = r"^/api/(?:v1/)?"
+_ROUTE_TIERS = [
+    (AdmissionTier.LIVE, re.compile(
+        _API + r"(?:health|auth/|tts/|admin/(?:rate-limiter|performance)\b)|^/ws/"
+    )),
+    (AdmissionTier.BULK, re.compile(
+        r"/bulk|[/-]batch\b|/patterns?\b|pattern-match|evasion-patterns|/export|export-manager|data-export"
+        r"|seed-mock-data|fix-orphan|auto-assign|auto-link|comparison-report|investigation-report"
+    )),
+    (AdmissionTier.BACKGROUND, re.compile(
+        _API + r"admin/|/analytics|/stats\b|-stats\b|/dashboard|trends\b|/heatmap|/insights|/metrics|/compare"
+    )),
+]
+
+
+# Routes that call Gemini and so spend RPD budget; everything else is only
+# shed for load. Plain exports are deliberately not listed.
+_QUOTA_ROUTES = re.compile(
+    r"/patterns?/analyze\b|/cases/[^/]+/patterns\b|pattern-match|evasion-patterns"
+    r"|/auto-assign\b|/auto-link\b|comparison-report|investigation-report|translate-batch"
+)
+
+
+def classify_path(path: str) -> AdmissionTier:
+    """Priority tier for an HTTP route."""
+    for tier, pattern in _ROUTE_TIERS:
+        if pattern.search(path):
+            return tier
+    return AdmissionTier.INTERACTIVE
+
+
+def route_uses_quota(path: str) -> bool:
+    """Whether an HTTP route spends Gemini quota."""
+    return _QUOTA_ROUTES.search(path) is not None
+
+
+def _level(value: float, threshold: float) -> int:
+    """0 below ``threshold``, then one more level at 2x and 4x."""
+    if threshold <= 0 or value < threshold:
+        return 0
+    if value < threshold * 2:
+        return 1
+    if value < threshold * 4:
+        return 2
+    return MAX_SHED_LEVEL
+
+
+class AdmissionController:
+    """Samples load signals and decides which tiers to admit."""
+
+    LAG_ALPHA = 0.3  # Weight of each lag sample; one slow tick alone does not shed
+    RECENT_DECISIONS = 50
+
+    def __init__(self):
+        self.enabled = settings.admission_control_enabled
+        self._task: Optional[asyncio.Task] = None
+        self._lag_ms = 0.0
+        self._lag_ewma_ms = 0.0
+        self._lag_max_ms = 0.0
+        self._backlog_per_worker = 0.0
+        self._budget_remaining = 1.0
+        self._signal_levels = {"loop_lag": 0, "executor_backlog": 0, "budget": 0}
+        self._load_level = 0
+        self._budget_level = 0
+        self._raised_at = 0.0
+        self._sampled_at: Optional[float] = None
+        self._admitted = {tier: 0 for tier in AdmissionTier}
+        self._shed = {tier: 0 for tier in AdmissionTier}
+        self._recent: deque = deque(maxlen=self.RECENT_DECISIONS)
+
+    async def start(self):
+        """Start sampling load signals."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._sample_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample_loop(self):
+        interval = max(0.05, settings.admission_sample_interval_seconds)
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            try:
+                self.update(lag_ms=max(0.0, (time.monotonic() - started - interval) * 1000))
+            except Exception as e:
+                logger.warning(f"Admission control sample failed: {e}")
+
+    @staticmethod
+    def _read_backlog_per_worker() -> float:
+        from app.services.executors import cpu_render, llm_io
+        return max(pool.backlog / pool.max_workers for pool in (llm_io, cpu_render))
+
+    @staticmethod
+    def _read_budget_remaining() -> float:
+        from app.services.rpd_budget import rpd_budget
+        return rpd_budget.remaining_fraction(settings.gemini_model)
+
+    def update(self, lag_ms: float = 0.0):
+        """Fold in one sample of every signal and recompute the shed levels."""
+        now = time.monotonic()
+        self._lag_ms = lag_ms
+        self._lag_ewma_ms += self.LAG_ALPHA * (lag_ms - self._lag_ewma_ms)
+        self._lag_max_ms = max(self._lag_max_ms, lag_ms)
+        self._backlog_per_worker = self._read_backlog_per_worker()
+        self._budget_remaining = self._read_budget_remaining()
+
+        reserve = settings.admission_budget_reserve
+        budget_level = 0
+        if self._budget_remaining < reserve / 2:
+            budget_level = 2
+        elif self._budget_remaining < reserve:
+            budget_level = 1
+        self._signal_levels = {
+            "loop_lag": _level(self._lag_ewma_ms, settings.admission_loop_lag_ms),
+            "executor_backlog": _level(self._backlog_per_worker, settings.admission_executor_backlog),
+            "budget": budget_level,
+        }
+        load_level = max(self._signal_levels["loop_lag"], self._signal_levels["executor_backlog"])
+        if load_level >= self._load_level:
+            if load_level > self._load_level:
+                logger.warning(
+                    f"Admission control shedding level {self._load_level} -> {load_level} "
+                    f"(loop lag {self._lag_ewma_ms:.0f}ms, backlog {self._backlog_per_worker:.1f}/worker)"
+                )
+            self._raised_at = now
+            self._load_level = load_level
+        elif now - self._raised_at >= settings.admission_hold_seconds:
+            logger.info(f"Admission control shedding level {self._load_level} -> {load_level}")
+            self._load_level = load_level
+        self._budget_level = budget_level
+        self._sampled_at = now
+
+    def shed_level(self, uses_quota: bool = False) -> int:
+        return max(self._load_level, self._budget_level if uses_quota else 0)
+
+    def admit(
+        self, tier: AdmissionTier, source: str = "", uses_quota: bool = False
+    ) -> Tuple[bool, int]:
+        """
+        Decide whether to run work of ``tier``; returns ``(admitted, retry_after_seconds)``.
+
+        Only work with ``uses_quota`` set is shed on a low RPD budget.
+        """
+        if not self.enabled or tier == AdmissionTier.LIVE:
+            self._admitted[tier] += 1
+            return True, 0
+        level = self.shed_level(uses_quota)
+        if tier <= MAX_SHED_LEVEL - level:
+            self._admitted[tier] += 1
+            return True, 0
+        self._shed[tier] += 1
+        retry_after = max(1, settings.admission_retry_after_seconds * level)
+        reason = "budget" if level > self._load_level else max(
+            ("loop_lag", "executor_backlog"), key=lambda name: self._signal_levels[name]
+        )
+        self._recent.append({
+            "at": time.time(),
+            "source": source,
+            "tier": tier.name.lower(),
+            "level": level,
+            "reason": reason,
+            "retry_after": retry_after,
+        })
+        return False, retry_after
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Signals, current shed levels and per-tier decisions."""
+        return {
+            "enabled": self.enabled,
+            "shed_level": self._load_level,
+            "budget_shed_level": self._budget_level,
+            "shedding_tiers": [
+                tier.name.lower() for tier in AdmissionTier
+                if tier != AdmissionTier.LIVE and tier > MAX_SHED_LEVEL - self._load_level
+            ],
+            "signals": {
+                "loop_lag_ms": round(self._lag_ms, 1),
+                "loop_lag_avg_ms": round(self._lag_ewma_ms, 1),
+                "loop_lag_max_ms": round(self._lag_max_ms, 1),
+                "executor_backlog_per_worker": round(self._backlog_per_worker, 2),
+                "budget_remaining": round(self._budget_remaining, 3),
+                "levels": dict(self._signal_levels),
+            },
+            "thresholds": {
+                "loop_lag_ms": settings.admission_loop_lag_ms,
+                "executor_backlog_per_worker": settings.admission_executor_backlog,
+                "budget_reserve": settings.admission_budget_reserve,
+            },
+            "sample_age_seconds": (
+                round(time.monotonic() - self._sampled_at, 2) if self._sampled_at is not None else None
+            ),
+            "tiers": {
+                tier.name.lower(): {"admitted": self._admitted[tier], "shed": self._shed[tier]}
+                for tier in AdmissionTier
+            },
+            "recent_shed": list(self._recent),
+        }
+
+
+# Global instance
+admission_controller = AdmissionController()
@@ -1,15 +1,22 @@
 """
 Gemini API account manager with prioritized key rotation and passive quota tracking.
 
-This module keeps Primary → Secondary → Tertiary ordering, tracks per-account /
-per-model cooldowns, parses rate-limit headers from functional responses, and
-exposes a drop-in rotating client wrapper for the SDK surfaces this app uses.
+This module tracks per-account / per-model cooldowns, parses rate-limit headers
+from functional responses, and exposes a drop-in rotating client wrapper for the
+SDK surfaces this app uses.
+
+Accounts are tried in the order set by ``GEMINI_ACCOUNT_BALANCING``:
+``priority`` keeps Primary → Secondary → Tertiary ordering; ``p2c`` (power of
+two choices) and ``wrr`` (smooth weighted round-robin) spread traffic by each
+account's predicted headroom, i.e. remaining RPM/RPD/TPM from response headers
+or local counters minus requests still in flight.
 """
 
 from __future__ import annotations
 
 import json
 import logging
+import random
 import threading
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
@@ -21,6 +28,11 @@ from zoneinfo import ZoneInfo
 from google import genai
 
 from app.config import settings
+from app.services.prompt_cache import CachedContentPool, cached_content_name
+from app.services.cancellation import OperationCancelled, raise_if_cancelled, record_if_abandoned
+from app.services.concurrency_limiter import ConcurrencyLimiter, Permit, SlotReservation, current_reservation
+from app.services.rate_counter import RateCounter
+from app.services.state_journal import state_journal
 
 logger = logging.getLogger(__name__)
 
@@ -106,18 +118,26 @@ class RotatingModels:
         for account in self._manager.get_account_candidates(model):
             attempted = True
             client = self._manager.get_raw_client(account.account_id)
+            routed_contents, routed_config, prefix = self._manager.prompt_cache.route(
+                client, account.account_id, model, contents, config,
+            )
+            permit = self._manager.acquire_slot(account.account_id, model)
             self._manager.note_selection(account.account_id, model)
             try:
                 response = client.models.generate_content(
                     model=model,
-                    contents=contents,
-                    config=config,
+                    contents=routed_contents,
+                    config=routed_config,
                 )
-                self._manager.record_success(account.account_id, model, response=response)
+                self._manager.record_success(account.account_id, model, response=response, permit=permit)
+                if prefix is not None:
+                    self._manager.prompt_cache.record_success(prefix, response)
                 return response
             except Exception as exc:
                 last_error = exc
-                self._manager.record_failure(account.account_id, model, exc)
+                self._manager.record_failure(account.account_id, model, exc, permit=permit)
+                if prefix is not None:
+                    self._manager.prompt_cache.note_failure(account.account_id, model, prefix, exc)
                 if self._manager.should_failover(exc):
                     continue
                 raise
@@ -134,6 +154,7 @@ class RotatingModels:
         for account in self._manager.get_account_candidates(model):
             attempted = True
             client = self._manager.get_raw_client(account.account_id)
+            permit = self._manager.acquire_slot(account.account_id, model)
             self._manager.note_selection(account.account_id, model)
             try:
                 response = client.models.embed_content(
@@ -141,11 +162,11 @@ class RotatingModels:
                     contents=contents,
                     config=config,
                 )
-                self._manager.record_success(account.account_id, model, response=response)
+                self._manager.record_success(account.account_id, model, response=response, permit=permit)
                 return response
             except Exception as exc:
                 last_error = exc
-                self._manager.record_failure(account.account_id, model, exc)
+                self._manager.record_failure(account.account_id, model, exc, permit=permit)
                 if self._manager.should_failover(exc):
                     continue
                 raise
@@ -156,6 +177,12 @@ class RotatingModels:
             raise RuntimeError(f"No Gemini accounts are configured for model '{model}'")
         raise RuntimeError(f"No Gemini accounts are currently available for model '{model}'")
 
+    async def reserve_dispatch_slot(self, func: Any, kwargs: Dict[str, Any]) -> Optional[SlotReservation]:
+        """Called by the executor on the event loop before ``func`` is sent to a worker."""
+        if getattr(func, "__name__", "") not in ("generate_content", "embed_content"):
+            return None
+        return await self._manager.reserve_slot(kwargs.get("model"))
+
     def list(self, *args: Any, **kwargs: Any) -> Any:
         client = self._manager.get_raw_client()
         return client.models.list(*args, **kwargs)
@@ -175,6 +202,8 @@ class RotatingChatSession:
         self._history = list(history or [])
         self._chat = None
         self._account_id: Optional[str] = None
+        self._cache_name: Optional[str] = None
+        self._prefix = None
 
     def _current_history(self) -> List[Any]:
         if self._chat is not None:
@@ -184,33 +213,54 @@ class RotatingChatSession:
         return list(self._history)
 
     def _ensure_chat(self, account_id: str):
-        if self._chat is not None and self._account_id == account_id:
-            return
         client = self._manager.get_raw_client(account_id)
+        # Resolved every turn so a chat follows its cached system prompt across refreshes
+        _, config, prefix = self._manager.prompt_cache.route(client, account_id, self._model, None, self._config)
+        cache_name = cached_content_name(config) if prefix is not None else None
+        if self._chat is not None and self._account_id == account_id and self._cache_name == cache_name:
+            return
         self._chat = client.chats.create(
             model=self._model,
-            config=self._config,
+            config=config,
             history=self._current_history(),
         )
         self._account_id = account_id
+        self._cache_name = cache_name
+        self._prefix = prefix
+
+    def _drop_chat(self, error: Exception):
+        if self._prefix is not None and self._account_id:
+            self._manager.prompt_cache.note_failure(self._account_id, self._model, self._prefix, error)
+        self._chat = None
+        self._account_id = None
+        self._cache_name = None
+        self._prefix = None
+
+    async def reserve_dispatch_slot(self, func: Any, kwargs: Dict[str, Any]) -> Optional[SlotReservation]:
+        """Called by the executor on the event loop before ``func`` is sent to a worker."""
+        if getattr(func, "__name__", "") not in ("send_message", "send_message_stream"):
+            return None
+        return await self._manager.reserve_slot(self._model)
 
     def send_message(self, message: Any, config: Any = None) -> Any:
         last_error: Optional[Exception] = None
         attempted = False
         for account in self._manager.get_account_candidates(self._model):
             attempted = True
-            self._manager.note_selection(account.account_id, self._model)
             self._ensure_chat(account.account_id)
+            permit = self._manager.acquire_slot(account.account_id, self._model)
+            self._manager.note_selection(account.account_id, self._model)
             try:
                 response = self._chat.send_message(message, config=config)
                 self._history = self._current_history()
-                self._manager.record_success(account.account_id, self._model, response=response)
+                self._manager.record_success(account.account_id, self._model, response=response, permit=permit)
+                if self._prefix is not None:
+                    self._manager.prompt_cache.record_success(self._prefix, response)
                 return response
             except Exception as exc:
                 last_error = exc
-                self._manager.record_failure(account.account_id, self._model, exc)
-                self._chat = None
-                self._account_id = None
+                self._manager.record_failure(account.account_id, self._model, exc, permit=permit)
+                self._drop_chat(exc)
                 if self._manager.should_failover(exc):
                     continue
                 raise
@@ -226,22 +276,33 @@ class RotatingChatSession:
         attempted = False
         for account in self._manager.get_account_candidates(self._model):
             attempted = True
-            self._manager.note_selection(account.account_id, self._model)
             self._ensure_chat(account.account_id)
+            permit = self._manager.acquire_slot(account.account_id, self._model)
+            self._manager.note_selection(account.account_id, self._model)
             yielded_any = False
+            last_chunk = None
             try:
                 stream = self._chat.send_message_stream(message, config=config)
                 for chunk in stream:
                     yielded_any = True
+                    last_chunk = chunk
                     yield chunk
                 self._history = self._current_history()
+                # Stream duration follows the reader, so it says little about upstream load
+                permit.release(measure_latency=False)
                 self._manager.record_success(account.account_id, self._model)
+                if self._prefix is not None:
+                    self._manager.prompt_cache.record_success(self._prefix, last_chunk)
                 return
+            except GeneratorExit:
+                # Consumer stopped reading; the request is no longer in flight
+                permit.release(measure_latency=False)
+                self._manager.release_selection(account.account_id, self._model)
+                raise
             except Exception as exc:
                 last_error = exc
-                self._manager.record_failure(account.account_id, self._model, exc)
-                self._chat = None
-                self._account_id = None
+                self._manager.record_failure(account.account_id, self._model, exc, permit=permit)
+                self._drop_chat(exc)
                 if not yielded_any and self._manager.should_failover(exc):
                     continue
                 raise
@@ -348,8 +409,8 @@ class APIKeyManager:
         self._account_lookup = {account.account_id: account for account in self.accounts}
         self._lock = threading.RLock()
         self._clients: Dict[str, genai.Client] = {}
+        self.prompt_cache = CachedContentPool()
         self._rotating_client = RotatingGenAIClient(self)
-        self._state_path = _state_path()
         self._last_reset_date = ""
         self._rotation_count = 0
         self._last_rotation_at: Optional[datetime] = None
@@ -366,6 +427,14 @@ class APIKeyManager:
             for account in self.accounts
         }
         self._model_state: Dict[str, Dict[str, Any]] = {}
+        self._minute_requests = RateCounter(window_seconds=60)  # keyed "account:model"
+        self._in_flight: Dict[str, int] = {}  # keyed "account:model"
+        self._wrr_weights: Dict[Tuple[str, str], float] = {}  # (model, account) -> current weight
+        self._rng = random.Random()
+        self.limiter = ConcurrencyLimiter()
+        self._state = state_journal.register(
+            "api_key_manager", _state_path(), self._snapshot_state, lock=self._lock,
+        )
         self._load_state()
         self._reset_if_new_day()
 
@@ -416,7 +485,95 @@ class APIKeyManager:
                     available.append(account)
                 else:
                     constrained.append(account)
-            return available + constrained
+            ordered = self._balance(available, model_name)
+            reservation = current_reservation()
+            if reservation is not None and not reservation.claimed and reservation.model_name == model_name:
+                # The slot was taken on the event loop for this account; try it first
+                ordered.sort(key=lambda account: account.account_id != reservation.account_id)
+            elif model_name and self.limiter.enabled:
+                # Start where a concurrency slot is free instead of queueing behind a busy account
+                ordered.sort(key=lambda account: not self.limiter.has_capacity(account.account_id, model_name))
+            return ordered + constrained
+
+    def _balance(self, available: List[GeminiAccountConfig], model_name: Optional[str]) -> List[GeminiAccountConfig]:
+        """Order available accounts by the configured policy; failover order follows headroom."""
+        policy = (settings.gemini_account_balancing or "priority").lower()
+        if policy == "priority" or not model_name or len(available) < 2:
+            return available
+
+        headroom = {account.account_id: self._headroom(account.account_id, model_name) for account in available}
+        ranked = sorted(available, key=lambda account: (-headroom[account.account_id], account.priority))
+        # Accounts whose in-flight requests already cover what is left only go first if nothing else can
+        open_accounts = [account for account in available if headroom[account.account_id] > 0]
+        if len(open_accounts) < 2:
+            return ranked
+        if policy == "wrr":
+            first = self._pick_weighted_round_robin(open_accounts, model_name, headroom)
+        else:
+            first = min(
+                self._rng.sample(open_accounts, 2),
+                key=lambda account: (-headroom[account.account_id], account.priority),
+            )
+        return [first] + [account for account in ranked if account is not first]
+
+    def _pick_weighted_round_robin(
+        self,
+        available: List[GeminiAccountConfig],
+        model_name: str,
+        headroom: Dict[str, float],
+    ) -> GeminiAccountConfig:
+        """Smooth weighted round-robin (as in nginx) with headroom as the weight."""
+        weights = {account.account_id: max(headroom[account.account_id], 0.01) for account in available}
+        total = sum(weights.values())
+        best = None
+        for account in available:
+            key = (model_name, account.account_id)
+            self._wrr_weights[key] = self._wrr_weights.get(key, 0.0) + weights[account.account_id]
+            if best is None or self._wrr_weights[key] > self._wrr_weights[(model_name, best.account_id)]:
+                best = account
+        self._wrr_weights[(model_name, best.account_id)] -= total
+        return best
+
+    def _headroom(self, account_id: str, model_name: str) -> float:
+        """
+        Predicted share (0-1) of the account's quota still free for ``model_name``.
+
+        The tightest of RPM, RPD and TPM wins. Rate-limit headers are trusted for
+        a minute after they arrive, otherwise the local counters stand in; requests
+        already in flight count as used. With no known limits the least busy
+        account scores highest.
+        """
+        key = f"{account_id}:{model_name}"
+        state = self._model_state.get(key) or {}
+        limits = self._get_model_limits(model_name)
+        in_flight = self._in_flight.get(key, 0)
+        fresh = _headers_fresh(state, datetime.now(timezone.utc))
+
+        fractions: List[float] = []
+        rpm_limit = state.get("limit_requests") or int(limits.get("rpm", 0) or 0)
+        if rpm_limit:
+            if fresh and state.get("remaining_requests") is not None:
+                remaining = state["remaining_requests"]
+            else:
+                remaining = rpm_limit - self._minute_requests.count(key)
+            fractions.append((remaining - in_flight) / rpm_limit)
+        rpd_limit = state.get("limit_daily_requests") or int(limits.get("rpd", 0) or 0)
+        if rpd_limit:
+            remaining = state.get("remaining_daily_requests")
+            if remaining is None:
+                remaining = rpd_limit - int(state.get("daily_requests", 0))
+            fractions.append((remaining - in_flight) / rpd_limit)
+        tpm_limit = state.get("limit_tokens") or int(limits.get("tpm", 0) or 0)
+        if tpm_limit:
+            if fresh and state.get("remaining_tokens") is not None:
+                remaining = state["remaining_tokens"]
+            else:
+                remaining = tpm_limit - int(state.get("daily_tokens", 0))
+            fractions.append(remaining / tpm_limit)
+
+        if not fractions:
+            return 1.0 / (1 + in_flight)
+        return max(0.0, min(fractions))
 
     def has_available_account(self, model_name: Optional[str] = None) -> bool:
         with self._lock:
@@ -439,6 +596,8 @@ class APIKeyManager:
             accounts = []
             for account in self.accounts:
                 state = self._get_model_state(account.account_id, model_name)
+                key = f"{account.account_id}:{model_name}"
+                minute_requests = self._minute_requests.count(key)
                 accounts.append({
                     "account_id": account.account_id,
                     "label": account.label,
@@ -449,11 +608,14 @@ class APIKeyManager:
                     "remaining_daily_requests": state.get("remaining_daily_requests"),
                     "daily_requests": state.get("daily_requests", 0),
                     "daily_tokens": state.get("daily_tokens", 0),
-                    "minute_requests": len(state.get("minute_requests", [])),
+                    "minute_requests": minute_requests,
+                    "in_flight": self._in_flight.get(key, 0),
+                    "headroom": round(self._headroom(account.account_id, model_name), 3),
                     "last_http_status": state.get("last_http_status"),
                 })
             return {
                 "model": model_name,
+                "balancing": settings.gemini_account_balancing,
                 "available_accounts": sum(1 for item in accounts if item["available"]),
                 "accounts": accounts,
             }
@@ -478,14 +640,80 @@ class APIKeyManager:
             state = self._account_state.get(account_id)
             if state is None:
                 return
+            if model_name:
+                key = f"{account_id}:{model_name}"
+                self._in_flight[key] = self._in_flight.get(key, 0) + 1
             state["last_used_at"] = datetime.now(timezone.utc)
             account = self._account_lookup.get(account_id)
             if account and account.priority > 1:
                 self._rotation_count += 1
                 self._last_rotation_at = datetime.now(timezone.utc)
-            self._save_state()
+            self._journal_state(account_id)
+
+    def acquire_slot(self, account_id: str, model_name: str) -> Permit:
+        """Wait for a concurrency slot on this account/model (see ``concurrency_limiter``).
+
+        Every attempt and failover passes through here, so an attempt whose
+        caller has already been cancelled is dropped before it is sent.
+        """
+        what = f"Gemini call to {model_name} on {account_id}"
+        raise_if_cancelled(what)
+        permit = self.limiter.acquire(account_id, model_name)
+        try:
+            raise_if_cancelled(what)  # Cancelled while queued for the slot
+        except OperationCancelled:
+            permit.release(measure_latency=False)
+            raise
+        return permit
+
+    async def reserve_slot(self, model_name: Optional[str]) -> Optional[SlotReservation]:
+        """Wait on the event loop for a slot on the account a call for ``model_name`` will try first.
+
+        The executor passes the reservation to the worker, whose ``acquire_slot``
+        then uses it instead of blocking the thread.
+        """
+        if not model_name or not self.limiter.enabled:
+            return None
+        candidates = self.get_account_candidates(model_name)
+        if not candidates:
+            return None
+        account_id = candidates[0].account_id
+        what = f"Gemini call to {model_name} on {account_id}"
+        raise_if_cancelled(what)
+        permit = await self.limiter.acquire_async(account_id, model_name)
+        reservation = SlotReservation(permit, account_id, model_name)
+        try:
+            raise_if_cancelled(what)  # Cancelled while queued for the slot
+        except OperationCancelled:
+            reservation.release_unclaimed()
+            raise
+        return reservation
+
+    def release_selection(self, account_id: str, model_name: Optional[str]):
+        """End the in-flight accounting started by ``note_selection``."""
+        if not model_name:
+            return
+        with self._lock:
+            key = f"{account_id}:{model_name}"
+            count = self._in_flight.get(key, 0) - 1
+            if count > 0:
+                self._in_flight[key] = count
+            else:
+                self._in_flight.pop(key, None)
 
-    def record_success(self, account_id: str, model_name: Optional[str], *, response: Any = None):
+    def record_success(
+        self,
+        account_id: str,
+        model_name: Optional[str],
+        *,
+        response: Any = None,
+        permit: Optional[Permit] = None,
+    ):
+        if permit is not None:
+            permit.release()
+        self.release_selection(account_id, model_name)
+        if response is not None:
+            record_if_abandoned(response)
         with self._lock:
             self._reset_if_new_day()
             account_state = self._account_state.get(account_id)
@@ -498,22 +726,33 @@ class APIKeyManager:
             if account_state.get("cooldown_until") and account_state["cooldown_until"] <= datetime.now(timezone.utc):
                 account_state["cooldown_until"] = None
 
+            request_at = None
             if model_name:
                 state = self._get_model_state(account_id, model_name)
-                state["minute_requests"].append(datetime.now(timezone.utc))
+                request_at = datetime.now(timezone.utc)
+                self._minute_requests.add(f"{account_id}:{model_name}", now=request_at.timestamp())
                 state["daily_requests"] = int(state.get("daily_requests", 0)) + 1
                 state["daily_tokens"] = int(state.get("daily_tokens", 0)) + _extract_tokens_used(response)
                 state["last_error"] = None
                 state["last_updated_at"] = datetime.now(timezone.utc)
-                self._prune_minute_window(state)
                 headers = _extract_headers_from_response(response)
                 if headers:
                     self._apply_headers(account_id, model_name, headers, status_code=200)
                 elif state.get("cooldown_until") and state["cooldown_until"] <= datetime.now(timezone.utc):
                     state["cooldown_until"] = None
-            self._save_state()
+            self._journal_state(account_id, model_name, request_at=request_at)
 
-    def record_failure(self, account_id: str, model_name: Optional[str], error: Exception):
+    def record_failure(
+        self,
+        account_id: str,
+        model_name: Optional[str],
+        error: Exception,
+        *,
+        permit: Optional[Permit] = None,
+    ):
+        if permit is not None:
+            permit.release(rate_limited=_is_rate_limit_error(error), measure_latency=False)
+        self.release_selection(account_id, model_name)
         with self._lock:
             self._reset_if_new_day()
             account_state = self._account_state.get(account_id)
@@ -538,13 +777,10 @@ class APIKeyManager:
                 account_state["auth_failed"] = True
                 account_state["cooldown_until"] = None
                 logger.error("Gemini account %s marked auth-failed after %s", account_id, status_code)
-                self._save_state()
+                self._journal_state(account_id, model_name)
                 return
 
-            if model_name and (
-                status_code == 429
-                or any(token in lowered for token in ("quota", "rate limit", "resource_exhausted", "resource has been exhausted", "too many requests"))
-            ):
+            if model_name and _is_rate_limit_error(error):
                 self._mark_model_cooldown(
                     account_id,
                     model_name,
@@ -552,7 +788,7 @@ class APIKeyManager:
                     reason=message,
                     status_code=status_code,
                 )
-                self._save_state()
+                self._journal_state(account_id, model_name)
                 return
 
             if status_code and 500 <= status_code < 600:
@@ -560,7 +796,7 @@ class APIKeyManager:
                 account_state["cooldown_until"] = datetime.now(timezone.utc) + timedelta(seconds=cooldown_seconds)
                 logger.warning("Gemini account %s cooling down globally for %ss after upstream error %s", account_id, cooldown_seconds, status_code)
 
-            self._save_state()
+            self._journal_state(account_id, model_name)
 
     def should_failover(self, error: Exception) -> bool:
         status_code = _extract_status_code(error)
@@ -615,7 +851,7 @@ class APIKeyManager:
                         "remaining_daily_requests": state.get("remaining_daily_requests"),
                         "daily_requests": state.get("daily_requests", 0),
                         "daily_tokens": state.get("daily_tokens", 0),
-                        "minute_requests": len(state.get("minute_requests", [])),
+                        "minute_requests": self._minute_requests.count(key),
                         "last_http_status": state.get("last_http_status"),
                     }
 
@@ -647,6 +883,9 @@ class APIKeyManager:
                 "failed_keys": failed,
                 "rotation_count": self._rotation_count,
                 "last_rotated": _iso_or_none(self._last_rotation_at),
+                "balancing": settings.gemini_account_balancing,
+                "in_flight": sum(self._in_flight.values()),
+                "concurrency": self.limiter.get_stats(),
                 "accounts": accounts_payload,
             }
 
@@ -674,12 +913,11 @@ class APIKeyManager:
         if model_cooldown and model_cooldown <= now:
             state["cooldown_until"] = None
 
-        limit_reason = self._evaluate_local_limit_state(state, model_name)
+        limit_reason = self._evaluate_local_limit_state(state, account_id, model_name)
         return limit_reason is None
 
-    def _evaluate_local_limit_state(self, state: Dict[str, Any], model_name: str) -> Optional[str]:
+    def _evaluate_local_limit_state(self, state: Dict[str, Any], account_id: str, model_name: str) -> Optional[str]:
         now = datetime.now(timezone.utc)
-        self._prune_minute_window(state)
         limits = self._get_model_limits(model_name)
         rpm_limit = int(limits.get("rpm", 0) or 0)
         tpm_limit = int(limits.get("tpm", 0) or 0)
@@ -689,16 +927,19 @@ class APIKeyManager:
             if not state.get("cooldown_until") or state["cooldown_until"] <= now:
                 state["cooldown_until"] = self._next_daily_reset_utc()
             return "header_rpd"
-        if state.get("remaining_requests") is not None and state["remaining_requests"] <= 0:
+        # Per-minute remainders describe the minute they were sent in; once that
+        # has passed they would otherwise re-arm the cooldown forever
+        minute_headers_fresh = _headers_fresh(state, now)
+        if minute_headers_fresh and state.get("remaining_requests") is not None and state["remaining_requests"] <= 0:
             if not state.get("cooldown_until") or state["cooldown_until"] <= now:
                 state["cooldown_until"] = now + timedelta(seconds=60)
             return "header_rpm"
-        if state.get("remaining_tokens") is not None and state["remaining_tokens"] <= 0:
+        if minute_headers_fresh and state.get("remaining_tokens") is not None and state["remaining_tokens"] <= 0:
             if not state.get("cooldown_until") or state["cooldown_until"] <= now:
                 state["cooldown_until"] = now + timedelta(seconds=60)
             return "header_tpm"
 
-        if rpm_limit and len(state.get("minute_requests", [])) >= rpm_limit:
+        if rpm_limit and self._minute_requests.count(f"{account_id}:{model_name}") >= rpm_limit:
             state["cooldown_until"] = max(state.get("cooldown_until") or now, now + timedelta(seconds=60))
             return "local_rpm"
         if tpm_limit and int(state.get("daily_tokens", 0)) >= tpm_limit:
@@ -714,7 +955,6 @@ class APIKeyManager:
         state = self._model_state.get(key)
         if state is None:
             state = {
-                "minute_requests": [],
                 "daily_requests": 0,
                 "daily_tokens": 0,
                 "cooldown_until": None,
@@ -726,16 +966,8 @@ class APIKeyManager:
                 "last_updated_at": None,
             }
             self._model_state[key] = state
-        self._prune_minute_window(state)
         return state
 
-    def _prune_minute_window(self, state: Dict[str, Any]):
-        cutoff = datetime.now(timezone.utc) - timedelta(seconds=60)
-        state["minute_requests"] = [
-            ts for ts in state.get("minute_requests", [])
-            if isinstance(ts, datetime) and ts > cutoff
-        ]
-
     def _apply_headers(self, account_id: str, model_name: str, headers: Dict[str, str], status_code: Optional[int] = None):
         state = self._get_model_state(account_id, model_name)
         normalized = {str(key).lower(): str(value) for key, value in (headers or {}).items()}
@@ -815,7 +1047,7 @@ class APIKeyManager:
             state["daily_requests"] = 0
             state["daily_tokens"] = 0
             state["remaining_daily_requests"] = None
-        self._save_state()
+        self._state.request_snapshot()
 
     def _next_daily_reset_utc(self) -> datetime:
         pacific_now = datetime.now(PACIFIC_TZ)
@@ -823,79 +1055,90 @@ class APIKeyManager:
         return next_reset.astimezone(timezone.utc)
 
     def _load_state(self):
+        payload, deltas = self._state.load()
         try:
-            if not self._state_path.exists():
-                return
-            payload = json.loads(self._state_path.read_text())
-            self._last_reset_date = str(payload.get("last_reset_date", "") or "")
-            self._rotation_count = int(payload.get("rotation_count", 0) or 0)
-            self._last_rotation_at = _parse_datetime(payload.get("last_rotation_at"))
-
-            restored_account_state = payload.get("account_state") or {}
-            for account_id, state in restored_account_state.items():
-                if account_id not in self._account_state:
-                    continue
-                self._account_state[account_id].update({
-                    "healthy": bool(state.get("healthy", True)),
-                    "auth_failed": bool(state.get("auth_failed", False)),
-                    "cooldown_until": _parse_datetime(state.get("cooldown_until")),
-                    "error_count": int(state.get("error_count", 0) or 0),
-                    "last_error": state.get("last_error"),
-                    "last_http_status": state.get("last_http_status"),
-                    "last_used_at": _parse_datetime(state.get("last_used_at")),
-                })
-
-            restored_model_state = payload.get("model_state") or {}
-            for key, state in restored_model_state.items():
-                self._model_state[key] = {
-                    "minute_requests": [
-                        dt for dt in (_parse_datetime(value) for value in state.get("minute_requests", []))
-                        if dt is not None
-                    ],
-                    "daily_requests": int(state.get("daily_requests", 0) or 0),
-                    "daily_tokens": int(state.get("daily_tokens", 0) or 0),
-                    "cooldown_until": _parse_datetime(state.get("cooldown_until")),
-                    "remaining_requests": _coerce_int(state.get("remaining_requests")),
-                    "remaining_tokens": _coerce_int(state.get("remaining_tokens")),
-                    "remaining_daily_requests": _coerce_int(state.get("remaining_daily_requests")),
-                    "limit_requests": _coerce_int(state.get("limit_requests")),
-                    "limit_tokens": _coerce_int(state.get("limit_tokens")),
-                    "limit_daily_requests": _coerce_int(state.get("limit_daily_requests")),
-                    "last_http_status": state.get("last_http_status"),
-                    "last_error": state.get("last_error"),
-                    "last_updated_at": _parse_datetime(state.get("last_updated_at")),
-                }
-                self._prune_minute_window(self._model_state[key])
+            if payload:
+                self._last_reset_date = str(payload.get("last_reset_date", "") or "")
+                self._rotation_count = int(payload.get("rotation_count", 0) or 0)
+                self._last_rotation_at = _parse_datetime(payload.get("last_rotation_at"))
+                for account_id, state in (payload.get("account_state") or {}).items():
+                    self._restore_account_state(account_id, state)
+                for key, state in (payload.get("model_state") or {}).items():
+                    self._model_state[key] = _parse_model_state(state)
+                    self._restore_minute_window(key, state)
+            for delta in deltas:
+                self._apply_delta(delta)
         except Exception as exc:
             logger.warning("APIKeyManager: could not load state: %s", exc)
 
-    def _save_state(self):
-        try:
-            payload = {
-                "last_reset_date": self._last_reset_date,
-                "rotation_count": self._rotation_count,
-                "last_rotation_at": _iso_or_none(self._last_rotation_at),
-                "account_state": {
-                    account_id: {
-                        **state,
-                        "cooldown_until": _iso_or_none(state.get("cooldown_until")),
-                        "last_used_at": _iso_or_none(state.get("last_used_at")),
-                    }
-                    for account_id, state in self._account_state.items()
-                },
-                "model_state": {
-                    key: {
-                        **state,
-                        "minute_requests": [_iso_or_none(ts) for ts in state.get("minute_requests", []) if ts],
-                        "cooldown_until": _iso_or_none(state.get("cooldown_until")),
-                        "last_updated_at": _iso_or_none(state.get("last_updated_at")),
-                    }
-                    for key, state in self._model_state.items()
-                },
-            }
-            self._state_path.write_text(json.dumps(payload, indent=2, sort_keys=True))
-        except Exception as exc:
-            logger.warning("APIKeyManager: could not save state: %s", exc)
+    def _restore_account_state(self, account_id: str, state: Dict[str, Any]):
+        if account_id not in self._account_state:
+            return
+        self._account_state[account_id].update({
+            "healthy": bool(state.get("healthy", True)),
+            "auth_failed": bool(state.get("auth_failed", False)),
+            "cooldown_until": _parse_datetime(state.get("cooldown_until")),
+            "error_count": int(state.get("error_count", 0) or 0),
+            "last_error": state.get("last_error"),
+            "last_http_status": state.get("last_http_status"),
+            "last_used_at": _parse_datetime(state.get("last_used_at")),
+        })
+
+    def _apply_delta(self, delta: Dict[str, Any]):
+        """Replay one journaled account (and model) update written by ``_journal_state``."""
+        self._last_reset_date = str(delta.get("day") or self._last_reset_date)
+        self._rotation_count = int(delta.get("rot", self._rotation_count) or 0)
+        self._last_rotation_at = _parse_datetime(delta.get("rot_at")) or self._last_rotation_at
+        self._restore_account_state(delta["a"], delta.get("v") or {})
+        key = delta.get("k")
+        if key:
+            self._model_state[key] = _parse_model_state(delta.get("mv") or {})
+            request_at = _parse_datetime(delta.get("at"))
+            if request_at is not None:
+                self._minute_requests.add(key, now=request_at.timestamp())
+
+    def _restore_minute_window(self, key: str, state: Dict[str, Any]):
+        if state.get("minute_window"):
+            self._minute_requests.restore(key, state["minute_window"])
+            return
+        # Snapshots written before the bucketed counter kept raw timestamps
+        for value in state.get("minute_requests") or []:
+            request_at = _parse_datetime(value)
+            if request_at is not None:
+                self._minute_requests.add(key, now=request_at.timestamp())
+
+    def _journal_state(self, account_id: str, model_name: Optional[str] = None, *, request_at: Optional[datetime] = None):
+        """Queue the touched account/model records (never the whole state) for persistence."""
+        delta: Dict[str, Any] = {
+            "day": self._last_reset_date,
+            "rot": self._rotation_count,
+            "rot_at": _iso_or_none(self._last_rotation_at),
+            "a": account_id,
+            "v": _serialize_account_state(self._account_state[account_id]),
+        }
+        key = f"{account_id}:{model_name}" if model_name else None
+        if key in self._model_state:
+            delta["k"] = key
+            delta["mv"] = _serialize_model_state(self._model_state[key])
+            if request_at is not None:
+                delta["at"] = _iso_or_none(request_at)
+        self._state.record(delta)
+
+    def _snapshot_state(self) -> Dict[str, Any]:
+        """Snapshot payload; called by the state journal with ``_lock`` held."""
+        return {
+            "last_reset_date": self._last_reset_date,
+            "rotation_count": self._rotation_count,
+            "last_rotation_at": _iso_or_none(self._last_rotation_at),
+            "account_state": {
+                account_id: _serialize_account_state(state)
+                for account_id, state in self._account_state.items()
+            },
+            "model_state": {
+                key: {**_serialize_model_state(state), "minute_window": self._minute_requests.to_state(key)}
+                for key, state in self._model_state.items()
+            },
+        }
 
     def _get_model_limits(self, model_name: str) -> Dict[str, int]:
         try:
@@ -1091,6 +1334,39 @@ def _parse_datetime(value: Any) -> Optional[datetime]:
         return None
 
 
+def _serialize_account_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **state,
+        "cooldown_until": _iso_or_none(state.get("cooldown_until")),
+        "last_used_at": _iso_or_none(state.get("last_used_at")),
+    }
+
+
+def _serialize_model_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **state,
+        "cooldown_until": _iso_or_none(state.get("cooldown_until")),
+        "last_updated_at": _iso_or_none(state.get("last_updated_at")),
+    }
+
+
+def _parse_model_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "daily_requests": int(state.get("daily_requests", 0) or 0),
+        "daily_tokens": int(state.get("daily_tokens", 0) or 0),
+        "cooldown_until": _parse_datetime(state.get("cooldown_until")),
+        "remaining_requests": _coerce_int(state.get("remaining_requests")),
+        "remaining_tokens": _coerce_int(state.get("remaining_tokens")),
+        "remaining_daily_requests": _coerce_int(state.get("remaining_daily_requests")),
+        "limit_requests": _coerce_int(state.get("limit_requests")),
+        "limit_tokens": _coerce_int(state.get("limit_tokens")),
+        "limit_daily_requests": _coerce_int(state.get("limit_daily_requests")),
+        "last_http_status": state.get("last_http_status"),
+        "last_error": state.get("last_error"),
+        "last_updated_at": _parse_datetime(state.get("last_updated_at")),
+    }
+
+
 def _iso_or_none(value: Any) -> Optional[str]:
     if not isinstance(value, datetime):
         return None
@@ -1118,6 +1394,20 @@ def _extract_status_code(error: Exception) -> Optional[int]:
     return None
 
 
+def _is_rate_limit_error(error: Exception) -> bool:
+    if _extract_status_code(error) == 429:
+        return True
+    lowered = str(error).lower()
+    return any(token in lowered for token in (
+        "quota", "rate limit", "resource_exhausted", "resource has been exhausted", "too many requests",
+    ))
+
+
+def _headers_fresh(state: Dict[str, Any], now: datetime) -> bool:
+    updated_at = state.get("last_updated_at")
+    return bool(updated_at and now - updated_at <= timedelta(seconds=60))
+
+
 def _extract_headers_from_response(response: Any) -> Optional[Dict[str, str]]:
     sdk_response = getattr(response, "sdk_http_response", None)
     headers = getattr(sdk_response, "headers", None)
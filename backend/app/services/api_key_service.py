@@ -1,17 +1,37 @@
 """
 API Key management service for WitnessReplay public API.
 Uses the existing SQLite DatabaseService for persistent storage.
+
+Keys are stored as bcrypt hashes plus ``key_index``, an HMAC-SHA256 of the
+full key, so validation finds the one candidate row by index and checks a
+single bcrypt hash on the crypto pool instead of trying every active key.
+Keys created before the index existed (or under a different
+``API_KEY_INDEX_SECRET``) are found by their display prefix and re-indexed on
+first use. Verified keys are cached by digest for ``API_KEY_CACHE_TTL_SECONDS``.
+
+Each key's ``rate_limit_rpm`` is enforced by an in-memory token bucket
+(bursts up to one minute's allowance, refilled continuously). Usage counts
+and last-used times are aggregated in memory and written to SQLite in one
+batch every ``API_KEY_USAGE_FLUSH_SECONDS`` instead of a write and commit per
+request; reads merge the pending numbers in.
 """
+import asyncio
+import hashlib
+import math
+import hmac
 import json
 import logging
 import secrets
+import time
 import uuid
 from datetime import datetime, timezone
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
 import bcrypt
 
+from app.config import settings
 from app.services.database import get_database
+from app.services.executors import crypto
 
 logger = logging.getLogger(__name__)
 
@@ -20,11 +40,44 @@ KEY_TOKEN_LENGTH = 32
 KEY_DISPLAY_PREFIX_LENGTH = 8
 
 
+class _TokenBucket:
+    """Continuously refilled allowance of ``rpm`` requests per minute."""
+
+    __slots__ = ("capacity", "tokens", "updated_at")
+
+    def __init__(self, rpm: int, now: float):
+        self.capacity = float(max(1, rpm))
+        self.tokens = self.capacity
+        self.updated_at = now
+
+    def refill(self, rpm: int, now: float):
+        capacity = float(max(1, rpm))
+        if capacity != self.capacity:  # Limit changed: keep the used share
+            self.tokens = min(capacity, self.tokens + capacity - self.capacity)
+            self.capacity = capacity
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.capacity / 60.0)
+        self.updated_at = now
+
+    def seconds_until(self, tokens: float) -> float:
+        return max(0.0, (tokens - self.tokens) * 60.0 / self.capacity)
+
+
 class APIKeyService:
     """Manages API keys for the public REST API."""
 
     def __init__(self):
         self._db = None
+        self._verified: Dict[str, Tuple[float, Dict[str, Any]]] = {}  # key digest -> (expires_at, metadata)
+        self._stats = {"cache_hits": 0, "cache_misses": 0, "bcrypt_checks": 0, "reindexed": 0, "rejected": 0}
+        self._buckets: Dict[str, _TokenBucket] = {}
+        self._pending_usage: Dict[str, List[Any]] = {}  # key id -> [requests, last_used_at]
+        self._flush_task: Optional[asyncio.Task] = None
+        self._usage_stats = {"flushes": 0, "rows_flushed": 0, "requests_flushed": 0, "flush_errors": 0}
+
+    @staticmethod
+    def _key_index(raw_key: str) -> str:
+        secret = settings.api_key_index_secret.encode("utf-8")
+        return hmac.new(secret, raw_key.encode("utf-8"), hashlib.sha256).hexdigest()
 
     async def initialize(self):
         """Obtain a reference to the shared database."""
@@ -33,6 +86,109 @@ class APIKeyService:
             await self._db.initialize()
         logger.info("API key service initialized")
 
+    async def start(self):
+        """Start the periodic usage flush."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush loop and write any pending usage."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush_usage()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(max(0.1, settings.api_key_usage_flush_seconds))
+            await self.flush_usage()
+
+    async def flush_usage(self) -> int:
+        """Write aggregated usage in one batch; returns the number of keys updated."""
+        if not self._pending_usage or self._db is None or self._db._db is None:
+            return 0
+        pending, self._pending_usage = self._pending_usage, {}
+        try:
+            await self._db._db.executemany(
+                "UPDATE api_keys SET usage_count = usage_count + ?, last_used_at = ? WHERE id = ?",
+                [(count, last_used_at, key_id) for key_id, (count, last_used_at) in pending.items()],
+            )
+            await self._db._db.commit()
+        except Exception as e:
+            # Put the counts back so the next flush retries them
+            for key_id, (count, last_used_at) in pending.items():
+                self._record_usage(key_id, count, last_used_at)
+            self._usage_stats["flush_errors"] += 1
+            logger.warning(f"API key usage flush failed: {e}")
+            return 0
+        self._usage_stats["flushes"] += 1
+        self._usage_stats["rows_flushed"] += len(pending)
+        self._usage_stats["requests_flushed"] += sum(count for count, _ in pending.values())
+        return len(pending)
+
+    def _record_usage(self, key_id: str, count: int = 1, last_used_at: Optional[str] = None):
+        last_used_at = last_used_at or datetime.now(timezone.utc).isoformat()
+        entry = self._pending_usage.get(key_id)
+        if entry is None:
+            self._pending_usage[key_id] = [count, last_used_at]
+        else:
+            entry[0] += count
+            entry[1] = max(entry[1], last_used_at)
+
+    def _merge_pending(self, key: Dict[str, Any]) -> Dict[str, Any]:
+        pending = self._pending_usage.get(key["id"])
+        if pending:
+            key["usage_count"] = (key["usage_count"] or 0) + pending[0]
+            key["last_used_at"] = max(key["last_used_at"] or "", pending[1])
+        return key
+
+    # ── Rate limiting ─────────────────────────────────────
+
+    def consume_rate_limit(self, key_id: str, rate_limit_rpm: int) -> Dict[str, Any]:
+        """
+        Take one request from the key's token bucket.
+
+        Returns ``allowed`` plus the values for the ``X-RateLimit-*`` headers:
+        ``limit``, ``remaining``, ``reset`` (seconds until the bucket is full)
+        and, when rejected, ``retry_after`` (seconds until one request fits).
+        """
+        now = time.monotonic()
+        rpm = max(1, int(rate_limit_rpm or 30))
+        bucket = self._buckets.get(key_id)
+        if bucket is None:
+            bucket = self._buckets[key_id] = _TokenBucket(rpm, now)
+        else:
+            bucket.refill(rpm, now)
+        allowed = bucket.tokens >= 1.0
+        if allowed:
+            bucket.tokens -= 1.0
+        result = {
+            "allowed": allowed,
+            "limit": rpm,
+            "remaining": int(bucket.tokens),
+            "reset": math.ceil(bucket.seconds_until(bucket.capacity)),
+        }
+        if not allowed:
+            result["retry_after"] = max(1, math.ceil(bucket.seconds_until(1.0)))
+        return result
+
+    def get_rate_limit_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Live bucket levels and not-yet-flushed usage per key id."""
+        now = time.monotonic()
+        snapshot = {}
+        for key_id, bucket in self._buckets.items():
+            bucket.refill(int(bucket.capacity), now)
+            snapshot[key_id] = {
+                "limit_rpm": int(bucket.capacity),
+                "remaining": int(bucket.tokens),
+                "pending_usage": (self._pending_usage.get(key_id) or [0])[0],
+            }
+        return snapshot
+
     # ── CRUD ──────────────────────────────────────────────
 
     async def create_key(
@@ -49,14 +205,14 @@ class APIKeyService:
         full_key = f"{KEY_PREFIX_TAG}{token}"
         prefix = full_key[:KEY_DISPLAY_PREFIX_LENGTH]
 
-        key_hash = bcrypt.hashpw(full_key.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+        key_hash = (await crypto.run(bcrypt.hashpw, full_key.encode("utf-8"), bcrypt.gensalt())).decode("utf-8")
         key_id = str(uuid.uuid4())
         now = datetime.now(timezone.utc).isoformat()
 
         await self._db._db.execute(
-            """INSERT INTO api_keys (id, name, key_hash, key_prefix, permissions, rate_limit_rpm, created_at, is_active, usage_count)
-               VALUES (?, ?, ?, ?, ?, ?, ?, 1, 0)""",
-            (key_id, name, key_hash, prefix, json.dumps(permissions), rate_limit_rpm, now),
+            """INSERT INTO api_keys (id, name, key_hash, key_prefix, key_index, permissions, rate_limit_rpm, created_at, is_active, usage_count)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, 0)""",
+            (key_id, name, key_hash, prefix, self._key_index(full_key), json.dumps(permissions), rate_limit_rpm, now),
         )
         await self._db._db.commit()
 
@@ -79,7 +235,7 @@ class APIKeyService:
         rows = await cursor.fetchall()
         keys = []
         for row in rows:
-            keys.append({
+            keys.append(self._merge_pending({
                 "id": row[0],
                 "name": row[1],
                 "prefix": row[2],
@@ -89,7 +245,7 @@ class APIKeyService:
                 "last_used_at": row[6],
                 "is_active": bool(row[7]),
                 "usage_count": row[8],
-            })
+            }))
         return keys
 
     async def revoke_key(self, key_id: str) -> bool:
@@ -100,6 +256,9 @@ class APIKeyService:
         await self._db._db.commit()
         revoked = cursor.rowcount > 0
         if revoked:
+            self._verified = {
+                digest: entry for digest, entry in self._verified.items() if entry[1]["id"] != key_id
+            }
             logger.info(f"Revoked API key {key_id}")
         return revoked
 
@@ -108,28 +267,69 @@ class APIKeyService:
         if not raw_key or not raw_key.startswith(KEY_PREFIX_TAG):
             return None
 
+        digest = self._key_index(raw_key)
+        cached = self._verified.get(digest)
+        if cached and cached[0] > time.monotonic():
+            self._stats["cache_hits"] += 1
+            key_meta = cached[1]
+        else:
+            self._stats["cache_misses"] += 1
+            key_meta = await self._verify(raw_key, digest)
+            if key_meta is None:
+                self._stats["rejected"] += 1
+                return None
+            self._verified[digest] = (time.monotonic() + settings.api_key_cache_ttl_seconds, key_meta)
+            self._prune_cache()
+
+        self._record_usage(key_meta["id"])
+        return dict(key_meta)
+
+    async def _verify(self, raw_key: str, digest: str) -> Optional[Dict[str, Any]]:
+        """Find the key's row by index (or, for unindexed keys, by prefix) and check its bcrypt hash."""
+        columns = "id, name, key_hash, permissions, rate_limit_rpm, key_index"
         cursor = await self._db._db.execute(
-            "SELECT id, name, key_hash, permissions, rate_limit_rpm, is_active FROM api_keys WHERE is_active = 1"
+            f"SELECT {columns} FROM api_keys WHERE key_index = ? AND is_active = 1", (digest,)
         )
         rows = await cursor.fetchall()
+        if not rows:
+            cursor = await self._db._db.execute(
+                f"""SELECT {columns} FROM api_keys
+                    WHERE key_prefix = ? AND is_active = 1 AND (key_index IS NULL OR key_index != ?)""",
+                (raw_key[:KEY_DISPLAY_PREFIX_LENGTH], digest),
+            )
+            rows = await cursor.fetchall()
 
         for row in rows:
-            key_hash = row[2]
-            if bcrypt.checkpw(raw_key.encode("utf-8"), key_hash.encode("utf-8")):
-                now = datetime.now(timezone.utc).isoformat()
-                await self._db._db.execute(
-                    "UPDATE api_keys SET last_used_at = ?, usage_count = usage_count + 1 WHERE id = ?",
-                    (now, row[0]),
-                )
+            self._stats["bcrypt_checks"] += 1
+            if not await crypto.run(bcrypt.checkpw, raw_key.encode("utf-8"), row[2].encode("utf-8")):
+                continue
+            if row[5] != digest:
+                await self._db._db.execute("UPDATE api_keys SET key_index = ? WHERE id = ?", (digest, row[0]))
                 await self._db._db.commit()
-                return {
-                    "id": row[0],
-                    "name": row[1],
-                    "permissions": json.loads(row[3]) if row[3] else ["read", "write"],
-                    "rate_limit_rpm": row[4],
-                }
+                self._stats["reindexed"] += 1
+            return {
+                "id": row[0],
+                "name": row[1],
+                "permissions": json.loads(row[3]) if row[3] else ["read", "write"],
+                "rate_limit_rpm": row[4],
+            }
         return None
 
+    def _prune_cache(self):
+        now = time.monotonic()
+        if len(self._verified) > 1000:
+            self._verified = {digest: entry for digest, entry in self._verified.items() if entry[0] > now}
+
+    def get_validation_stats(self) -> Dict[str, Any]:
+        """Validation cache, bcrypt and usage-flush counters."""
+        return {
+            **self._stats,
+            "cached_keys": len(self._verified),
+            "rate_limited_keys": len(self._buckets),
+            "pending_usage_keys": len(self._pending_usage),
+            "usage_flush": dict(self._usage_stats),
+        }
+
     async def get_key_stats(self, key_id: str) -> Optional[Dict[str, Any]]:
         """Get usage statistics for a specific key."""
         cursor = await self._db._db.execute(
@@ -139,7 +339,7 @@ class APIKeyService:
         row = await cursor.fetchone()
         if not row:
             return None
-        return {
+        return self._merge_pending({
             "id": row[0],
             "name": row[1],
             "prefix": row[2],
@@ -149,7 +349,7 @@ class APIKeyService:
             "last_used_at": row[6],
             "is_active": bool(row[7]),
             "usage_count": row[8],
-        }
+        })
 
 
 # Singleton
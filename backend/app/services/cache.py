@@ -1,38 +1,26 @@
 """
-Simple in-memory caching service for frequently accessed data.
+Simple caching service for frequently accessed data.
 Reduces load on storage and API calls.
+Entries live in the configured state backend so every worker sees them.
 """
 import logging
-import asyncio
-from datetime import datetime, timedelta
 from typing import Any, Optional, Dict, Callable
 from functools import wraps
 
-logger = logging.getLogger(__name__)
-
+from app.services.state_backend import get_state_backend
 
-class CacheEntry:
-    """Represents a single cache entry with expiration."""
-    
-    def __init__(self, value: Any, ttl_seconds: int = 300):
-        self.value = value
-        self.created_at = datetime.utcnow()
-        self.ttl = timedelta(seconds=ttl_seconds)
-    
-    def is_expired(self) -> bool:
-        """Check if the cache entry has expired."""
-        return datetime.utcnow() > (self.created_at + self.ttl)
+logger = logging.getLogger(__name__)
 
 
 class Cache:
     """
-    Simple in-memory cache with TTL support.
-    Thread-safe for async operations.
+    Cache with TTL support backed by the shared state backend.
+    Expiry is enforced by the backend; hit/miss counters are per worker.
     """
     
+    NAMESPACE = "cache"
+    
     def __init__(self):
-        self._cache: Dict[str, CacheEntry] = {}
-        self._lock = asyncio.Lock()
         self._hits = 0
         self._misses = 0
         logger.info("Cache service initialized")
@@ -42,53 +30,34 @@ class Cache:
         Get a value from cache.
         Returns None if not found or expired.
         """
-        async with self._lock:
-            entry = self._cache.get(key)
-            
-            if entry is None:
-                self._misses += 1
-                return None
-            
-            if entry.is_expired():
-                del self._cache[key]
-                self._misses += 1
-                return None
-            
-            self._hits += 1
-            return entry.value
+        value = get_state_backend().get(self.NAMESPACE, key)
+        if value is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return value
     
     async def set(self, key: str, value: Any, ttl_seconds: int = 300):
         """
         Set a value in cache with TTL.
         Default TTL is 5 minutes (300 seconds).
         """
-        async with self._lock:
-            self._cache[key] = CacheEntry(value, ttl_seconds)
+        get_state_backend().set(self.NAMESPACE, key, value, ttl_seconds=ttl_seconds)
     
     async def delete(self, key: str):
         """Delete a specific cache entry."""
-        async with self._lock:
-            if key in self._cache:
-                del self._cache[key]
+        get_state_backend().delete(self.NAMESPACE, key)
     
     async def clear(self):
         """Clear all cache entries."""
-        async with self._lock:
-            self._cache.clear()
-            logger.info("Cache cleared")
+        get_state_backend().clear(self.NAMESPACE)
+        logger.info("Cache cleared")
     
     async def cleanup_expired(self):
         """Remove all expired entries from cache."""
-        async with self._lock:
-            expired_keys = [
-                key for key, entry in self._cache.items()
-                if entry.is_expired()
-            ]
-            for key in expired_keys:
-                del self._cache[key]
-            
-            if expired_keys:
-                logger.info(f"Cleaned up {len(expired_keys)} expired cache entries")
+        removed = get_state_backend().purge_expired(self.NAMESPACE)
+        if removed:
+            logger.info(f"Cleaned up {removed} expired cache entries")
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
@@ -96,7 +65,7 @@ class Cache:
         hit_rate = (self._hits / total_requests * 100) if total_requests > 0 else 0
         
         return {
-            "entries": len(self._cache),
+            "entries": get_state_backend().count(self.NAMESPACE),
             "hits": self._hits,
             "misses": self._misses,
             "total_requests": total_requests,
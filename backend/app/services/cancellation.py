@@ -0,0 +1,175 @@
+"""
+Cooperative cancellation for abandoned LLM work.
+
+When a WebSocket client disconnects or ``timeout_middleware`` gives up on a
+request, the asyncio task is cancelled, but the blocking Gemini call it was
+awaiting keeps running on an ``llm-io`` worker. A stream keeps being read,
+and a failover or retry can even start a brand-new request for nobody.
+
+A ``CancellationToken`` is a thread-safe flag that travels with the call the
+same way ``call_priority`` does: it lives in a contextvar, and the executor
+pools copy that into their workers.
+
+- ``cancellation_scope(token)`` binds a token around a unit of work, such as a
+  WebSocket connection or an HTTP request.
+- Blocking code checks the token between stream chunks. Before each retry,
+  fallback or account failover it calls ``raise_if_cancelled``, which raises
+  ``OperationCancelled`` instead of starting another attempt.
+- Executor jobs whose token fired while they were still queued are dropped.
+
+Work that happened anyway after the caller left is counted: discarded
+chunks, the tokens in those chunks and in late responses, attempts that were
+not started, and thread time spent after cancellation.
+"""
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_token: contextvars.ContextVar[Optional["CancellationToken"]] = contextvars.ContextVar(
+    "cancellation_token", default=None
+)
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "cancelled": 0,
+    "dropped_attempts": 0,
+    "dropped_jobs": 0,
+    "discarded_chunks": 0,
+    "late_responses": 0,
+    "wasted_tokens": 0,
+    "abandoned_jobs": 0,
+    "wasted_thread_seconds": 0.0,
+}
+_cancelled_by_reason: Dict[str, int] = {}
+
+
+class OperationCancelled(RuntimeError):
+    """The caller of this LLM work has gone away; no further attempts are made."""
+
+
+class CancellationToken:
+    """Thread-safe cancellation flag; a child also reads as cancelled once its parent is."""
+
+    __slots__ = ("_event", "parent", "reason", "cancelled_at")
+
+    def __init__(self, parent: Optional["CancellationToken"] = None):
+        self._event = threading.Event()
+        self.parent = parent
+        self.reason: Optional[str] = None
+        self.cancelled_at: Optional[float] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def cancelled_since(self) -> Optional[float]:
+        """Monotonic time this token (or an ancestor) was cancelled."""
+        times = [t for t in (self.cancelled_at, self.parent.cancelled_since if self.parent else None) if t is not None]
+        return min(times) if times else None
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel the token; returns False if it was already cancelled."""
+        if self._event.is_set():
+            return False
+        self.reason = reason
+        self.cancelled_at = time.monotonic()
+        self._event.set()
+        with _stats_lock:
+            _stats["cancelled"] += 1
+            _cancelled_by_reason[reason] = _cancelled_by_reason.get(reason, 0) + 1
+        return True
+
+
+def current_token() -> Optional[CancellationToken]:
+    return _current_token.get()
+
+
+@contextlib.contextmanager
+def cancellation_scope(token: Optional[CancellationToken] = None) -> Iterator[CancellationToken]:
+    """Bind ``token`` (by default a child of the current one) for the enclosed work."""
+    if token is None:
+        token = CancellationToken(parent=current_token())
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def raise_if_cancelled(what: str = "LLM attempt"):
+    """Call before starting an attempt; drops it when the current caller has gone away."""
+    token = current_token()
+    if token is None or not token.cancelled:
+        return
+    with _stats_lock:
+        _stats["dropped_attempts"] += 1
+    raise OperationCancelled(f"{what} not started: caller cancelled ({_reason(token)})")
+
+
+def _reason(token: CancellationToken) -> str:
+    while token is not None:
+        if token.reason:
+            return token.reason
+        token = token.parent
+    return "cancelled"
+
+
+def _item_tokens(item: Any) -> int:
+    if isinstance(item, (bytes, bytearray)):
+        return len(item) // 1500  # Audio is ~32 tokens per second; 24kHz 16-bit PCM is 48KB/s
+    text = getattr(item, "text", None)
+    try:
+        from app.services.token_estimator import estimate_tokens
+        return estimate_tokens(text) if isinstance(text, str) and text else 0
+    except Exception:
+        return 0
+
+
+def _response_tokens(response: Any) -> int:
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None) if usage is not None else None
+    return int(total) if isinstance(total, int) else _item_tokens(response)
+
+
+def record_discarded_chunk(item: Any):
+    """A stream chunk that arrived after its consumer left."""
+    with _stats_lock:
+        _stats["discarded_chunks"] += 1
+        _stats["wasted_tokens"] += _item_tokens(item)
+
+
+def record_if_abandoned(response: Any) -> bool:
+    """Count a finished response whose caller cancelled while it was in flight."""
+    token = current_token()
+    if token is None or not token.cancelled:
+        return False
+    with _stats_lock:
+        _stats["late_responses"] += 1
+        _stats["wasted_tokens"] += _response_tokens(response)
+    return True
+
+
+def record_dropped_job():
+    with _stats_lock:
+        _stats["dropped_jobs"] += 1
+
+
+def record_abandoned_job(seconds: float):
+    """A worker thread kept running ``seconds`` after its caller was cancelled."""
+    with _stats_lock:
+        _stats["abandoned_jobs"] += 1
+        _stats["wasted_thread_seconds"] += max(0.0, seconds)
+
+
+def get_cancellation_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+        stats["cancelled_by_reason"] = dict(_cancelled_by_reason)
+    stats["wasted_thread_seconds"] = round(stats["wasted_thread_seconds"], 3)
+    return stats
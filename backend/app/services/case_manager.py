@@ -2,7 +2,8 @@ import logging
 import json
 import asyncio
 import re
-from typing import Optional, List, Dict, Any
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Any, Iterable, Tuple
 from datetime import datetime
 from google.genai import types
 
@@ -13,12 +14,14 @@ from app.models.schemas import (
     IncidentClassificationResponse,
     CaseSummaryResponse,
     CaseMatchResponse,
+    BatchCaseMatchResponse,
 )
 from app.services.firestore import firestore_service
 from app.services.model_selector import model_selector
 from app.services.response_cache import response_cache
 from app.services.multi_model_verifier import multi_model_verifier, VerificationResult
 from app.services.api_key_manager import get_genai_client
+from app.services.executors import llm_io
 
 logger = logging.getLogger(__name__)
 
@@ -49,9 +52,19 @@ class CaseManager:
         "pkwy": "parkway",
     }
 
+    CASE_LOCK_STRIPES = 64
+    MAX_ASSIGNMENT_RETRIES = 3
+
     def __init__(self):
         self.client = None
-        self._assignment_lock = asyncio.Lock()
+        # Matching runs unlocked; only commits to a case take that case's stripe
+        self._case_lock_stripes = [asyncio.Lock() for _ in range(self.CASE_LOCK_STRIPES)]
+        self._case_creation_lock = asyncio.Lock()
+        self._case_set_version = 0  # Bumped whenever assignment creates a case
+        self._report_locks: Dict[str, List[Any]] = {}  # report_id -> [lock, holders]
+        self._assignment_stats = {
+            "assigned": 0, "created": 0, "create_conflicts": 0, "attach_conflicts": 0, "in_flight": 0,
+        }
         self._initialize()
 
     def _initialize(self):
@@ -269,8 +282,13 @@ class CaseManager:
             return True
         return report_subtype == case_subtype
 
-    def _score_case_candidate(self, report_profile: Dict[str, Any], case: Case) -> Optional[Dict[str, Any]]:
-        case_profile = self._build_case_profile(case)
+    def _score_case_candidate(
+        self,
+        report_profile: Dict[str, Any],
+        case: Case,
+        case_profile: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        case_profile = case_profile or self._build_case_profile(case)
 
         if not self._incident_types_compatible(report_profile, case_profile):
             return None
@@ -331,10 +349,18 @@ class CaseManager:
             "case_profile": case_profile,
         }
 
-    def _rank_case_candidates(self, report_profile: Dict[str, Any], cases: List[Case]) -> List[Dict[str, Any]]:
+    def _rank_case_candidates(
+        self,
+        report_profile: Dict[str, Any],
+        cases: List[Case],
+        case_profiles: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Score cases for a report; case_profiles (by case id) skips rebuilding profiles."""
         ranked = []
         for case in cases:
-            scored = self._score_case_candidate(report_profile, case)
+            scored = self._score_case_candidate(
+                report_profile, case, (case_profiles or {}).get(case.id),
+            )
             if scored:
                 ranked.append(scored)
         ranked.sort(
@@ -503,6 +529,7 @@ class CaseManager:
         report: ReconstructionSession,
         linked_cases: List[Case],
         report_profile: Optional[Dict[str, Any]] = None,
+        summarize: bool = True,
     ) -> str:
         """Ensure a report exists on only one canonical case."""
         target_case_id = target_case.id
@@ -531,6 +558,7 @@ class CaseManager:
             target_case,
             report,
             report_profile=report_profile,
+            summarize=summarize,
         )
         report.case_id = assigned_case_id
         return assigned_case_id
@@ -540,6 +568,7 @@ class CaseManager:
         case: Case,
         report: ReconstructionSession,
         report_profile: Optional[Dict[str, Any]] = None,
+        summarize: bool = True,
     ) -> str:
         """Attach a report to an existing case and refresh stable metadata."""
         report_profile = report_profile or await self._build_incident_profile(report)
@@ -582,68 +611,187 @@ class CaseManager:
 
         if report_added or metadata.get("grouping"):
             await firestore_service.update_case(case)
-        if report_added:
+        if report_added and summarize:
             await self.generate_case_summary(case.id)
         return case.id
 
-    async def assign_report_to_case(self, report: ReconstructionSession) -> str:
+    @asynccontextmanager
+    async def _report_lock(self, report_id: str):
+        """Serialize assignments of the same report; other reports are unaffected."""
+        entry = self._report_locks.get(report_id)
+        if entry is None:
+            entry = self._report_locks[report_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._report_locks.pop(report_id, None)
+
+    @asynccontextmanager
+    async def _case_locks(self, case_ids: Iterable[str]):
+        """Hold the stripe locks for a set of cases, acquired in stripe order."""
+        stripes = sorted({hash(case_id) % self.CASE_LOCK_STRIPES for case_id in case_ids if case_id})
+        acquired = []
+        try:
+            for index in stripes:
+                await self._case_lock_stripes[index].acquire()
+                acquired.append(index)
+            yield
+        finally:
+            for index in reversed(acquired):
+                self._case_lock_stripes[index].release()
+
+    async def _select_case_for_report(
+        self,
+        report: ReconstructionSession,
+        report_profile: Dict[str, Any],
+    ) -> Tuple[Optional[Case], List[Case]]:
+        """Pick the case a report belongs to (None = open a new one). Takes no locks."""
+        all_cases = await firestore_service.list_cases(limit=0)
+        cases = [
+            case for case in all_cases
+            if (case.status or "").lower() != "merged"
+        ]
+        linked_cases = [case for case in all_cases if report.id in (case.report_ids or [])]
+        if not cases:
+            return None, linked_cases
+        current_case = await self._resolve_current_case(report, cases)
+
+        ranked_candidates = self._rank_case_candidates(report_profile, cases)
+        selected_case: Optional[Case] = None
+
+        direct_match = self._select_direct_match(ranked_candidates)
+        if direct_match:
+            selected_case = direct_match["case"]
+
+        if self.client and not selected_case:
+            llm_candidates = [entry["case"] for entry in ranked_candidates[:6]]
+            if current_case and current_case.id not in {case.id for case in llm_candidates}:
+                llm_candidates = [current_case] + llm_candidates
+            llm_candidates = llm_candidates[:6] or cases[:12]
+            match_case_id = await self._find_matching_case(report, llm_candidates)
+
+            if match_case_id:
+                selected_case = next((case for case in cases if case.id == match_case_id), None)
+                if not selected_case:
+                    selected_case = await firestore_service.get_case(match_case_id)
+
+        if not selected_case:
+            fallback_match = self._select_fallback_match(ranked_candidates)
+            if fallback_match:
+                selected_case = fallback_match["case"]
+
+        if not selected_case and current_case:
+            selected_case = current_case
+
+        return selected_case, linked_cases
+
+    async def _commit_report_to_case(
+        self,
+        case_id: str,
+        report: ReconstructionSession,
+        linked_case_ids: List[str],
+        report_profile: Dict[str, Any],
+    ) -> Optional[Tuple[str, bool]]:
         """
-        Analyze a report and assign it to an existing case or create a new one.
-        Returns the case_id.
+        Attach a report to a case under that case's lock, working on freshly read
+        copies. Returns None if the case was merged or deleted since it was chosen.
         """
-        async with self._assignment_lock:
-            all_cases = await firestore_service.list_cases(limit=0)
-            cases = [
-                case for case in all_cases
-                if (case.status or "").lower() != "merged"
+        async with self._case_locks([case_id, *linked_case_ids]):
+            case = await firestore_service.get_case(case_id)
+            if not case or (case.status or "").lower() == "merged":
+                return None
+            linked_cases = [
+                linked for linked in [
+                    await firestore_service.get_case(linked_id)
+                    for linked_id in linked_case_ids if linked_id != case_id
+                ]
+                if linked is not None
             ]
-            linked_cases = [case for case in all_cases if report.id in (case.report_ids or [])]
-            current_case = await self._resolve_current_case(report, cases)
-            report_profile = await self._build_incident_profile(report)
-
-            if not cases:
-                case_id = await self._create_case_for_report(report, report_profile=report_profile)
-                report.case_id = case_id
-                return case_id
-
-            ranked_candidates = self._rank_case_candidates(report_profile, cases)
-            selected_case: Optional[Case] = None
-
-            direct_match = self._select_direct_match(ranked_candidates)
-            if direct_match:
-                selected_case = direct_match["case"]
-
-            if self.client and not selected_case:
-                llm_candidates = [entry["case"] for entry in ranked_candidates[:6]]
-                if current_case and current_case.id not in {case.id for case in llm_candidates}:
-                    llm_candidates = [current_case] + llm_candidates
-                llm_candidates = llm_candidates[:6] or cases[:12]
-                match_case_id = await self._find_matching_case(report, llm_candidates)
-
-                if match_case_id:
-                    selected_case = next((case for case in cases if case.id == match_case_id), None)
-                    if not selected_case:
-                        selected_case = await firestore_service.get_case(match_case_id)
-
-            if not selected_case:
-                fallback_match = self._select_fallback_match(ranked_candidates)
-                if fallback_match:
-                    selected_case = fallback_match["case"]
-
-            if not selected_case and current_case:
-                selected_case = current_case
-
-            if not selected_case:
-                case_id = await self._create_case_for_report(report, report_profile=report_profile)
-                report.case_id = case_id
-                return case_id
-
-            return await self._sync_report_case_membership(
-                selected_case,
+            report_added = report.id not in (case.report_ids or [])
+            assigned_case_id = await self._sync_report_case_membership(
+                case,
                 report,
                 linked_cases=linked_cases,
                 report_profile=report_profile,
+                summarize=False,
             )
+        return assigned_case_id, report_added
+
+    async def assign_report_to_case(self, report: ReconstructionSession) -> str:
+        """
+        Analyze a report and assign it to an existing case or create a new one.
+        Returns the case_id.
+
+        Matching, including any Gemini adjudication, runs without locks so
+        unrelated reports are assigned in parallel. Attaching takes only the
+        locks of the cases it writes. Creating a case is optimistic: if another
+        assignment created a case meanwhile, matching is redone so the two
+        reports are not split into duplicate cases.
+        """
+        self._assignment_stats["in_flight"] += 1
+        try:
+            async with self._report_lock(report.id):
+                report_profile = await self._build_incident_profile(report)
+                for attempt in range(self.MAX_ASSIGNMENT_RETRIES + 1):
+                    seen_version = self._case_set_version
+                    selected_case, linked_cases = await self._select_case_for_report(report, report_profile)
+                    last_attempt = attempt == self.MAX_ASSIGNMENT_RETRIES
+
+                    if selected_case is not None:
+                        committed = await self._commit_report_to_case(
+                            selected_case.id,
+                            report,
+                            [case.id for case in linked_cases],
+                            report_profile,
+                        )
+                        if committed is not None:
+                            case_id, report_added = committed
+                            if report_added:
+                                await self.generate_case_summary(case_id)
+                            self._assignment_stats["assigned"] += 1
+                            return case_id
+                        self._assignment_stats["attach_conflicts"] += 1
+                        if not last_attempt:
+                            continue
+
+                    case_id = await self._open_case_for_report(
+                        report, report_profile, expected_version=None if last_attempt else seen_version,
+                    )
+                    if case_id is not None:
+                        return case_id
+                    self._assignment_stats["create_conflicts"] += 1
+        finally:
+            self._assignment_stats["in_flight"] -= 1
+
+    async def _open_case_for_report(
+        self,
+        report: ReconstructionSession,
+        report_profile: Dict[str, Any],
+        expected_version: Optional[int] = None,
+    ) -> Optional[str]:
+        """
+        Create a case for a report and bump the case-set version. With
+        expected_version, returns None instead if another case was created since.
+        """
+        async with self._case_creation_lock:
+            if expected_version is not None and self._case_set_version != expected_version:
+                return None
+            case_id = await self._create_case_for_report(report, report_profile=report_profile)
+            self._case_set_version += 1
+        report.case_id = case_id
+        self._assignment_stats["created"] += 1
+        return case_id
+
+    def get_assignment_stats(self) -> Dict[str, Any]:
+        return {
+            **self._assignment_stats,
+            "case_set_version": self._case_set_version,
+            "reports_locked": len(self._report_locks),
+        }
 
     async def _find_matching_case(self, report: ReconstructionSession, cases: List[Case]) -> Optional[str]:
         """Use Gemini LLM to intelligently match reports to existing cases.
@@ -661,6 +809,108 @@ class CaseManager:
         # Always use LLM for case matching — embeddings are too loose
         return await self._find_matching_case_llm(report, cases)
 
+    def _describe_case_for_matching(self, idx: int, case: Case) -> str:
+        case_profile = self._build_case_profile(case)
+        timeframe = case.timeframe.get("description", "Unknown") if isinstance(case.timeframe, dict) else "Unknown"
+        if not timeframe and case_profile.get("day_key"):
+            timeframe = case_profile["day_key"]
+        return (
+            f"[{idx}] {case.title}\n"
+            f"    Summary: {(case.summary or 'No summary')[:300]}\n"
+            f"    Location: {case_profile.get('location') or 'Unknown'}\n"
+            f"    Incident Type: {case_profile.get('incident_type') or 'Unknown'}\n"
+            f"    Incident Subtype: {case_profile.get('incident_subtype') or 'Unknown'}\n"
+            f"    Timeframe: {timeframe}\n"
+            f"    Reports: {len(case.report_ids)}"
+        )
+
+    async def find_matching_cases_batch(
+        self,
+        items: List[Tuple[ReconstructionSession, List[Case]]],
+    ) -> Dict[str, Optional[str]]:
+        """
+        Adjudicate several reports in one Gemini call. Each item is a report and
+        its candidate cases; the prompt lists the union of candidates once.
+
+        Returns report_id -> matched case_id (None = no match). Reports missing
+        from the result (e.g. the call failed) should fall back to heuristics.
+        """
+        if not self.client or not items:
+            return {}
+
+        case_numbers: Dict[str, int] = {}
+        case_map: Dict[int, Case] = {}
+        for _, candidates in items:
+            for case in candidates:
+                if case.id not in case_numbers:
+                    case_numbers[case.id] = len(case_numbers) + 1
+                    case_map[case_numbers[case.id]] = case
+        if not case_map:
+            return {}
+
+        report_labels: Dict[str, ReconstructionSession] = {}
+        report_blocks = []
+        for idx, (report, candidates) in enumerate(items, 1):
+            label = f"R{idx}"
+            report_labels[label] = report
+            candidate_numbers = ", ".join(str(case_numbers[case.id]) for case in candidates) or "none"
+            report_blocks.append(
+                f"{label}: \"{report.title}\"\n"
+                f"    Statements: {self._build_report_matching_text(report)[:600]}\n"
+                f"    Candidate cases: {candidate_numbers}"
+            )
+
+        cases_text = "\n".join(self._describe_case_for_matching(idx, case) for idx, case in case_map.items())
+        reports_text = "\n".join(report_blocks)
+        prompt = f"""You are a police case classifier. For EACH new witness report below, decide whether it describes the SAME specific incident as one of its candidate cases.
+
+Match criteria — ALL must be true:
+- Same TYPE of incident (car crash = car crash, robbery = robbery)
+- Same LOCATION (same street or intersection)
+- Same TIME PERIOD (same day/date)
+- Descriptions clearly refer to the same event
+
+Do NOT match different types of incidents together (e.g., car accident ≠ robbery).
+Only pick a case listed among that report's candidates.
+
+EXISTING CASES:
+{cases_text}
+
+NEW WITNESS REPORTS:
+{reports_text}
+
+Return one entry per report with the matched case number, or 0 if it matches none."""
+
+        try:
+            response = await llm_io.run(
+                self.client.models.generate_content,
+                model="gemini-2.5-flash-lite",
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    temperature=0.0,
+                    response_mime_type="application/json",
+                    response_json_schema=BatchCaseMatchResponse,
+                ),
+            )
+            parsed = BatchCaseMatchResponse.model_validate_json(response.text or "")
+        except Exception as e:
+            logger.error(f"Error in batched LLM case matching: {e}")
+            return {}
+
+        results: Dict[str, Optional[str]] = {}
+        candidates_by_report = {report.id: {case.id for case in candidates} for report, candidates in items}
+        for match in parsed.matches:
+            report = report_labels.get(match.report.strip())
+            if report is None:
+                continue
+            case = case_map.get(match.case)
+            if case is not None and case.id in candidates_by_report[report.id]:
+                results[report.id] = case.id
+            else:
+                results[report.id] = None
+        logger.info(f"Batched case matching: {len(results)}/{len(items)} reports adjudicated in one call")
+        return results
+
     async def _find_matching_case_llm(self, report: ReconstructionSession, cases: List[Case]) -> Optional[str]:
         """Simple direct Gemini call to match reports to cases using numbered labels."""
         try:
@@ -673,19 +923,7 @@ class CaseManager:
             case_descriptions = []
             for idx, case in enumerate(cases, 1):
                 case_map[idx] = case
-                case_profile = self._build_case_profile(case)
-                timeframe = case.timeframe.get("description", "Unknown") if isinstance(case.timeframe, dict) else "Unknown"
-                if not timeframe and case_profile.get("day_key"):
-                    timeframe = case_profile["day_key"]
-                case_descriptions.append(
-                    f"[{idx}] {case.title}\n"
-                    f"    Summary: {(case.summary or 'No summary')[:300]}\n"
-                    f"    Location: {case_profile.get('location') or 'Unknown'}\n"
-                    f"    Incident Type: {case_profile.get('incident_type') or 'Unknown'}\n"
-                    f"    Incident Subtype: {case_profile.get('incident_subtype') or 'Unknown'}\n"
-                    f"    Timeframe: {timeframe}\n"
-                    f"    Reports: {len(case.report_ids)}"
-                )
+                case_descriptions.append(self._describe_case_for_matching(idx, case))
 
             cases_text = "\n".join(case_descriptions)
 
@@ -712,7 +950,8 @@ If it does NOT match any case, reply with: 0"""
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    response = self.client.models.generate_content(
+                    response = await llm_io.run(
+                        self.client.models.generate_content,
                         model="gemini-2.5-flash-lite",
                         contents=prompt,
                         config=types.GenerateContentConfig(
@@ -861,7 +1100,7 @@ Create a comprehensive summary combining all witness perspectives, identify key
                         logger.info(f"Using cached summary for case {case.case_number}")
                     else:
                         chat_model = await model_selector.get_best_model_for_task("analysis")
-                        response = await asyncio.to_thread(
+                        response = await llm_io.run(
                             self.client.models.generate_content,
                             model=chat_model,
                             contents=prompt,
@@ -0,0 +1,450 @@
+"""
+Adaptive concurrency limits for outbound Gemini calls.
+
+Nothing used to cap how many requests were in flight to one account/model at
+once, so a burst of interview turns plus background analytics could fire
+dozens of parallel calls that all hit 429 together, after which every caller
+backed off at once. ``ConcurrencyLimiter`` keeps one AIMD limit per
+(account, model):
+
+- a success while the limit is being used grows it by about one per round trip
+  (``+1/limit`` per success);
+- a 429 cuts it multiplicatively (``gemini_concurrency_backoff_ratio``);
+- a success much slower than the usual latency for that key (beyond
+  ``gemini_concurrency_latency_tolerance`` times its moving average) shrinks it
+  gently, since queueing upstream shows up as latency before it shows up as 429s.
+
+Calls over the limit wait in a priority queue: live interview turns first, then
+transcription, analytics and finally image generation. Callers mark their
+priority with ``call_priority(...)``; contextvars follow the call into the
+``llm_io`` pool, so the rotating client picks it up without extra arguments.
+Waiting happens on the event loop, before the call is dispatched: when a
+rotating-client method is handed to ``llm_io``, the executor first awaits
+``acquire_async`` for the account the call will try first and passes the
+permit into the worker as a ``SlotReservation``. Worker threads therefore never
+block on the limiter, and low-priority callers can't fill the pool while a
+live turn waits behind them. Failover to another account from inside a worker,
+and the few legacy call sites that still call the SDK directly on the event
+loop, are never made to wait; they take a slot immediately and are counted as
+overflow.
+"""
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from enum import IntEnum
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CallPriority(IntEnum):
+    """Lower values are served first."""
+    LIVE_INTERVIEW = 0
+    TRANSCRIPTION = 1
+    ANALYTICS = 2
+    IMAGE_GENERATION = 3
+
+
+_TASK_PRIORITIES = {
+    "chat": CallPriority.LIVE_INTERVIEW,
+    "live": CallPriority.LIVE_INTERVIEW,
+    "tts": CallPriority.LIVE_INTERVIEW,
+    "transcription": CallPriority.TRANSCRIPTION,
+    "image": CallPriority.IMAGE_GENERATION,
+}
+
+_call_priority: contextvars.ContextVar[Optional[CallPriority]] = contextvars.ContextVar(
+    "gemini_call_priority", default=None
+)
+
+
+class ConcurrencyLimitTimeout(RuntimeError):
+    """A call waited longer than ``gemini_concurrency_queue_timeout_seconds`` for a slot."""
+
+
+def priority_for_task(task_type: str) -> CallPriority:
+    return _TASK_PRIORITIES.get(task_type, CallPriority.ANALYTICS)
+
+
+@contextlib.contextmanager
+def call_priority(priority: Union[CallPriority, str]) -> Iterator[CallPriority]:
+    """Run the enclosed Gemini calls at ``priority`` (a CallPriority or a task type)."""
+    if isinstance(priority, str):
+        priority = priority_for_task(priority)
+    token = _call_priority.set(priority)
+    try:
+        yield priority
+    finally:
+        _call_priority.reset(token)
+
+
+def current_priority(model_name: Optional[str] = None) -> CallPriority:
+    """The caller's priority, falling back to one implied by the model."""
+    priority = _call_priority.get()
+    if priority is not None:
+        return priority
+    lowered = (model_name or "").lower()
+    if "imagen" in lowered or "image" in lowered:
+        return CallPriority.IMAGE_GENERATION
+    if "native-audio" in lowered or "live" in lowered or "tts" in lowered:
+        return CallPriority.LIVE_INTERVIEW
+    return CallPriority.ANALYTICS
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class _Waiter:
+    __slots__ = ("event", "future", "granted", "abandoned", "priority")
+
+    def __init__(self, priority: CallPriority, future: Optional[asyncio.Future] = None):
+        self.event = threading.Event()
+        self.future = future  # Set for waiters on the event loop
+        self.granted = False
+        self.abandoned = False
+        self.priority = priority
+
+    def wake(self):
+        self.event.set()
+        if self.future is not None:
+            try:
+                self.future.get_loop().call_soon_threadsafe(_resolve, self.future)
+            except RuntimeError:  # Loop already closed
+                pass
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+
+class _KeyState:
+    """Limit, in-flight count and wait queue for one account/model."""
+
+    def __init__(self, initial_limit: float):
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self.waiters: List[tuple] = []  # Heap of (priority, seq, _Waiter); abandoned entries are skipped
+        self.queued_by_priority: Dict[CallPriority, int] = {priority: 0 for priority in CallPriority}
+        self.latency_avg_ms: Optional[float] = None
+        self.acquired = 0
+        self.queued = 0
+        self.timeouts = 0
+        self.rate_limited = 0
+        self.latency_backoffs = 0
+        self.peak_queue = 0
+        self.peak_limit = self.limit
+        self.overflow = 0
+
+
+class Permit:
+    """One in-flight call. Release exactly once, ideally via ``release``."""
+
+    __slots__ = ("_limiter", "key", "started_at", "_released")
+
+    def __init__(self, limiter: Optional["ConcurrencyLimiter"], key: str):
+        self._limiter = limiter
+        self.key = key
+        self.started_at = time.monotonic()
+        self._released = False
+
+    def release(self, *, rate_limited: bool = False, measure_latency: bool = True):
+        if self._released or self._limiter is None:
+            return
+        self._released = True
+        latency_ms = (time.monotonic() - self.started_at) * 1000 if measure_latency else None
+        self._limiter._release(self.key, latency_ms=latency_ms, rate_limited=rate_limited)
+
+
+class SlotReservation:
+    """A permit taken on the event loop for a call about to be dispatched to a worker thread."""
+
+    __slots__ = ("permit", "account_id", "model_name", "_claimed", "_lock")
+
+    def __init__(self, permit: Permit, account_id: str, model_name: str):
+        self.permit = permit
+        self.account_id = account_id
+        self.model_name = model_name
+        self._claimed = False
+        self._lock = threading.Lock()
+
+    @property
+    def claimed(self) -> bool:
+        return self._claimed
+
+    def claim(self) -> Optional[Permit]:
+        """Hand the permit to exactly one taker: the worker's first attempt or ``release_unclaimed``."""
+        with self._lock:
+            if self._claimed:
+                return None
+            self._claimed = True
+            return self.permit
+
+    def release_unclaimed(self):
+        """Return the slot if the call never used it (dropped, withdrawn or cancelled)."""
+        permit = self.claim()
+        if permit is not None:
+            permit.release(measure_latency=False)
+
+
+_reservation: contextvars.ContextVar[Optional[SlotReservation]] = contextvars.ContextVar(
+    "gemini_slot_reservation", default=None
+)
+
+
+def current_reservation() -> Optional[SlotReservation]:
+    return _reservation.get()
+
+
+@contextlib.contextmanager
+def dispatch_reservation(reservation: Optional[SlotReservation]) -> Iterator[Optional[SlotReservation]]:
+    """Make ``reservation`` visible to work dispatched (context copied) inside the block."""
+    token = _reservation.set(reservation)
+    try:
+        yield reservation
+    finally:
+        _reservation.reset(token)
+
+
+class ConcurrencyLimiter:
+    """Per-key AIMD concurrency limits with a priority wait queue."""
+
+    LATENCY_ALPHA = 0.1  # Weight of each sample in the moving latency average
+    LATENCY_BACKOFF_RATIO = 0.9
+
+    def __init__(
+        self,
+        *,
+        enabled: Optional[bool] = None,
+        initial_limit: Optional[int] = None,
+        min_limit: Optional[int] = None,
+        max_limit: Optional[int] = None,
+        backoff_ratio: Optional[float] = None,
+        latency_tolerance: Optional[float] = None,
+        queue_timeout_seconds: Optional[float] = None,
+    ):
+        self.enabled = settings.gemini_concurrency_enabled if enabled is None else enabled
+        self.initial_limit = initial_limit or settings.gemini_concurrency_initial_limit
+        self.min_limit = max(1, min_limit or settings.gemini_concurrency_min_limit)
+        self.max_limit = max(self.min_limit, max_limit or settings.gemini_concurrency_max_limit)
+        self.backoff_ratio = backoff_ratio or settings.gemini_concurrency_backoff_ratio
+        self.latency_tolerance = latency_tolerance or settings.gemini_concurrency_latency_tolerance
+        self.queue_timeout_seconds = (
+            settings.gemini_concurrency_queue_timeout_seconds if queue_timeout_seconds is None else queue_timeout_seconds
+        )
+        self._lock = threading.Lock()
+        self._keys: Dict[str, _KeyState] = {}
+        self._seq = itertools.count()
+
+    def _state(self, key: str) -> _KeyState:
+        state = self._keys.get(key)
+        if state is None:
+            state = _KeyState(min(max(self.initial_limit, self.min_limit), self.max_limit))
+            self._keys[key] = state
+        return state
+
+    def has_capacity(self, account_id: str, model_name: str) -> bool:
+        """True when a call for this account/model would start without queueing."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            state = self._keys.get(f"{account_id}:{model_name}")
+            return state is None or (state.in_flight < int(state.limit) and not self._queue_depth(state))
+
+    def acquire(
+        self,
+        account_id: str,
+        model_name: str,
+        priority: Optional[CallPriority] = None,
+        timeout: Optional[float] = None,
+    ) -> Permit:
+        """
+        Take a slot for this account/model from a worker thread.
+
+        Inside a dispatch with a ``SlotReservation`` (see ``acquire_async``) the
+        reserved permit is used, and a failover to another account takes a slot
+        without waiting. Otherwise the thread blocks until a slot is free;
+        raises ConcurrencyLimitTimeout.
+        """
+        key = f"{account_id}:{model_name}"
+        if not self.enabled:
+            return Permit(None, key)
+        reservation = _reservation.get()
+        if reservation is not None:
+            permit = reservation.claim()
+            if permit is not None:
+                if permit.key == key:
+                    return permit
+                permit.release(measure_latency=False)  # The call went to another account
+        priority = current_priority(model_name) if priority is None else priority
+        timeout = self.queue_timeout_seconds if timeout is None else timeout
+        with self._lock:
+            state = self._state(key)
+            if state.in_flight < int(state.limit) and not self._queue_depth(state):
+                state.in_flight += 1
+                state.acquired += 1
+                return Permit(self, key)
+            if reservation is not None or _on_event_loop():
+                state.in_flight += 1
+                state.acquired += 1
+                state.overflow += 1
+                return Permit(self, key)
+            waiter = _Waiter(priority)
+            heapq.heappush(state.waiters, (int(priority), next(self._seq), waiter))
+            state.queued += 1
+            state.queued_by_priority[priority] += 1
+            state.peak_queue = max(state.peak_queue, self._queue_depth(state))
+            self._grant(state)
+
+        waiter.event.wait(timeout)
+        with self._lock:
+            if waiter.granted:
+                return Permit(self, key)
+            self._abandon(state, waiter, timed_out=True)
+        raise self._timeout_error(key, model_name, state, priority, timeout)
+
+    async def acquire_async(
+        self,
+        account_id: str,
+        model_name: str,
+        priority: Optional[CallPriority] = None,
+        timeout: Optional[float] = None,
+    ) -> Permit:
+        """Wait on the event loop for a slot; raises ConcurrencyLimitTimeout."""
+        key = f"{account_id}:{model_name}"
+        if not self.enabled:
+            return Permit(None, key)
+        priority = current_priority(model_name) if priority is None else priority
+        timeout = self.queue_timeout_seconds if timeout is None else timeout
+        with self._lock:
+            state = self._state(key)
+            if state.in_flight < int(state.limit) and not self._queue_depth(state):
+                state.in_flight += 1
+                state.acquired += 1
+                return Permit(self, key)
+            waiter = _Waiter(priority, asyncio.get_running_loop().create_future())
+            heapq.heappush(state.waiters, (int(priority), next(self._seq), waiter))
+            state.queued += 1
+            state.queued_by_priority[priority] += 1
+            state.peak_queue = max(state.peak_queue, self._queue_depth(state))
+            self._grant(state)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            timed_out = isinstance(exc, asyncio.TimeoutError)
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._abandon(state, waiter, timed_out=timed_out)
+            if not granted:
+                if timed_out:
+                    raise self._timeout_error(key, model_name, state, priority, timeout) from None
+                raise
+            if not timed_out:
+                # Granted just as the caller went away: hand the slot straight back
+                Permit(self, key).release(measure_latency=False)
+                raise
+        return Permit(self, key)
+
+    def _abandon(self, state: _KeyState, waiter: _Waiter, *, timed_out: bool):
+        """Take a waiter out of the queue (caller holds the lock)."""
+        waiter.abandoned = True
+        state.queued_by_priority[waiter.priority] -= 1
+        if timed_out:
+            state.timeouts += 1
+
+    @staticmethod
+    def _timeout_error(
+        key: str, model_name: str, state: _KeyState, priority: CallPriority, timeout: float
+    ) -> ConcurrencyLimitTimeout:
+        logger.warning(
+            f"Gemini concurrency queue timeout for {key} after {timeout:.0f}s "
+            f"(limit {int(state.limit)}, priority {priority.name.lower()})"
+        )
+        return ConcurrencyLimitTimeout(
+            f"Local concurrency limit for model '{model_name}' is saturated; request waited {timeout:.0f}s"
+        )
+
+    @staticmethod
+    def _queue_depth(state: _KeyState) -> int:
+        return sum(state.queued_by_priority.values())
+
+    def _release(self, key: str, *, latency_ms: Optional[float], rate_limited: bool):
+        with self._lock:
+            state = self._state(key)
+            used = state.in_flight
+            state.in_flight = max(0, state.in_flight - 1)
+            if rate_limited:
+                state.rate_limited += 1
+                state.limit = max(float(self.min_limit), state.limit * self.backoff_ratio)
+            elif latency_ms is not None:
+                average = state.latency_avg_ms
+                if average is not None and latency_ms > average * self.latency_tolerance:
+                    state.latency_backoffs += 1
+                    state.limit = max(float(self.min_limit), state.limit * self.LATENCY_BACKOFF_RATIO)
+                elif used >= state.limit / 2:
+                    # Only grow a limit that is actually being exercised
+                    state.limit = min(float(self.max_limit), state.limit + 1.0 / state.limit)
+                state.latency_avg_ms = latency_ms if average is None else (
+                    average + self.LATENCY_ALPHA * (latency_ms - average)
+                )
+            state.peak_limit = max(state.peak_limit, state.limit)
+            self._grant(state)
+
+    def _grant(self, state: _KeyState):
+        """Hand free slots to the highest-priority live waiters (caller holds the lock)."""
+        while state.waiters and state.in_flight < int(state.limit):
+            _, _, waiter = heapq.heappop(state.waiters)
+            if waiter.abandoned:
+                continue
+            waiter.granted = True
+            state.queued_by_priority[waiter.priority] -= 1
+            state.in_flight += 1
+            state.acquired += 1
+            waiter.wake()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current limit, in-flight count and queue depth per account/model."""
+        with self._lock:
+            keys = {
+                key: {
+                    "limit": int(state.limit),
+                    "limit_exact": round(state.limit, 2),
+                    "in_flight": state.in_flight,
+                    "queue_depth": self._queue_depth(state),
+                    "queued_by_priority": {
+                        priority.name.lower(): count for priority, count in state.queued_by_priority.items() if count
+                    },
+                    "peak_queue": state.peak_queue,
+                    "peak_limit": int(state.peak_limit),
+                    "acquired": state.acquired,
+                    "queued_total": state.queued,
+                    "timeouts": state.timeouts,
+                    "rate_limited": state.rate_limited,
+                    "latency_backoffs": state.latency_backoffs,
+                    "overflow": state.overflow,
+                    "avg_latency_ms": round(state.latency_avg_ms, 1) if state.latency_avg_ms is not None else None,
+                }
+                for key, state in self._keys.items()
+            }
+        return {
+            "enabled": self.enabled,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": sum(item["in_flight"] for item in keys.values()),
+            "queue_depth": sum(item["queue_depth"] for item in keys.values()),
+            "keys": keys,
+        }
@@ -6,6 +6,8 @@ from datetime import datetime
 from dataclasses import dataclass
 import json
 
+from app.services.state_backend import get_state_backend, SESSION_STATE_TTL_SECONDS
+
 logger = logging.getLogger(__name__)
 
 
@@ -42,11 +44,21 @@ class Contradiction:
 
 
 class ContradictionDetector:
-    """Detects and tracks contradictions in witness statements."""
+    """
+    Detects and tracks contradictions in witness statements.
+    
+    Per-session element history and contradictions are kept in the state
+    backend under one record per session, so any worker can read them.
+    """
+    
+    NAMESPACE = "contradiction_state"
     
-    def __init__(self):
-        self.contradictions: Dict[str, List[Contradiction]] = {}
-        self._element_history: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    @staticmethod
+    def _new_session_state() -> Dict[str, Any]:
+        return {"element_history": {}, "contradictions": []}
+    
+    def _session_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return get_state_backend().get(self.NAMESPACE, session_id)
         
     def track_element_mention(
         self,
@@ -72,23 +84,42 @@ class ContradictionDetector:
         """
         if timestamp is None:
             timestamp = datetime.utcnow()
-            
-        # Initialize session tracking if needed
-        if session_id not in self._element_history:
-            self._element_history[session_id] = {}
-            self.contradictions[session_id] = []
+        
+        with get_state_backend().edit(
+            self.NAMESPACE,
+            session_id,
+            self._new_session_state,
+            ttl_seconds=SESSION_STATE_TTL_SECONDS,
+        ) as state:
+            self._track_in_state(
+                state, session_id, element_type, element_id, attribute, value, statement, timestamp
+            )
+    
+    def _track_in_state(
+        self,
+        state: Dict[str, Any],
+        session_id: str,
+        element_type: str,
+        element_id: str,
+        attribute: str,
+        value: Any,
+        statement: str,
+        timestamp: datetime
+    ):
+        """Record a mention inside a loaded session state record."""
+        element_history = state["element_history"]
             
         # Create element key
         element_key = f"{element_type}:{element_id}"
-        if element_key not in self._element_history[session_id]:
-            self._element_history[session_id][element_key] = {}
+        if element_key not in element_history:
+            element_history[element_key] = {}
             
         # Track attribute history
-        if attribute not in self._element_history[session_id][element_key]:
-            self._element_history[session_id][element_key][attribute] = []
+        if attribute not in element_history[element_key]:
+            element_history[element_key][attribute] = []
             
         # Check for contradictions
-        history = self._element_history[session_id][element_key][attribute]
+        history = element_history[element_key][attribute]
         if history:
             # Compare with most recent value
             last_entry = history[-1]
@@ -101,9 +132,10 @@ class ContradictionDetector:
                     original_entry=last_entry,
                     new_value=value,
                     new_statement=statement,
-                    timestamp=timestamp
+                    timestamp=timestamp,
+                    element_history=element_history
                 )
-                self.contradictions[session_id].append(contradiction)
+                state["contradictions"].append(contradiction)
                 logger.info(
                     f"Contradiction detected in session {session_id}: "
                     f"{element_key}.{attribute} changed from {last_entry['value']} to {value}"
@@ -178,7 +210,8 @@ class ContradictionDetector:
         attribute: str,
         original_entry: Dict[str, Any],
         new_value: Any,
-        new_timestamp: datetime
+        new_timestamp: datetime,
+        element_history: Optional[Dict[str, Dict[str, List[Dict[str, Any]]]]] = None
     ) -> ContradictionSeverity:
         """
         Calculate severity score for a contradiction.
@@ -223,10 +256,12 @@ class ContradictionDetector:
         # More mentions of an element = more reliable baseline = more severe contradiction
         element_key = f"{element_type}:{attribute}"
         mentions = 1
-        if session_id in self._element_history:
-            for key, attrs in self._element_history[session_id].items():
-                if attribute in attrs:
-                    mentions += len(attrs[attribute])
+        if element_history is None:
+            state = self._session_state(session_id)
+            element_history = state["element_history"] if state else {}
+        for key, attrs in element_history.items():
+            if attribute in attrs:
+                mentions += len(attrs[attribute])
         if mentions >= 5:
             factors['witness_count'] = 0.9
         elif mentions >= 3:
@@ -297,7 +332,8 @@ class ContradictionDetector:
         original_entry: Dict[str, Any],
         new_value: Any,
         new_statement: str,
-        timestamp: datetime
+        timestamp: datetime,
+        element_history: Optional[Dict[str, Dict[str, List[Dict[str, Any]]]]] = None
     ) -> Contradiction:
         """Create a contradiction object with severity scoring."""
         contradiction_id = f"{session_id}_{element_type}_{element_id}_{attribute}_{timestamp.isoformat()}"
@@ -307,7 +343,8 @@ class ContradictionDetector:
         
         # Calculate severity
         severity = self._calculate_severity(
-            session_id, element_type, attribute, original_entry, new_value, timestamp
+            session_id, element_type, attribute, original_entry, new_value, timestamp,
+            element_history=element_history
         )
         
         return Contradiction(
@@ -338,10 +375,11 @@ class ContradictionDetector:
             unresolved_only: If True, only return unresolved contradictions
             sort_by: Sort order - "timestamp", "severity", or "severity_desc"
         """
-        if session_id not in self.contradictions:
+        state = self._session_state(session_id)
+        if not state:
             return []
             
-        contradictions = self.contradictions[session_id]
+        contradictions = state["contradictions"]
         if unresolved_only:
             contradictions = [c for c in contradictions if not c.resolved]
         
@@ -388,15 +426,16 @@ class ContradictionDetector:
         resolution_note: str
     ) -> bool:
         """Mark a contradiction as resolved."""
-        if session_id not in self.contradictions:
-            return False
-            
-        for contradiction in self.contradictions[session_id]:
-            if contradiction.id == contradiction_id:
-                contradiction.resolved = True
-                contradiction.resolution_note = resolution_note
-                logger.info(f"Resolved contradiction {contradiction_id}: {resolution_note}")
-                return True
+        with get_state_backend().edit(self.NAMESPACE, session_id) as state:
+            if not state:
+                return False
+                
+            for contradiction in state["contradictions"]:
+                if contradiction.id == contradiction_id:
+                    contradiction.resolved = True
+                    contradiction.resolution_note = resolution_note
+                    logger.info(f"Resolved contradiction {contradiction_id}: {resolution_note}")
+                    return True
                 
         return False
         
@@ -407,11 +446,12 @@ class ContradictionDetector:
         element_id: str
     ) -> Dict[str, List[Dict[str, Any]]]:
         """Get the full history of mentions for an element."""
-        if session_id not in self._element_history:
+        state = self._session_state(session_id)
+        if not state:
             return {}
             
         element_key = f"{element_type}:{element_id}"
-        return self._element_history[session_id].get(element_key, {})
+        return state["element_history"].get(element_key, {})
 
 
 # Global singleton instance
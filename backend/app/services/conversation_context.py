@@ -0,0 +1,142 @@
+"""
+Token-budgeted rolling context for long interviews.
+
+The chat sent to Gemini keeps the last few turns verbatim and folds everything
+older into a rolling summary once the history passes a per-model token budget.
+The summary is written by a background task after the reply has gone out; the
+next turn swaps it in if it is ready, so reply latency stays flat however long
+the interview runs.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "[Previous conversation summary]: "
+
+Summarizer = Callable[[List[Dict[str, Any]]], Awaitable[str]]
+
+_context_stats = {"scheduled": 0, "applied": 0, "discarded": 0, "failed": 0, "messages_folded": 0}
+
+
+def history_budget_for_model(model_name: Optional[str]) -> int:
+    """
+    History token budget for a model. Overrides are ``substring=tokens`` pairs
+    matched against the model name (e.g. ``gemma=3000``).
+    """
+    model_lower = (model_name or "").lower()
+    for entry in settings.context_history_budget_overrides.split(","):
+        pattern, _, tokens = entry.partition("=")
+        pattern = pattern.strip().lower()
+        if pattern and pattern in model_lower:
+            try:
+                return int(tokens)
+            except ValueError:
+                logger.warning(f"Ignoring invalid context budget override '{entry}'")
+    return settings.context_history_budget_tokens
+
+
+def is_summary_message(message: Dict[str, Any]) -> bool:
+    return message.get("role") == "system" and str(message.get("content", "")).startswith(SUMMARY_PREFIX)
+
+
+def summary_text(history: List[Dict[str, Any]]) -> str:
+    """The rolling summary at the head of *history*, if any."""
+    if history and is_summary_message(history[0]):
+        return history[0]["content"][len(SUMMARY_PREFIX):]
+    return ""
+
+
+@dataclass
+class _ReadySummary:
+    summary: str
+    folded: List[Dict[str, Any]]  # The exact message objects the summary replaces
+
+
+class RollingContext:
+    """Per-conversation scheduler for background history summaries."""
+
+    def __init__(self, keep_turns: Optional[int] = None):
+        self.keep_messages = 2 * (settings.context_keep_turns if keep_turns is None else keep_turns)
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[_ReadySummary] = None
+
+    @property
+    def pending(self) -> bool:
+        return self._ready is not None or (self._task is not None and not self._task.done())
+
+    def needs_summary(self, history: List[Dict[str, Any]], history_tokens: int, model_name: Optional[str]) -> bool:
+        # Need at least two messages to fold, or a summary would only rewrite itself
+        foldable = len(history) - self.keep_messages
+        if foldable < 2 or (foldable == 2 and is_summary_message(history[0])):
+            return False
+        return history_tokens > history_budget_for_model(model_name)
+
+    def schedule(
+        self,
+        history: List[Dict[str, Any]],
+        summarize: Summarizer,
+        history_tokens: int,
+        model_name: Optional[str],
+    ) -> Optional[asyncio.Task]:
+        """Start summarizing the older part of *history* if it is over budget."""
+        if self.pending or not self.needs_summary(history, history_tokens, model_name):
+            return None
+        folded = list(history[:-self.keep_messages]) if self.keep_messages else list(history)
+        _context_stats["scheduled"] += 1
+        self._task = asyncio.create_task(self._summarize(folded, summarize))
+        return self._task
+
+    async def _summarize(self, folded: List[Dict[str, Any]], summarize: Summarizer):
+        try:
+            summary = (await summarize(folded)).strip()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _context_stats["failed"] += 1
+            logger.warning(f"Background history summary failed: {e}")
+            return
+        if summary:
+            self._ready = _ReadySummary(summary=summary, folded=folded)
+
+    def apply(self, history: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return *history* with the summarized prefix replaced by the summary, or
+        None if no summary is ready. A summary whose prefix no longer matches
+        (history reset or restored meanwhile) is dropped.
+        """
+        ready, self._ready = self._ready, None
+        if ready is None:
+            return None
+        count = len(ready.folded)
+        if len(history) < count or any(a is not b for a, b in zip(history[:count], ready.folded)):
+            _context_stats["discarded"] += 1
+            return None
+        _context_stats["applied"] += 1
+        _context_stats["messages_folded"] += count
+        summary_message = {
+            "role": "system",
+            "content": f"{SUMMARY_PREFIX}{ready.summary}",
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+        return [summary_message] + history[count:]
+
+    def reset(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        self._ready = None
+
+
+def get_context_stats() -> Dict[str, Any]:
+    return {
+        **_context_stats,
+        "keep_turns": settings.context_keep_turns,
+        "default_budget_tokens": settings.context_history_budget_tokens,
+        "budget_overrides": settings.context_history_budget_overrides,
+    }
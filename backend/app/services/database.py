@@ -342,17 +342,46 @@ class DatabaseService:
                 is_active INTEGER DEFAULT 1,
                 created_at TEXT
             );
+
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                created_at TEXT
+            );
+
+            CREATE TABLE IF NOT EXISTS translation_memory (
+                key TEXT PRIMARY KEY,
+                source_language TEXT NOT NULL,
+                target_language TEXT NOT NULL,
+                model TEXT NOT NULL,
+                source_text TEXT NOT NULL,
+                translated_text TEXT NOT NULL,
+                hit_count INTEGER DEFAULT 0,
+                created_at TEXT
+            );
         """)
         await self._ensure_columns("sessions", {
             "witness_name": "TEXT",
             "witness_contact": "TEXT",
             "witness_location": "TEXT",
         })
+        await self._ensure_columns("response_cache", {
+            "context_key": "TEXT DEFAULT ''",
+            "expires_at": "TEXT",
+            "hit_count": "INTEGER DEFAULT 0",
+        })
+        await self._ensure_columns("api_keys", {
+            "key_index": "TEXT",
+        })
+        await self._db.execute("CREATE INDEX IF NOT EXISTS idx_api_keys_index ON api_keys(key_index)")
+        await self._db.execute("CREATE INDEX IF NOT EXISTS idx_api_keys_prefix ON api_keys(key_prefix)")
         await self._db.execute("CREATE INDEX IF NOT EXISTS idx_statements_session ON statements(session_id)")
         await self._db.execute("CREATE INDEX IF NOT EXISTS idx_scene_versions_session ON scene_versions(session_id)")
         await self._db.execute("CREATE INDEX IF NOT EXISTS idx_cases_status ON cases(status)")
         await self._db.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
         await self._db.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)")
+        await self._db.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_expires ON response_cache(expires_at)")
+        await self._db.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_hits ON response_cache(hit_count)")
         await self._db.commit()
 
     async def _ensure_columns(self, table_name: str, columns: Dict[str, str]):
@@ -520,6 +549,37 @@ class DatabaseService:
         d["scene_versions"] = svs
         return d
 
+    async def set_session_metadata_key(self, session_id: str, key: str, value: Any) -> bool:
+        """Set one metadata key in a single UPDATE, leaving the rest of the session untouched."""
+        try:
+            cursor = await self._db.execute(
+                """UPDATE sessions
+                   SET metadata = json_set(COALESCE(NULLIF(metadata, ''), '{}'), ?, json(?)),
+                       updated_at = ?
+                   WHERE id = ?""",
+                (f'$."{key}"', json.dumps(value, default=str), datetime.utcnow().isoformat(), session_id),
+            )
+            await self._db.commit()
+            return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"SQLite set_session_metadata_key error: {e}")
+            return False
+
+    async def remove_session_metadata_key(self, session_id: str, key: str) -> bool:
+        """Remove one metadata key in a single UPDATE; False if the session or key is missing."""
+        try:
+            cursor = await self._db.execute(
+                """UPDATE sessions
+                   SET metadata = json_remove(metadata, ?)
+                   WHERE id = ? AND json_valid(metadata) AND json_type(metadata, ?) IS NOT NULL""",
+                (f'$."{key}"', session_id, f'$."{key}"'),
+            )
+            await self._db.commit()
+            return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"SQLite remove_session_metadata_key error: {e}")
+            return False
+
     async def delete_session(self, session_id: str) -> bool:
         try:
             await self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
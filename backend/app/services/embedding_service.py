@@ -13,6 +13,7 @@ from datetime import datetime, timezone
 
 from app.services.token_estimator import token_estimator
 from app.services.api_key_manager import get_genai_client, get_key_manager
+from app.services.executors import llm_io
 
 logger = logging.getLogger(__name__)
 
@@ -159,7 +160,7 @@ class EmbeddingService:
                 logger.warning(f"Embedding quota warning: {quota_check.warning}")
 
         try:
-            result = await asyncio.to_thread(
+            result = await llm_io.run(
                 self.client.models.embed_content,
                 model=self.MODEL,
                 contents=text[:8000],  # Limit input size
@@ -0,0 +1,244 @@
+"""
+Debounced post-turn enrichment scheduler.
+
+After each witness turn the WebSocket handler queues non-critical work (report
+and case scene images, metadata updates). Witnesses often speak in quick
+bursts, so each session's work is debounced: a new turn replaces a run that is
+still waiting and restarts the wait, but never past the max debounce, so a
+witness who keeps talking still gets updates. A run whose stages have started
+is left to finish (its image generation is already paid for); the next run
+starts once it is done. The work itself is a small DAG of named stages; a stage
+starts as soon as the stages it depends on finish, so independent stages run
+concurrently.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+StageFn = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class EnrichmentStage:
+    """One unit of post-turn work; receives the results of earlier stages by name."""
+    name: str
+    run: StageFn
+    depends_on: Tuple[str, ...] = ()
+
+
+class StageSkipped(Exception):
+    """Raised for a stage whose dependency failed."""
+
+
+def _order_stages(stages: Sequence[EnrichmentStage]) -> List[EnrichmentStage]:
+    """Topologically sort stages; raises ValueError on unknown deps or cycles."""
+    by_name = {stage.name: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Duplicate enrichment stage names")
+    ordered: List[EnrichmentStage] = []
+    state: Dict[str, str] = {}
+
+    def visit(name: str):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Enrichment stages form a cycle at '{name}'")
+        if name not in by_name:
+            raise ValueError(f"Unknown enrichment stage dependency '{name}'")
+        state[name] = "visiting"
+        for dep in by_name[name].depends_on:
+            visit(dep)
+        state[name] = "done"
+        ordered.append(by_name[name])
+
+    for stage in stages:
+        visit(stage.name)
+    return ordered
+
+
+class EnrichmentScheduler:
+    """Per-session debounced runner for post-turn enrichment DAGs."""
+
+    MAX_RECENT_RUNS = 100
+
+    def __init__(self, debounce_seconds: Optional[float] = None, max_debounce_seconds: Optional[float] = None):
+        self.debounce_seconds = (
+            settings.enrichment_debounce_seconds if debounce_seconds is None else debounce_seconds
+        )
+        self.max_debounce_seconds = (
+            settings.enrichment_max_debounce_seconds if max_debounce_seconds is None else max_debounce_seconds
+        )
+        self._runs: Dict[str, asyncio.Task] = {}  # latest run per session
+        self._running: Dict[str, asyncio.Task] = {}  # run whose stages have started
+        self._waiting_since: Dict[str, float] = {}  # when the not-yet-started work was first requested
+        self._stage_stats: Dict[str, Dict[str, float]] = defaultdict(lambda: {
+            "runs": 0, "failed": 0, "cancelled": 0, "skipped": 0,
+            "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0,
+        })
+        self._counters = {"scheduled": 0, "superseded": 0, "completed": 0, "cancelled": 0}
+        self._recent_runs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def schedule(
+        self,
+        session_id: str,
+        stages: Sequence[EnrichmentStage],
+        delay: Optional[float] = None,
+    ) -> asyncio.Task:
+        """Queue *stages* for a session, superseding work that has not started yet."""
+        ordered = _order_stages(stages)
+        previous = self._runs.get(session_id)
+        if (
+            previous is not None
+            and not previous.done()
+            and self._running.get(session_id) is not previous
+        ):
+            previous.cancel()
+            self._counters["superseded"] += 1
+        self._counters["scheduled"] += 1
+
+        now = time.monotonic()
+        first_requested = self._waiting_since.setdefault(session_id, now)
+        wait = self.debounce_seconds if delay is None else delay
+        wait = max(0.0, min(wait, first_requested + self.max_debounce_seconds - now))
+        task = asyncio.create_task(self._run(session_id, ordered, wait))
+        self._runs[session_id] = task
+
+        def _forget(done: asyncio.Task):
+            if self._runs.get(session_id) is done:
+                del self._runs[session_id]
+            if self._running.get(session_id) is done:
+                del self._running[session_id]
+
+        task.add_done_callback(_forget)
+        return task
+
+    def cancel(self, session_id: str) -> bool:
+        """Drop pending/running work for a session (e.g. on disconnect)."""
+        self._waiting_since.pop(session_id, None)
+        cancelled = False
+        for task in (self._runs.pop(session_id, None), self._running.pop(session_id, None)):
+            if task is not None and not task.done():
+                task.cancel()
+                cancelled = True
+        return cancelled
+
+    def is_pending(self, session_id: str) -> bool:
+        task = self._runs.get(session_id)
+        return task is not None and not task.done()
+
+    async def _run(self, session_id: str, stages: List[EnrichmentStage], delay: float) -> Dict[str, Any]:
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            running = self._running.get(session_id)
+            if running is not None and not running.done():
+                await asyncio.wait({running})  # let the started run finish first
+        except asyncio.CancelledError:
+            self._counters["cancelled"] += 1
+            raise
+        self._running[session_id] = asyncio.current_task()
+        self._waiting_since.pop(session_id, None)
+
+        started = time.perf_counter()
+        results: Dict[str, Any] = {}
+        timings: Dict[str, float] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        for stage in stages:
+            deps = [tasks[dep] for dep in stage.depends_on]
+            tasks[stage.name] = asyncio.create_task(
+                self._run_stage(session_id, stage, deps, results, timings)
+            )
+
+        try:
+            outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        except asyncio.CancelledError:
+            for task in tasks.values():
+                task.cancel()
+            self._counters["cancelled"] += 1
+            raise
+
+        self._counters["completed"] += 1
+        self._recent_runs[session_id] = {
+            "total_ms": round((time.perf_counter() - started) * 1000, 2),
+            "stages_ms": timings,
+            "failed": [
+                stage.name for stage, outcome in zip(stages, outcomes)
+                if isinstance(outcome, BaseException)
+            ],
+        }
+        self._recent_runs.move_to_end(session_id)
+        while len(self._recent_runs) > self.MAX_RECENT_RUNS:
+            self._recent_runs.popitem(last=False)
+        return results
+
+    async def _run_stage(
+        self,
+        session_id: str,
+        stage: EnrichmentStage,
+        deps: List[asyncio.Task],
+        results: Dict[str, Any],
+        timings: Dict[str, float],
+    ) -> Any:
+        stats = self._stage_stats[stage.name]
+        if deps:
+            done = await asyncio.gather(*deps, return_exceptions=True)
+            if any(isinstance(outcome, BaseException) for outcome in done):
+                stats["skipped"] += 1
+                raise StageSkipped(stage.name)
+
+        started = time.perf_counter()
+        try:
+            result = await stage.run(results)
+        except asyncio.CancelledError:
+            stats["cancelled"] += 1
+            raise
+        except Exception as e:
+            stats["failed"] += 1
+            logger.warning(f"Enrichment stage '{stage.name}' failed for session {session_id}: {e}")
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            timings[stage.name] = round(elapsed_ms, 2)
+
+        stats["runs"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["last_ms"] = elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        results[stage.name] = result
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Run counters and per-stage timings."""
+        stages = {}
+        for name, s in self._stage_stats.items():
+            stages[name] = {
+                "runs": int(s["runs"]),
+                "failed": int(s["failed"]),
+                "cancelled": int(s["cancelled"]),
+                "skipped": int(s["skipped"]),
+                "avg_ms": round(s["total_ms"] / s["runs"], 2) if s["runs"] else 0,
+                "max_ms": round(s["max_ms"], 2),
+                "last_ms": round(s["last_ms"], 2),
+            }
+        return {
+            "debounce_seconds": self.debounce_seconds,
+            "max_debounce_seconds": self.max_debounce_seconds,
+            "pending_sessions": sum(1 for task in self._runs.values() if not task.done()),
+            **self._counters,
+            "stages": stages,
+        }
+
+    def get_session_run(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Timings of the last completed run for a session."""
+        return self._recent_runs.get(session_id)
+
+
+# Global instance
+enrichment_scheduler = EnrichmentScheduler()
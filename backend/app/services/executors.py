@@ -0,0 +1,307 @@
+"""
+Named thread pools for blocking work.
+
+Gemini SDK calls, PIL rendering, bcrypt hashing and file I/O used to share the
+default asyncio executor, so a burst of slow model calls could starve password
+checks or disk writes (and vice versa). Each workload class now gets its own
+sized pool:
+
+- ``llm-io``: blocking Gemini/Imagen/TTS/embedding SDK calls (network bound)
+- ``cpu-render``: PIL scene rendering and other CPU-heavy work
+- ``crypto``: bcrypt hashing and verification
+- ``disk``: JSON state files and other local file I/O
+
+Callers await ``<executor>.run(fn, *args, **kwargs)`` exactly like
+``asyncio.to_thread``. A queue limit bounds how many jobs may wait for a worker;
+beyond it callers wait on the event loop instead of piling into the pool.
+``<executor>.iterate(fn, ...)`` does the same for blocking iterators such as
+Gemini response streams.
+
+Gemini calls made through the rotating client wait for their concurrency slot
+on the event loop before they are queued here (``concurrency_limiter``), so
+workers never sit blocked on the limiter.
+
+Jobs honour the caller's cancellation token (``app.services.cancellation``):
+a job whose token fired while it was queued is dropped, and worker time spent
+after the caller was cancelled is counted as wasted.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.services.cancellation import (
+    CancellationToken,
+    OperationCancelled,
+    cancellation_scope,
+    current_token,
+    record_abandoned_job,
+    record_discarded_chunk,
+    record_dropped_job,
+)
+from app.services.concurrency_limiter import SlotReservation, dispatch_reservation
+
+logger = logging.getLogger(__name__)
+
+LLM_IO = "llm-io"
+CPU_RENDER = "cpu-render"
+CRYPTO = "crypto"
+DISK = "disk"
+
+_END = object()
+
+
+async def _reserve_slot(func: Callable[..., Any], kwargs: Dict[str, Any]) -> Optional[SlotReservation]:
+    """Take a Gemini concurrency slot on the loop for rotating-client methods."""
+    reserve = getattr(getattr(func, "__self__", None), "reserve_dispatch_slot", None)
+    if reserve is None:
+        return None
+    return await reserve(func, kwargs)
+
+
+class NamedExecutor:
+    """A sized ThreadPoolExecutor with a bounded wait queue and timing stats."""
+
+    WAIT_SAMPLES = 500
+
+    def __init__(self, name: str, max_workers: int, queue_limit: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.queue_limit = max(0, queue_limit)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._created_at = time.monotonic()
+
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._active = 0
+        self._queued = 0
+        self._peak_queued = 0
+        self._busy_seconds = 0.0
+        self._queue_waits_ms: deque = deque(maxlen=self.WAIT_SAMPLES)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=self.name,
+                    )
+        return self._pool
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # Semaphores are bound to the loop they first wait on; rebuild per loop.
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_workers + self.queue_limit)
+            self._slots_loop = loop
+        return self._slots
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run *func* on this pool and await its result (``asyncio.to_thread`` semantics)."""
+        reservation = await _reserve_slot(func, kwargs)
+        try:
+            with dispatch_reservation(reservation):
+                return await self._run(func, *args, **kwargs)
+        finally:
+            if reservation is not None:
+                reservation.release_unclaimed()
+
+    async def _run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        submitted_at = time.perf_counter()
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, func, *args, **kwargs)
+        token = current_token()
+        abandoned_at: List[Optional[float]] = [None]
+        # "queued" until a worker picks the job up ("started") or the caller
+        # withdraws it ("withdrawn"); whichever happens first owns the _queued decrement
+        state = ["queued"]
+
+        def _job():
+            started_at = time.perf_counter()
+            started_mono = time.monotonic()
+            with self._lock:
+                if state[0] == "withdrawn":
+                    return None  # The caller was cancelled while this sat in the queue
+                state[0] = "started"
+                self._queued -= 1
+                self._active += 1
+                self._queue_waits_ms.append((started_at - submitted_at) * 1000)
+            dropped = token is not None and token.cancelled
+            try:
+                if dropped:
+                    record_dropped_job()
+                    raise OperationCancelled(f"{self.name} job dropped: caller cancelled before it started")
+                return call()
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._busy_seconds += time.perf_counter() - started_at
+                gone_since = [t for t in (abandoned_at[0], token.cancelled_since if token else None) if t is not None]
+                if gone_since and not dropped:
+                    finished = time.monotonic()
+                    record_abandoned_job(finished - max(min(gone_since), started_mono))
+
+        async with self._get_slots():
+            with self._lock:
+                self._submitted += 1
+                self._queued += 1
+                self._peak_queued = max(self._peak_queued, self._queued)
+            try:
+                result = await loop.run_in_executor(self._get_pool(), _job)
+            except BaseException as exc:
+                if isinstance(exc, asyncio.CancelledError):
+                    abandoned_at[0] = time.monotonic()
+                with self._lock:
+                    self._failed += 1
+                    if state[0] == "queued":
+                        # _job will never run (or will return at once): release its queue slot
+                        state[0] = "withdrawn"
+                        self._queued -= 1
+                raise
+            with self._lock:
+                self._completed += 1
+            return result
+
+    async def iterate(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        Iterate the blocking iterable ``func(*args, **kwargs)`` on one worker of this pool.
+
+        Items are handed to the event loop as they arrive. Between items the
+        worker checks a child of the caller's cancellation token: once the
+        caller is cancelled or the consumer stops early, it stops pulling and
+        closes the iterator (releasing the upstream stream) instead of reading
+        it to the end. A stream cut short by the caller's token raises
+        ``OperationCancelled`` to a consumer that is still listening.
+        """
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        token = CancellationToken(parent=current_token())
+
+        def _emit(item):
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, (item, None))
+            except RuntimeError:  # Loop already closed
+                pass
+
+        def _pull():
+            iterator = iter(func(*args, **kwargs))
+            try:
+                for item in iterator:
+                    if token.cancelled:
+                        record_discarded_chunk(item)
+                        raise OperationCancelled(f"{self.name} stream stopped: caller cancelled")
+                    _emit(item)
+            finally:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+
+        def _done(job: asyncio.Future):
+            # Runs after every item the worker queued; also retrieves the error if nobody listens
+            error = asyncio.CancelledError() if job.cancelled() else job.exception()
+            items.put_nowait((_END, error))
+
+        reservation = await _reserve_slot(func, kwargs)
+        with cancellation_scope(token), dispatch_reservation(reservation):
+            job = asyncio.ensure_future(self.run(_pull))
+        if reservation is not None:
+            job.add_done_callback(lambda _: reservation.release_unclaimed())
+        job.add_done_callback(_done)
+        finished = False
+        try:
+            while True:
+                item, error = await items.get()
+                if item is _END:
+                    finished = True
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            if not finished:
+                token.cancel("consumer_stopped")
+
+    @property
+    def backlog(self) -> int:
+        """Jobs submitted but not yet picked up by a worker (cheap, lock-free read)."""
+        return max(self._queued, 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue wait and utilization for this pool."""
+        with self._lock:
+            waits = sorted(self._queue_waits_ms)
+            uptime = max(time.monotonic() - self._created_at, 1e-9)
+            stats = {
+                "max_workers": self.max_workers,
+                "queue_limit": self.queue_limit,
+                "active": self._active,
+                "queued": max(self._queued, 0),
+                "peak_queued": self._peak_queued,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "utilization_pct": round(self._active / self.max_workers * 100, 1),
+                "avg_utilization_pct": round(
+                    min(self._busy_seconds / (uptime * self.max_workers), 1.0) * 100, 2
+                ),
+            }
+        if waits:
+            stats["queue_wait_ms"] = {
+                "avg": round(sum(waits) / len(waits), 2),
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2),
+                "max": round(waits[-1], 2),
+            }
+        else:
+            stats["queue_wait_ms"] = {"avg": 0, "p95": 0, "max": 0}
+        return stats
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+llm_io = NamedExecutor(LLM_IO, settings.executor_llm_io_workers, settings.executor_llm_io_queue_limit)
+cpu_render = NamedExecutor(CPU_RENDER, settings.executor_cpu_render_workers, settings.executor_cpu_render_queue_limit)
+crypto = NamedExecutor(CRYPTO, settings.executor_crypto_workers, settings.executor_crypto_queue_limit)
+disk = NamedExecutor(DISK, settings.executor_disk_workers, settings.executor_disk_queue_limit)
+
+_executors: Dict[str, NamedExecutor] = {e.name: e for e in (llm_io, cpu_render, crypto, disk)}
+
+
+def get_executor(name: str) -> NamedExecutor:
+    """Look up a pool by workload class name."""
+    try:
+        return _executors[name]
+    except KeyError:
+        raise ValueError(f"Unknown executor: {name}") from None
+
+
+async def run_in(name: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run *func* on the named pool; drop-in replacement for ``asyncio.to_thread``."""
+    return await get_executor(name).run(func, *args, **kwargs)
+
+
+def get_executor_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every pool, keyed by name."""
+    return {name: executor.get_stats() for name, executor in _executors.items()}
+
+
+def shutdown_executors(wait: bool = False):
+    """Stop all pools (called from the app lifespan)."""
+    for executor in _executors.values():
+        executor.shutdown(wait=wait)
+    logger.info("Shut down named executors")
@@ -1,7 +1,8 @@
 import asyncio
 import logging
-from typing import Optional, List
+from typing import Any, Optional, List
 from datetime import datetime
+from google.cloud.firestore_v1 import DELETE_FIELD
 from google.cloud.firestore_v1.async_client import AsyncClient
 from google.api_core import exceptions as gcp_exceptions
 
@@ -140,6 +141,63 @@ class FirestoreService:
             logger.info(f"Updated session {session.id} in memory")
         return True
     
+    async def update_session_metadata(self, session_id: str, key: str, value: Any) -> bool:
+        """Set ``metadata[key]`` without re-saving (and overwriting) the rest of the session."""
+        await cache.delete(f"session:{session_id}")
+
+        if self.client:
+            try:
+                await self.client.collection(self.collection_name).document(session_id).update({
+                    f"metadata.{key}": value,
+                    "updated_at": datetime.utcnow().isoformat(),
+                })
+                return True
+            except Exception as e:
+                logger.error(f"Failed to update session metadata in Firestore: {e}")
+
+        # SQLite fallback
+        try:
+            db = await self._get_sqlite()
+            if await db.set_session_metadata_key(session_id, key, value):
+                return True
+        except Exception as e:
+            logger.warning(f"SQLite update_session_metadata failed: {e}")
+
+        session = self._memory_store.get(session_id)
+        if session is None:
+            return False
+        session.metadata = {**(session.metadata or {}), key: value}
+        return True
+
+    async def remove_session_metadata_key(self, session_id: str, key: str) -> bool:
+        """Delete ``metadata[key]`` without re-saving (and overwriting) the rest of the session."""
+        await cache.delete(f"session:{session_id}")
+
+        if self.client:
+            try:
+                await self.client.collection(self.collection_name).document(session_id).update({
+                    f"metadata.{key}": DELETE_FIELD,
+                })
+                return True
+            except gcp_exceptions.NotFound:
+                return False
+            except Exception as e:
+                logger.error(f"Failed to remove session metadata in Firestore: {e}")
+
+        # SQLite fallback
+        try:
+            db = await self._get_sqlite()
+            if await db.remove_session_metadata_key(session_id, key):
+                return True
+        except Exception as e:
+            logger.warning(f"SQLite remove_session_metadata_key failed: {e}")
+
+        session = self._memory_store.get(session_id)
+        if session is None or key not in (session.metadata or {}):
+            return False
+        session.metadata = {k: v for k, v in session.metadata.items() if k != key}
+        return True
+
     async def delete_session(self, session_id: str) -> bool:
         """Delete a session from Firestore or in-memory."""
         if self.client:
@@ -6,7 +6,6 @@ than Imagen 4 (25 RPD per model) and produces good quality scene images.
 """
 
 import logging
-import asyncio
 import os
 import base64
 from typing import Optional
@@ -14,6 +13,7 @@ from datetime import datetime
 
 from google.genai import types
 from app.services.api_key_manager import get_genai_client
+from app.services.executors import llm_io
 
 logger = logging.getLogger(__name__)
 
@@ -111,12 +111,12 @@ class GeminiImageService:
         for config in configs:
             try:
                 if config is None:
-                    return await asyncio.to_thread(
+                    return await llm_io.run(
                         self.client.models.generate_content,
                         model=model_name,
                         contents=[prompt],
                     )
-                return await asyncio.to_thread(
+                return await llm_io.run(
                     self.client.models.generate_content,
                     model=model_name,
                     contents=[prompt],
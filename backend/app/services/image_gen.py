@@ -12,6 +12,7 @@ from app.config import settings
 from app.models.schemas import SceneElement
 from app.services.model_selector import model_selector
 from app.services.api_key_manager import get_genai_client
+from app.services.executors import cpu_render
 
 logger = logging.getLogger(__name__)
 
@@ -318,7 +319,7 @@ class ImageGenerationService:
 
         # Fallback to PIL diagram
         try:
-            return self.generate_pil_scene_fallback(scene_description, elements)
+            return await cpu_render.run(self.generate_pil_scene_fallback, scene_description, elements)
         except Exception as e:
             logger.error(f"Failed to generate scene image: {e}")
             return None
@@ -1,5 +1,4 @@
 import logging
-import asyncio
 import os
 import re
 from typing import Optional, Any, Dict, List, Tuple
@@ -7,6 +6,7 @@ from datetime import datetime
 
 from google.genai import types
 from app.services.api_key_manager import get_genai_client
+from app.services.executors import cpu_render, llm_io
 
 logger = logging.getLogger(__name__)
 
@@ -313,7 +313,7 @@ class ImagenService:
                 continue
 
             try:
-                result = await asyncio.to_thread(
+                result = await llm_io.run(
                     self.client.models.generate_images,
                     model=model,
                     prompt=self._build_scene_prompt(prompt),
@@ -424,7 +424,8 @@ class ImagenService:
             except Exception:
                 continue
 
-        fallback_bytes = image_service.generate_pil_scene_fallback(
+        fallback_bytes = await cpu_render.run(
+            image_service.generate_pil_scene_fallback,
             scene_description=scene_description,
             elements=fallback_elements,
         )
@@ -11,6 +11,8 @@ from datetime import datetime
 from dataclasses import dataclass, field
 from enum import Enum
 
+from app.services.state_backend import get_state_backend, SESSION_STATE_TTL_SECONDS
+
 logger = logging.getLogger(__name__)
 
 
@@ -330,12 +332,31 @@ BRANCHING_QUESTIONS: Dict[TopicCategory, List[Dict[str, Any]]] = {
 
 
 class InterviewBranchingService:
-    """Service for managing dynamic interview branching based on witness responses."""
+    """
+    Service for managing dynamic interview branching based on witness responses.
+    
+    Each session's branching path, asked questions and node counter are kept
+    as one record in the state backend so every worker sees the same path.
+    """
+    
+    NAMESPACE = "interview_branching"
+    
+    @staticmethod
+    def _new_session_state() -> Dict[str, Any]:
+        return {"path": None, "asked": set(), "node_counter": 0}
+    
+    def _edit_session(self, session_id: str):
+        """Open the session's branching record for read-modify-write."""
+        return get_state_backend().edit(
+            self.NAMESPACE,
+            session_id,
+            self._new_session_state,
+            ttl_seconds=SESSION_STATE_TTL_SECONDS,
+        )
     
-    def __init__(self):
-        self._session_paths: Dict[str, BranchingPath] = {}
-        self._session_asked: Dict[str, Set[str]] = {}
-        self._node_counter: Dict[str, int] = {}
+    def _load_session(self, session_id: str) -> Dict[str, Any]:
+        """Read the session's branching record without creating it."""
+        return get_state_backend().get(self.NAMESPACE, session_id) or self._new_session_state()
     
     def detect_topics(
         self,
@@ -400,14 +421,12 @@ class InterviewBranchingService:
         Returns:
             List of prioritized follow-up questions with metadata
         """
-        if session_id not in self._session_asked:
-            self._session_asked[session_id] = set()
-        
-        asked = self._session_asked[session_id]
+        state = self._load_session(session_id)
+        asked = state["asked"]
         questions: List[Dict[str, Any]] = []
         
         # Get branching path to check explored topics
-        path = self._get_or_create_path(session_id)
+        path = state["path"] or BranchingPath(session_id=session_id)
         
         for topic in detected_topics:
             if topic.category not in BRANCHING_QUESTIONS:
@@ -495,15 +514,12 @@ class InterviewBranchingService:
     
     def mark_question_asked(self, session_id: str, question: str):
         """Mark a question as having been asked."""
-        if session_id not in self._session_asked:
-            self._session_asked[session_id] = set()
-        self._session_asked[session_id].add(question)
+        with self._edit_session(session_id) as state:
+            state["asked"].add(question)
     
     def _get_or_create_path(self, session_id: str) -> BranchingPath:
-        """Get or create the branching path for a session."""
-        if session_id not in self._session_paths:
-            self._session_paths[session_id] = BranchingPath(session_id=session_id)
-        return self._session_paths[session_id]
+        """Get the branching path for a session (a fresh one if none is stored)."""
+        return self._load_session(session_id)["path"] or BranchingPath(session_id=session_id)
     
     def _record_branch(
         self,
@@ -518,28 +534,29 @@ class InterviewBranchingService:
         Returns:
             Node ID
         """
-        path = self._get_or_create_path(session_id)
-        
-        # Generate node ID
-        if session_id not in self._node_counter:
-            self._node_counter[session_id] = 0
-        self._node_counter[session_id] += 1
-        node_id = f"branch_{session_id}_{self._node_counter[session_id]}"
-        
-        # Create node
-        node = BranchNode(
-            id=node_id,
-            topic=topic,
-            question_asked=question,
-            response_summary=response_summary
-        )
-        
-        # Link to previous node if exists
-        if path.nodes:
-            path.nodes[-1].child_branches.append(node_id)
-        
-        path.nodes.append(node)
-        path.topics_explored.add(topic)
+        with self._edit_session(session_id) as state:
+            if state["path"] is None:
+                state["path"] = BranchingPath(session_id=session_id)
+            path = state["path"]
+            
+            # Generate node ID
+            state["node_counter"] += 1
+            node_id = f"branch_{session_id}_{state['node_counter']}"
+            
+            # Create node
+            node = BranchNode(
+                id=node_id,
+                topic=topic,
+                question_asked=question,
+                response_summary=response_summary
+            )
+            
+            # Link to previous node if exists
+            if path.nodes:
+                path.nodes[-1].child_branches.append(node_id)
+            
+            path.nodes.append(node)
+            path.topics_explored.add(topic)
         
         logger.info(f"Recorded branch: {topic.value} -> {question[:50]}...")
         return node_id
@@ -551,11 +568,13 @@ class InterviewBranchingService:
         response_summary: str
     ):
         """Update a branch node with the witness response summary."""
-        path = self._get_or_create_path(session_id)
-        for node in path.nodes:
-            if node.id == node_id:
-                node.response_summary = response_summary
-                break
+        with get_state_backend().edit(self.NAMESPACE, session_id) as state:
+            if not state or state["path"] is None:
+                return
+            for node in state["path"].nodes:
+                if node.id == node_id:
+                    node.response_summary = response_summary
+                    break
     
     def get_branching_path(self, session_id: str) -> Dict[str, Any]:
         """
@@ -628,12 +647,7 @@ class InterviewBranchingService:
     
     def reset_session(self, session_id: str):
         """Reset branching state for a session."""
-        if session_id in self._session_paths:
-            del self._session_paths[session_id]
-        if session_id in self._session_asked:
-            del self._session_asked[session_id]
-        if session_id in self._node_counter:
-            del self._node_counter[session_id]
+        get_state_backend().delete(self.NAMESPACE, session_id)
 
 
 # Global singleton instance
@@ -0,0 +1,259 @@
+"""
+Offline language identification for witness text.
+
+Used by TranslationService.detect_language to avoid a Gemini round trip when
+the language is obvious. Non-Latin scripts are decided from their Unicode
+blocks plus a few distinguishing letters (Persian vs Arabic, Ukrainian vs
+Russian, Traditional vs Simplified Chinese). Latin-script languages are scored
+with a character trigram model trained on the small seed corpora below.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# Text shorter than this (in letters) gets a proportionally reduced confidence
+MIN_CONFIDENT_LETTERS = 24
+# Cap on trigrams used as evidence so long texts don't become over-confident
+MAX_EVIDENCE_TRIGRAMS = 40
+# Share of the text's trigrams the winning profile must have seen for full
+# confidence. Scores are only relative between supported languages, so text in
+# an unsupported one (Dutch, Norwegian) would otherwise still win confidently.
+MIN_TRIGRAM_COVERAGE = 0.5
+
+_LATIN_SEEDS: Dict[str, str] = {
+    "en": (
+        "I was standing at the corner when I saw the car come through the red light. "
+        "The driver was a tall man with a dark jacket and he did not stop after hitting the other vehicle. "
+        "It happened around nine in the evening and the street was wet because it had been raining. "
+        "There were two people waiting at the bus stop and they saw everything too. "
+        "He ran towards the park and I think he was carrying a black bag. "
+        "I called the police right away and waited with the woman who was hurt. "
+        "What happened next was that the truck backed up and drove off down the road. "
+        "Can you tell me what you remember about the person? They were wearing a hat."
+    ),
+    "es": (
+        "Estaba parado en la esquina cuando vi que el coche pasó el semáforo en rojo. "
+        "El conductor era un hombre alto con una chaqueta oscura y no se detuvo después de chocar con el otro vehículo. "
+        "Pasó alrededor de las nueve de la noche y la calle estaba mojada porque había llovido. "
+        "Había dos personas esperando en la parada del autobús y ellos también lo vieron todo. "
+        "Corrió hacia el parque y creo que llevaba una bolsa negra. "
+        "Llamé a la policía enseguida y me quedé con la mujer que estaba herida. "
+        "Lo que pasó después fue que la camioneta dio marcha atrás y se fue por la calle. "
+        "¿Puede decirme qué recuerda de la persona? Llevaba un sombrero."
+    ),
+    "fr": (
+        "J'étais au coin de la rue quand j'ai vu la voiture passer au feu rouge. "
+        "Le conducteur était un homme grand avec une veste sombre et il ne s'est pas arrêté après avoir heurté l'autre véhicule. "
+        "C'est arrivé vers neuf heures du soir et la rue était mouillée parce qu'il avait plu. "
+        "Il y avait deux personnes qui attendaient à l'arrêt de bus et elles ont tout vu aussi. "
+        "Il a couru vers le parc et je pense qu'il portait un sac noir. "
+        "J'ai appelé la police tout de suite et je suis restée avec la femme qui était blessée. "
+        "Ensuite le camion a reculé et il est parti dans la rue. "
+        "Pouvez-vous me dire ce dont vous vous souvenez de cette personne? Elle portait un chapeau."
+    ),
+    "de": (
+        "Ich stand an der Ecke, als ich sah, wie das Auto über die rote Ampel fuhr. "
+        "Der Fahrer war ein großer Mann mit einer dunklen Jacke und er hielt nicht an, nachdem er das andere Fahrzeug gerammt hatte. "
+        "Es passierte gegen neun Uhr abends und die Straße war nass, weil es geregnet hatte. "
+        "Zwei Leute warteten an der Bushaltestelle und sie haben auch alles gesehen. "
+        "Er rannte in Richtung Park und ich glaube, er trug eine schwarze Tasche. "
+        "Ich habe sofort die Polizei gerufen und bin bei der verletzten Frau geblieben. "
+        "Danach ist der Lastwagen zurückgefahren und die Straße hinunter verschwunden. "
+        "Können Sie mir sagen, woran Sie sich bei der Person erinnern? Sie trug einen Hut."
+    ),
+    "pt": (
+        "Eu estava na esquina quando vi o carro passar no sinal vermelho. "
+        "O motorista era um homem alto com uma jaqueta escura e ele não parou depois de bater no outro veículo. "
+        "Aconteceu por volta das nove da noite e a rua estava molhada porque tinha chovido. "
+        "Havia duas pessoas esperando no ponto de ônibus e elas também viram tudo. "
+        "Ele correu em direção ao parque e acho que estava carregando uma bolsa preta. "
+        "Liguei para a polícia na hora e fiquei com a mulher que estava ferida. "
+        "Depois disso o caminhão deu ré e foi embora pela rua. "
+        "Você pode me dizer o que lembra da pessoa? Ela estava usando um chapéu."
+    ),
+    "it": (
+        "Ero all'angolo quando ho visto la macchina passare con il semaforo rosso. "
+        "L'autista era un uomo alto con una giacca scura e non si è fermato dopo aver urtato l'altro veicolo. "
+        "È successo verso le nove di sera e la strada era bagnata perché aveva piovuto. "
+        "C'erano due persone che aspettavano alla fermata dell'autobus e anche loro hanno visto tutto. "
+        "È corso verso il parco e penso che portasse una borsa nera. "
+        "Ho chiamato subito la polizia e sono rimasta con la donna che era ferita. "
+        "Dopo il camion ha fatto retromarcia e se n'è andato lungo la strada. "
+        "Può dirmi cosa ricorda della persona? Indossava un cappello."
+    ),
+    "pl": (
+        "Stałem na rogu, kiedy zobaczyłem, że samochód przejechał na czerwonym świetle. "
+        "Kierowca był wysokim mężczyzną w ciemnej kurtce i nie zatrzymał się po uderzeniu w drugi pojazd. "
+        "To się stało około dziewiątej wieczorem, a ulica była mokra, bo wcześniej padał deszcz. "
+        "Na przystanku autobusowym czekały dwie osoby i one też wszystko widziały. "
+        "Pobiegł w stronę parku i myślę, że niósł czarną torbę. "
+        "Od razu zadzwoniłem na policję i zostałem z kobietą, która była ranna. "
+        "Potem ciężarówka cofnęła się i odjechała w dół ulicy. "
+        "Czy może pan powiedzieć, co pamięta o tej osobie? Miała na głowie kapelusz."
+    ),
+    "vi": (
+        "Tôi đang đứng ở góc đường thì thấy chiếc xe vượt đèn đỏ. "
+        "Người lái xe là một người đàn ông cao mặc áo khoác tối màu và anh ta không dừng lại sau khi đâm vào xe kia. "
+        "Chuyện xảy ra khoảng chín giờ tối và đường bị ướt vì trời vừa mưa. "
+        "Có hai người đang đợi ở trạm xe buýt và họ cũng thấy hết mọi chuyện. "
+        "Anh ta chạy về phía công viên và tôi nghĩ anh ta mang theo một cái túi màu đen. "
+        "Tôi gọi cảnh sát ngay lập tức và ở lại với người phụ nữ bị thương. "
+        "Sau đó chiếc xe tải lùi lại rồi chạy mất dọc theo con đường. "
+        "Bạn có thể cho tôi biết bạn nhớ gì về người đó không? Người đó đội một cái mũ."
+    ),
+    "tl": (
+        "Nakatayo ako sa kanto nang makita kong lumampas ang kotse sa pulang ilaw. "
+        "Ang drayber ay isang matangkad na lalaki na may madilim na dyaket at hindi siya huminto pagkatapos niyang mabangga ang isa pang sasakyan. "
+        "Nangyari ito bandang alas nuwebe ng gabi at basa ang kalsada dahil umulan. "
+        "May dalawang tao na naghihintay sa sakayan ng bus at nakita rin nila ang lahat. "
+        "Tumakbo siya papunta sa parke at sa tingin ko ay may dala siyang itim na bag. "
+        "Tumawag agad ako sa pulis at sinamahan ko ang babaeng nasugatan. "
+        "Pagkatapos noon ay umatras ang trak at umalis sa kalsada. "
+        "Maaari mo bang sabihin sa akin kung ano ang naaalala mo tungkol sa tao? May suot siyang sumbrero."
+    ),
+}
+
+# Letters that only occur in one of two languages sharing a script
+_PERSIAN_LETTERS = set("پچژگکی")
+_ARABIC_LETTERS = set("ةيكىإأ")
+_UKRAINIAN_LETTERS = set("іїєґ")
+_RUSSIAN_LETTERS = set("ыэъё")
+_SIMPLIFIED_CHARS = set("说这个来时车们么后见开没还对会过里边发问门听钱买红绿头东话长们难点")
+_TRADITIONAL_CHARS = set("說這個來時車們麼後見開沒還對會過裡邊發問門聽錢買紅綠頭東話長們難點")
+
+_NON_LETTERS = re.compile(r"[^\w']+|[\d_]+")
+
+
+@dataclass
+class LanguageGuess:
+    """Result of local language identification."""
+    language: str
+    confidence: float
+    method: str  # "script", "ngram", or "none"
+
+
+def _script_of(char: str) -> str:
+    code = ord(char)
+    if 0x0590 <= code <= 0x05FF:
+        return "hebrew"
+    if 0x0600 <= code <= 0x06FF or 0xFB50 <= code <= 0xFEFF:
+        return "arabic"
+    if 0x0400 <= code <= 0x04FF:
+        return "cyrillic"
+    if 0x0900 <= code <= 0x097F:
+        return "devanagari"
+    if 0x0E00 <= code <= 0x0E7F:
+        return "thai"
+    if 0x3040 <= code <= 0x30FF:
+        return "kana"
+    if 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF or 0x3130 <= code <= 0x318F:
+        return "hangul"
+    if 0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF:
+        return "han"
+    if char.isalpha() and unicodedata.name(char, "").startswith("LATIN"):
+        return "latin"
+    return "other"
+
+
+def _normalize(text: str) -> str:
+    return " " + _NON_LETTERS.sub(" ", text.lower()).strip() + " "
+
+
+def _trigrams(text: str) -> List[str]:
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+
+@lru_cache(maxsize=1)
+def _latin_profiles() -> Tuple[Dict[str, Dict[str, float]], Dict[str, float]]:
+    """Per-language trigram log-probabilities with add-one smoothing."""
+    counts = {lang: Counter(_trigrams(_normalize(seed))) for lang, seed in _LATIN_SEEDS.items()}
+    vocabulary = set().union(*counts.values())
+    profiles: Dict[str, Dict[str, float]] = {}
+    unseen: Dict[str, float] = {}
+    for lang, counter in counts.items():
+        denominator = sum(counter.values()) + len(vocabulary)
+        profiles[lang] = {gram: math.log((n + 1) / denominator) for gram, n in counter.items()}
+        unseen[lang] = math.log(1 / denominator)
+    return profiles, unseen
+
+
+def _identify_latin(text: str) -> Tuple[str, float]:
+    grams = _trigrams(_normalize(text))
+    if not grams:
+        return "en", 0.0
+    profiles, unseen = _latin_profiles()
+    scores = {
+        lang: sum(profile.get(gram, unseen[lang]) for gram in grams) / len(grams)
+        for lang, profile in profiles.items()
+    }
+    # Posterior over languages from the mean per-trigram likelihood, weighted by
+    # a capped amount of evidence
+    evidence = min(len(grams), MAX_EVIDENCE_TRIGRAMS)
+    best = max(scores.values())
+    weights = {lang: math.exp((score - best) * evidence) for lang, score in scores.items()}
+    total = sum(weights.values())
+    language = max(weights, key=weights.get)
+    coverage = sum(1 for gram in grams if gram in profiles[language]) / len(grams)
+    return language, weights[language] / total * min(1.0, coverage / MIN_TRIGRAM_COVERAGE)
+
+
+def _pick_by_markers(chars: str, first: Tuple[str, set], second: Tuple[str, set]) -> Tuple[str, float]:
+    """Choose between two languages sharing a script by their distinctive letters."""
+    first_hits = sum(1 for c in chars if c in first[1])
+    second_hits = sum(1 for c in chars if c in second[1])
+    if first_hits == second_hits:
+        return first[0], 0.6
+    winner = first if first_hits > second_hits else second
+    margin = abs(first_hits - second_hits) / (first_hits + second_hits)
+    return winner[0], 0.75 + 0.24 * margin
+
+
+def identify_language(text: str) -> LanguageGuess:
+    """
+    Identify the language of text without any network call.
+
+    Args:
+        text: Text to analyze
+
+    Returns:
+        LanguageGuess with a language code from SUPPORTED_LANGUAGES and a
+        0.0-1.0 confidence (0.0 when nothing could be decided)
+    """
+    letters = [c for c in text if c.isalpha()]
+    if not letters:
+        return LanguageGuess("en", 0.0, "none")
+
+    scripts = Counter(_script_of(c) for c in letters)
+    script, script_count = scripts.most_common(1)[0]
+    purity = script_count / len(letters)
+    length_factor = min(1.0, len(letters) / MIN_CONFIDENT_LETTERS)
+
+    if script == "latin":
+        language, confidence = _identify_latin(text)
+        method = "ngram"
+    elif script == "other":
+        return LanguageGuess("en", 0.0, "none")
+    else:
+        method = "script"
+        chars = "".join(letters)
+        if script in ("kana", "han") and scripts.get("kana"):
+            language, confidence = "ja", 0.97
+            purity = (scripts["kana"] + scripts.get("han", 0)) / len(letters)
+        elif script == "han":
+            language, confidence = _pick_by_markers(chars, ("zh", _SIMPLIFIED_CHARS), ("zh-TW", _TRADITIONAL_CHARS))
+        elif script == "arabic":
+            language, confidence = _pick_by_markers(chars, ("ar", _ARABIC_LETTERS), ("fa", _PERSIAN_LETTERS))
+        elif script == "cyrillic":
+            language, confidence = _pick_by_markers(chars, ("ru", _RUSSIAN_LETTERS), ("uk", _UKRAINIAN_LETTERS))
+        else:
+            language = {"hebrew": "he", "devanagari": "hi", "thai": "th", "hangul": "ko"}[script]
+            confidence = 0.98
+        # Ideographic text packs a lot into few characters
+        if script in ("han", "kana", "hangul"):
+            length_factor = min(1.0, len(letters) / (MIN_CONFIDENT_LETTERS / 3))
+
+    return LanguageGuess(language, round(confidence * purity * length_factor, 4), method)
@@ -0,0 +1,132 @@
+"""
+Streaming latency sketches.
+
+Model metrics used to keep every latency of the day in a list and sort it
+for each p50/p95, so summaries (and the optimization hints read on every
+model selection) got slower as traffic grew. ``LatencySketch`` is a
+log-bucketed histogram in the style of HDR Histogram / DDSketch: each sample
+increments one bucket whose width is a fixed share of its value, so any
+quantile is accurate to within ``relative_accuracy`` (1% by default) while
+memory stays bounded by the value range, not the sample count. Latencies
+from 1 ms to 10 minutes fit in about 700 buckets.
+
+``WindowedLatencySketch`` answers "over roughly the last N samples" by
+rotating two sketches of N/2 samples each.
+"""
+import math
+from typing import Dict, Optional
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BUCKETS = 2048
+
+
+class LatencySketch:
+    """Constant-memory quantile sketch with bounded relative error."""
+
+    __slots__ = ("_gamma_log", "_gamma", "max_buckets", "buckets", "zero_count", "count", "total", "min", "max")
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY, max_buckets: int = DEFAULT_MAX_BUCKETS):
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._gamma_log = math.log(self._gamma)
+        self.max_buckets = max_buckets
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0  # Samples <= 0 (e.g. failures recorded without a latency)
+        self.count = 0
+        self.total = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def add(self, value: float, count: int = 1):
+        if count <= 0:
+            return
+        if self.count == 0:
+            self.min = self.max = value
+        else:
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+        self.count += count
+        self.total += value * count
+        if value <= 0:
+            self.zero_count += count
+            return
+        index = math.ceil(math.log(value) / self._gamma_log)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse_lowest()
+
+    def _collapse_lowest(self):
+        # Fold the two smallest buckets together; only the fastest samples lose accuracy
+        lowest, second = sorted(self.buckets)[:2]
+        self.buckets[second] += self.buckets.pop(lowest)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Value at quantile ``q`` (0-1), using the nearest-rank convention ``sorted[int(n * q)]``."""
+        if self.count == 0:
+            return 0.0
+        rank = min(self.count - 1, max(0, int(self.count * q)))
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                estimate = 2 * self._gamma ** index / (self._gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def merge(self, other: "LatencySketch"):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.min, self.max = other.min, other.max
+        else:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+        self.zero_count += other.zero_count
+        for index, bucket_count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + bucket_count
+        while len(self.buckets) > self.max_buckets:
+            self._collapse_lowest()
+
+    def copy(self) -> "LatencySketch":
+        clone = LatencySketch.__new__(LatencySketch)
+        clone._gamma, clone._gamma_log, clone.max_buckets = self._gamma, self._gamma_log, self.max_buckets
+        clone.buckets = dict(self.buckets)
+        clone.zero_count, clone.count, clone.total = self.zero_count, self.count, self.total
+        clone.min, clone.max = self.min, self.max
+        return clone
+
+
+class WindowedLatencySketch:
+    """Quantiles over the most recent ``window`` to ``window / 2`` samples."""
+
+    __slots__ = ("half", "relative_accuracy", "current", "previous")
+
+    def __init__(self, window: int = 200, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.half = max(1, window // 2)
+        self.relative_accuracy = relative_accuracy
+        self.current = LatencySketch(relative_accuracy)
+        self.previous: Optional[LatencySketch] = None
+
+    def add(self, value: float):
+        if self.current.count >= self.half:
+            self.previous = self.current
+            self.current = LatencySketch(self.relative_accuracy)
+        self.current.add(value)
+
+    @property
+    def count(self) -> int:
+        return self.current.count + (self.previous.count if self.previous else 0)
+
+    def quantile(self, q: float) -> float:
+        if self.previous is None:
+            return self.current.quantile(q)
+        merged = self.previous.copy()
+        merged.merge(self.current)
+        return merged.quantile(q)
@@ -11,6 +11,7 @@ from typing import Optional, List, Dict, Any, Tuple
 
 from app.services.embedding_service import embedding_service
 from app.config import settings
+from app.services.executors import llm_io
 
 logger = logging.getLogger(__name__)
 
@@ -447,7 +448,6 @@ class MemoryService:
         try:
             from app.services.model_selector import model_selector, call_with_retry
             from app.services.api_key_manager import get_genai_client
-            import asyncio
             
             if settings.google_api_key:
                 client = get_genai_client()
@@ -474,7 +474,7 @@ Return ONLY the JSON array, no other text."""
                 lightweight_model = await model_selector.get_best_model_for_task("lightweight")
                 
                 response = await call_with_retry(
-                    asyncio.to_thread,
+                    llm_io.run,
                     client.models.generate_content,
                     model=lightweight_model,
                     contents=extraction_prompt,
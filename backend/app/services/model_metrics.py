@@ -8,18 +8,22 @@ Tracks per-model:
 - Error types
 
 Stores metrics in database and provides dashboard endpoint data.
+Latencies are kept in constant-memory streaming sketches (see
+``latency_sketch``), and optimization hints are refreshed as requests are
+recorded so model selection reads them without touching the history.
 """
 import logging
 import threading
 import asyncio
 import json
-import statistics
 from collections import defaultdict, deque
 from datetime import datetime, timezone, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field, asdict
 from enum import Enum
 
+from app.services.latency_sketch import LatencySketch, WindowedLatencySketch
+
 logger = logging.getLogger(__name__)
 
 
@@ -154,31 +158,26 @@ class ModelMetricsCollector:
     - Model selection optimization hints
     """
     
-    def __init__(self, max_recent_records: int = 5000):
-        self._lock = threading.Lock()
-        self.max_recent_records = max_recent_records
+    def __init__(self, recent_window: int = 200):
+        self._lock = threading.RLock()
+        self.recent_window = recent_window
         
-        # Recent records per model (for percentile calculations)
-        self._recent_records: Dict[str, deque] = defaultdict(
-            lambda: deque(maxlen=max_recent_records)
+        # Latencies of each model's most recent successful requests (for hedging delays)
+        self._recent_success_latency: Dict[str, WindowedLatencySketch] = defaultdict(
+            lambda: WindowedLatencySketch(recent_window)
         )
         
         # Aggregated counters (reset daily)
-        self._daily_counters: Dict[str, Dict] = defaultdict(lambda: {
-            "total": 0,
-            "success": 0,
-            "failed": 0,
-            "input_tokens": 0,
-            "output_tokens": 0,
-            "latencies": [],
-            "errors": defaultdict(int),
-        })
+        self._daily_counters: Dict[str, Dict] = defaultdict(_new_counters)
         
         # Per-task-type metrics
         self._task_metrics: Dict[str, Dict[str, Dict]] = defaultdict(
-            lambda: defaultdict(lambda: {"count": 0, "success": 0, "latencies": []})
+            lambda: defaultdict(lambda: {"count": 0, "success": 0, "latency": LatencySketch()})
         )
         
+        # Optimization hints per model, refreshed on record_request
+        self._hints: Dict[str, Dict] = {}
+        
         # Current day tracking
         self._current_date = datetime.now(timezone.utc).date()
         
@@ -211,6 +210,7 @@ class ModelMetricsCollector:
             # Reset for new day
             self._daily_counters.clear()
             self._task_metrics.clear()
+            self._hints.clear()
             self._current_date = today
             logger.info(f"Model metrics rolled over to new day: {today}")
     
@@ -258,8 +258,8 @@ class ModelMetricsCollector:
         with self._lock:
             self._check_day_rollover()
             
-            # Add to recent records
-            self._recent_records[model].append(record)
+            if success:
+                self._recent_success_latency[model].add(latency_ms)
             
             # Update daily counters
             counters = self._daily_counters[model]
@@ -273,14 +273,15 @@ class ModelMetricsCollector:
             
             counters["input_tokens"] += input_tokens
             counters["output_tokens"] += output_tokens
-            counters["latencies"].append(latency_ms)
+            counters["latency"].add(latency_ms)
+            self._refresh_hints(model, counters)
             
             # Update task metrics
             task_metrics = self._task_metrics[task_type][model]
             task_metrics["count"] += 1
             if success:
                 task_metrics["success"] += 1
-            task_metrics["latencies"].append(latency_ms)
+            task_metrics["latency"].add(latency_ms)
         
         # Async persist to database
         try:
@@ -330,14 +331,7 @@ class ModelMetricsCollector:
     ) -> ModelPerformanceSummary:
         """Compute performance summary from counters."""
         total = counters["total"]
-        latencies = counters.get("latencies", [])
-        
-        if not latencies:
-            latencies = [0]
-        
-        sorted_latencies = sorted(latencies)
-        p50_idx = int(len(sorted_latencies) * 0.5)
-        p95_idx = int(len(sorted_latencies) * 0.95)
+        latency: LatencySketch = counters["latency"]
         
         return ModelPerformanceSummary(
             model=model,
@@ -345,11 +339,11 @@ class ModelMetricsCollector:
             successful_requests=counters["success"],
             failed_requests=counters["failed"],
             success_rate=counters["success"] / total if total > 0 else 0.0,
-            avg_latency_ms=sum(latencies) / len(latencies) if latencies else 0,
-            p50_latency_ms=sorted_latencies[p50_idx] if sorted_latencies else 0,
-            p95_latency_ms=sorted_latencies[p95_idx] if sorted_latencies else 0,
-            min_latency_ms=min(latencies) if latencies else 0,
-            max_latency_ms=max(latencies) if latencies else 0,
+            avg_latency_ms=latency.mean,
+            p50_latency_ms=latency.quantile(0.5),
+            p95_latency_ms=latency.quantile(0.95),
+            min_latency_ms=latency.min,
+            max_latency_ms=latency.max,
             total_input_tokens=counters["input_tokens"],
             total_output_tokens=counters["output_tokens"],
             avg_input_tokens=counters["input_tokens"] / total if total > 0 else 0,
@@ -363,11 +357,7 @@ class ModelMetricsCollector:
         """Get performance summary for a specific model (current day)."""
         with self._lock:
             self._check_day_rollover()
-            counters = self._daily_counters.get(model, {
-                "total": 0, "success": 0, "failed": 0,
-                "input_tokens": 0, "output_tokens": 0,
-                "latencies": [], "errors": {}
-            })
+            counters = self._daily_counters.get(model) or _new_counters()
             return self._compute_summary(
                 model, counters,
                 datetime.combine(self._current_date, datetime.min.time()).replace(tzinfo=timezone.utc),
@@ -390,74 +380,98 @@ class ModelMetricsCollector:
             for task_type, models in self._task_metrics.items():
                 result[task_type] = {}
                 for model, metrics in models.items():
-                    latencies = metrics.get("latencies", [])
+                    latency = metrics["latency"]
                     count = metrics["count"]
                     result[task_type][model] = {
                         "count": count,
                         "success": metrics["success"],
                         "success_rate": metrics["success"] / count if count > 0 else 0,
-                        "avg_latency_ms": sum(latencies) / len(latencies) if latencies else 0,
+                        "avg_latency_ms": latency.mean,
+                        "p50_latency_ms": round(latency.quantile(0.5), 2),
+                        "p95_latency_ms": round(latency.quantile(0.95), 2),
                     }
             return result
     
+    def get_latency_percentile(
+        self,
+        model: str,
+        percentile: float,
+        min_samples: int = 20,
+    ) -> Optional[float]:
+        """
+        Observed latency percentile (ms) over a model's recent successful requests
+        (the last ``recent_window`` to ``recent_window / 2`` of them).
+
+        Returns None until at least ``min_samples`` successes have been seen.
+        """
+        with self._lock:
+            sketch = self._recent_success_latency.get(model)
+            if sketch is None or sketch.count < min_samples:
+                return None
+            return sketch.quantile(percentile)
+
+    def _refresh_hints(self, model: str, counters: Dict):
+        """Recompute one model's hints from its running counters (caller holds the lock)."""
+        total = counters["total"]
+        if total < 5:
+            return  # Not enough data
+        
+        success_rate = counters["success"] / total if total > 0 else 0
+        avg_latency = counters["latency"].mean
+        
+        error_counts = counters.get("errors", {})
+        rate_limit_errors = error_counts.get(ErrorType.RATE_LIMIT.value, 0)
+        
+        # Generate hints
+        model_hints = {
+            "reliability_score": success_rate,
+            "avg_latency_ms": avg_latency,
+            "rate_limit_pressure": rate_limit_errors / total if total > 0 else 0,
+            "recommendations": [],
+        }
+        
+        if success_rate < 0.9:
+            model_hints["recommendations"].append(
+                f"Low success rate ({success_rate:.1%}). Consider fallback model."
+            )
+        
+        if rate_limit_errors > total * 0.1:
+            model_hints["recommendations"].append(
+                "High rate limit errors. Reduce request frequency or switch models."
+            )
+        
+        if avg_latency > 5000:
+            model_hints["recommendations"].append(
+                f"High latency ({avg_latency:.0f}ms). Consider faster model for latency-sensitive tasks."
+            )
+        
+        # Compute overall score (0-1, higher is better)
+        latency_score = max(0, 1 - (avg_latency / 10000))  # 10s max
+        model_hints["overall_score"] = (
+            success_rate * 0.5 + 
+            latency_score * 0.3 + 
+            (1 - model_hints["rate_limit_pressure"]) * 0.2
+        )
+        
+        # Replace rather than mutate so readers holding the old dict see a consistent view
+        self._hints[model] = model_hints
+
     def get_model_optimization_hints(self) -> Dict[str, Dict]:
         """
-        Generate model selection optimization hints based on metrics.
+        Model selection optimization hints based on metrics.
         
         Returns recommendations for model selection based on:
         - Success rate
         - Latency
         - Error patterns
-        """
-        hints = {}
         
+        Hints are maintained as requests are recorded, so this is a dictionary
+        copy regardless of how many requests have been seen. Treat the per-model
+        dicts as read-only.
+        """
         with self._lock:
-            for model, counters in self._daily_counters.items():
-                total = counters["total"]
-                if total < 5:
-                    continue  # Not enough data
-                
-                success_rate = counters["success"] / total if total > 0 else 0
-                latencies = counters.get("latencies", [])
-                avg_latency = sum(latencies) / len(latencies) if latencies else 0
-                
-                error_counts = counters.get("errors", {})
-                rate_limit_errors = error_counts.get(ErrorType.RATE_LIMIT.value, 0)
-                
-                # Generate hints
-                model_hints = {
-                    "reliability_score": success_rate,
-                    "avg_latency_ms": avg_latency,
-                    "rate_limit_pressure": rate_limit_errors / total if total > 0 else 0,
-                    "recommendations": [],
-                }
-                
-                if success_rate < 0.9:
-                    model_hints["recommendations"].append(
-                        f"Low success rate ({success_rate:.1%}). Consider fallback model."
-                    )
-                
-                if rate_limit_errors > total * 0.1:
-                    model_hints["recommendations"].append(
-                        "High rate limit errors. Reduce request frequency or switch models."
-                    )
-                
-                if avg_latency > 5000:
-                    model_hints["recommendations"].append(
-                        f"High latency ({avg_latency:.0f}ms). Consider faster model for latency-sensitive tasks."
-                    )
-                
-                # Compute overall score (0-1, higher is better)
-                latency_score = max(0, 1 - (avg_latency / 10000))  # 10s max
-                model_hints["overall_score"] = (
-                    success_rate * 0.5 + 
-                    latency_score * 0.3 + 
-                    (1 - model_hints["rate_limit_pressure"]) * 0.2
-                )
-                
-                hints[model] = model_hints
-        
-        return hints
+            self._check_day_rollover()
+            return dict(self._hints)
     
     def get_dashboard_data(self) -> Dict:
         """Get comprehensive dashboard data for model metrics."""
@@ -572,6 +586,18 @@ class ModelMetricsCollector:
             return []
 
 
+def _new_counters() -> Dict:
+    return {
+        "total": 0,
+        "success": 0,
+        "failed": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "latency": LatencySketch(),
+        "errors": defaultdict(int),
+    }
+
+
 # Global singleton
 model_metrics = ModelMetricsCollector()
 
@@ -13,6 +13,11 @@ from typing import Any, Callable, Dict, List, Optional, Tuple
 from zoneinfo import ZoneInfo
 
 from app.config import settings
+from app.services.cancellation import OperationCancelled, cancellation_scope, raise_if_cancelled
+from app.services.concurrency_limiter import call_priority
+from app.services.executors import llm_io
+from app.services.rate_counter import RateCounter
+from app.services.state_journal import state_journal
 
 logger = logging.getLogger(__name__)
 
@@ -126,6 +131,8 @@ def estimate_tokens(text: str) -> int:
 
 def is_retryable_model_error(error: Exception) -> bool:
     """Errors that should trigger retry/fallback model switching."""
+    if isinstance(error, OperationCancelled):
+        return False
     msg = str(error).lower()
     return (
         "429" in msg
@@ -198,44 +205,56 @@ class QuotaTracker:
     """Tracks actual API usage against Google quotas per model."""
 
     def __init__(self):
-        self._minute_counts: Dict[str, List[datetime]] = defaultdict(list)
+        self._minute_counts = RateCounter(window_seconds=60)
         self._daily_counts: Dict[str, int] = defaultdict(int)
         self._daily_tokens: Dict[str, int] = defaultdict(int)
         self._last_reset_date: str = ""
         self._lock = asyncio.Lock()
-        self._state_path = _quota_tracker_state_path()
+        self._state = state_journal.register(
+            "quota_tracker", _quota_tracker_state_path(), self._snapshot_state,
+        )
         self._load_state()
 
     # -- internal helpers --------------------------------------------------
 
     def _load_state(self):
+        payload, deltas = self._state.load()
         try:
-            if not self._state_path.exists():
-                return
-            payload = json.loads(self._state_path.read_text())
-            self._last_reset_date = str(payload.get("last_reset_date", "") or "")
-            self._daily_counts = defaultdict(int, {
-                model: int(count)
-                for model, count in (payload.get("daily_counts") or {}).items()
-            })
-            self._daily_tokens = defaultdict(int, {
-                model: int(count)
-                for model, count in (payload.get("daily_tokens") or {}).items()
-            })
+            if payload:
+                self._last_reset_date = str(payload.get("last_reset_date", "") or "")
+                self._daily_counts = defaultdict(int, {
+                    model: int(count)
+                    for model, count in (payload.get("daily_counts") or {}).items()
+                })
+                self._daily_tokens = defaultdict(int, {
+                    model: int(count)
+                    for model, count in (payload.get("daily_tokens") or {}).items()
+                })
+            for delta in deltas:
+                self._apply_delta(delta)
             self._reset_if_new_day()
         except Exception as exc:
             logger.warning("QuotaTracker: could not load state: %s", exc)
 
-    def _save_state(self):
-        try:
-            payload = {
-                "last_reset_date": self._last_reset_date,
-                "daily_counts": dict(self._daily_counts),
-                "daily_tokens": dict(self._daily_tokens),
-            }
-            self._state_path.write_text(json.dumps(payload, indent=2, sort_keys=True))
-        except Exception as exc:
-            logger.warning("QuotaTracker: could not save state: %s", exc)
+    def _apply_delta(self, delta: Dict[str, Any]):
+        """Replay one journaled ``record_request``."""
+        day = str(delta.get("d", ""))
+        if day < self._last_reset_date:
+            return
+        if day > self._last_reset_date:
+            self._daily_counts.clear()
+            self._daily_tokens.clear()
+            self._last_reset_date = day
+        model = delta["m"]
+        self._daily_counts[model] += 1
+        self._daily_tokens[model] += int(delta.get("t", 0))
+
+    def _snapshot_state(self) -> Dict[str, Any]:
+        return {
+            "last_reset_date": self._last_reset_date,
+            "daily_counts": dict(self._daily_counts),
+            "daily_tokens": dict(self._daily_tokens),
+        }
 
     def _reset_if_new_day(self):
         today = datetime.now(ZoneInfo("America/Los_Angeles")).strftime("%Y-%m-%d")
@@ -244,14 +263,7 @@ class QuotaTracker:
             self._daily_counts.clear()
             self._daily_tokens.clear()
             self._last_reset_date = today
-            self._save_state()
-
-    def _prune_minute_window(self, model: str):
-        """Remove entries older than 60 s from the per-minute window."""
-        cutoff = datetime.now(timezone.utc) - timedelta(seconds=60)
-        self._minute_counts[model] = [
-            ts for ts in self._minute_counts[model] if ts > cutoff
-        ]
+            self._state.request_snapshot()
 
     # -- public API --------------------------------------------------------
 
@@ -259,18 +271,15 @@ class QuotaTracker:
         """Record a completed request (RPM + RPD + token count)."""
         async with self._lock:
             self._reset_if_new_day()
-            now = datetime.now(timezone.utc)
-            self._minute_counts[model].append(now)
+            self._minute_counts.add(model)
             self._daily_counts[model] = self._daily_counts.get(model, 0) + 1
             self._daily_tokens[model] = self._daily_tokens.get(model, 0) + tokens_used
-            self._prune_minute_window(model)
-            self._save_state()
+            self._state.record({"d": self._last_reset_date, "m": model, "t": tokens_used})
 
     async def can_make_request(self, model: str) -> bool:
         """Return True if the model has remaining quota for a request."""
         async with self._lock:
             self._reset_if_new_day()
-            self._prune_minute_window(model)
             key_manager = _get_key_manager()
             if key_manager and key_manager.has_multi_account_rotation():
                 return key_manager.has_available_account(model)
@@ -280,7 +289,7 @@ class QuotaTracker:
             rpd_limit = quota.get("rpd", 0)
 
             # rpm=0 means unlimited
-            if rpm_limit and len(self._minute_counts[model]) >= rpm_limit:
+            if rpm_limit and self._minute_counts.count(model) >= rpm_limit:
                 return False
             # rpd=0 means unlimited
             if rpd_limit and self._daily_counts.get(model, 0) >= rpd_limit:
@@ -290,7 +299,6 @@ class QuotaTracker:
     async def rpm_usage_ratio(self, model: str) -> float:
         """Return current RPM usage as a ratio 0.0–1.0."""
         async with self._lock:
-            self._prune_minute_window(model)
             quota = MODEL_QUOTAS.get(model, {})
             rpm_limit = quota.get("rpm", 0)
             if not rpm_limit:
@@ -300,7 +308,7 @@ class QuotaTracker:
             if key_manager and key_manager.has_multi_account_rotation():
                 multiplier = key_manager.get_capacity_multiplier(model)
             effective_limit = max(1, rpm_limit * multiplier)
-            return len(self._minute_counts[model]) / effective_limit
+            return self._minute_counts.count(model) / effective_limit
 
     async def wait_for_quota(self, model: str, timeout: float = 60.0) -> bool:
         """Wait up to *timeout* seconds for quota to become available.
@@ -319,7 +327,6 @@ class QuotaTracker:
             status: Dict[str, Any] = {}
             key_manager = _get_key_manager()
             for model, quota in MODEL_QUOTAS.items():
-                self._prune_minute_window(model)
                 rpm_limit = quota.get("rpm", 0)
                 tpm_limit = quota.get("tpm", 0)
                 rpd_limit = quota.get("rpd", 0)
@@ -329,7 +336,7 @@ class QuotaTracker:
                 effective_rpm_limit = rpm_limit * multiplier if rpm_limit else 0
                 effective_tpm_limit = tpm_limit * multiplier if tpm_limit else 0
                 effective_rpd_limit = rpd_limit * multiplier if rpd_limit else 0
-                rpm_used = len(self._minute_counts.get(model, []))
+                rpm_used = self._minute_counts.count(model)
                 rpd_used = self._daily_counts.get(model, 0)
                 tpm_used = self._daily_tokens.get(model, 0)
                 status[model] = {
@@ -810,6 +817,177 @@ async def call_with_retry(
         raise
 
 
+# ---------------------------------------------------------------------------
+# Latency hedging across a task's model chain
+# ---------------------------------------------------------------------------
+
+_hedge_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {
+    "requests": 0,
+    "hedges_launched": 0,
+    "hedge_wins": 0,
+    "primary_wins": 0,
+    "skipped_no_data": 0,
+    "skipped_budget": 0,
+})
+
+
+def hedging_enabled(task_type: str) -> bool:
+    """True if the task type opted into latency hedging."""
+    enabled = {t.strip() for t in settings.hedging_task_types.split(",") if t.strip()}
+    return task_type in enabled
+
+
+def _hedge_delay_seconds(task_type: str, model_name: str) -> Optional[float]:
+    """Seconds to wait on *model_name* before hedging, or None to never hedge."""
+    from app.services.model_metrics import model_metrics
+
+    p90 = model_metrics.get_latency_percentile(
+        model_name, 0.9, min_samples=settings.hedging_min_samples
+    )
+    if p90 is None:
+        _hedge_stats[task_type]["skipped_no_data"] += 1
+        return None
+    return max(p90, settings.hedging_min_delay_ms) / 1000
+
+
+async def _hedge_allowed(model_name: str) -> bool:
+    """A hedge is optional work: only spend quota the budget can comfortably spare."""
+    from app.services.rpd_budget import rpd_budget
+
+    if model_selector._is_rate_limited(model_name):
+        return False
+    if not await quota_tracker.can_make_request(model_name):
+        return False
+    return rpd_budget.has_headroom(model_name, settings.hedging_budget_reserve)
+
+
+async def _record_model_success(model_name: str, task_type: str, latency_ms: float, response: Any):
+    from app.services.model_metrics import model_metrics
+
+    input_tokens = 0
+    output_tokens = 0
+    if hasattr(response, "usage_metadata"):
+        usage = response.usage_metadata
+        input_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    await quota_tracker.record_request(model_name, tokens_used=input_tokens + output_tokens)
+    model_metrics.record_request(
+        model=model_name,
+        task_type=task_type,
+        latency_ms=latency_ms,
+        success=True,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+    )
+
+
+async def _record_model_failure(model_name: str, task_type: str, latency_ms: float, error: BaseException):
+    """Record a failed attempt the way ``call_with_retry`` does."""
+    from app.services.model_metrics import model_metrics
+
+    if isinstance(error, (asyncio.CancelledError, OperationCancelled)):
+        return
+    if is_retryable_model_error(error):
+        await model_selector.mark_rate_limited(model_name, error=error)
+    else:
+        model_metrics.record_request(
+            model=model_name,
+            task_type=task_type,
+            latency_ms=latency_ms,
+            success=False,
+            error=error,
+        )
+
+
+async def hedged_call(
+    task_type: str,
+    primary: Tuple[str, Callable[[], Any]],
+    hedge: Optional[Tuple[str, Callable[[], Any]]] = None,
+) -> Tuple[Any, str]:
+    """
+    Run ``primary`` (model, coroutine factory); if it is still running after
+    the model's observed p90 latency, also start ``hedge`` and return whichever
+    succeeds first, cancelling the other. Returns (response, model used).
+
+    The winner's quota and latency, and every failed attempt, are recorded
+    here. Errors propagate only when every launched attempt failed (the
+    primary's error is preferred).
+    """
+    import time
+
+    tokens = {}
+
+    def launch(factory: Callable[[], Any]) -> asyncio.Task:
+        # Tasks copy the context here, so the task's priority and cancellation token
+        # reach the concurrency limiter and the worker thread
+        with call_priority(task_type), cancellation_scope() as token:
+            task = asyncio.ensure_future(factory())
+        tokens[task] = token
+        return task
+
+    primary_model, primary_factory = primary
+    stats = _hedge_stats[task_type]
+    stats["requests"] += 1
+    started = {primary_model: time.perf_counter()}
+    tasks: Dict[asyncio.Task, str] = {launch(primary_factory): primary_model}
+
+    try:
+        delay = None
+        if hedge and hedging_enabled(task_type) and hedge[0] != primary_model:
+            delay = _hedge_delay_seconds(task_type, primary_model)
+        if delay is not None:
+            done, _ = await asyncio.wait(set(tasks), timeout=delay)
+            if not done:
+                raise_if_cancelled(f"{task_type} hedge")
+                hedge_model, hedge_factory = hedge
+                if await _hedge_allowed(hedge_model):
+                    from app.services.rpd_budget import rpd_budget
+
+                    started[hedge_model] = time.perf_counter()
+                    tasks[launch(hedge_factory)] = hedge_model
+                    rpd_budget.record_request(hedge_model)
+                    stats["hedges_launched"] += 1
+                    logger.info(
+                        "Hedging %s request: %s exceeded %.0fms, also trying %s",
+                        task_type, primary_model, delay * 1000, hedge_model,
+                    )
+                else:
+                    stats["skipped_budget"] += 1
+
+        errors: Dict[str, BaseException] = {}
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                model_name = tasks[task]
+                latency_ms = (time.perf_counter() - started[model_name]) * 1000
+                if task.exception() is not None:
+                    errors[model_name] = task.exception()
+                    await _record_model_failure(model_name, task_type, latency_ms, task.exception())
+                    continue
+                if len(tasks) > 1:
+                    stats["primary_wins" if model_name == primary_model else "hedge_wins"] += 1
+                await _record_model_success(model_name, task_type, latency_ms, task.result())
+                return task.result(), model_name
+        raise errors.get(primary_model) or next(iter(errors.values()))
+    finally:
+        for task in tasks:
+            if not task.done():
+                # Stops the abandoned attempt from failing over and counts its late response
+                tokens[task].cancel("hedge_abandoned")
+                task.cancel()
+
+
+def get_hedging_stats() -> Dict[str, Any]:
+    """Hedging policy and per-task counters."""
+    return {
+        "task_types": [t.strip() for t in settings.hedging_task_types.split(",") if t.strip()],
+        "min_delay_ms": settings.hedging_min_delay_ms,
+        "budget_reserve": settings.hedging_budget_reserve,
+        "tasks": {task: dict(counters) for task, counters in _hedge_stats.items()},
+    }
+
+
 async def generate_content_with_fallback(
     client: Any,
     task_type: str,
@@ -822,9 +1000,19 @@ async def generate_content_with_fallback(
     if not candidates:
         candidates = model_selector.get_model_chain(task_type)
 
+    def _generate(model_name: str):
+        kwargs: Dict[str, Any] = {
+            "model": model_name,
+            "contents": contents,
+        }
+        if config is not None:
+            kwargs["config"] = config
+        return llm_io.run(client.models.generate_content, **kwargs)
+
     last_error: Optional[Exception] = None
     attempted_models = False
-    for model_name in candidates:
+    for index, model_name in enumerate(candidates):
+        raise_if_cancelled(f"{task_type} call to {model_name}")
         if not await quota_tracker.can_make_request(model_name):
             last_error = RuntimeError(
                 f"Tracked quota is exhausted for task '{task_type}' on model '{model_name}'"
@@ -838,23 +1026,12 @@ async def generate_content_with_fallback(
 
         try:
             attempted_models = True
-            kwargs: Dict[str, Any] = {
-                "model": model_name,
-                "contents": contents,
-            }
-            if config is not None:
-                kwargs["config"] = config
-
-            response = await asyncio.to_thread(client.models.generate_content, **kwargs)
-
-            input_tokens = 0
-            output_tokens = 0
-            if hasattr(response, "usage_metadata"):
-                usage = response.usage_metadata
-                input_tokens = getattr(usage, "prompt_token_count", 0) or 0
-                output_tokens = getattr(usage, "candidates_token_count", 0) or 0
-            await quota_tracker.record_request(model_name, tokens_used=input_tokens + output_tokens)
-            return response, model_name
+            hedge_model = candidates[index + 1] if index + 1 < len(candidates) else None
+            return await hedged_call(
+                task_type,
+                (model_name, lambda m=model_name: _generate(m)),
+                (hedge_model, lambda m=hedge_model: _generate(m)) if hedge_model else None,
+            )
         except Exception as error:
             last_error = error
             if is_retryable_model_error(error):
@@ -21,6 +21,7 @@ from app.services.model_selector import (
     LIGHTWEIGHT_MODELS,
 )
 from app.services.api_key_manager import get_genai_client
+from app.services.executors import llm_io
 
 logger = logging.getLogger(__name__)
 
@@ -225,7 +226,7 @@ class MultiModelVerifier:
                 config_kwargs["response_mime_type"] = "application/json"
                 config_kwargs["response_json_schema"] = response_schema
 
-            response = await asyncio.to_thread(
+            response = await llm_io.run(
                 self.client.models.generate_content,
                 model=model_name,
                 contents=prompt,
@@ -0,0 +1,326 @@
+"""
+Bulk assignment of orphan reports (reports with no case).
+
+Running the per-report assignment path once per orphan lists every case and
+may make a Gemini call for each report. A bulk run instead:
+
+1. builds incident profiles for all orphans, with bounded concurrency;
+2. ranks every orphan against one shared case index (case profiles built once);
+3. adjudicates ambiguous orphans in batched Gemini prompts, several per call;
+4. commits the decisions under the same per-report lock single-report
+   assignment takes, letting later orphans join cases opened earlier in the
+   same run (a report assigned meanwhile by another path is skipped);
+5. refreshes each touched case summary once.
+
+Runs are background tasks with progress reporting; one runs at a time.
+"""
+import asyncio
+import contextvars
+import logging
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+from app.models.schemas import Case, ReconstructionSession
+from app.services.case_manager import case_manager
+from app.services.firestore import firestore_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OrphanAssignmentJob:
+    job_id: str
+    limit: int
+    status: str = "queued"  # queued, running, completed, failed
+    stage: str = "queued"  # profiling, ranking, adjudicating, committing, summarizing, done
+    total: int = 0
+    profiled: int = 0
+    adjudicated: int = 0
+    committed: int = 0
+    skipped: int = 0  # assigned by another path before this run committed it
+    assigned: int = 0
+    cases_created: int = 0
+    matched_directly: int = 0
+    matched_by_llm: int = 0
+    llm_calls: int = 0
+    failures: List[Dict[str, str]] = field(default_factory=list)
+    error: Optional[str] = None
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def fail(self, report_id: str, error: Any):
+        self.failures.append({"report_id": report_id, "error": str(error)[:200]})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "stage": self.stage,
+            "limit": self.limit,
+            "total": self.total,
+            "profiled": self.profiled,
+            "adjudicated": self.adjudicated,
+            "committed": self.committed,
+            "skipped": self.skipped,
+            "progress_pct": (
+                round(100 * min(self.total, self.committed + self.skipped + len(self.failures)) / self.total, 1)
+                if self.total else (100.0 if self.done else 0.0)
+            ),
+            "assigned": self.assigned,
+            "cases_created": self.cases_created,
+            "matched_directly": self.matched_directly,
+            "matched_by_llm": self.matched_by_llm,
+            "llm_calls": self.llm_calls,
+            "failed": len(self.failures),
+            "failures": self.failures,
+            "error": self.error,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+async def _bounded(coros: Iterable[Awaitable[Any]], limit: int) -> List[Any]:
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros), return_exceptions=True)
+
+
+class OrphanAssignmentPipeline:
+    """Starts and tracks bulk orphan assignment runs."""
+
+    MAX_JOBS = 20
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, OrphanAssignmentJob]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, limit: int = 50) -> OrphanAssignmentJob:
+        """Start a run, or return the one already in progress."""
+        running = next((job for job in self._jobs.values() if not job.done), None)
+        if running is not None:
+            return running
+        job = OrphanAssignmentJob(job_id=uuid.uuid4().hex[:12], limit=limit)
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self.MAX_JOBS:
+            self._jobs.popitem(last=False)
+        # The run outlives the request that started it: don't inherit its
+        # cancellation token or call priority
+        task = asyncio.create_task(self._run(job), context=contextvars.Context())
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.job_id, None))
+        return job
+
+    async def wait(self, job_id: str) -> Optional[OrphanAssignmentJob]:
+        task = self._tasks.get(job_id)
+        if task is not None:
+            # A cancelled caller (request timeout) must not cancel the run mid-commit
+            await asyncio.shield(task)
+        return self._jobs.get(job_id)
+
+    def get_job(self, job_id: str) -> Optional[OrphanAssignmentJob]:
+        return self._jobs.get(job_id)
+
+    def latest_job(self) -> Optional[OrphanAssignmentJob]:
+        return next(reversed(self._jobs.values()), None)
+
+    async def _run(self, job: OrphanAssignmentJob):
+        job.status = "running"
+        try:
+            orphans = await firestore_service.list_orphan_sessions(limit=job.limit)
+            job.total = len(orphans)
+
+            job.stage = "profiling"
+            profiles = await self._build_profiles(orphans, job)
+
+            job.stage = "ranking"
+            all_cases = await firestore_service.list_cases(limit=0)
+            cases = [case for case in all_cases if (case.status or "").lower() != "merged"]
+            case_profiles = {case.id: case_manager._build_case_profile(case) for case in cases}
+            decisions: Dict[str, Optional[str]] = {}  # report_id -> case_id, None = new case
+            ambiguous: List[Tuple[ReconstructionSession, List[Dict[str, Any]]]] = []
+            for session in orphans:
+                if session.id not in profiles:
+                    continue
+                ranked = case_manager._rank_case_candidates(profiles[session.id], cases, case_profiles)
+                direct = case_manager._select_direct_match(ranked)
+                if direct:
+                    decisions[session.id] = direct["case"].id
+                    job.matched_directly += 1
+                elif ranked and case_manager.client:
+                    ambiguous.append((session, ranked))
+                else:
+                    fallback = case_manager._select_fallback_match(ranked)
+                    decisions[session.id] = fallback["case"].id if fallback else None
+
+            job.stage = "adjudicating"
+            await self._adjudicate(ambiguous, decisions, job)
+
+            job.stage = "committing"
+            linked = {
+                session.id: [case.id for case in all_cases if session.id in (case.report_ids or [])]
+                for session in orphans
+            }
+            touched = await self._commit(orphans, profiles, decisions, linked, job)
+
+            job.stage = "summarizing"
+            await _bounded(
+                (case_manager.generate_case_summary(case_id) for case_id in touched),
+                settings.orphan_assign_concurrency,
+            )
+            job.stage = "done"
+            job.status = "completed"
+            logger.info(
+                f"Orphan assignment {job.job_id}: {job.assigned}/{job.total} assigned, "
+                f"{job.cases_created} new cases, {job.llm_calls} LLM calls"
+            )
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)[:200]
+            logger.error(f"Orphan assignment {job.job_id} failed: {e}")
+        finally:
+            job.finished_at = datetime.utcnow()
+
+    async def _build_profiles(self, orphans: List[ReconstructionSession], job: OrphanAssignmentJob) -> Dict[str, Dict[str, Any]]:
+        async def profile(session: ReconstructionSession):
+            result = await case_manager._build_incident_profile(session)
+            job.profiled += 1
+            return result
+
+        results = await _bounded((profile(s) for s in orphans), settings.orphan_assign_concurrency)
+        profiles = {}
+        for session, result in zip(orphans, results):
+            if isinstance(result, BaseException):
+                job.fail(session.id, result)
+            else:
+                profiles[session.id] = result
+        return profiles
+
+    async def _adjudicate(
+        self,
+        ambiguous: List[Tuple[ReconstructionSession, List[Dict[str, Any]]]],
+        decisions: Dict[str, Optional[str]],
+        job: OrphanAssignmentJob,
+    ):
+        batch_size = max(1, settings.orphan_assign_llm_batch_size)
+        batches = [ambiguous[i:i + batch_size] for i in range(0, len(ambiguous), batch_size)]
+
+        async def adjudicate(batch):
+            job.llm_calls += 1
+            matches = await case_manager.find_matching_cases_batch(
+                [(session, [entry["case"] for entry in ranked[:6]]) for session, ranked in batch]
+            )
+            for session, ranked in batch:
+                matched = matches.get(session.id)
+                if matched:
+                    decisions[session.id] = matched
+                    job.matched_by_llm += 1
+                else:
+                    fallback = case_manager._select_fallback_match(ranked)
+                    decisions[session.id] = fallback["case"].id if fallback else None
+                job.adjudicated += 1
+
+        results = await _bounded((adjudicate(batch) for batch in batches), settings.orphan_assign_concurrency)
+        for batch, result in zip(batches, results):
+            if isinstance(result, BaseException):
+                for session, _ in batch:
+                    job.fail(session.id, result)
+
+    async def _commit(
+        self,
+        orphans: List[ReconstructionSession],
+        profiles: Dict[str, Dict[str, Any]],
+        decisions: Dict[str, Optional[str]],
+        linked: Dict[str, List[str]],
+        job: OrphanAssignmentJob,
+    ) -> set:
+        """Attach matched orphans (concurrently), then open cases for the rest (in order)."""
+        touched: set = set()
+        pending_new: List[ReconstructionSession] = []
+
+        async def attach(session: ReconstructionSession):
+            async with case_manager._report_lock(session.id):
+                latest = await self._reload_orphan(session, job)
+                if latest is None:
+                    return
+                committed = await case_manager._commit_report_to_case(
+                    decisions[session.id], latest, linked[session.id], profiles[session.id],
+                )
+                if committed is None:  # Case merged/deleted since ranking
+                    pending_new.append(session)
+                    return
+                case_id, report_added = committed
+                if report_added:
+                    touched.add(case_id)
+                await self._save_assignment(latest, case_id, job)
+
+        to_attach = [s for s in orphans if s.id in decisions and decisions[s.id]]
+        results = await _bounded((attach(s) for s in to_attach), settings.orphan_assign_concurrency)
+        for session, result in zip(to_attach, results):
+            if isinstance(result, BaseException):
+                job.fail(session.id, result)
+
+        # Sequential so orphans about the same new incident end up on one case
+        opened: List[Case] = []
+        opened_profiles: Dict[str, Dict[str, Any]] = {}
+        for session in pending_new + [s for s in orphans if s.id in decisions and not decisions[s.id]]:
+            try:
+                async with case_manager._report_lock(session.id):
+                    latest = await self._reload_orphan(session, job)
+                    if latest is None:
+                        continue
+                    ranked = case_manager._rank_case_candidates(profiles[session.id], opened, opened_profiles)
+                    match = case_manager._select_direct_match(ranked) or case_manager._select_fallback_match(ranked)
+                    committed = None
+                    if match:
+                        committed = await case_manager._commit_report_to_case(
+                            match["case"].id, latest, linked[session.id], profiles[session.id],
+                        )
+                    if committed is not None:
+                        case_id = committed[0]
+                        touched.add(case_id)
+                    else:
+                        case_id = await case_manager._open_case_for_report(latest, profiles[session.id])
+                        job.cases_created += 1
+                        case = await firestore_service.get_case(case_id)
+                        if case is not None:
+                            opened.append(case)
+                            opened_profiles[case.id] = case_manager._build_case_profile(case)
+                    await self._save_assignment(latest, case_id, job)
+            except Exception as e:
+                job.fail(session.id, e)
+        return touched
+
+    @staticmethod
+    async def _reload_orphan(
+        session: ReconstructionSession, job: OrphanAssignmentJob,
+    ) -> Optional[ReconstructionSession]:
+        """Re-read a report under its lock; None if it was assigned (or deleted) since the scan."""
+        latest = await firestore_service.get_session(session.id)
+        if latest is None or latest.case_id:
+            job.skipped += 1
+            return None
+        return latest
+
+    @staticmethod
+    async def _save_assignment(session: ReconstructionSession, case_id: str, job: OrphanAssignmentJob):
+        session.case_id = case_id
+        session.updated_at = datetime.utcnow()
+        await firestore_service.update_session(session)
+        job.committed += 1
+        job.assigned += 1
+
+
+# Global instance
+orphan_assignment_pipeline = OrphanAssignmentPipeline()
@@ -0,0 +1,255 @@
+"""
+Gemini cached-content reuse for stable prompt prefixes.
+
+The interview system prompt and the few-shot scene extraction preamble are
+identical on every request. Prefixes registered here (the compiled prompt
+registry does this when it builds them) are uploaded once per account and
+model as Gemini cached content, and the rotating client sends the cache name
+instead of resending the text. Entries are extended shortly before they
+expire for as long as they keep being used; an (account, model) pair that
+rejects caching is left alone for a while.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+KIND_SYSTEM_INSTRUCTION = "system_instruction"  # Matched against config.system_instruction exactly
+KIND_CONTENTS = "contents"  # Matched as a leading prefix of string contents
+
+
+@dataclass(frozen=True)
+class PromptPrefix:
+    key: str
+    label: str
+    kind: str
+    text: str
+    token_count: int
+
+
+_prefixes: Dict[str, PromptPrefix] = {}
+_system_prefixes: Dict[str, PromptPrefix] = {}  # exact text -> prefix
+_contents_prefixes: List[PromptPrefix] = []  # longest first
+_prefix_lock = threading.Lock()
+
+
+def register_prompt_prefix(text: str, label: str, kind: str, token_count: int) -> Optional[PromptPrefix]:
+    """Mark a prompt prefix as worth caching. Prefixes below the API minimum are ignored."""
+    if not settings.prompt_cache_enabled or token_count < settings.prompt_cache_min_tokens:
+        return None
+    key = hashlib.sha256(f"{kind}\n{text}".encode("utf-8")).hexdigest()[:16]
+    with _prefix_lock:
+        if key in _prefixes:
+            return _prefixes[key]
+        prefix = PromptPrefix(key=key, label=label, kind=kind, text=text, token_count=token_count)
+        _prefixes[key] = prefix
+        if kind == KIND_SYSTEM_INSTRUCTION:
+            _system_prefixes[text] = prefix
+        else:
+            _contents_prefixes.append(prefix)
+            _contents_prefixes.sort(key=lambda p: len(p.text), reverse=True)
+        return prefix
+
+
+def get_prompt_prefixes() -> List[PromptPrefix]:
+    with _prefix_lock:
+        return list(_prefixes.values())
+
+
+def _config_value(config: Any, name: str) -> Any:
+    if config is None:
+        return None
+    if isinstance(config, dict):
+        return config.get(name)
+    return getattr(config, name, None)
+
+
+def cached_content_name(config: Any) -> Optional[str]:
+    """The cached content a routed request config points at, if any."""
+    return _config_value(config, "cached_content")
+
+
+def _config_with_cache(config: Any, cache_name: str, drop_system_instruction: bool) -> Any:
+    """Copy a dict or SDK config, pointing it at cached content."""
+    if config is None:
+        config = {}
+    if isinstance(config, dict):
+        routed = dict(config)
+        if drop_system_instruction:
+            routed.pop("system_instruction", None)
+        routed["cached_content"] = cache_name
+        return routed
+    update: Dict[str, Any] = {"cached_content": cache_name}
+    if drop_system_instruction:
+        update["system_instruction"] = None
+    return config.model_copy(update=update)
+
+
+@dataclass
+class _CacheEntry:
+    name: str
+    expires_at: float  # epoch seconds
+
+
+class CachedContentPool:
+    """Per-account, per-model cached content for registered prompt prefixes."""
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str, str], _CacheEntry] = {}
+        self._unsupported_until: Dict[Tuple[str, str], float] = {}
+        self._failure_streak: Dict[Tuple[str, str], int] = {}  # consecutive failures per account/model
+        self._in_flight: set = set()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {
+            "requests": 0, "created": 0, "refreshed": 0, "failures": 0, "tokens_saved": 0,
+        })
+
+    @staticmethod
+    def supports_model(model: str) -> bool:
+        model_lower = (model or "").lower()
+        return any(
+            pattern.strip() and pattern.strip().lower() in model_lower
+            for pattern in settings.prompt_cache_models.split(",")
+        )
+
+    def match(self, contents: Any, config: Any) -> Optional[PromptPrefix]:
+        """Find the registered prefix this request starts with, if any."""
+        system_instruction = _config_value(config, "system_instruction")
+        if isinstance(system_instruction, str):
+            prefix = _system_prefixes.get(system_instruction)
+            if prefix is not None:
+                return prefix
+        if isinstance(contents, str) and not _config_value(config, "system_instruction"):
+            for prefix in _contents_prefixes:
+                if contents.startswith(prefix.text) and contents[len(prefix.text):].strip():
+                    return prefix
+        return None
+
+    def route(self, client: Any, account_id: str, model: str, contents: Any, config: Any) -> Tuple[Any, Any, Optional[PromptPrefix]]:
+        """
+        Rewrite a request to use cached content when its prefix is registered.
+
+        Returns (contents, config, prefix); prefix is None when the request
+        goes out unchanged.
+        """
+        if not settings.prompt_cache_enabled or not self.supports_model(model):
+            return contents, config, None
+        prefix = self.match(contents, config)
+        if prefix is None:
+            return contents, config, None
+        cache_name = self.resolve(client, account_id, model, prefix)
+        if cache_name is None:
+            return contents, config, None
+        if prefix.kind == KIND_SYSTEM_INSTRUCTION:
+            return contents, _config_with_cache(config, cache_name, drop_system_instruction=True), prefix
+        return contents[len(prefix.text):], _config_with_cache(config, cache_name, drop_system_instruction=False), prefix
+
+    def resolve(self, client: Any, account_id: str, model: str, prefix: PromptPrefix) -> Optional[str]:
+        """Return a live cache name for the prefix, creating or extending it as needed."""
+        key = (account_id, model, prefix.key)
+        now = time.time()
+        with self._lock:
+            if self._unsupported_until.get((account_id, model), 0) > now:
+                return None
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at - now > settings.prompt_cache_refresh_margin_seconds:
+                return entry.name
+            if key in self._in_flight:
+                # Another request is creating/refreshing it; use it if still valid
+                return entry.name if entry is not None and entry.expires_at > now else None
+            self._in_flight.add(key)
+
+        ttl = f"{settings.prompt_cache_ttl_seconds}s"
+        stats = self._stats[prefix.label]
+        try:
+            if entry is not None and entry.expires_at > now:
+                try:
+                    updated = client.caches.update(name=entry.name, config={"ttl": ttl})
+                    stats["refreshed"] += 1
+                    return self._store(key, entry.name, updated)
+                except Exception as e:
+                    logger.info(f"Refreshing cached prompt '{prefix.label}' failed, recreating: {e}")
+            create_config: Dict[str, Any] = {"ttl": ttl, "display_name": f"witnessreplay-{prefix.label}"}
+            if prefix.kind == KIND_SYSTEM_INSTRUCTION:
+                create_config["system_instruction"] = prefix.text
+            else:
+                create_config["contents"] = [prefix.text]
+            created = client.caches.create(model=model, config=create_config)
+            stats["created"] += 1
+            logger.info(f"Cached prompt '{prefix.label}' for {model} on account {account_id}")
+            return self._store(key, created.name, created)
+        except Exception as e:
+            stats["failures"] += 1
+            with self._lock:
+                self._entries.pop(key, None)
+                # Back off exponentially: a transient error retries within seconds,
+                # a model that never supports caching settles at the cap.
+                streak = self._failure_streak.get((account_id, model), 0) + 1
+                self._failure_streak[(account_id, model)] = streak
+                backoff = min(
+                    settings.prompt_cache_retry_seconds * 2 ** (streak - 1),
+                    settings.prompt_cache_retry_max_seconds,
+                )
+                self._unsupported_until[(account_id, model)] = now + backoff
+            logger.warning(
+                f"Prompt caching unavailable for {model} on account {account_id} "
+                f"(retrying in {backoff:.0f}s): {e}"
+            )
+            return None
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+    def _store(self, key: Tuple[str, str, str], name: str, cached: Any) -> str:
+        expire_time = getattr(cached, "expire_time", None)
+        if isinstance(expire_time, datetime):
+            if expire_time.tzinfo is None:
+                expire_time = expire_time.replace(tzinfo=timezone.utc)
+            expires_at = expire_time.timestamp()
+        else:
+            expires_at = time.time() + settings.prompt_cache_ttl_seconds
+        with self._lock:
+            self._entries[key] = _CacheEntry(name=name, expires_at=expires_at)
+            self._failure_streak.pop(key[:2], None)
+            self._unsupported_until.pop(key[:2], None)
+        return name
+
+    def record_success(self, prefix: PromptPrefix, response: Any):
+        usage = getattr(response, "usage_metadata", None)
+        cached_tokens = getattr(usage, "cached_content_token_count", None) if usage is not None else None
+        stats = self._stats[prefix.label]
+        stats["requests"] += 1
+        stats["tokens_saved"] += int(cached_tokens if cached_tokens is not None else prefix.token_count)
+
+    def note_failure(self, account_id: str, model: str, prefix: PromptPrefix, error: Exception):
+        """Forget a cache entry the API no longer accepts (expired or deleted server-side)."""
+        if "cache" not in str(error).lower():
+            return  # Rate limits etc. say nothing about the cache itself
+        with self._lock:
+            self._entries.pop((account_id, model, prefix.key), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            live = sum(1 for entry in self._entries.values() if entry.expires_at > now)
+            unsupported = sorted(f"{account}:{model}" for (account, model), until in self._unsupported_until.items() if until > now)
+        by_prefix = {label: dict(stats) for label, stats in self._stats.items()}
+        return {
+            "enabled": settings.prompt_cache_enabled,
+            "registered_prefixes": [
+                {"label": p.label, "kind": p.kind, "tokens": p.token_count} for p in get_prompt_prefixes()
+            ],
+            "live_caches": live,
+            "unsupported": unsupported,
+            "requests": sum(s["requests"] for s in by_prefix.values()),
+            "input_tokens_saved": sum(s["tokens_saved"] for s in by_prefix.values()),
+            "by_prefix": by_prefix,
+        }
@@ -13,6 +13,7 @@ from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 import threading
+from collections import OrderedDict
 
 from app.services.token_estimator import estimate_tokens
 
@@ -85,8 +86,12 @@ class PromptOptimizer:
     Optimizes prompts to reduce token usage while preserving meaning.
     """
     
+    # Compressed system prompts are memoized; the set of distinct prompts is small
+    MAX_COMPRESSED_CACHE = 64
+    
     def __init__(self):
         self._lock = threading.Lock()
+        self._compressed: "OrderedDict[Tuple[str, str], Tuple[str, int, int]]" = OrderedDict()
         self._total_tokens_saved = 0
         self._total_compressions = 0
         self._savings_by_method: Dict[str, int] = {}
@@ -106,8 +111,39 @@ class PromptOptimizer:
         Returns:
             OptimizationResult with compressed prompt and stats
         """
-        original_tokens = estimate_tokens(prompt)
+        cache_key = (level, prompt)
+        with self._lock:
+            cached = self._compressed.get(cache_key)
+            if cached is not None:
+                self._compressed.move_to_end(cache_key)
+        if cached is not None:
+            compressed, original_tokens, compressed_tokens = cached
+        else:
+            compressed = self._compress_text(prompt, level)
+            original_tokens = estimate_tokens(prompt)
+            compressed_tokens = estimate_tokens(compressed)
+            with self._lock:
+                self._compressed[cache_key] = (compressed, original_tokens, compressed_tokens)
+                if len(self._compressed) > self.MAX_COMPRESSED_CACHE:
+                    self._compressed.popitem(last=False)
+        
+        tokens_saved = original_tokens - compressed_tokens
         
+        stats = CompressionStats(
+            original_tokens=original_tokens,
+            compressed_tokens=compressed_tokens,
+            tokens_saved=tokens_saved,
+            compression_ratio=compressed_tokens / original_tokens if original_tokens > 0 else 1.0,
+            method=f"system_prompt_{level}",
+        )
+        
+        self._record_savings(stats)
+        
+        return OptimizationResult(text=compressed, stats=stats)
+    
+    @staticmethod
+    def _compress_text(prompt: str, level: str) -> str:
+        """Apply the regex passes for a compression level."""
         compressed = prompt
         
         if level in ("moderate", "aggressive"):
@@ -136,21 +172,7 @@ class PromptOptimizer:
                 compressed
             )
         
-        compressed = compressed.strip()
-        compressed_tokens = estimate_tokens(compressed)
-        tokens_saved = original_tokens - compressed_tokens
-        
-        stats = CompressionStats(
-            original_tokens=original_tokens,
-            compressed_tokens=compressed_tokens,
-            tokens_saved=tokens_saved,
-            compression_ratio=compressed_tokens / original_tokens if original_tokens > 0 else 1.0,
-            method=f"system_prompt_{level}",
-        )
-        
-        self._record_savings(stats)
-        
-        return OptimizationResult(text=compressed, stats=stats)
+        return compressed.strip()
     
     def summarize_history(
         self,
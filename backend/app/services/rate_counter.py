@@ -0,0 +1,178 @@
+"""
+Sliding-window request counters.
+
+Per-minute quota checks used to keep a list of request timestamps per model
+(or account/model, or client) and rebuild it with a list comprehension on every
+check, so cost and memory grew with traffic. ``RateCounter`` keeps a fixed ring
+of time buckets per key instead: recording and counting are O(1) amortized and
+memory per key is constant, however busy the key is.
+
+Counts are conservative: a request stays counted until its whole bucket has
+left the window, so a count may include requests up to one bucket older than
+the window but never misses one inside it. With the default 12 buckets per
+minute that is at most 5 extra seconds, which errs toward staying under
+Google's per-minute quotas.
+
+``sliding_window_estimate`` is the two-counter variant used where counts live
+in the shared state backend (one fixed-window counter per key and window).
+"""
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_BUCKETS = 12
+
+
+class SlidingWindowCounter:
+    """Events within the last ``window_seconds``, kept in a ring of time buckets."""
+
+    __slots__ = ("width", "counts", "total", "head")
+
+    def __init__(self, window_seconds: float = 60.0, buckets: int = DEFAULT_BUCKETS):
+        self.width = window_seconds / max(1, buckets)
+        # One extra bucket so the ring always spans the full window
+        self.counts: List[int] = [0] * (max(1, buckets) + 1)
+        self.total = 0
+        self.head = 0  # Absolute index of the newest bucket
+
+    def _advance(self, slot: int):
+        if slot <= self.head:
+            return
+        size = len(self.counts)
+        if slot - self.head >= size:
+            self.counts = [0] * size
+            self.total = 0
+        else:
+            for index in range(self.head + 1, slot + 1):
+                position = index % size
+                self.total -= self.counts[position]
+                self.counts[position] = 0
+        self.head = slot
+
+    def add(self, now: float, amount: int = 1) -> int:
+        """Record ``amount`` events at ``now``; past events still inside the window are allowed."""
+        slot = int(now // self.width)
+        self._advance(slot)
+        if self.head - slot < len(self.counts):
+            self.counts[slot % len(self.counts)] += amount
+            self.total += amount
+        return self.total
+
+    def count(self, now: float) -> int:
+        self._advance(int(now // self.width))
+        return self.total
+
+    def retry_after(self, limit: int, now: float) -> float:
+        """Seconds until the count drops below ``limit`` (0 if it already is)."""
+        total = self.count(now)
+        if not limit or total < limit:
+            return 0.0
+        size = len(self.counts)
+        oldest = self.head - size + 1
+        for offset in range(size):
+            total -= self.counts[(oldest + offset) % size]
+            if total < limit:
+                # That bucket leaves the ring once the head moves ``offset + 1`` buckets on
+                return max(0.0, (self.head + offset + 1) * self.width - now)
+        return self.width * size
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"width": self.width, "head": self.head, "counts": list(self.counts)}
+
+    def restore(self, state: Dict[str, Any]):
+        """Load a ``to_state`` payload taken with the same window and bucket count."""
+        counts = [int(value) for value in state.get("counts", [])]
+        if len(counts) == len(self.counts) and float(state.get("width", 0)) == self.width:
+            self.counts = counts
+            self.total = sum(counts)
+            self.head = int(state.get("head", 0))
+
+
+class RateCounter:
+    """Keyed sliding-window counters (per model, per account/model, per client)."""
+
+    def __init__(
+        self,
+        window_seconds: float = 60.0,
+        buckets: int = DEFAULT_BUCKETS,
+        clock=time.time,
+    ):
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self._clock = clock
+        self._counters: Dict[str, SlidingWindowCounter] = {}
+        self._lock = threading.Lock()
+
+    def _counter(self, key: str) -> SlidingWindowCounter:
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = SlidingWindowCounter(self.window_seconds, self.buckets)
+        return counter
+
+    def add(self, key: str, amount: int = 1, now: Optional[float] = None) -> int:
+        """Record events for ``key`` and return its count for the window."""
+        with self._lock:
+            return self._counter(key).add(self._clock() if now is None else now, amount)
+
+    def count(self, key: str, now: Optional[float] = None) -> int:
+        with self._lock:
+            counter = self._counters.get(key)
+            return counter.count(self._clock() if now is None else now) if counter else 0
+
+    def try_acquire(self, key: str, limit: int, amount: int = 1, now: Optional[float] = None) -> bool:
+        """Record ``amount`` events only if that keeps ``key`` within ``limit`` (0 = unlimited)."""
+        with self._lock:
+            now = self._clock() if now is None else now
+            counter = self._counter(key)
+            if limit and counter.count(now) + amount > limit:
+                return False
+            counter.add(now, amount)
+            return True
+
+    def retry_after(self, key: str, limit: int, now: Optional[float] = None) -> float:
+        with self._lock:
+            counter = self._counters.get(key)
+            return counter.retry_after(limit, self._clock() if now is None else now) if counter else 0.0
+
+    def reset(self, key: Optional[str] = None):
+        with self._lock:
+            if key is None:
+                self._counters.clear()
+            else:
+                self._counters.pop(key, None)
+
+    def purge_idle(self, now: Optional[float] = None) -> int:
+        """Drop keys with nothing left in the window; returns how many were dropped."""
+        with self._lock:
+            now = self._clock() if now is None else now
+            idle = [key for key, counter in self._counters.items() if not counter.count(now)]
+            for key in idle:
+                del self._counters[key]
+            return len(idle)
+
+    def to_state(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            counter = self._counters.get(key)
+            return counter.to_state() if counter else None
+
+    def restore(self, key: str, state: Dict[str, Any]):
+        with self._lock:
+            self._counter(key).restore(state)
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._counters))
+
+
+def sliding_window_estimate(previous: int, current: int, window_seconds: float, now: float) -> float:
+    """
+    Approximate a sliding-window count from two fixed-window counters.
+
+    ``previous`` and ``current`` are the counts of the fixed windows before and
+    containing ``now``; the previous window is weighted by how much of it still
+    overlaps the sliding window ending at ``now``.
+    """
+    elapsed = (now % window_seconds) / window_seconds
+    return previous * (1.0 - elapsed) + current
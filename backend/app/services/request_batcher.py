@@ -9,6 +9,7 @@ from typing import Dict, List, Optional, Any, Callable, Awaitable, TypeVar, Gene
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from collections import defaultdict
+from app.services.executors import llm_io
 
 logger = logging.getLogger(__name__)
 
@@ -371,7 +372,6 @@ async def embedding_batch_processor(items: List[Dict]) -> List[Any]:
     try:
         # Gemini embedding API supports batch requests
         from google import genai
-        import asyncio
         
         # Group by task_type for efficiency (API requires same task_type per batch)
         task_groups: Dict[str, List[tuple]] = defaultdict(list)
@@ -385,7 +385,7 @@ async def embedding_batch_processor(items: List[Dict]) -> List[Any]:
             
             try:
                 # Use batch embedding
-                response = await asyncio.to_thread(
+                response = await llm_io.run(
                     embedding_service.client.models.embed_content,
                     model=embedding_service.MODEL,
                     contents=batch_texts,
@@ -441,7 +441,6 @@ async def classification_batch_processor(items: List[Dict]) -> List[Any]:
     from app.config import settings
     from app.services.api_key_manager import get_genai_client
     from app.services.model_selector import model_selector, call_with_retry
-    import asyncio
     import json
     
     if not settings.google_api_key:
@@ -473,7 +472,7 @@ Items to classify:
     
     try:
         response = await call_with_retry(
-            asyncio.to_thread,
+            llm_io.run,
             client.models.generate_content,
             model=model,
             contents=batch_prompt,
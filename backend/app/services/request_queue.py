@@ -2,18 +2,27 @@
 Request queuing service for handling rate-limited requests.
 Buffers requests when rate limits are hit and processes them when quota refreshes.
 Supports priority levels for processing critical requests (e.g., police emergencies) first.
+
+Each model has its own heap. Cancelled, expired and re-prioritized requests are
+not removed from the heap; their stale entries are skipped when popped (lazy
+deletion). The processor sleeps until a request arrives or until the per-minute
+rate counters say a slot frees up, instead of polling on a fixed interval.
 """
 import logging
 import asyncio
+import itertools
+import time
 import uuid
 import heapq
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Optional, Callable, Any, Tuple, List
 from dataclasses import dataclass, field
-from collections import deque
+from collections import defaultdict
 from enum import Enum, IntEnum
 import threading
 
+from app.services.rate_counter import RateCounter
+
 logger = logging.getLogger(__name__)
 
 
@@ -53,8 +62,11 @@ class QueuedRequest:
     error: Optional[str] = field(default=None, compare=False)
     completed_at: Optional[datetime] = field(default=None, compare=False)
     session_id: Optional[str] = field(default=None, compare=False)  # Associated session for priority lookup
+    model: str = field(default="", compare=False)  # Quota the request waits on
     # Callable to execute when processing (stored separately, not serialized)
     _callback: Optional[Callable] = field(default=None, repr=False, compare=False)
+    # Sequence number of the request's live heap entry; older entries are stale
+    _entry_seq: int = field(default=0, repr=False, compare=False)
     
     def __post_init__(self):
         # Initialize sort key for heap ordering (lower priority value + earlier time = first)
@@ -89,6 +101,7 @@ class QueuedRequest:
             "status": self.status.value,
             "error": self.error,
             "session_id": self.session_id,
+            "model": self.model,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
         }
 
@@ -99,16 +112,16 @@ class RequestQueue:
     
     Features:
     - Queue requests when rate limits are hit
-    - Priority-based processing (critical > high > normal > low)
-    - Background task processes queued requests when quota refreshes
+    - Priority-based processing (critical > high > normal > low), per model
+    - Background task wakes when a request arrives or quota frees up
     - Max queue size to prevent memory issues
     - TTL for queued requests to prevent stale requests
-    - Status endpoint for checking pending requests
+    - Status endpoint with queue position and ETA for pending requests
     """
     
     DEFAULT_MAX_QUEUE_SIZE = 100
     DEFAULT_TTL_SECONDS = 300  # 5 minutes
-    DEFAULT_PROCESS_INTERVAL = 5  # seconds
+    DEFAULT_PROCESS_INTERVAL = 5  # seconds; longest the processor sleeps without an event
     
     def __init__(
         self,
@@ -117,13 +130,21 @@ class RequestQueue:
         process_interval: float = DEFAULT_PROCESS_INTERVAL,
     ):
         self._lock = threading.Lock()
-        self._priority_queue: List[QueuedRequest] = []  # Heap-based priority queue
+        # model -> heap of (priority, created_ts, seq, request)
+        self._queues: Dict[str, List[Tuple[int, float, int, QueuedRequest]]] = defaultdict(list)
         self._requests_by_id: Dict[str, QueuedRequest] = {}
+        self._pending_count = 0
+        self._seq = itertools.count(1)
         self._max_queue_size = max_queue_size
         self._default_ttl_seconds = default_ttl_seconds
         self._process_interval = process_interval
         self._processing_task: Optional[asyncio.Task] = None
         self._is_running = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # Requests released without a callback are expected to retry right away;
+        # hold their slot for a minute so one free slot does not release the whole queue.
+        self._released = RateCounter(window_seconds=60)
         
         # Statistics
         self._stats = {
@@ -133,6 +154,9 @@ class RequestQueue:
             "total_failed": 0,
             "total_rejected": 0,  # Rejected due to full queue
             "by_priority": {p.name.lower(): 0 for p in RequestPriority},
+            "wakeups": 0,
+            "stale_entries_skipped": 0,
+            "total_wait_seconds": 0.0,
         }
     
     async def start(self):
@@ -141,6 +165,8 @@ class RequestQueue:
             return
         
         self._is_running = True
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
         self._processing_task = asyncio.create_task(self._process_queue_loop())
         logger.info("Request queue processor started")
     
@@ -155,6 +181,63 @@ class RequestQueue:
                 pass
         logger.info("Request queue processor stopped")
     
+    def _notify(self):
+        """Wake the processor (safe from any thread)."""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            pass
+    
+    def _push(self, request: QueuedRequest):
+        """Add a live heap entry for ``request``, superseding any older one."""
+        request._entry_seq = next(self._seq)
+        heapq.heappush(
+            self._queues[request.model],
+            (int(request.priority), request.created_at.timestamp(), request._entry_seq, request),
+        )
+    
+    def _is_live(self, entry: Tuple[int, float, int, QueuedRequest]) -> bool:
+        request = entry[3]
+        return entry[2] == request._entry_seq and request.status == QueuedRequestStatus.PENDING
+    
+    def _expire(self, request: QueuedRequest):
+        request.status = QueuedRequestStatus.EXPIRED
+        request.completed_at = datetime.now(timezone.utc)
+        self._pending_count -= 1
+        self._stats["total_expired"] += 1
+    
+    def _live_entries(self, model: str) -> List[Tuple[int, float, int, QueuedRequest]]:
+        """Pending entries for ``model`` in processing order, expiring any that timed out."""
+        entries = []
+        for entry in sorted(self._queues.get(model, [])):
+            if not self._is_live(entry):
+                continue
+            if entry[3].is_expired:
+                self._expire(entry[3])
+                continue
+            entries.append(entry)
+        return entries
+    
+    def _pop_next(self, model: str) -> Optional[QueuedRequest]:
+        """Pop the highest-priority live request for ``model`` (caller holds the lock)."""
+        heap = self._queues.get(model)
+        while heap:
+            entry = heapq.heappop(heap)
+            if not self._is_live(entry):
+                self._stats["stale_entries_skipped"] += 1
+                continue
+            request = entry[3]
+            if request.is_expired:
+                self._expire(request)
+                continue
+            return request
+        if heap is not None:
+            del self._queues[model]
+        return None
+    
     def queue_request(
         self,
         endpoint: str,
@@ -164,6 +247,7 @@ class RequestQueue:
         ttl_seconds: Optional[int] = None,
         priority: RequestPriority = RequestPriority.NORMAL,
         session_id: Optional[str] = None,
+        model: Optional[str] = None,
     ) -> Tuple[bool, Optional[QueuedRequest]]:
         """
         Queue a request for later processing.
@@ -176,13 +260,18 @@ class RequestQueue:
             ttl_seconds: Time-to-live for this request
             priority: Request priority (critical, high, normal, low)
             session_id: Associated session ID for priority lookup
+            model: Model whose quota the request waits on (defaults to GEMINI_MODEL)
             
         Returns:
             Tuple of (success, queued_request or None if rejected)
         """
+        if not model:
+            from app.config import settings
+            model = settings.gemini_model
+        
         with self._lock:
             # Check queue size limit
-            if len(self._priority_queue) >= self._max_queue_size:
+            if self._pending_count >= self._max_queue_size:
                 self._stats["total_rejected"] += 1
                 logger.warning(
                     f"Request queue full ({self._max_queue_size}), rejecting request to {endpoint}"
@@ -199,26 +288,31 @@ class RequestQueue:
                 ttl_seconds=ttl_seconds or self._default_ttl_seconds,
                 priority=priority,
                 session_id=session_id,
+                model=model,
                 _callback=callback,
             )
             
-            # Add to priority queue (heap)
-            heapq.heappush(self._priority_queue, request)
+            self._push(request)
             self._requests_by_id[request.id] = request
+            self._pending_count += 1
             self._stats["total_queued"] += 1
             self._stats["by_priority"][priority.name.lower()] += 1
             
             logger.info(
                 f"Queued request {request.id}: {method} {endpoint} "
-                f"(priority: {priority.name}, queue size: {len(self._priority_queue)})"
+                f"(priority: {priority.name}, model: {model}, queue size: {self._pending_count})"
             )
-            
-            return True, request
+        
+        self._notify()
+        return True, request
     
     def get_request_status(self, request_id: str) -> Optional[QueuedRequest]:
         """Get the status of a queued request."""
         with self._lock:
-            return self._requests_by_id.get(request_id)
+            request = self._requests_by_id.get(request_id)
+            if request and request.status == QueuedRequestStatus.PENDING and request.is_expired:
+                self._expire(request)
+            return request
     
     def cancel_request(self, request_id: str) -> bool:
         """Cancel a pending queued request."""
@@ -228,13 +322,10 @@ class RequestQueue:
                 return False
             
             if request.status == QueuedRequestStatus.PENDING:
+                # Its heap entry is skipped when popped
                 request.status = QueuedRequestStatus.CANCELLED
-                # Remove from priority queue
-                try:
-                    self._priority_queue.remove(request)
-                    heapq.heapify(self._priority_queue)
-                except ValueError:
-                    pass
+                request.completed_at = datetime.now(timezone.utc)
+                self._pending_count -= 1
                 logger.info(f"Cancelled queued request {request_id}")
                 return True
             
@@ -261,44 +352,111 @@ class RequestQueue:
             
             old_priority = request.priority
             request.update_priority(priority)
-            
-            # Re-heapify to maintain heap property
-            heapq.heapify(self._priority_queue)
+            # Push a fresh entry; the old one is now stale
+            self._push(request)
             
             logger.info(
                 f"Updated priority for request {request_id}: "
                 f"{old_priority.name} -> {priority.name}"
             )
-            return True
+        
+        self._notify()
+        return True
+    
+    def _slot_wait(self, model: str) -> Tuple[float, int, int]:
+        """
+        Return (seconds until a request for ``model`` may run, RPM limit, free slots now).
+        
+        Released requests count against the minute window alongside recorded usage.
+        """
+        from app.services.usage_tracker import usage_tracker
+        
+        usage = usage_tracker.get_usage(model)
+        minute = usage["requests"]["minute"]
+        day = usage["requests"]["day"]
+        rpm_limit = int(minute["limit"] or 0)
+        if day["limit"] and day["used"] >= day["limit"]:
+            return max(0.0, usage["next_reset_timestamp"] - time.time()), rpm_limit, 0
+        allowed, _ = usage_tracker.check_rate_limit(model)
+        if not allowed and not (rpm_limit and minute["used"] >= rpm_limit):
+            # Token budget exhausted; nothing frees it before the daily reset
+            return max(0.0, usage["next_reset_timestamp"] - time.time()), rpm_limit, 0
+        if not rpm_limit:
+            return 0.0, 0, self._max_queue_size
+        
+        released = self._released.count(model)
+        free = rpm_limit - minute["used"] - released
+        if free > 0:
+            return 0.0, rpm_limit, free
+        # The combined count only drops when one of the two windows loses a bucket
+        waits = [
+            wait for wait in (
+                usage_tracker.minute_retry_after(model, minute["used"]) if minute["used"] else 0.0,
+                self._released.retry_after(model, released) if released else 0.0,
+            ) if wait > 0
+        ]
+        return (min(waits) if waits else 1.0), rpm_limit, 0
+    
+    def get_request_eta(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Queue position and estimated seconds until a pending request is processed."""
+        with self._lock:
+            request = self._requests_by_id.get(request_id)
+            if not request or request.status != QueuedRequestStatus.PENDING:
+                return None
+            entries = self._live_entries(request.model)
+            position = next(
+                (index for index, entry in enumerate(entries) if entry[3] is request), None
+            )
+        if position is None:
+            return None
+        
+        wait, rpm_limit, free = self._slot_wait(request.model)
+        if position < free:
+            eta = 0.0
+        elif rpm_limit:
+            # One slot after ``wait``, then the model's steady per-minute rate
+            eta = wait + max(0, position - free) * 60.0 / rpm_limit
+        else:
+            eta = wait
+        eta = min(eta, max(0.0, (request.expires_at - datetime.now(timezone.utc)).total_seconds()))
+        return {
+            "position": position + 1,
+            "ahead": position,
+            "eta_seconds": round(eta, 1),
+            "estimated_start": (datetime.now(timezone.utc) + timedelta(seconds=eta)).isoformat(),
+        }
     
     def get_queue_status(self) -> Dict:
         """Get overall queue status and statistics."""
         with self._lock:
-            pending_count = sum(
-                1 for r in self._priority_queue 
-                if r.status == QueuedRequestStatus.PENDING and not r.is_expired
-            )
-            
             # Group pending by endpoint
             pending_by_endpoint: Dict[str, int] = {}
             pending_by_priority: Dict[str, int] = {p.name.lower(): 0 for p in RequestPriority}
+            pending_by_model: Dict[str, int] = {}
             
-            for request in self._priority_queue:
-                if request.status == QueuedRequestStatus.PENDING and not request.is_expired:
+            for model in list(self._queues):
+                for entry in self._live_entries(model):
+                    request = entry[3]
                     key = f"{request.method} {request.endpoint}"
                     pending_by_endpoint[key] = pending_by_endpoint.get(key, 0) + 1
                     pending_by_priority[request.priority.name.lower()] += 1
+                    pending_by_model[model] = pending_by_model.get(model, 0) + 1
+            
+            stats = dict(self._stats)
+            completed = stats["total_processed"] + stats["total_failed"]
+            stats["avg_wait_seconds"] = round(stats.pop("total_wait_seconds") / completed, 2) if completed else 0.0
             
             return {
                 "is_running": self._is_running,
-                "queue_size": len(self._priority_queue),
-                "pending_count": pending_count,
+                "queue_size": sum(len(heap) for heap in self._queues.values()),
+                "pending_count": self._pending_count,
                 "max_queue_size": self._max_queue_size,
                 "default_ttl_seconds": self._default_ttl_seconds,
                 "process_interval_seconds": self._process_interval,
                 "pending_by_endpoint": pending_by_endpoint,
                 "pending_by_priority": pending_by_priority,
-                "statistics": dict(self._stats),
+                "pending_by_model": pending_by_model,
+                "statistics": stats,
             }
     
     def get_pending_requests(
@@ -309,15 +467,13 @@ class RequestQueue:
     ) -> list[Dict]:
         """Get list of pending requests, sorted by priority."""
         with self._lock:
+            entries = sorted(
+                (entry for model in list(self._queues) for entry in self._live_entries(model)),
+                key=lambda entry: entry[:3],
+            )
             results = []
-            # Sort by priority for display (heap maintains partial order)
-            sorted_requests = sorted(self._priority_queue)
-            
-            for request in sorted_requests:
-                if request.status != QueuedRequestStatus.PENDING:
-                    continue
-                if request.is_expired:
-                    continue
+            for entry in entries:
+                request = entry[3]
                 if client_ip and request.client_ip != client_ip:
                     continue
                 if priority is not None and request.priority != priority:
@@ -330,118 +486,80 @@ class RequestQueue:
             return results
     
     async def _process_queue_loop(self):
-        """Background loop that processes queued requests."""
-        from app.services.usage_tracker import usage_tracker
-        from app.config import settings
-        
+        """Background loop that processes queued requests as quota allows."""
         logger.info("Queue processing loop started")
         
         while self._is_running:
             try:
-                await asyncio.sleep(self._process_interval)
-                await self._process_pending_requests(usage_tracker, settings)
+                timeout = await self._process_pending_requests()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._stats["wakeups"] += 1
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Error in queue processing loop: {e}")
+                await asyncio.sleep(self._process_interval)
     
-    async def _process_pending_requests(self, usage_tracker, settings):
-        """Process pending requests by priority if rate limit allows."""
-        # Get current model for rate limit check
-        current_model = settings.gemini_model
-        
-        # Check if we have quota available
-        allowed, reason = usage_tracker.check_rate_limit(current_model)
-        
-        if not allowed:
-            logger.debug(f"Rate limit still exceeded, skipping queue processing: {reason}")
-            return
-        
-        # Process requests while we have quota (in priority order)
-        processed_count = 0
-        max_batch = 5  # Process up to 5 requests per cycle
+    async def _process_pending_requests(self) -> float:
+        """
+        Run every request whose model has quota, in priority order.
         
+        Returns how long to sleep before quota can next free up (capped at
+        ``process_interval``); a new request or priority change wakes earlier.
+        """
+        next_wake = float(self._process_interval)
         with self._lock:
-            requests_to_process = []
-            expired_requests = []
-            
-            # Process in priority order using heap
-            # Create a copy since we'll modify the heap
-            temp_heap = self._priority_queue.copy()
-            
-            while temp_heap and len(requests_to_process) < max_batch:
-                request = heapq.heappop(temp_heap)
-                
-                if request.status != QueuedRequestStatus.PENDING:
-                    continue
-                
-                if request.is_expired:
-                    request.status = QueuedRequestStatus.EXPIRED
-                    expired_requests.append(request)
-                    self._stats["total_expired"] += 1
-                    continue
-                
-                request.status = QueuedRequestStatus.PROCESSING
-                requests_to_process.append(request)
-            
-            # Remove expired requests from the priority queue
-            for request in expired_requests:
-                try:
-                    self._priority_queue.remove(request)
-                except ValueError:
-                    pass
-            if expired_requests:
-                heapq.heapify(self._priority_queue)
+            models = [model for model, heap in self._queues.items() if heap]
         
-        # Process requests outside the lock
-        for request in requests_to_process:
-            try:
-                # Re-check rate limit before each request
-                allowed, _ = usage_tracker.check_rate_limit(current_model)
-                if not allowed:
-                    # Put back to pending
-                    with self._lock:
-                        request.status = QueuedRequestStatus.PENDING
+        processed_count = 0
+        for model in models:
+            while True:
+                wait, _, free = self._slot_wait(model)
+                if free <= 0:
+                    next_wake = min(next_wake, max(wait, 0.05))
                     break
-                
-                if request._callback:
-                    result = await request._callback()
-                    request.result = result
-                
-                request.status = QueuedRequestStatus.COMPLETED
-                request.completed_at = datetime.now(timezone.utc)
-                processed_count += 1
-                
-                with self._lock:
-                    self._stats["total_processed"] += 1
-                    # Remove from priority queue
-                    try:
-                        self._priority_queue.remove(request)
-                        heapq.heapify(self._priority_queue)
-                    except ValueError:
-                        pass
-                
-                logger.info(
-                    f"Processed queued request {request.id}: {request.method} {request.endpoint} "
-                    f"(priority: {request.priority.name})"
-                )
-                
-            except Exception as e:
-                logger.error(f"Error processing queued request {request.id}: {e}")
-                request.status = QueuedRequestStatus.FAILED
-                request.error = str(e)
-                request.completed_at = datetime.now(timezone.utc)
-                
                 with self._lock:
-                    self._stats["total_failed"] += 1
-                    try:
-                        self._priority_queue.remove(request)
-                        heapq.heapify(self._priority_queue)
-                    except ValueError:
-                        pass
+                    request = self._pop_next(model)
+                    if request is None:
+                        break
+                    request.status = QueuedRequestStatus.PROCESSING
+                    self._pending_count -= 1
+                    if not request._callback:
+                        self._released.add(model)
+                await self._run_request(request)
+                processed_count += 1
         
         if processed_count > 0:
             logger.info(f"Processed {processed_count} queued requests")
+        return next_wake
+    
+    async def _run_request(self, request: QueuedRequest):
+        try:
+            if request._callback:
+                request.result = await request._callback()
+            
+            request.status = QueuedRequestStatus.COMPLETED
+            request.completed_at = datetime.now(timezone.utc)
+            with self._lock:
+                self._stats["total_processed"] += 1
+                self._stats["total_wait_seconds"] += (request.completed_at - request.created_at).total_seconds()
+            
+            logger.info(
+                f"Processed queued request {request.id}: {request.method} {request.endpoint} "
+                f"(priority: {request.priority.name})"
+            )
+        except Exception as e:
+            logger.error(f"Error processing queued request {request.id}: {e}")
+            request.status = QueuedRequestStatus.FAILED
+            request.error = str(e)
+            request.completed_at = datetime.now(timezone.utc)
+            with self._lock:
+                self._stats["total_failed"] += 1
+                self._stats["total_wait_seconds"] += (request.completed_at - request.created_at).total_seconds()
     
     def cleanup_completed(self, max_age_seconds: int = 3600):
         """Clean up completed/failed/expired requests older than max_age."""
@@ -463,6 +581,15 @@ class RequestQueue:
             for request_id in to_remove:
                 del self._requests_by_id[request_id]
             
+            # Drop stale heap entries left behind by cancels and priority changes
+            for model in list(self._queues):
+                heap = [entry for entry in self._queues[model] if self._is_live(entry)]
+                if heap:
+                    heapq.heapify(heap)
+                    self._queues[model] = heap
+                else:
+                    del self._queues[model]
+            
             if to_remove:
                 logger.debug(f"Cleaned up {len(to_remove)} old queued requests")
 
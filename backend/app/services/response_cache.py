@@ -11,6 +11,8 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Any, Tuple
 from dataclasses import dataclass, field
 
+from app.config import settings
+
 logger = logging.getLogger(__name__)
 
 
@@ -59,24 +61,38 @@ class ResponseCache:
     """
     Embedding-based response cache for AI calls.
     Uses cosine similarity to find cached responses for semantically similar queries.
+    Only the hottest entries are held in memory; exact-match misses fall through
+    to the SQLite `response_cache` table, which is also shared by all workers.
+    New entries and hit counts are written to SQLite in batches.
     """
     
     DEFAULT_SIMILARITY_THRESHOLD = 0.95
     DEFAULT_TTL_SECONDS = 3600  # 1 hour
     MAX_CACHE_SIZE = 1000
+    WRITE_BATCH_SIZE = 50  # Flush immediately once this many writes are pending
     
     def __init__(
         self,
         similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
         default_ttl: int = DEFAULT_TTL_SECONDS,
+        flush_interval: Optional[float] = None,
     ):
         self.similarity_threshold = similarity_threshold
         self.default_ttl = default_ttl
+        self.flush_interval = (
+            settings.response_cache_flush_interval_seconds if flush_interval is None else flush_interval
+        )
         self._cache: Dict[str, CachedResponse] = {}
         self._lock = asyncio.Lock()
         self._hits = 0
         self._misses = 0
+        self._db_hits = 0
         self._embedding_service = None
+        # Write-behind buffers flushed to SQLite in one transaction
+        self._pending_writes: Dict[str, CachedResponse] = {}
+        self._pending_hits: Dict[str, int] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flushed_rows = 0
         logger.info(f"ResponseCache initialized (threshold={similarity_threshold}, ttl={default_ttl}s)")
     
     def _get_embedding_service(self):
@@ -86,11 +102,25 @@ class ResponseCache:
             self._embedding_service = embedding_service
         return self._embedding_service
     
+    @staticmethod
+    def _get_db():
+        """Return the open aiosqlite connection, or None before startup."""
+        from app.services.database import get_database
+        db_svc = get_database()
+        return db_svc._db if db_svc else None
+    
     @staticmethod
     def _compute_hash(text: str) -> str:
         """Compute hash for exact match lookup."""
         return hashlib.sha256(text.encode()).hexdigest()[:16]
     
+    def _record_hit(self, key: str, entry: CachedResponse):
+        """Count a hit in memory and queue the increment for SQLite."""
+        entry.hit_count += 1
+        if key not in self._pending_writes:
+            self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+        self._schedule_flush()
+    
     async def get(
         self,
         query: str,
@@ -116,14 +146,25 @@ class ResponseCache:
             if query_hash in self._cache:
                 entry = self._cache[query_hash]
                 if not entry.is_expired():
-                    entry.hit_count += 1
+                    self._record_hit(query_hash, entry)
                     self._hits += 1
                     logger.debug(f"Exact cache hit for query hash {query_hash}")
                     return entry.response, 1.0
                 else:
                     del self._cache[query_hash]
         
-        # Slow path: semantic similarity search
+        # Persistent tier: exact match evicted from memory or cached by another worker
+        persisted = await self._load_persisted(query_hash)
+        if persisted is not None:
+            async with self._lock:
+                self._insert(query_hash, persisted)
+                self._record_hit(query_hash, persisted)
+            self._hits += 1
+            self._db_hits += 1
+            logger.debug(f"Persistent cache hit for query hash {query_hash}")
+            return persisted.response, 1.0
+        
+        # Slow path: semantic similarity search over the in-memory working set
         embedding_svc = self._get_embedding_service()
         query_embedding, _ = await embedding_svc.embed_text(query, task_type="SEMANTIC_SIMILARITY")
         
@@ -132,6 +173,7 @@ class ResponseCache:
             return None
         
         best_match: Optional[CachedResponse] = None
+        best_key = ""
         best_score = threshold
         
         async with self._lock:
@@ -150,10 +192,11 @@ class ResponseCache:
                 if score > best_score:
                     best_score = score
                     best_match = entry
+                    best_key = key
         
         if best_match:
             async with self._lock:
-                best_match.hit_count += 1
+                self._record_hit(best_key, best_match)
             self._hits += 1
             logger.info(f"Semantic cache hit (similarity={best_score:.4f})")
             return best_match.response, best_score
@@ -202,20 +245,25 @@ class ResponseCache:
         )
         
         async with self._lock:
-            # Evict if at capacity
-            if len(self._cache) >= self.MAX_CACHE_SIZE:
-                await self._evict_oldest()
-            
-            self._cache[query_hash] = entry
-        
-        # Persist in background
-        asyncio.create_task(self._persist_entry(query_hash, entry))
+            self._insert(query_hash, entry)
+            self._pending_writes[query_hash] = entry
+            self._pending_hits.pop(query_hash, None)
+            self._schedule_flush()
         
         logger.debug(f"Cached response for query hash {query_hash}")
         return True
     
-    async def _evict_oldest(self):
-        """Evict oldest/least-used entries when cache is full."""
+    def _insert(self, key: str, entry: CachedResponse):
+        """Add an entry to the in-memory working set, evicting if at capacity."""
+        if key not in self._cache and len(self._cache) >= self.MAX_CACHE_SIZE:
+            self._evict_oldest()
+        self._cache[key] = entry
+    
+    def _evict_oldest(self):
+        """Evict oldest/least-used entries when cache is full.
+        
+        Evicted entries stay in SQLite and are reloaded on their next exact hit.
+        """
         if not self._cache:
             return
         
@@ -236,52 +284,143 @@ class ResponseCache:
         
         logger.info(f"Evicted {remove_count} cache entries")
     
-    async def _persist_entry(self, key: str, entry: CachedResponse):
-        """Persist cache entry to SQLite for survival across restarts."""
+    async def _load_persisted(self, key: str) -> Optional[CachedResponse]:
+        """Resolve an exact-match miss from a pending write or the SQLite table."""
+        pending = self._pending_writes.get(key)
+        if pending is not None:
+            return None if pending.is_expired() else pending
         try:
-            from app.services.database import get_database
-            db_svc = get_database()
-            if db_svc and db_svc._db:
-                await db_svc._db.execute("""
-                    CREATE TABLE IF NOT EXISTS response_cache (
-                        key TEXT PRIMARY KEY,
-                        data TEXT NOT NULL,
-                        created_at TEXT
-                    )
-                """)
-                await db_svc._db.execute(
-                    "INSERT OR REPLACE INTO response_cache (key, data, created_at) VALUES (?, ?, ?)",
-                    (key, json.dumps(entry.to_dict()), datetime.utcnow().isoformat())
+            db = self._get_db()
+            if db is None:
+                return None
+            async with db.execute(
+                "SELECT data FROM response_cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, datetime.utcnow().isoformat()),
+            ) as cursor:
+                row = await cursor.fetchone()
+            if not row:
+                return None
+            entry = CachedResponse.from_dict(json.loads(row[0]))
+            return None if entry.is_expired() else entry
+        except Exception as e:
+            logger.debug(f"Persistent cache lookup failed: {e}")
+            return None
+    
+    def _schedule_flush(self):
+        """Start a delayed flush unless one is already pending."""
+        pending = len(self._pending_writes) + len(self._pending_hits)
+        if not pending or (self._flush_task and not self._flush_task.done()):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        delay = 0 if pending >= self.WRITE_BATCH_SIZE else self.flush_interval
+        self._flush_task = loop.create_task(self._flush_after(delay))
+    
+    async def _flush_after(self, delay: float):
+        await asyncio.sleep(delay)
+        await self.flush()
+    
+    async def flush(self) -> int:
+        """Write pending entries and hit counts to SQLite in a single transaction.
+        
+        Returns:
+            Number of rows written or updated
+        """
+        async with self._lock:
+            writes = self._pending_writes
+            hits = self._pending_hits
+            self._pending_writes = {}
+            self._pending_hits = {}
+        if not writes and not hits:
+            return 0
+        
+        db = self._get_db()
+        if db is None:
+            await self._requeue(writes, hits)
+            return 0
+        try:
+            if writes:
+                await db.executemany(
+                    """INSERT OR REPLACE INTO response_cache
+                       (key, data, created_at, context_key, expires_at, hit_count)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    [
+                        (
+                            key,
+                            json.dumps(entry.to_dict()),
+                            entry.created_at.isoformat(),
+                            entry.metadata.get("context_key", ""),
+                            (entry.created_at + timedelta(seconds=entry.ttl_seconds)).isoformat(),
+                            entry.hit_count,
+                        )
+                        for key, entry in writes.items()
+                    ],
+                )
+            if hits:
+                await db.executemany(
+                    "UPDATE response_cache SET hit_count = hit_count + ? WHERE key = ?",
+                    [(count, key) for key, count in hits.items()],
                 )
-                await db_svc._db.commit()
+            await db.commit()
         except Exception as e:
-            logger.debug(f"Failed to persist cache entry: {e}")
+            logger.warning(f"Failed to flush response cache, keeping {len(writes) + len(hits)} rows for retry: {e}")
+            try:
+                await db.rollback()
+            except Exception:
+                pass
+            await self._requeue(writes, hits)
+            return 0
+        
+        written = len(writes) + len(hits)
+        self._flushed_rows += written
+        logger.debug(f"Flushed {written} response cache rows to SQLite")
+        return written
     
-    async def load_from_db(self):
-        """Load cached responses from SQLite on startup."""
+    async def _requeue(self, writes: Dict[str, CachedResponse], hits: Dict[str, int]):
+        """Put an unwritten batch back; anything buffered since then is newer and wins."""
+        async with self._lock:
+            self._pending_writes = {**writes, **self._pending_writes}
+            for key in writes:
+                self._pending_hits.pop(key, None)  # The entry carries its own hit_count
+            for key, count in hits.items():
+                if key not in self._pending_writes:
+                    self._pending_hits[key] = self._pending_hits.get(key, 0) + count
+
+    async def load_from_db(self, limit: Optional[int] = None):
+        """Preload the hottest unexpired entries from SQLite on startup.
+        
+        Args:
+            limit: Max entries to load (defaults to RESPONSE_CACHE_PRELOAD_ENTRIES; 0 loads none)
+        """
+        if limit is None:
+            limit = settings.response_cache_preload_entries
+        limit = min(limit, self.MAX_CACHE_SIZE)
+        if limit <= 0:
+            return
         try:
-            from app.services.database import get_database
-            db_svc = get_database()
-            if db_svc and db_svc._db:
-                await db_svc._db.execute("""
-                    CREATE TABLE IF NOT EXISTS response_cache (
-                        key TEXT PRIMARY KEY,
-                        data TEXT NOT NULL,
-                        created_at TEXT
-                    )
-                """)
-                async with db_svc._db.execute("SELECT key, data FROM response_cache") as cursor:
-                    loaded = 0
-                    async for row in cursor:
-                        try:
-                            entry = CachedResponse.from_dict(json.loads(row[1]))
-                            if not entry.is_expired():
-                                self._cache[row[0]] = entry
-                                loaded += 1
-                        except Exception:
-                            pass
-                    if loaded:
-                        logger.info(f"Loaded {loaded} cached responses from SQLite")
+            db = self._get_db()
+            if db is None:
+                return
+            loaded = 0
+            async with db.execute(
+                """SELECT key, data FROM response_cache
+                   WHERE expires_at IS NULL OR expires_at > ?
+                   ORDER BY hit_count DESC, created_at DESC
+                   LIMIT ?""",
+                (datetime.utcnow().isoformat(), limit),
+            ) as cursor:
+                async for row in cursor:
+                    try:
+                        entry = CachedResponse.from_dict(json.loads(row[1]))
+                        if not entry.is_expired():
+                            self._cache[row[0]] = entry
+                            loaded += 1
+                    except Exception:
+                        pass
+            if loaded:
+                logger.info(f"Loaded {loaded} cached responses from SQLite")
         except Exception as e:
             logger.debug(f"Could not load cached responses: {e}")
     
@@ -291,6 +430,8 @@ class ResponseCache:
             if not context_key:
                 count = len(self._cache)
                 self._cache.clear()
+                self._pending_writes.clear()
+                self._pending_hits.clear()
                 logger.info(f"Invalidated all {count} cache entries")
             else:
                 keys_to_remove = [
@@ -299,16 +440,47 @@ class ResponseCache:
                 ]
                 for key in keys_to_remove:
                     del self._cache[key]
+                for key, entry in list(self._pending_writes.items()):
+                    if entry.metadata.get("context_key") == context_key:
+                        del self._pending_writes[key]
                 logger.info(f"Invalidated {len(keys_to_remove)} cache entries for context '{context_key}'")
+        
+        try:
+            db = self._get_db()
+            if db is not None:
+                if context_key:
+                    await db.execute("DELETE FROM response_cache WHERE context_key = ?", (context_key,))
+                else:
+                    await db.execute("DELETE FROM response_cache")
+                await db.commit()
+        except Exception as e:
+            logger.debug(f"Failed to invalidate persisted cache entries: {e}")
     
     async def cleanup_expired(self):
-        """Remove all expired entries."""
+        """Remove all expired entries from memory and SQLite."""
         async with self._lock:
             expired_keys = [k for k, v in self._cache.items() if v.is_expired()]
             for key in expired_keys:
                 del self._cache[key]
             if expired_keys:
                 logger.info(f"Cleaned up {len(expired_keys)} expired cache entries")
+        
+        try:
+            db = self._get_db()
+            if db is not None:
+                now = datetime.utcnow()
+                # Rows written before expires_at existed fall back to the default TTL
+                cursor = await db.execute(
+                    """DELETE FROM response_cache
+                       WHERE expires_at <= ?
+                          OR (expires_at IS NULL AND created_at <= ?)""",
+                    (now.isoformat(), (now - timedelta(seconds=self.default_ttl)).isoformat()),
+                )
+                await db.commit()
+                if cursor.rowcount:
+                    logger.info(f"Pruned {cursor.rowcount} expired rows from response_cache")
+        except Exception as e:
+            logger.debug(f"Failed to prune persisted cache entries: {e}")
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
@@ -323,6 +495,9 @@ class ResponseCache:
             "similarity_threshold": self.similarity_threshold,
             "default_ttl": self.default_ttl,
             "max_size": self.MAX_CACHE_SIZE,
+            "persistent_hits": self._db_hits,
+            "pending_writes": len(self._pending_writes) + len(self._pending_hits),
+            "flushed_rows": self._flushed_rows,
         }
 
 
@@ -6,7 +6,6 @@ allowing for peak hour reservations and budget tracking per window.
 """
 import logging
 import json
-import asyncio
 import threading
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
@@ -15,9 +14,9 @@ from dataclasses import dataclass, field
 from enum import Enum
 from collections import defaultdict
 import os
-import tempfile
 
 from app.config import settings
+from app.services.state_journal import state_journal
 
 logger = logging.getLogger(__name__)
 
@@ -156,6 +155,9 @@ class RPDBudgetAllocator:
         else:
             data_dir = _persistent_state_dir()
             self._persistence_file = data_dir / "rpd_budget.json"
+        self._state = state_journal.register(
+            "rpd_budget", self._persistence_file, self._snapshot_state, lock=self._lock,
+        )
         
         # Load configuration from environment
         self._load_config_from_env()
@@ -255,6 +257,7 @@ class RPDBudgetAllocator:
         logger.info(f"Resetting RPD budget for new day: {today}")
         self._current_date = today
         self._window_usage.clear()
+        self._state.request_snapshot()
     
     def _ensure_window_usage(self, model: str, window: TimeWindow) -> WindowUsage:
         """Ensure WindowUsage exists for model/window combination."""
@@ -305,6 +308,32 @@ class RPDBudgetAllocator:
             
             return False, reason, self._exceed_action
     
+    def has_headroom(self, model: str, reserve_fraction: float = 0.0, count: int = 1) -> bool:
+        """
+        True if *count* optional requests fit while keeping ``reserve_fraction``
+        of the current window's budget untouched (used for speculative work).
+        """
+        with self._lock:
+            self._check_date_reset()
+            window = self._get_current_window()
+            if not window:
+                return True
+            usage = self._ensure_window_usage(model, window)
+            return usage.remaining - count >= usage.budget * reserve_fraction
+
+    def remaining_fraction(self, model: str) -> float:
+        """Share of the current window's budget still unused (1.0 outside any window)."""
+        with self._lock:
+            self._check_date_reset()
+            window = self._get_current_window()
+            if not window:
+                return 1.0
+            usage = self._ensure_window_usage(model, window)
+            return usage.remaining / usage.budget if usage.budget else 0.0
+
+    def _journal(self, model: str, window: TimeWindow, counter: str, count: int):
+        self._state.record({"d": self._current_date.isoformat(), "m": model, "w": window.name, counter: count})
+
     def record_request(self, model: str, count: int = 1) -> Dict:
         """Record a request against the current window's budget."""
         with self._lock:
@@ -316,19 +345,13 @@ class RPDBudgetAllocator:
             
             usage = self._ensure_window_usage(model, window)
             usage.used += count
+            self._journal(model, window, "used", count)
             
             logger.debug(
                 f"Recorded {count} request(s) for {model} in window '{window.name}': "
                 f"{usage.used}/{usage.budget}"
             )
         
-        # Save asynchronously
-        try:
-            loop = asyncio.get_running_loop()
-            loop.create_task(self._save_to_disk_async())
-        except RuntimeError:
-            pass
-        
         return {
             "recorded": True,
             "window": window.name,
@@ -345,6 +368,7 @@ class RPDBudgetAllocator:
             if window:
                 usage = self._ensure_window_usage(model, window)
                 usage.queued += count
+                self._journal(model, window, "queued", count)
     
     def record_rejected(self, model: str, count: int = 1):
         """Record a request that was rejected due to budget limits."""
@@ -354,6 +378,7 @@ class RPDBudgetAllocator:
             if window:
                 usage = self._ensure_window_usage(model, window)
                 usage.rejected += count
+                self._journal(model, window, "rejected", count)
     
     def get_current_window_status(self, model: str) -> Dict:
         """Get status for the current time window."""
@@ -461,19 +486,13 @@ class RPDBudgetAllocator:
         return [w.to_dict() for w in self._windows]
     
     def _load_from_disk(self):
-        """Load budget data from disk."""
+        """Load budget data from the last snapshot plus the journal."""
+        data, deltas = self._state.load()
         try:
-            if self._persistence_file.exists():
-                with open(self._persistence_file, 'r') as f:
-                    data = json.load(f)
-                
-                saved_date_str = data.get("date", "")
-                if not saved_date_str:
-                    return
-                
+            today = datetime.now(timezone.utc).date()
+            saved_date_str = (data or {}).get("date", "")
+            if saved_date_str:
                 saved_date = datetime.fromisoformat(saved_date_str).date()
-                today = datetime.now(timezone.utc).date()
-                
                 if saved_date == today:
                     self._current_date = saved_date
                     
@@ -492,42 +511,31 @@ class RPDBudgetAllocator:
                     logger.info(f"Loaded RPD budget data from {self._persistence_file}")
                 else:
                     logger.info(f"Budget data is from {saved_date}, starting fresh for {today}")
+            
+            windows = {w.name: w for w in self._windows}
+            for delta in deltas:
+                window = windows.get(delta.get("w"))
+                if delta.get("d") != today.isoformat() or window is None:
+                    continue
+                usage = self._ensure_window_usage(delta["m"], window)
+                for counter in ("used", "queued", "rejected"):
+                    setattr(usage, counter, getattr(usage, counter) + int(delta.get(counter, 0)))
         except Exception as e:
             logger.warning(f"Could not load RPD budget data: {e}")
     
-    async def _save_to_disk_async(self):
-        """Save budget data to disk asynchronously."""
-        try:
-            with self._lock:
-                data = {
-                    "date": self._current_date.isoformat(),
-                    "saved_at": datetime.now(timezone.utc).isoformat(),
-                    "window_usage": {
-                        model: {
-                            window_name: usage.to_dict()
-                            for window_name, usage in windows.items()
-                        }
-                        for model, windows in self._window_usage.items()
-                    },
+    def _snapshot_state(self) -> Dict:
+        """Snapshot payload; called by the state journal with ``_lock`` held."""
+        return {
+            "date": self._current_date.isoformat(),
+            "saved_at": datetime.now(timezone.utc).isoformat(),
+            "window_usage": {
+                model: {
+                    window_name: usage.to_dict()
+                    for window_name, usage in windows.items()
                 }
-            
-            def _write_file():
-                self._persistence_file.parent.mkdir(parents=True, exist_ok=True)
-                with tempfile.NamedTemporaryFile(
-                    mode='w',
-                    dir=self._persistence_file.parent,
-                    prefix=f"{self._persistence_file.stem}-",
-                    suffix='.tmp',
-                    delete=False,
-                ) as f:
-                    json.dump(data, f, indent=2)
-                    temp_file = Path(f.name)
-                temp_file.replace(self._persistence_file)
-            
-            await asyncio.to_thread(_write_file)
-            logger.debug(f"Saved RPD budget data to {self._persistence_file}")
-        except Exception as e:
-            logger.error(f"Failed to save RPD budget data: {e}")
+                for model, windows in self._window_usage.items()
+            },
+        }
 
 
 # Global instance
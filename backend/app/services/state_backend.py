@@ -0,0 +1,502 @@
+"""
+Pluggable state backend for process-shared runtime state.
+
+Admin sessions, rate-limit counters, caches, SSE fan-out and per-session
+interview state used to live in module-level dicts, which pinned the API to a
+single uvicorn worker. Services now keep that state in a ``StateBackend``:
+
+- ``memory``: in-process dicts (default, single worker, zero overhead)
+- ``sqlite``: a WAL-mode SQLite file shared by every worker on the host
+
+Select the backend with ``STATE_BACKEND`` and ``STATE_BACKEND_PATH``.
+"""
+import copy
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+from app.services.executors import disk
+
+logger = logging.getLogger(__name__)
+
+# Idle lifetime for per-session interview state (refreshed on every write)
+SESSION_STATE_TTL_SECONDS = 7 * 24 * 3600
+
+
+class StateBackend:
+    """
+    Namespaced key/value store with TTLs, atomic counters and an event log.
+
+    All operations are synchronous and cheap so they can be used from both
+    async handlers and worker threads without changing call signatures.
+    """
+
+    name = "base"
+    shared = False  # True when state is visible to other worker processes
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str) -> bool:
+        raise NotImplementedError
+
+    def keys(self, namespace: str) -> List[str]:
+        raise NotImplementedError
+
+    def items(self, namespace: str) -> List[Tuple[str, Any]]:
+        raise NotImplementedError
+
+    def count(self, namespace: str) -> int:
+        return len(self.keys(namespace))
+
+    def clear(self, namespace: str) -> int:
+        raise NotImplementedError
+
+    def incr(self, namespace: str, key: str, amount: int = 1, ttl_seconds: Optional[float] = None) -> int:
+        """Atomically add to an integer counter and return the new value."""
+        raise NotImplementedError
+
+    @contextmanager
+    def edit(
+        self,
+        namespace: str,
+        key: str,
+        default_factory: Optional[Callable[[], Any]] = None,
+        ttl_seconds: Optional[float] = None,
+    ) -> Iterator[Any]:
+        """
+        Read-modify-write a value atomically.
+
+        Yields the stored value (or ``default_factory()`` when missing) and
+        writes it back when the block exits without raising. Yields ``None``
+        without storing anything when the key is missing and no factory is given.
+        """
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    def purge_expired(self, namespace: Optional[str] = None) -> int:
+        raise NotImplementedError
+
+    def publish(self, channel: str, payload: Any) -> int:
+        """Append an event to a channel and return its sequence id."""
+        raise NotImplementedError
+
+    def read_events(self, channel: str, after_id: int = 0, limit: int = 100) -> List[Tuple[int, Any]]:
+        """Return events published after ``after_id`` in publish order."""
+        raise NotImplementedError
+
+    def latest_event_id(self, channel: str) -> int:
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "shared": self.shared}
+
+
+class InMemoryStateBackend(StateBackend):
+    """Process-local backend. Values are stored by reference; ``edit`` works on a copy."""
+
+    name = "memory"
+    shared = False
+    MAX_EVENTS_PER_CHANNEL = 1000
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Tuple[Any, Optional[float]]]] = {}
+        self._events: Dict[str, Deque[Tuple[int, Any]]] = {}
+        self._event_seq = 0
+        self._lock = threading.RLock()
+
+    def _namespace(self, namespace: str) -> Dict[str, Tuple[Any, Optional[float]]]:
+        bucket = self._data.get(namespace)
+        if bucket is None:
+            bucket = self._data[namespace] = {}
+        return bucket
+
+    @staticmethod
+    def _expires_at(ttl_seconds: Optional[float]) -> Optional[float]:
+        return time.time() + ttl_seconds if ttl_seconds else None
+
+    @staticmethod
+    def _alive(entry: Tuple[Any, Optional[float]], now: float) -> bool:
+        return entry[1] is None or entry[1] > now
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            bucket = self._namespace(namespace)
+            entry = bucket.get(key)
+            if entry is None:
+                return default
+            if not self._alive(entry, time.time()):
+                del bucket[key]
+                return default
+            return entry[0]
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        with self._lock:
+            self._namespace(namespace)[key] = (value, self._expires_at(ttl_seconds))
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            return self._namespace(namespace).pop(key, None) is not None
+
+    def keys(self, namespace: str) -> List[str]:
+        now = time.time()
+        with self._lock:
+            return [k for k, entry in self._namespace(namespace).items() if self._alive(entry, now)]
+
+    def items(self, namespace: str) -> List[Tuple[str, Any]]:
+        now = time.time()
+        with self._lock:
+            return [(k, entry[0]) for k, entry in self._namespace(namespace).items() if self._alive(entry, now)]
+
+    def clear(self, namespace: str) -> int:
+        with self._lock:
+            bucket = self._namespace(namespace)
+            count = len(bucket)
+            bucket.clear()
+            return count
+
+    def incr(self, namespace: str, key: str, amount: int = 1, ttl_seconds: Optional[float] = None) -> int:
+        with self._lock:
+            bucket = self._namespace(namespace)
+            entry = bucket.get(key)
+            if entry is None or not self._alive(entry, time.time()):
+                value, expires_at = 0, self._expires_at(ttl_seconds)
+            else:
+                value, expires_at = entry
+            value = int(value) + amount
+            bucket[key] = (value, expires_at)
+            return value
+
+    @contextmanager
+    def edit(self, namespace, key, default_factory=None, ttl_seconds=None):
+        with self._lock:
+            bucket = self._namespace(namespace)
+            entry = bucket.get(key)
+            if entry is not None and self._alive(entry, time.time()):
+                # A copy, so a block that raises leaves the stored value as it was
+                value, expires_at = copy.deepcopy(entry[0]), entry[1]
+            elif default_factory is not None:
+                value, expires_at = default_factory(), None
+            else:
+                yield None
+                return
+            yield value
+            if ttl_seconds:
+                expires_at = self._expires_at(ttl_seconds)
+            bucket[key] = (value, expires_at)
+
+    def purge_expired(self, namespace: Optional[str] = None) -> int:
+        now = time.time()
+        removed = 0
+        with self._lock:
+            namespaces = [namespace] if namespace else list(self._data)
+            for ns in namespaces:
+                bucket = self._namespace(ns)
+                expired = [k for k, entry in bucket.items() if not self._alive(entry, now)]
+                for k in expired:
+                    del bucket[k]
+                removed += len(expired)
+        return removed
+
+    def publish(self, channel: str, payload: Any) -> int:
+        with self._lock:
+            self._event_seq += 1
+            events = self._events.get(channel)
+            if events is None:
+                events = self._events[channel] = deque(maxlen=self.MAX_EVENTS_PER_CHANNEL)
+            events.append((self._event_seq, payload))
+            return self._event_seq
+
+    def read_events(self, channel: str, after_id: int = 0, limit: int = 100) -> List[Tuple[int, Any]]:
+        with self._lock:
+            events = self._events.get(channel) or ()
+            return [event for event in events if event[0] > after_id][:limit]
+
+    def latest_event_id(self, channel: str) -> int:
+        with self._lock:
+            events = self._events.get(channel)
+            return events[-1][0] if events else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "shared": self.shared,
+                "namespaces": {ns: len(bucket) for ns, bucket in self._data.items()},
+                "channels": {ch: len(events) for ch, events in self._events.items()},
+            }
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    Host-shared backend on a WAL-mode SQLite file.
+
+    Values are pickled; the file holds internal runtime state only and must
+    live on a local disk readable by every worker. ``edit`` runs inside a
+    ``BEGIN IMMEDIATE`` transaction so read-modify-write is atomic across
+    processes.
+    """
+
+    name = "sqlite"
+    shared = True
+    EVENT_RETENTION_SECONDS = 300
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.RLock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Reconnect after fork so workers never share a connection handle.
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS kv_state (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB,
+                    expires_at REAL,
+                    PRIMARY KEY (namespace, key)
+                );
+                CREATE INDEX IF NOT EXISTS idx_kv_state_expires ON kv_state(expires_at);
+                CREATE TABLE IF NOT EXISTS state_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel TEXT NOT NULL,
+                    payload BLOB,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_state_events_channel ON state_events(channel, id);
+            """)
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _dump(value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(blob: Optional[bytes]) -> Any:
+        return pickle.loads(blob) if blob is not None else None
+
+    @staticmethod
+    def _expires_at(ttl_seconds: Optional[float]) -> Optional[float]:
+        return time.time() + ttl_seconds if ttl_seconds else None
+
+    def _select(self, conn: sqlite3.Connection, namespace: str, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        row = conn.execute(
+            "SELECT value, expires_at FROM kv_state WHERE namespace = ? AND key = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return row
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._select(self._connection(), namespace, key)
+        return self._load(row[0]) if row else default
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        blob = self._dump(value)
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO kv_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, blob, self._expires_at(ttl_seconds)),
+            )
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            cursor = self._connection().execute(
+                "DELETE FROM kv_state WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+            return cursor.rowcount > 0
+
+    def keys(self, namespace: str) -> List[str]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT key FROM kv_state WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time()),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def items(self, namespace: str) -> List[Tuple[str, Any]]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT key, value FROM kv_state WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time()),
+            ).fetchall()
+        return [(row[0], self._load(row[1])) for row in rows]
+
+    def count(self, namespace: str) -> int:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT COUNT(*) FROM kv_state WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time()),
+            ).fetchone()
+        return int(row[0]) if row else 0
+
+    def clear(self, namespace: str) -> int:
+        with self._lock:
+            cursor = self._connection().execute("DELETE FROM kv_state WHERE namespace = ?", (namespace,))
+            return cursor.rowcount
+
+    def incr(self, namespace: str, key: str, amount: int = 1, ttl_seconds: Optional[float] = None) -> int:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._select(conn, namespace, key)
+                if row is None:
+                    value, expires_at = 0, self._expires_at(ttl_seconds)
+                else:
+                    value, expires_at = int(self._load(row[0]) or 0), row[1]
+                value += amount
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, self._dump(value), expires_at),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return value
+
+    @contextmanager
+    def edit(self, namespace, key, default_factory=None, ttl_seconds=None):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._select(conn, namespace, key)
+                if row is not None:
+                    value, expires_at = self._load(row[0]), row[1]
+                elif default_factory is not None:
+                    value, expires_at = default_factory(), None
+                else:
+                    conn.execute("COMMIT")
+                    yield None
+                    return
+                yield value
+                if ttl_seconds:
+                    expires_at = self._expires_at(ttl_seconds)
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, self._dump(value), expires_at),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    def purge_expired(self, namespace: Optional[str] = None) -> int:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            if namespace:
+                cursor = conn.execute(
+                    "DELETE FROM kv_state WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                    (namespace, now),
+                )
+            else:
+                cursor = conn.execute(
+                    "DELETE FROM kv_state WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+                )
+                conn.execute(
+                    "DELETE FROM state_events WHERE created_at < ?", (now - self.EVENT_RETENTION_SECONDS,)
+                )
+            return cursor.rowcount
+
+    def publish(self, channel: str, payload: Any) -> int:
+        with self._lock:
+            cursor = self._connection().execute(
+                "INSERT INTO state_events (channel, payload, created_at) VALUES (?, ?, ?)",
+                (channel, self._dump(payload), time.time()),
+            )
+            return int(cursor.lastrowid)
+
+    def read_events(self, channel: str, after_id: int = 0, limit: int = 100) -> List[Tuple[int, Any]]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT id, payload FROM state_events WHERE channel = ? AND id > ? ORDER BY id LIMIT ?",
+                (channel, after_id, limit),
+            ).fetchall()
+        return [(int(row[0]), self._load(row[1])) for row in rows]
+
+    def latest_event_id(self, channel: str) -> int:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT MAX(id) FROM state_events WHERE channel = ?", (channel,)
+            ).fetchone()
+        return int(row[0]) if row and row[0] is not None else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT namespace, COUNT(*) FROM kv_state GROUP BY namespace"
+            ).fetchall()
+        return {
+            "backend": self.name,
+            "shared": self.shared,
+            "path": self.path,
+            "namespaces": {row[0]: row[1] for row in rows},
+        }
+
+
+_state_backend: Optional[StateBackend] = None
+
+
+def create_state_backend(kind: Optional[str] = None, path: Optional[str] = None) -> StateBackend:
+    """Build a backend from explicit arguments or settings."""
+    kind = (kind or settings.state_backend or "memory").strip().lower()
+    if kind == "sqlite":
+        return SQLiteStateBackend(path or settings.state_backend_path)
+    if kind != "memory":
+        logger.warning(f"Unknown STATE_BACKEND '{kind}', falling back to in-process memory")
+    return InMemoryStateBackend()
+
+
+def get_state_backend() -> StateBackend:
+    """Get or create the process-wide state backend."""
+    global _state_backend
+    if _state_backend is None:
+        _state_backend = create_state_backend()
+        logger.info(f"State backend initialized: {_state_backend.name}")
+    return _state_backend
+
+
+async def run_state_io(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Call *func* (a backend operation or a small batch of them) from async code.
+
+    The shared SQLite backend does blocking file I/O (and ``BEGIN IMMEDIATE``
+    can wait on another worker's lock), so it runs on the ``disk`` pool; the
+    in-memory backend is cheap enough to call inline.
+    """
+    if not get_state_backend().shared:
+        return func(*args, **kwargs)
+    return await disk.run(func, *args, **kwargs)
+
+
+def set_state_backend(backend: StateBackend) -> StateBackend:
+    """Replace the process-wide backend (used at startup and in tests)."""
+    global _state_backend
+    _state_backend = backend
+    return backend
@@ -0,0 +1,302 @@
+"""
+Journaled persistence for quota and key-rotation state.
+
+QuotaTracker, APIKeyManager, UsageTracker and RPDBudgetAllocator used to
+rewrite their whole JSON state file on every recorded request. They now record
+small deltas in memory instead; a background task appends them to a JSONL
+journal next to the state file every ``state_journal_flush_seconds`` and writes
+a full snapshot (then truncates the journal) every
+``state_snapshot_interval_seconds``, once the journal grows past
+``state_journal_max_entries``, when a tracker asks for one, and on shutdown.
+
+Nothing touches the disk on the request path, and a crash loses at most one
+flush interval. Each worker process appends to its own journal file
+(``<state>.<worker>.journal``) and only ever truncates that file, so with
+WEB_CONCURRENCY > 1 no worker discards another's entries. On startup a
+tracker loads the snapshot and replays every worker's entries newer than it:
+sequence numbers are per worker, and snapshots record the last one they
+include for each worker, so an entry is never applied twice. Journals left by
+workers that have exited are folded into the next snapshot and then removed.
+"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.services.executors import disk
+
+logger = logging.getLogger(__name__)
+
+SEQS_KEY = "journal_seqs"  # worker id -> last sequence number the snapshot includes
+
+
+def _new_worker_id() -> str:
+    # The random suffix keeps a recycled pid from appending to a dead worker's journal
+    return f"{os.getpid()}-{secrets.token_hex(3)}"
+
+
+def _worker_alive(worker_id: str) -> bool:
+    try:
+        os.kill(int(worker_id.split("-", 1)[0]), 0)
+    except ProcessLookupError:
+        return False
+    except (ValueError, OSError):
+        pass  # unparseable id or not ours to signal: assume it is still running
+    return True
+
+
+class JournaledState:
+    """Persistence handle for one tracker's state file."""
+
+    def __init__(
+        self,
+        name: str,
+        path: Path,
+        snapshot: Callable[[], Dict[str, Any]],
+        lock: Optional[Any] = None,
+    ):
+        self.name = name
+        self.path = Path(path)
+        self.worker_id = _new_worker_id()
+        self.journal_path = self._journal_file(self.worker_id)
+        # Called with ``lock`` held; must not take it again
+        self._snapshot = snapshot
+        # Trackers pass the lock their mutations (and record() calls) run under,
+        # so a snapshot and the deltas it supersedes are swapped atomically.
+        self._lock = lock if lock is not None else threading.Lock()
+        self._seq = 0
+        # Last sequence number replayed from each other worker's journal
+        self._replayed_seqs: Dict[str, int] = {}
+        self._exited_journals: Dict[str, Path] = {}  # folded into our state; removed after our next snapshot
+        self._pending: List[Dict[str, Any]] = []
+        self._journal_entries = 0
+        self._snapshot_requested = False
+        self._last_snapshot_at = time.monotonic()
+        self.stats = {"deltas": 0, "journal_writes": 0, "snapshots": 0, "replayed": 0, "errors": 0}
+
+    # -- request path (no I/O) ----------------------------------------------
+
+    def record(self, delta: Dict[str, Any]):
+        """Queue a delta. Call while holding the tracker's lock."""
+        self._seq += 1
+        self._pending.append({"s": self._seq, **delta})
+        self.stats["deltas"] += 1
+
+    def request_snapshot(self):
+        """Ask for a full snapshot at the next flush (e.g. after a daily reset)."""
+        self._snapshot_requested = True
+
+    # -- startup ---------------------------------------------------------------
+
+    def _journal_file(self, worker_id: str) -> Path:
+        return self.path.with_name(f"{self.path.name}.{worker_id}.journal")
+
+    def _journal_files(self) -> Dict[str, Path]:
+        prefix, suffix = f"{self.path.name}.", ".journal"
+        return {
+            path.name[len(prefix):-len(suffix)]: path
+            for path in self.path.parent.glob(f"{self.path.name}.*{suffix}")
+        }
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Return the last snapshot and every worker's journal entries recorded after it."""
+        payload = None
+        try:
+            if self.path.exists():
+                payload = json.loads(self.path.read_text())
+        except Exception as exc:
+            logger.warning(f"{self.name}: could not load state snapshot: {exc}")
+            self.stats["errors"] += 1
+        included = {
+            str(worker): int(seq or 0)
+            for worker, seq in ((payload or {}).get(SEQS_KEY) or {}).items()
+        }
+
+        deltas: List[Dict[str, Any]] = []
+        replayed: Dict[str, int] = {}
+        exited: Dict[str, Path] = {}
+        try:
+            for worker_id, journal_path in sorted(self._journal_files().items()):
+                if worker_id == self.worker_id:
+                    continue
+                floor = last = included.get(worker_id, 0)
+                seen = set()
+                for line in journal_path.read_text().splitlines():
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn final line from a crash mid-append
+                    # A retried append can repeat entries a failed one partly wrote
+                    seq = int(entry.get("s", 0))
+                    if seq > floor and seq not in seen:
+                        seen.add(seq)
+                        deltas.append(entry)
+                        last = max(last, seq)
+                replayed[worker_id] = last
+                if not _worker_alive(worker_id):
+                    exited[worker_id] = journal_path
+        except Exception as exc:
+            logger.warning(f"{self.name}: could not read state journal: {exc}")
+            self.stats["errors"] += 1
+
+        self._replayed_seqs = replayed
+        self._exited_journals = exited
+        self._journal_entries = 0  # our own journal starts empty
+        self.stats["replayed"] = len(deltas)
+        return payload, deltas
+
+    # -- background writer -------------------------------------------------
+
+    def _snapshot_due(self, now: float) -> bool:
+        return (
+            self._snapshot_requested
+            or self._journal_entries + len(self._pending) >= settings.state_journal_max_entries
+            or (
+                (self._journal_entries or self._pending)
+                and now - self._last_snapshot_at >= settings.state_snapshot_interval_seconds
+            )
+        )
+
+    async def flush(self, snapshot: bool = False):
+        """Append pending deltas to the journal, or write a snapshot if one is due."""
+        now = time.monotonic()
+        if snapshot or self._snapshot_due(now):
+            with self._lock:
+                seqs = {**self._replayed_seqs, self.worker_id: self._seq}
+                payload = {**self._snapshot(), SEQS_KEY: seqs}
+                entries, self._pending = self._pending, []
+                self._snapshot_requested = False
+            exited, self._exited_journals = self._exited_journals, {}
+            try:
+                await disk.run(self._write_snapshot, payload, list(exited.values()))
+            except Exception:
+                self._requeue(entries)
+                self._exited_journals = {**exited, **self._exited_journals}
+                self._snapshot_requested = True
+                raise
+            for worker_id in exited:
+                # The file is gone; a future worker reusing the id must not inherit its watermark
+                self._replayed_seqs.pop(worker_id, None)
+            self._journal_entries = 0
+            self._last_snapshot_at = now
+            self.stats["snapshots"] += 1
+            return
+
+        with self._lock:
+            entries, self._pending = self._pending, []
+        if not entries:
+            return
+        try:
+            await disk.run(self._append_journal, entries)
+        except Exception:
+            # Keep the deltas for the next flush rather than losing them until a snapshot
+            self._requeue(entries)
+            raise
+        self._journal_entries += len(entries)
+        self.stats["journal_writes"] += 1
+
+    def _requeue(self, entries: List[Dict[str, Any]]):
+        with self._lock:
+            self._pending = entries + self._pending
+
+    def _append_journal(self, entries: List[Dict[str, Any]]):
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.journal_path, "a") as f:
+            f.write("".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries))
+            f.flush()
+
+    def _write_snapshot(self, payload: Dict[str, Any], exited: Sequence[Path] = ()):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="w",
+            dir=self.path.parent,
+            prefix=f"{self.path.stem}-",
+            suffix=".tmp",
+            delete=False,
+        ) as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
+            temp_file = Path(f.name)
+        temp_file.replace(self.path)
+        # Our entries up to our seq now live in the snapshot. Other workers'
+        # journals are theirs to truncate, except those of workers that exited,
+        # which were replayed in full.
+        if self.journal_path.exists():
+            os.truncate(self.journal_path, 0)
+        for journal_path in exited:
+            journal_path.unlink(missing_ok=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "pending": len(self._pending),
+            "journal_entries": self._journal_entries,
+            "worker_id": self.worker_id,
+            "seq": self._seq,
+        }
+
+
+class StateJournal:
+    """Owns the registered state handles and the background flush task."""
+
+    def __init__(self):
+        self._states: Dict[str, JournaledState] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(
+        self,
+        name: str,
+        path: Path,
+        snapshot: Callable[[], Dict[str, Any]],
+        lock: Optional[Any] = None,
+    ) -> JournaledState:
+        """Register a tracker's state file. A later registration for the same path replaces it."""
+        state = JournaledState(name, path, snapshot, lock)
+        self._states[str(state.path)] = state
+        return state
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush task and snapshot every tracker."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush(snapshot=True)
+
+    async def flush(self, snapshot: bool = False):
+        for state in list(self._states.values()):
+            try:
+                await state.flush(snapshot=snapshot)
+            except Exception as exc:
+                state.stats["errors"] += 1
+                logger.warning(f"{state.name}: could not persist state: {exc}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(max(0.05, settings.state_journal_flush_seconds))
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "flush_seconds": settings.state_journal_flush_seconds,
+            "snapshot_interval_seconds": settings.state_snapshot_interval_seconds,
+            "states": {state.name: state.get_stats() for state in self._states.values()},
+        }
+
+
+# Global instance
+state_journal = StateJournal()
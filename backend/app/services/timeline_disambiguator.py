@@ -8,11 +8,14 @@ Helps witnesses clarify temporal relationships by:
 
 import logging
 import re
+import zlib
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from dataclasses import dataclass, field
 from enum import Enum
 
+from app.services.state_backend import get_state_backend, SESSION_STATE_TTL_SECONDS
+
 logger = logging.getLogger(__name__)
 
 
@@ -141,10 +144,13 @@ DISAMBIGUATION_QUESTIONS = {
 
 
 class TimelineDisambiguator:
-    """Service for detecting and clarifying vague time references in witness statements."""
+    """
+    Service for detecting and clarifying vague time references in witness statements.
+    
+    Disambiguated timelines are stored per session in the state backend.
+    """
     
-    def __init__(self):
-        self._session_timelines: Dict[str, Dict[str, Any]] = {}
+    NAMESPACE = "timeline_state"
     
     def detect_time_references(
         self,
@@ -338,7 +344,8 @@ class TimelineDisambiguator:
             templates = DISAMBIGUATION_QUESTIONS['anchor_needed']
         
         # Select template (rotate based on session usage)
-        template_idx = hash(session_id + time_ref.text) % len(templates)
+        # Stable across workers (built-in hash() is salted per process)
+        template_idx = zlib.crc32((session_id + time_ref.text).encode("utf-8")) % len(templates)
         template = templates[template_idx]
         
         # Format the question
@@ -521,7 +528,7 @@ class TimelineDisambiguator:
             ))
         
         # Store in session
-        self._session_timelines[session_id] = {
+        get_state_backend().set(self.NAMESPACE, session_id, {
             "events": [
                 {
                     "id": e.id,
@@ -542,13 +549,13 @@ class TimelineDisambiguator:
                 for a in anchors
             ],
             "updated_at": datetime.utcnow().isoformat(),
-        }
+        }, ttl_seconds=SESSION_STATE_TTL_SECONDS)
         
         return disambiguated
     
     def get_session_timeline(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get the current disambiguated timeline for a session."""
-        return self._session_timelines.get(session_id)
+        return get_state_backend().get(self.NAMESPACE, session_id)
     
     def apply_clarification(
         self,
@@ -567,32 +574,34 @@ class TimelineDisambiguator:
         Returns:
             True if applied successfully
         """
-        timeline = self._session_timelines.get(session_id)
-        if not timeline:
-            return False
-        
-        for event in timeline['events']:
-            if event['id'] == event_id:
-                if 'offset_description' in clarification:
-                    event['offset_description'] = clarification['offset_description']
-                if 'relative_to' in clarification:
-                    event['relative_to_anchor'] = clarification['relative_to']
-                if 'sequence' in clarification:
-                    event['sequence'] = clarification['sequence']
-                
-                event['clarity'] = 'clear'
-                event['needs_clarification'] = False
-                event['confidence'] = min(event['confidence'] + 0.2, 1.0)
-                
-                timeline['updated_at'] = datetime.utcnow().isoformat()
-                logger.info(f"Applied clarification to event {event_id} in session {session_id}")
-                return True
+        with get_state_backend().edit(
+            self.NAMESPACE, session_id, ttl_seconds=SESSION_STATE_TTL_SECONDS
+        ) as timeline:
+            if not timeline:
+                return False
+            
+            for event in timeline['events']:
+                if event['id'] == event_id:
+                    if 'offset_description' in clarification:
+                        event['offset_description'] = clarification['offset_description']
+                    if 'relative_to' in clarification:
+                        event['relative_to_anchor'] = clarification['relative_to']
+                    if 'sequence' in clarification:
+                        event['sequence'] = clarification['sequence']
+                    
+                    event['clarity'] = 'clear'
+                    event['needs_clarification'] = False
+                    event['confidence'] = min(event['confidence'] + 0.2, 1.0)
+                    
+                    timeline['updated_at'] = datetime.utcnow().isoformat()
+                    logger.info(f"Applied clarification to event {event_id} in session {session_id}")
+                    return True
         
         return False
     
     def get_pending_clarifications(self, session_id: str) -> List[Dict[str, Any]]:
         """Get all events that still need timeline clarification."""
-        timeline = self._session_timelines.get(session_id)
+        timeline = get_state_backend().get(self.NAMESPACE, session_id)
         if not timeline:
             return []
         
@@ -603,8 +612,7 @@ class TimelineDisambiguator:
     
     def reset_session(self, session_id: str):
         """Reset timeline disambiguation state for a session."""
-        if session_id in self._session_timelines:
-            del self._session_timelines[session_id]
+        get_state_backend().delete(self.NAMESPACE, session_id)
 
 
 # Global singleton instance
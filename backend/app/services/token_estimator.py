@@ -5,6 +5,7 @@ Provides token counting before sending requests to prevent quota exhaustion.
 Uses character-based estimation (4 chars = ~1 token for English text).
 """
 import logging
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 
@@ -12,6 +13,32 @@ from app.services.model_selector import MODEL_QUOTAS
 
 logger = logging.getLogger(__name__)
 
+SPECIAL_CHARS = "{}[]()<>.,;:!?\"'`@#$%^&*"
+_STRIP_SPECIAL = str.maketrans("", "", SPECIAL_CHARS)
+CACHEABLE_TEXT_LENGTH = 4096  # Longer texts are rarely repeated; don't pin them in the cache
+
+
+def count_special_chars(text: str) -> int:
+    """Count punctuation/special characters with str.translate (C speed, no per-char loop)."""
+    return len(text) - len(text.translate(_STRIP_SPECIAL))
+
+
+def _char_estimate(text: str, chars_per_token: int) -> int:
+    char_estimate = len(text) / chars_per_token
+
+    # Adjust for whitespace (fewer tokens than chars suggest)
+    whitespace_count = text.count(' ') + text.count('\n') + text.count('\t')
+    whitespace_adjustment = whitespace_count * 0.3
+
+    # Adjust for special characters (more tokens)
+    special_adjustment = count_special_chars(text) * 0.2
+
+    estimated = int(char_estimate - whitespace_adjustment + special_adjustment)
+    return max(1, estimated)
+
+
+_cached_char_estimate = lru_cache(maxsize=4096)(_char_estimate)
+
 
 @dataclass
 class TokenEstimate:
@@ -109,19 +136,10 @@ class TokenEstimator:
             self.CHARS_PER_TOKEN["default"]
         )
         
-        # Basic character-based estimation
-        char_estimate = len(text) / chars_per_token
-        
-        # Adjust for whitespace (fewer tokens than chars suggest)
-        whitespace_count = text.count(' ') + text.count('\n') + text.count('\t')
-        whitespace_adjustment = whitespace_count * 0.3
-        
-        # Adjust for special characters (more tokens)
-        special_chars = sum(1 for c in text if c in "{}[]()<>.,;:!?\"'`@#$%^&*")
-        special_adjustment = special_chars * 0.2
-        
-        estimated = int(char_estimate - whitespace_adjustment + special_adjustment)
-        return max(1, estimated)
+        # Recurring short texts (agent phrases, re-sent turns) hit the cache
+        if len(text) <= CACHEABLE_TEXT_LENGTH:
+            return _cached_char_estimate(text, chars_per_token)
+        return _char_estimate(text, chars_per_token)
     
     def estimate_request(
         self,
@@ -130,6 +148,8 @@ class TokenEstimator:
         history: Optional[List[Dict[str, str]]] = None,
         task_type: str = "chat",
         content_type: str = "english",
+        system_prompt_tokens: Optional[int] = None,
+        history_tokens: Optional[int] = None,
     ) -> TokenEstimate:
         """
         Estimate total tokens for a complete request.
@@ -140,6 +160,8 @@ class TokenEstimator:
             history: Conversation history
             task_type: Type of task for output estimation
             content_type: Type of content being processed
+            system_prompt_tokens: Precomputed system prompt token count (skips re-estimation)
+            history_tokens: Running history total from a TokenLedger (skips re-estimation)
             
         Returns:
             TokenEstimate with breakdown
@@ -149,16 +171,19 @@ class TokenEstimator:
         
         # System prompt tokens
         if system_prompt:
-            system_tokens = self.estimate_tokens(system_prompt, content_type)
+            if system_prompt_tokens is None:
+                system_prompt_tokens = self.estimate_tokens(system_prompt, content_type)
+            system_tokens = system_prompt_tokens
             breakdown["system_prompt"] = system_tokens
             total_input += system_tokens
         
         # History tokens
-        if history:
+        if history_tokens is None and history:
             history_tokens = sum(
                 self.estimate_tokens(msg.get("content", ""), content_type)
                 for msg in history
             )
+        if history_tokens:
             breakdown["history"] = history_tokens
             total_input += history_tokens
         
@@ -304,6 +329,42 @@ class TokenEstimator:
 token_estimator = TokenEstimator()
 
 
+class TokenLedger:
+    """
+    Running token total for an append-mostly conversation history.
+
+    ``sync`` only estimates messages appended since the last call, so a quota
+    pre-check costs O(new messages) instead of O(history). If the history was
+    replaced or trimmed (summarization, restore), the ledger rebuilds once.
+    """
+
+    def __init__(self, content_type: str = "english"):
+        self.content_type = content_type
+        self._messages: List[Dict[str, Any]] = []  # references, to detect a replaced history
+        self.total = 0
+        self.rebuilds = 0
+
+    def _matches(self, history: List[Dict[str, Any]]) -> bool:
+        known = len(self._messages)
+        if len(history) < known:
+            return False
+        return known == 0 or (history[0] is self._messages[0] and history[known - 1] is self._messages[-1])
+
+    def sync(self, history: List[Dict[str, Any]]) -> int:
+        """Account for new messages in *history* and return its token total."""
+        if not self._matches(history):
+            self.reset()
+            self.rebuilds += 1
+        for msg in history[len(self._messages):]:
+            self.total += token_estimator.estimate_tokens(msg.get("content", ""), self.content_type)
+            self._messages.append(msg)
+        return self.total
+
+    def reset(self):
+        self._messages = []
+        self.total = 0
+
+
 # Convenience functions for backward compatibility
 def estimate_tokens(text: str) -> int:
     """Estimate token count for text (4 chars = ~1 token)."""
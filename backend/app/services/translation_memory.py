@@ -0,0 +1,180 @@
+"""
+Translation memory for multilingual interviews.
+
+Content-addressed cache of completed translations keyed by
+(text hash, source language, target language, model). An in-memory LRU sits
+in front of the SQLite `translation_memory` table so recurring agent phrases
+(greetings, quick phrases) and re-sent messages after reconnects are only
+translated once across sessions, workers, and restarts.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationMemory:
+    """Two-tier (LRU + SQLite) store of translated strings."""
+
+    MAX_MEMORY_ENTRIES = 2000
+
+    def __init__(self, max_entries: int = MAX_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._db_hits = 0
+        self._misses = 0
+        self._stored = 0
+
+    @staticmethod
+    def make_key(text: str, source_language: str, target_language: str, model: str) -> str:
+        """Content address for a translation."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model}:{source_language}:{target_language}:{digest}"
+
+    @staticmethod
+    def _get_db():
+        from app.services.database import get_database
+        db_svc = get_database()
+        return db_svc._db if db_svc else None
+
+    def _remember(self, key: str, translated: str):
+        with self._lock:
+            self._entries[key] = translated
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get(
+        self,
+        text: str,
+        source_language: str,
+        target_language: str,
+        model: str,
+    ) -> Optional[str]:
+        """Look up a single translation."""
+        found = await self.get_many([text], source_language, target_language, model)
+        return found.get(text)
+
+    async def get_many(
+        self,
+        texts: Sequence[str],
+        source_language: str,
+        target_language: str,
+        model: str,
+    ) -> Dict[str, str]:
+        """Look up several translations; returns only the texts that were found."""
+        found: Dict[str, str] = {}
+        missing: Dict[str, str] = {}
+        with self._lock:
+            for text in texts:
+                key = self.make_key(text, source_language, target_language, model)
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[text] = self._entries[key]
+                    self._memory_hits += 1
+                else:
+                    missing[key] = text
+
+        if missing:
+            rows = await self._load_rows(list(missing))
+            for key, translated in rows.items():
+                found[missing[key]] = translated
+                self._remember(key, translated)
+            self._db_hits += len(rows)
+            self._misses += len(missing) - len(rows)
+        return found
+
+    async def _load_rows(self, keys: List[str]) -> Dict[str, str]:
+        try:
+            db = self._get_db()
+            if db is None:
+                return {}
+            placeholders = ",".join("?" for _ in keys)
+            rows: Dict[str, str] = {}
+            async with db.execute(
+                f"SELECT key, translated_text FROM translation_memory WHERE key IN ({placeholders})",
+                keys,
+            ) as cursor:
+                async for row in cursor:
+                    rows[row[0]] = row[1]
+            if rows:
+                await db.executemany(
+                    "UPDATE translation_memory SET hit_count = hit_count + 1 WHERE key = ?",
+                    [(key,) for key in rows],
+                )
+                await db.commit()
+            return rows
+        except Exception as e:
+            logger.debug(f"Translation memory lookup failed: {e}")
+            return {}
+
+    async def put(
+        self,
+        text: str,
+        translated: str,
+        source_language: str,
+        target_language: str,
+        model: str,
+    ):
+        """Store a single translation."""
+        await self.put_many([(text, translated)], source_language, target_language, model)
+
+    async def put_many(
+        self,
+        pairs: Sequence[Tuple[str, str]],
+        source_language: str,
+        target_language: str,
+        model: str,
+    ):
+        """Store several (text, translated) pairs in one transaction."""
+        rows = []
+        now = datetime.utcnow().isoformat()
+        for text, translated in pairs:
+            key = self.make_key(text, source_language, target_language, model)
+            self._remember(key, translated)
+            rows.append((key, source_language, target_language, model, text, translated, now))
+        if not rows:
+            return
+        self._stored += len(rows)
+        try:
+            db = self._get_db()
+            if db is None:
+                return
+            await db.executemany(
+                """INSERT OR REPLACE INTO translation_memory
+                   (key, source_language, target_language, model, source_text, translated_text, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                rows,
+            )
+            await db.commit()
+        except Exception as e:
+            logger.debug(f"Failed to persist translations: {e}")
+
+    def clear(self):
+        """Drop the in-memory tier (persisted rows are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Hit/miss counters for both tiers."""
+        lookups = self._memory_hits + self._db_hits + self._misses
+        hits = self._memory_hits + self._db_hits
+        return {
+            "memory_entries": len(self._entries),
+            "max_memory_entries": self.max_entries,
+            "memory_hits": self._memory_hits,
+            "db_hits": self._db_hits,
+            "misses": self._misses,
+            "stored": self._stored,
+            "hit_rate": round(hits / lookups * 100, 2) if lookups else 0,
+        }
+
+
+# Global instance
+translation_memory = TranslationMemory()
@@ -1,15 +1,20 @@
 """
 Translation Service using Gemini for real-time interview translation.
 Detects witness language and translates between languages.
+Completed translations are kept in the translation memory so recurring
+agent phrases are translated once rather than per session.
 """
 
+import json
 import logging
-import asyncio
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, List, Sequence
 from google.genai import types
 
 from app.config import settings
 from app.services.api_key_manager import get_genai_client
+from app.services.translation_memory import translation_memory
+from app.services.language_id import identify_language
+from app.services.executors import llm_io
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +50,8 @@ class TranslationService:
 
     def __init__(self):
         self.client = None
+        self._local_detections = 0
+        self._remote_detections = 0
         self._initialize_client()
 
     def _initialize_client(self):
@@ -63,15 +70,28 @@ class TranslationService:
         """
         Detect the language of the given text.
         
+        The offline identifier answers first; Gemini is only asked when its
+        confidence is below LANGUAGE_ID_CONFIDENCE_THRESHOLD.
+        
         Args:
             text: Text to analyze
             
         Returns:
             Tuple of (language_code, confidence)
         """
-        if not self.client or not text.strip():
+        if not text.strip():
+            return ("en", 1.0)
+
+        local = identify_language(text)
+        if local.confidence >= settings.language_id_confidence_threshold:
+            self._local_detections += 1
+            logger.debug(f"Detected language locally: {local.language} (confidence: {local.confidence})")
+            return (local.language, local.confidence)
+
+        if not self.client:
             return ("en", 1.0)
 
+        self._remote_detections += 1
         try:
             prompt = f"""Detect the language of this text and respond with ONLY a JSON object.
 Do not include any other text or explanation.
@@ -83,7 +103,7 @@ Response format:
 
 Use ISO 639-1 language codes (en, es, zh, vi, ko, etc.)."""
 
-            response = await asyncio.to_thread(
+            response = await llm_io.run(
                 self.client.models.generate_content,
                 model=settings.gemini_lite_model,
                 contents=prompt,
@@ -93,7 +113,6 @@ Use ISO 639-1 language codes (en, es, zh, vi, ko, etc.)."""
                 )
             )
 
-            import json
             result_text = response.text.strip()
             # Handle markdown code blocks
             if result_text.startswith("```"):
@@ -144,6 +163,11 @@ Use ISO 639-1 language codes (en, es, zh, vi, ko, etc.)."""
         if source_language == target_language:
             return (text, source_language)
 
+        model = settings.gemini_lite_model
+        remembered = await translation_memory.get(text, source_language, target_language, model)
+        if remembered is not None:
+            return (remembered, source_language)
+
         try:
             target_name = SUPPORTED_LANGUAGES.get(target_language, target_language)
             source_name = SUPPORTED_LANGUAGES.get(source_language, source_language)
@@ -155,9 +179,9 @@ Return ONLY the translated text, nothing else.
 Text to translate:
 {text}"""
 
-            response = await asyncio.to_thread(
+            response = await llm_io.run(
                 self.client.models.generate_content,
-                model=settings.gemini_lite_model,
+                model=model,
                 contents=prompt,
                 config=types.GenerateContentConfig(
                     temperature=0.3,
@@ -167,12 +191,129 @@ Text to translate:
 
             translated = response.text.strip()
             logger.debug(f"Translated from {source_language} to {target_language}: {text[:50]}... -> {translated[:50]}...")
+            if translated:
+                await translation_memory.put(text, translated, source_language, target_language, model)
             return (translated, source_language)
 
         except Exception as e:
             logger.error(f"Translation failed: {e}")
             return (text, source_language)
 
+    async def translate_batch(
+        self,
+        texts: Sequence[str],
+        target_language: str,
+        source_language: str = "en",
+    ) -> List[str]:
+        """
+        Translate several strings, sending every uncached one in a single model call.
+        
+        Args:
+            texts: Strings to translate
+            target_language: Target language code
+            source_language: Source language code (not auto-detected for batches)
+            
+        Returns:
+            Translations in the same order as texts (originals where translation failed)
+        """
+        texts = list(texts)
+        if not texts or source_language == target_language:
+            return texts
+
+        model = settings.gemini_lite_model
+        known = await translation_memory.get_many(texts, source_language, target_language, model)
+        pending = list(dict.fromkeys(t for t in texts if t not in known and t.strip()))
+
+        if pending and self.client:
+            translated = await self._translate_in_one_call(pending, source_language, target_language, model)
+            if translated is None:
+                # Fall back to one call per string if the batch reply is unusable
+                for text in pending:
+                    single, _ = await self.translate(text, target_language, source_language)
+                    known[text] = single
+            else:
+                known.update(zip(pending, translated))
+                await translation_memory.put_many(
+                    list(zip(pending, translated)), source_language, target_language, model
+                )
+
+        return [known.get(text, text) for text in texts]
+
+    async def _translate_in_one_call(
+        self,
+        texts: List[str],
+        source_language: str,
+        target_language: str,
+        model: str,
+    ) -> Optional[List[str]]:
+        """Translate a JSON array of strings; None if the reply can't be matched up."""
+        target_name = SUPPORTED_LANGUAGES.get(target_language, target_language)
+        source_name = SUPPORTED_LANGUAGES.get(source_language, source_language)
+        prompt = f"""Translate each string in this JSON array from {source_name} to {target_name}.
+Preserve the meaning, tone, and any specific terminology.
+Return ONLY a JSON array of the translated strings, in the same order and with the same length.
+
+{json.dumps(texts, ensure_ascii=False)}"""
+
+        try:
+            response = await llm_io.run(
+                self.client.models.generate_content,
+                model=model,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    temperature=0.3,
+                    max_output_tokens=4000,
+                    response_mime_type="application/json",
+                )
+            )
+            result = json.loads(response.text.strip())
+        except Exception as e:
+            logger.warning(f"Batch translation failed: {e}")
+            return None
+
+        if (
+            not isinstance(result, list)
+            or len(result) != len(texts)
+            or not all(isinstance(item, str) and item.strip() for item in result)
+        ):
+            logger.warning(f"Batch translation returned {type(result).__name__} of unexpected shape")
+            return None
+        return [item.strip() for item in result]
+
+    async def prewarm(
+        self,
+        phrases: Sequence[str] = (),
+        languages: Optional[Sequence[str]] = None,
+    ) -> Dict[str, int]:
+        """
+        Translate recurring agent phrases into every supported language ahead of time.
+        
+        Covers the given phrases (e.g. voice quick phrases) plus the initial and
+        per-template greetings, one batched model call per language at most.
+        
+        Returns:
+            Number of phrases available per language after warming
+        """
+        from app.agents.prompts import INITIAL_GREETING, TEMPLATE_GREETING
+        from app.services.interview_templates import INTERVIEW_TEMPLATES
+
+        all_phrases = list(dict.fromkeys([
+            *phrases,
+            INITIAL_GREETING,
+            *(
+                TEMPLATE_GREETING.format(template_name=template.name.strip().lower())
+                for template in INTERVIEW_TEMPLATES.values()
+            ),
+        ]))
+        warmed: Dict[str, int] = {}
+        for language in languages or SUPPORTED_LANGUAGES:
+            if language == "en":
+                continue
+            translated = await self.translate_batch(all_phrases, target_language=language, source_language="en")
+            warmed[language] = sum(1 for src, dst in zip(all_phrases, translated) if dst != src)
+        logger.info(f"Translation memory pre-warmed for {len(warmed)} languages ({len(all_phrases)} phrases)")
+        return warmed
+
     async def translate_for_witness(
         self,
         agent_response: str,
@@ -248,6 +389,16 @@ Text to translate:
             "language_confidence": confidence,
         }
 
+    def get_detection_stats(self) -> Dict[str, Any]:
+        """How many detections were answered locally vs by Gemini."""
+        total = self._local_detections + self._remote_detections
+        return {
+            "local": self._local_detections,
+            "remote": self._remote_detections,
+            "local_rate": round(self._local_detections / total * 100, 2) if total else 0,
+            "confidence_threshold": settings.language_id_confidence_threshold,
+        }
+
     def get_supported_languages(self) -> Dict[str, str]:
         """Get dictionary of supported language codes and names."""
         return SUPPORTED_LANGUAGES.copy()
@@ -1,6 +1,5 @@
 """Text-to-Speech service with Native Audio Live API primary and TTS fallback."""
 import logging
-import asyncio
 import base64
 import io
 import re
@@ -13,6 +12,9 @@ from google.genai import types
 from app.config import settings
 from app.services.model_selector import MODEL_QUOTAS, is_retryable_model_error
 from app.services.api_key_manager import get_genai_client, get_key_manager
+from app.services.executors import llm_io
+from app.services.cancellation import OperationCancelled, current_token, raise_if_cancelled, record_discarded_chunk
+from app.services.rate_counter import RateCounter
 
 logger = logging.getLogger(__name__)
 
@@ -59,7 +61,7 @@ class TTSService:
     def __init__(self):
         self.client = None
         self._daily_count: dict[str, int] = {}
-        self._minute_requests: dict[str, List[datetime]] = {}
+        self._minute_requests = RateCounter(window_seconds=60)
         self._last_reset_date = ""
         self._initialize()
 
@@ -75,19 +77,10 @@ class TTSService:
         today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
         if today != self._last_reset_date:
             self._daily_count = {}
-            self._minute_requests = {}
+            self._minute_requests.reset()
             self._last_reset_date = today
             logger.info("TTS daily counter reset for %s", today)
 
-    def _prune_minute_window(self, model: str):
-        """Remove requests older than 60 seconds from minute tracking."""
-        cutoff = datetime.now(timezone.utc).timestamp() - 60
-        requests = self._minute_requests.get(model, [])
-        self._minute_requests[model] = [
-            ts for ts in requests
-            if ts.timestamp() > cutoff
-        ]
-
     @classmethod
     def _normalize_model_alias(cls, model: Optional[str]) -> Optional[str]:
         """Map deprecated model IDs to currently supported ones."""
@@ -142,10 +135,9 @@ class TTSService:
             return False, f"No Gemini account currently available for {model}"
 
         self._reset_if_new_day()
-        self._prune_minute_window(model)
         rpm_limit, rpd_limit = self._get_limits(model)
         daily = self._daily_count.get(model, 0)
-        minute = len(self._minute_requests.get(model, []))
+        minute = self._minute_requests.count(model)
 
         if rpd_limit and daily >= rpd_limit:
             return False, f"Daily TTS quota exhausted for {model} ({rpd_limit}/day)"
@@ -158,7 +150,7 @@ class TTSService:
     def _record_request(self, model: str):
         """Record a successful TTS request for rate limiting."""
         self._daily_count[model] = self._daily_count.get(model, 0) + 1
-        self._minute_requests.setdefault(model, []).append(datetime.now(timezone.utc))
+        self._minute_requests.add(model)
 
     def _mark_model_exhausted(self, model: str):
         """Mark model daily quota as exhausted when API returns quota errors."""
@@ -351,7 +343,7 @@ class TTSService:
         """Generate audio with standard generate_content TTS models."""
         # Wrap text so the model reads it verbatim
         read_instruction = self._build_read_instruction(text, context)
-        response = await asyncio.to_thread(
+        response = await llm_io.run(
             self.client.models.generate_content,
             model=model,
             contents=read_instruction,
@@ -432,13 +424,20 @@ class TTSService:
         voice: str = DEFAULT_VOICE,
         context: str = "response",
     ) -> AsyncIterator[tuple[bytes, str, int]]:
-        """Yield native-audio chunks for low-latency Detective Ray playback."""
+        """
+        Yield native-audio chunks for low-latency Detective Ray playback.
+
+        Checks the caller's cancellation token between chunks and before each
+        fallback model, so a disconnected listener ends the Live session.
+        """
         text, voice = self._prepare_text(text, voice)
         if not text:
             return
 
+        cancel_token = current_token()
         last_error: Optional[Exception] = None
         for model in self._get_native_model_chain():
+            raise_if_cancelled(f"Native TTS stream with {model}")
             allowed, reason = self._can_make_request(model)
             if not allowed:
                 logger.warning("Native TTS stream blocked for %s: %s", model, reason)
@@ -453,6 +452,9 @@ class TTSService:
                     voice=voice,
                     context=context,
                 ):
+                    if cancel_token is not None and cancel_token.cancelled:
+                        record_discarded_chunk(chunk_bytes)
+                        raise OperationCancelled(f"Native TTS stream with {model} stopped: caller cancelled")
                     last_mime_type = mime_type or last_mime_type
                     chunk_count += 1
                     yield chunk_bytes, last_mime_type, self._pcm_sample_rate(last_mime_type)
@@ -467,6 +469,10 @@ class TTSService:
                     )
                     return
                 logger.warning("Native TTS stream contained no audio data for %s", model)
+            except OperationCancelled:
+                if chunk_count > 0:
+                    self._record_request(model)
+                raise
             except Exception as e:
                 last_error = e
                 error_str = str(e)
@@ -513,18 +519,16 @@ class TTSService:
         self._reset_if_new_day()
         chain = self._get_model_chain()
         primary_model = chain[0]
-        self._prune_minute_window(primary_model)
         rpm_limit, rpd_limit = self._get_limits(primary_model)
-        rpm_used = len(self._minute_requests.get(primary_model, []))
+        rpm_used = self._minute_requests.count(primary_model)
         rpd_used = self._daily_count.get(primary_model, 0)
 
         per_model = {}
         available_models = []
         for model in chain:
             model = self._normalize_model_alias(model)
-            self._prune_minute_window(model)
             m_rpm_limit, m_rpd_limit = self._get_limits(model)
-            m_rpm_used = len(self._minute_requests.get(model, []))
+            m_rpm_used = self._minute_requests.count(model)
             m_rpd_used = self._daily_count.get(model, 0)
             per_model[model] = {
                 "rpm": {
@@ -6,19 +6,18 @@ we track usage locally with JSON file persistence.
 Updated for actual Google API quotas (per-model RPM/TPM/RPD).
 """
 import logging
-import json
 import os
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Optional, Tuple
 from collections import defaultdict
 import threading
-import asyncio
-import tempfile
 from zoneinfo import ZoneInfo
 
 from app.config import settings
 from app.services.model_selector import MODEL_QUOTAS
+from app.services.rate_counter import RateCounter
+from app.services.state_journal import state_journal
 from app.services.token_estimator import (
     token_estimator,
     estimate_tokens,
@@ -89,7 +88,7 @@ class UsageTracker:
         self._lock = threading.Lock()
         # Track requests per model
         self._requests_today: Dict[str, int] = defaultdict(int)
-        self._requests_minute: Dict[str, list] = defaultdict(list)
+        self._requests_minute = RateCounter(window_seconds=60)
         # Track tokens per model
         self._tokens_today: Dict[str, int] = defaultdict(int)
         # Track last reset
@@ -101,6 +100,9 @@ class UsageTracker:
         else:
             data_dir = _persistent_state_dir()
             self._persistence_file = data_dir / "usage_tracker.json"
+        self._state = state_journal.register(
+            "usage_tracker", self._persistence_file, self._snapshot_state, lock=self._lock,
+        )
         
         self._load_from_disk()
     
@@ -112,6 +114,7 @@ class UsageTracker:
             self._requests_today.clear()
             self._tokens_today.clear()
             self._last_reset = today
+            self._state.request_snapshot()
     
     def record_request(
         self,
@@ -127,19 +130,12 @@ class UsageTracker:
             self._requests_today[model_name] += 1
             
             # Record for RPM tracking
-            now = datetime.now(timezone.utc)
-            self._requests_minute[model_name].append(now)
-            
-            # Clean up old minute entries (keep last 60 seconds)
-            cutoff = now.timestamp() - 60
-            self._requests_minute[model_name] = [
-                ts for ts in self._requests_minute[model_name]
-                if ts.timestamp() > cutoff
-            ]
+            self._requests_minute.add(model_name)
             
             # Record tokens
             total_tokens = input_tokens + output_tokens
             self._tokens_today[model_name] += total_tokens
+            self._state.record({"d": self._last_reset.isoformat(), "m": model_name, "t": total_tokens})
             
             logger.debug(
                 f"Recorded usage for {model_name}: "
@@ -147,13 +143,6 @@ class UsageTracker:
                 f"(total today: {self._requests_today[model_name]} req, "
                 f"{self._tokens_today[model_name]} tokens)"
             )
-        
-        # Save to disk asynchronously after recording (outside lock)
-        try:
-            loop = asyncio.get_running_loop()
-            loop.create_task(self._save_to_disk_async())
-        except RuntimeError:
-            logger.debug("No event loop available for async save, skipping")
     
     def _get_limits(self, model_name: str) -> Dict:
         """Get rate limits for a model, falling back to conservative defaults."""
@@ -166,7 +155,7 @@ class UsageTracker:
         limits = self._get_limits(model_name)
         
         requests_today = self._requests_today.get(model_name, 0)
-        requests_minute = len(self._requests_minute.get(model_name, []))
+        requests_minute = self._requests_minute.count(model_name)
         tokens_today = self._tokens_today.get(model_name, 0)
         
         rpm_limit = limits.get("rpm", 0)
@@ -227,7 +216,7 @@ class UsageTracker:
             limits = self._get_limits(model_name)
             
             requests_today = self._requests_today.get(model_name, 0)
-            requests_minute = len(self._requests_minute.get(model_name, []))
+            requests_minute = self._requests_minute.count(model_name)
             tokens_today = self._tokens_today.get(model_name, 0)
             
             rpm_limit = limits.get("rpm", 0)
@@ -248,6 +237,12 @@ class UsageTracker:
             
             return True, "OK"
     
+    def minute_retry_after(self, model_name: str, limit: Optional[int] = None) -> float:
+        """Seconds until the last minute holds fewer than ``limit`` requests (default: the model's RPM)."""
+        if limit is None:
+            limit = self._get_limits(model_name).get("rpm", 0)
+        return self._requests_minute.retry_after(model_name, limit)
+
     def precheck_request(
         self,
         model_name: str,
@@ -256,6 +251,8 @@ class UsageTracker:
         history: Optional[list] = None,
         task_type: str = "chat",
         enforce: bool = True,
+        system_prompt_tokens: Optional[int] = None,
+        history_tokens: Optional[int] = None,
     ) -> Tuple[QuotaCheckResult, TokenEstimate]:
         """
         Pre-check a request before sending to the API.
@@ -269,6 +266,8 @@ class UsageTracker:
             history: Conversation history
             task_type: Type of task
             enforce: If True, reject requests that exceed limits
+            system_prompt_tokens: Precomputed system prompt token count
+            history_tokens: Running history token total (e.g. from a TokenLedger)
             
         Returns:
             Tuple of (QuotaCheckResult, TokenEstimate)
@@ -279,6 +278,8 @@ class UsageTracker:
             system_prompt=system_prompt,
             history=history,
             task_type=task_type,
+            system_prompt_tokens=system_prompt_tokens,
+            history_tokens=history_tokens,
         )
         
         # Get current usage
@@ -309,19 +310,13 @@ class UsageTracker:
             return self._get_usage_unlocked(model_name)
     
     def _load_from_disk(self):
-        """Load usage data from disk."""
+        """Load usage data from the last snapshot plus the journal."""
+        data, deltas = self._state.load()
         try:
-            if self._persistence_file.exists():
-                with open(self._persistence_file, 'r') as f:
-                    data = json.load(f)
-                
-                # Check if data is from today
-                date_str = data.get("date", "")
-                if not date_str:
-                    return
+            today = datetime.now(timezone.utc).date()
+            date_str = (data or {}).get("date", "")
+            if date_str:
                 saved_date = datetime.fromisoformat(date_str).date()
-                today = datetime.now(timezone.utc).date()
-                
                 if saved_date == today:
                     self._requests_today = defaultdict(int, data.get("requests_today", {}))
                     self._tokens_today = defaultdict(int, data.get("tokens_today", {}))
@@ -329,63 +324,22 @@ class UsageTracker:
                     logger.info(f"Loaded usage data from {self._persistence_file}")
                 else:
                     logger.info(f"Usage data is from {saved_date}, starting fresh for {today}")
+            for delta in deltas:
+                if delta.get("d") != today.isoformat():
+                    continue
+                self._requests_today[delta["m"]] += 1
+                self._tokens_today[delta["m"]] += int(delta.get("t", 0))
         except Exception as e:
             logger.warning(f"Could not load usage data from disk: {e}")
     
-    async def _save_to_disk_async(self):
-        """Save usage data to disk asynchronously (non-blocking)."""
-        try:
-            with self._lock:
-                data = {
-                    "date": self._last_reset.isoformat(),
-                    "requests_today": dict(self._requests_today),
-                    "tokens_today": dict(self._tokens_today),
-                    "saved_at": datetime.now(timezone.utc).isoformat()
-                }
-            
-            def _write_file():
-                self._persistence_file.parent.mkdir(parents=True, exist_ok=True)
-                with tempfile.NamedTemporaryFile(
-                    mode='w',
-                    dir=self._persistence_file.parent,
-                    prefix=f"{self._persistence_file.stem}-",
-                    suffix='.tmp',
-                    delete=False,
-                ) as f:
-                    json.dump(data, f, indent=2)
-                    temp_file = Path(f.name)
-                temp_file.replace(self._persistence_file)
-            
-            await asyncio.to_thread(_write_file)
-            logger.debug(f"Saved usage data to {self._persistence_file}")
-        except Exception as e:
-            logger.error(f"Failed to save usage data to disk: {e}")
-    
-    def _save_to_disk(self):
-        """Synchronous save (for use in __init__ only)."""
-        try:
-            data = {
-                "date": self._last_reset.isoformat(),
-                "requests_today": dict(self._requests_today),
-                "tokens_today": dict(self._tokens_today),
-                "saved_at": datetime.now(timezone.utc).isoformat()
-            }
-            
-            self._persistence_file.parent.mkdir(parents=True, exist_ok=True)
-            with tempfile.NamedTemporaryFile(
-                mode='w',
-                dir=self._persistence_file.parent,
-                prefix=f"{self._persistence_file.stem}-",
-                suffix='.tmp',
-                delete=False,
-            ) as f:
-                json.dump(data, f, indent=2)
-                temp_file = Path(f.name)
-            temp_file.replace(self._persistence_file)
-            
-            logger.debug(f"Saved usage data to {self._persistence_file}")
-        except Exception as e:
-            logger.error(f"Failed to save usage data to disk: {e}")
+    def _snapshot_state(self) -> Dict:
+        """Snapshot payload; called by the state journal with ``_lock`` held."""
+        return {
+            "date": self._last_reset.isoformat(),
+            "requests_today": dict(self._requests_today),
+            "tokens_today": dict(self._tokens_today),
+            "saved_at": datetime.now(timezone.utc).isoformat()
+        }
     
     def get_all_usage(self) -> Dict:
         """Get usage stats for all tracked models."""
@@ -10,6 +10,7 @@ from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
 
 from app.services.database import get_database
+from app.services.executors import crypto
 
 logger = logging.getLogger(__name__)
 
@@ -43,7 +44,7 @@ class UserService:
         # Hash password if provided (local auth)
         password_hash = None
         if password:
-            password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+            password_hash = (await crypto.run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())).decode('utf-8')
         
         try:
             db = self._db
@@ -89,7 +90,7 @@ class UserService:
         if not user.get("password_hash"):
             return None  # OAuth-only user, can't login with password
         
-        if bcrypt.checkpw(password.encode('utf-8'), user["password_hash"].encode('utf-8')):
+        if await crypto.run(bcrypt.checkpw, password.encode('utf-8'), user["password_hash"].encode('utf-8')):
             # Update last login
             await db._db.execute(
                 "UPDATE users SET last_login_at = ? WHERE id = ?",
@@ -201,7 +202,7 @@ class UserService:
         return await self.get_user_by_id(user_id)
 
     async def change_password(self, user_id: str, new_password: str) -> bool:
-        password_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        password_hash = (await crypto.run(bcrypt.hashpw, new_password.encode('utf-8'), bcrypt.gensalt())).decode('utf-8')
         db = self._db
         await db._db.execute("UPDATE users SET password_hash = ? WHERE id = ?", (password_hash, user_id))
         await db._db.commit()
@@ -0,0 +1,75 @@
+"""Tests for headroom-weighted balancing across Gemini accounts."""
+
+from collections import Counter
+
+import pytest
+
+from app.config import settings
+from app.services.api_key_manager import APIKeyManager, GeminiAccountConfig
+from app.services.state_journal import StateJournal
+
+MODEL = "gemini-2.5-flash"  # 5 RPM / 20 RPD locally
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "database_path", str(tmp_path / "witnessreplay.db"))
+    monkeypatch.setattr("app.services.api_key_manager.state_journal", StateJournal())
+
+
+def _manager(policy, monkeypatch, accounts=3):
+    monkeypatch.setattr(settings, "gemini_account_balancing", policy)
+    return APIKeyManager([
+        GeminiAccountConfig(account_id=f"acct{i}", label=f"Account {i}", priority=i, api_key=f"k{i}")
+        for i in range(1, accounts + 1)
+    ])
+
+
+def test_priority_policy_keeps_primary_first(monkeypatch):
+    manager = _manager("priority", monkeypatch)
+    for _ in range(3):
+        manager.record_success("acct1", MODEL)
+    assert [a.account_id for a in manager.get_account_candidates(MODEL)] == ["acct1", "acct2", "acct3"]
+
+
+def test_headroom_counts_in_flight_requests_and_fresh_headers(monkeypatch):
+    manager = _manager("p2c", monkeypatch)
+    assert manager._headroom("acct1", MODEL) == 1.0
+
+    manager.note_selection("acct1", MODEL)
+    manager.note_selection("acct1", MODEL)
+    assert manager._headroom("acct1", MODEL) == pytest.approx(3 / 5)
+
+    manager.record_success("acct1", MODEL)  # One finished, one still in flight
+    assert manager.get_model_status(MODEL)["accounts"][0]["in_flight"] == 1
+    assert manager._headroom("acct1", MODEL) == pytest.approx(3 / 5)
+
+    with manager._lock:
+        manager._apply_headers("acct2", MODEL, {"x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "90"}, status_code=200)
+    assert manager._headroom("acct2", MODEL) == pytest.approx(0.9)
+
+    manager.release_selection("acct1", MODEL)
+    manager.release_selection("acct1", MODEL)  # Never goes negative
+    assert manager.get_status()["in_flight"] == 0
+
+
+def test_p2c_prefers_the_less_loaded_of_two_accounts(monkeypatch):
+    manager = _manager("p2c", monkeypatch, accounts=2)
+    for _ in range(3):
+        manager.note_selection("acct1", MODEL)
+    firsts = Counter(manager.get_account_candidates(MODEL)[0].account_id for _ in range(20))
+    assert firsts == {"acct2": 20}
+
+
+def test_wrr_spreads_picks_in_proportion_to_headroom(monkeypatch):
+    manager = _manager("wrr", monkeypatch, accounts=2)
+    manager.record_success("acct1", MODEL)
+    manager.record_success("acct1", MODEL)
+    manager.record_success("acct1", MODEL)  # acct1 has 2/5 of its RPM left, acct2 all of it
+
+    firsts = Counter(manager.get_account_candidates(MODEL)[0].account_id for _ in range(70))
+    assert firsts["acct2"] == 50 and firsts["acct1"] == 20
+
+    for _ in range(2):
+        manager.record_success("acct1", MODEL)  # Out of RPM: acct1 drops behind even constrained ordering
+    assert [a.account_id for a in manager.get_account_candidates(MODEL)] == ["acct2", "acct1"]
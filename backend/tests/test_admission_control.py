@@ -0,0 +1,157 @@
+"""Tests for budget-aware admission control and load shedding."""
+
+import asyncio
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.middleware import admission as admission_middleware
+from app.middleware.admission import AdmissionControlMiddleware
+from app.services import executors as executors_module
+from app.services.admission_control import AdmissionController, AdmissionTier, classify_path, route_uses_quota
+
+
+def _controller(monkeypatch, backlog=0.0, budget=1.0):
+    monkeypatch.setattr(settings, "admission_loop_lag_ms", 100.0)
+    monkeypatch.setattr(settings, "admission_executor_backlog", 1.0)
+    monkeypatch.setattr(settings, "admission_budget_reserve", 0.2)
+    monkeypatch.setattr(settings, "admission_retry_after_seconds", 5)
+    controller = AdmissionController()
+    controller.enabled = True
+    signals = {"backlog": backlog, "budget": budget}
+    monkeypatch.setattr(controller, "_read_backlog_per_worker", lambda: signals["backlog"])
+    monkeypatch.setattr(controller, "_read_budget_remaining", lambda: signals["budget"])
+    return controller, signals
+
+
+def test_routes_are_classified_into_tiers():
+    assert classify_path("/api/health") == AdmissionTier.LIVE
+    assert classify_path("/api/auth/login") == AdmissionTier.LIVE
+    assert classify_path("/api/admin/rate-limiter") == AdmissionTier.LIVE
+    assert classify_path("/api/sessions/abc/messages") == AdmissionTier.INTERACTIVE
+    assert classify_path("/api/v1/cases/c1") == AdmissionTier.INTERACTIVE
+    assert classify_path("/api/admin/dashboard/stats") == AdmissionTier.BACKGROUND
+    assert classify_path("/api/admin/usage-trends") == AdmissionTier.BACKGROUND
+    assert classify_path("/api/patterns/analyze") == AdmissionTier.BULK
+    assert classify_path("/api/sessions/abc/pattern-match") == AdmissionTier.BULK
+    assert classify_path("/api/cases/bulk/assign") == AdmissionTier.BULK
+    assert classify_path("/api/translation/translate-batch") == AdmissionTier.BULK
+
+
+def test_loop_lag_sheds_tiers_in_order_and_holds(monkeypatch):
+    controller, _ = _controller(monkeypatch)
+    monkeypatch.setattr(settings, "admission_hold_seconds", 60.0)
+    for _ in range(20):
+        controller.update(lag_ms=250.0)  # Smoothed lag settles at 2.5x the threshold: level 2
+
+    assert controller.admit(AdmissionTier.LIVE) == (True, 0)
+    assert controller.admit(AdmissionTier.INTERACTIVE) == (True, 0)
+    assert controller.admit(AdmissionTier.BACKGROUND, source="GET /api/admin/analytics") == (False, 10)
+    assert controller.admit(AdmissionTier.BULK) == (False, 10)
+
+    controller.update(lag_ms=0.0)
+    assert controller.admit(AdmissionTier.BACKGROUND)[0] is False  # Still inside the hold period
+
+    monkeypatch.setattr(settings, "admission_hold_seconds", 0.0)
+    for _ in range(20):
+        controller.update(lag_ms=0.0)
+    assert controller.admit(AdmissionTier.BULK) == (True, 0)
+
+    stats = controller.get_stats()
+    assert stats["tiers"]["background"] == {"admitted": 0, "shed": 2}
+    assert stats["recent_shed"][0]["source"] == "GET /api/admin/analytics"
+    assert stats["recent_shed"][0]["reason"] == "loop_lag"
+
+
+def test_budget_only_sheds_quota_work_and_backlog_sheds_everything_but_live(monkeypatch):
+    controller, signals = _controller(monkeypatch, budget=0.15)
+    monkeypatch.setattr(settings, "admission_hold_seconds", 0.0)
+    controller.update()
+
+    assert controller.admit(AdmissionTier.BULK, uses_quota=True) == (False, 5)  # Pattern analysis spends quota
+    assert controller.admit(AdmissionTier.BACKGROUND) == (True, 0)  # A dashboard read does not
+    assert controller.get_stats()["recent_shed"][-1]["reason"] == "budget"
+
+    signals.update(backlog=5.0, budget=1.0)
+    controller.update()
+    assert controller.get_stats()["shedding_tiers"] == ["interactive", "background", "bulk"]
+    assert controller.admit(AdmissionTier.INTERACTIVE) == (False, 15)
+    assert controller.admit(AdmissionTier.LIVE) == (True, 0)
+
+
+def test_middleware_returns_fast_503_with_retry_after(monkeypatch):
+    controller, signals = _controller(monkeypatch, backlog=2.5)
+    controller.update()
+    monkeypatch.setattr(admission_middleware, "admission_controller", controller)
+    app = FastAPI()
+    app.add_middleware(AdmissionControlMiddleware)
+    handled = []
+
+    @app.get("/api/admin/analytics")
+    async def analytics():
+        handled.append("analytics")
+        return {"ok": True}
+
+    @app.get("/api/health")
+    async def health():
+        return {"status": "ok"}
+
+    client = TestClient(app)
+    shed = client.get("/api/admin/analytics")
+    assert shed.status_code == 503 and shed.headers["Retry-After"] == "10"
+    assert shed.json()["tier"] == "background" and handled == []
+    assert client.get("/api/health").status_code == 200
+
+
+def test_exports_are_admitted_when_the_budget_is_spent(monkeypatch):
+    controller, _ = _controller(monkeypatch, budget=0.0)
+    controller.update()
+
+    for path in (
+        "/api/sessions/abc/export",
+        "/api/sessions/abc/export/markdown",
+        "/api/export/cases.csv",
+        "/api/cases/c1/export",
+    ):
+        assert classify_path(path) == AdmissionTier.BULK and not route_uses_quota(path)
+        assert controller.admit(classify_path(path), uses_quota=route_uses_quota(path)) == (True, 0)
+
+    for path in ("/api/patterns/analyze", "/api/reports/orphans/auto-assign", "/api/sessions/abc/comparison-report"):
+        assert route_uses_quota(path)
+    assert controller.admit(AdmissionTier.BULK, uses_quota=route_uses_quota("/api/patterns/analyze")) == (False, 10)
+
+
+def test_shed_level_recovers_after_callers_cancel_queued_jobs(monkeypatch):
+    monkeypatch.setattr(settings, "admission_executor_backlog", 1.0)
+    monkeypatch.setattr(settings, "admission_hold_seconds", 0.0)
+    render = executors_module.NamedExecutor("test-render", max_workers=2, queue_limit=8)
+    llm = executors_module.NamedExecutor("test-llm", max_workers=4, queue_limit=8)
+    monkeypatch.setattr(executors_module, "cpu_render", render)
+    monkeypatch.setattr(executors_module, "llm_io", llm)
+    controller = AdmissionController()
+    controller.enabled = True
+    monkeypatch.setattr(controller, "_read_budget_remaining", lambda: 1.0)
+    release = threading.Event()
+
+    async def scenario():
+        busy = [asyncio.create_task(render.run(release.wait, 5)) for _ in range(2)]
+        queued = [asyncio.create_task(render.run(lambda: None)) for _ in range(6)]
+        await asyncio.sleep(0.05)
+        controller.update()
+        assert controller.shed_level() == 2  # 3 queued jobs per render worker
+        for task in queued:
+            task.cancel()  # The WebSocket clients disconnect
+        await asyncio.gather(*queued, return_exceptions=True)
+        release.set()
+        await asyncio.gather(*busy)
+        controller.update()
+        assert controller.shed_level() == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        render.shutdown(wait=True)
+        llm.shutdown(wait=True)
@@ -0,0 +1,242 @@
+"""Tests for the bounded scene agent registry."""
+
+import asyncio
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents import scene_agent as scene_agent_module
+from app.agents.scene_agent import (
+    SceneReconstructionAgent,
+    evict_idle_agents,
+    get_agent,
+    get_agent_registry_stats,
+    load_agent,
+    pin_agent,
+    remove_agent,
+)
+from app.config import settings
+from app.services.database import DatabaseService
+from app.services.firestore import firestore_service
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """Start every test with an empty registry and small limits."""
+    monkeypatch.setattr(SceneReconstructionAgent, "_initialize_model", lambda self: None)
+    monkeypatch.setattr(scene_agent_module, "_agent_cache", OrderedDict())
+    monkeypatch.setattr(scene_agent_module, "_agent_last_used", {})
+    monkeypatch.setattr(scene_agent_module, "_pinned_agents", set())
+    monkeypatch.setattr(scene_agent_module, "_evicted_snapshots", {})
+    monkeypatch.setattr(scene_agent_module, "_agent_registry_stats", {
+        "created": 0, "rehydrated": 0, "evicted": 0, "persisted": 0, "dropped": 0,
+    })
+    monkeypatch.setattr(settings, "agent_cache_max_agents", 3)
+    monkeypatch.setattr(settings, "agent_cache_memory_budget_mb", 64)
+    monkeypatch.setattr(settings, "agent_cache_idle_ttl_seconds", 60)
+
+
+def _talk(agent, text="A red car ran the light."):
+    agent.conversation_history.append({"role": "user", "content": text, "timestamp": "2026-01-01T00:00:00"})
+
+
+def test_least_recently_used_agent_is_evicted_and_rehydrated():
+    first = get_agent("s1")
+    _talk(first)
+    get_agent("s2")
+    get_agent("s3")
+    get_agent("s1")  # touch: s2 is now the oldest
+    get_agent("s4")
+
+    stats = get_agent_registry_stats()
+    assert stats["cached_agents"] == 3
+    assert "s2" not in scene_agent_module._agent_cache
+    assert stats["evicted"] == 1
+
+    get_agent("s5")  # evicts s3, then s1
+    get_agent("s6")
+    assert "s1" not in scene_agent_module._agent_cache
+
+    restored = get_agent("s1")
+    assert restored is not first
+    assert restored.conversation_history == first.conversation_history
+    assert get_agent_registry_stats()["rehydrated"] == 1
+
+
+def test_pinned_agents_survive_limits_and_idle_eviction():
+    live = get_agent("live")
+    pin_agent(live)
+    for index in range(5):
+        get_agent(f"other-{index}")
+
+    assert scene_agent_module._agent_cache["live"] is live
+    assert evict_idle_agents(now=scene_agent_module.time.monotonic() + 3600) == 2
+    assert list(scene_agent_module._agent_cache) == ["live"]
+
+
+def test_memory_budget_evicts_large_agents(monkeypatch):
+    monkeypatch.setattr(settings, "agent_cache_max_agents", 100)
+    monkeypatch.setattr(settings, "agent_cache_memory_budget_mb", 1)
+    big = get_agent("big")
+    _talk(big, "x" * 1_100_000)
+    get_agent("small-1")
+    get_agent("small-2")  # over budget: the big, least recent agent goes first
+
+    assert "big" not in scene_agent_module._agent_cache
+    assert get_agent_registry_stats()["estimated_bytes"] <= 1024 * 1024
+
+
+def test_evicted_state_is_written_to_session_and_loaded_back(monkeypatch):
+    sessions = {"s1": SimpleNamespace(id="s1", status="active", metadata={"location": "5th and Main"})}
+
+    async def fake_get_session(session_id):
+        return sessions.get(session_id)
+
+    async def fake_update_session_metadata(session_id, key, value):
+        sessions[session_id].metadata[key] = value
+        return True
+
+    monkeypatch.setattr(firestore_service, "get_session", fake_get_session)
+    monkeypatch.setattr(firestore_service, "update_session_metadata", fake_update_session_metadata)
+
+    async def scenario():
+        agent = get_agent("s1")
+        _talk(agent)
+        agent.scene_description = "Intersection at night"
+        scene_agent_module._evict_agent("s1")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return await load_agent("s1")
+
+    restored = asyncio.run(scenario())
+
+    assert sessions["s1"].metadata["agent_state"]["scene_description"] == "Intersection at night"
+    assert sessions["s1"].metadata["location"] == "5th and Main"
+    assert scene_agent_module._evicted_snapshots == {}
+    assert restored.scene_description == "Intersection at night"
+    assert get_agent_registry_stats()["persisted"] == 1
+
+
+def test_sqlite_metadata_update_only_touches_its_key(tmp_path):
+    async def scenario():
+        db = DatabaseService(str(tmp_path / "sessions.db"))
+        await db.initialize()
+        await db.save_session({"id": "s1", "metadata": {"location": "5th and Main"}})
+        # A concurrent writer lands between the agent's eviction and its write
+        await db.save_session({"id": "s1", "metadata": {"location": "5th and Main", "priority": "high"}})
+        assert await db.set_session_metadata_key("s1", "agent_state", {"revision": 3})
+        assert not await db.set_session_metadata_key("missing", "agent_state", {})
+        session = await db.get_session("s1")
+        await db.close()
+        return session
+
+    session = asyncio.run(scenario())
+    assert session["metadata"] == {"location": "5th and Main", "priority": "high", "agent_state": {"revision": 3}}
+
+
+def test_sqlite_metadata_key_removal_leaves_the_rest(tmp_path):
+    async def scenario():
+        db = DatabaseService(str(tmp_path / "sessions.db"))
+        await db.initialize()
+        await db.save_session({"id": "s1", "metadata": {"location": "5th and Main", "agent_state": {"revision": 3}}})
+        assert await db.remove_session_metadata_key("s1", "agent_state")
+        assert not await db.remove_session_metadata_key("s1", "agent_state")
+        assert not await db.remove_session_metadata_key("missing", "agent_state")
+        session = await db.get_session("s1")
+        await db.close()
+        return session
+
+    assert asyncio.run(scenario())["metadata"] == {"location": "5th and Main"}
+
+
+def test_removed_agent_state_is_cleared_and_not_rehydrated(monkeypatch):
+    sessions = {"s1": SimpleNamespace(id="s1", status="active", metadata={"location": "5th and Main"})}
+
+    async def fake_update_session_metadata(session_id, key, value):
+        sessions[session_id].metadata[key] = value
+        return True
+
+    async def fake_remove_session_metadata_key(session_id, key):
+        return sessions[session_id].metadata.pop(key, None) is not None
+
+    monkeypatch.setattr(firestore_service, "update_session_metadata", fake_update_session_metadata)
+    monkeypatch.setattr(firestore_service, "remove_session_metadata_key", fake_remove_session_metadata_key)
+
+    async def scenario():
+        _talk(get_agent("s1"))
+        scene_agent_module._evict_agent("s1")
+        await asyncio.sleep(0)
+        assert "agent_state" in sessions["s1"].metadata
+        remove_agent("s1")  # the interview ended
+        await asyncio.sleep(0)
+        return get_agent("s1", session=sessions["s1"])
+
+    fresh = asyncio.run(scenario())
+    assert sessions["s1"].metadata == {"location": "5th and Main"}
+    assert fresh.conversation_history == []
+
+    completed = SimpleNamespace(id="s2", status="completed", metadata={"agent_state": fresh.export_state()})
+    assert get_agent("s2", session=completed) is not fresh
+    assert get_agent_registry_stats()["rehydrated"] == 0
+
+
+def test_failed_snapshot_writes_are_retried_then_dropped(monkeypatch):
+    monkeypatch.setattr(scene_agent_module, "SNAPSHOT_RETRY_BASE_SECONDS", 0)
+    attempts = []
+
+    async def failing_update(session_id, key, value):
+        attempts.append(session_id)
+        if len(attempts) < 3:
+            raise RuntimeError("store unavailable")
+        return True
+
+    monkeypatch.setattr(firestore_service, "update_session_metadata", failing_update)
+
+    async def scenario():
+        _talk(get_agent("s1"))
+        scene_agent_module._evict_agent("s1")
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert attempts == ["s1", "s1", "s1"]
+    assert scene_agent_module._evicted_snapshots == {}
+    assert get_agent_registry_stats()["persisted"] == 1
+
+    async def down(session_id, key, value):
+        raise RuntimeError("store unavailable")
+
+    monkeypatch.setattr(firestore_service, "update_session_metadata", down)
+
+    async def outage():
+        for index in range(6):
+            _talk(get_agent(f"o{index}"))
+            scene_agent_module._evict_agent(f"o{index}")
+        # Pending snapshots never exceed the cache bound, even mid-outage
+        assert len(scene_agent_module._evicted_snapshots) == settings.agent_cache_max_agents
+        for _ in range(20):
+            await asyncio.sleep(0)
+
+    asyncio.run(outage())
+    assert scene_agent_module._evicted_snapshots == {}
+    assert get_agent_registry_stats()["dropped"] == 6
+
+
+def test_session_payloads_do_not_expose_agent_state(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.models.schemas import ReconstructionSession
+
+    session = ReconstructionSession(id="s1", metadata={"location": "5th and Main", "agent_state": {"revision": 3}})
+
+    async def fake_get_session(session_id):
+        return session if session_id == "s1" else None
+
+    monkeypatch.setattr(firestore_service, "get_session", fake_get_session)
+    response = TestClient(app).get("/api/sessions/s1")
+
+    assert response.status_code == 200
+    assert response.json()["metadata"] == {"location": "5th and Main"}
+    assert session.metadata["agent_state"] == {"revision": 3}  # the stored record keeps it
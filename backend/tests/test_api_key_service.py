@@ -0,0 +1,140 @@
+"""Tests for public API key validation, per-key rate limits and usage accounting."""
+
+import asyncio
+
+import bcrypt
+from fastapi import FastAPI, Depends
+from fastapi.testclient import TestClient
+import pytest
+
+from app.api import auth as auth_module
+from app.services import api_key_service as api_key_service_module
+from app.services import database as database_module
+from app.services.api_key_service import APIKeyService
+from app.services.database import DatabaseService
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    real_gensalt = bcrypt.gensalt
+    monkeypatch.setattr(bcrypt, "gensalt", lambda rounds=4: real_gensalt(4))  # Fast hashes for tests
+    db_svc = DatabaseService(str(tmp_path / "keys.db"))
+    asyncio.run(db_svc.initialize())
+    monkeypatch.setattr(database_module, "_db_instance", db_svc)
+    svc = APIKeyService()
+    asyncio.run(svc.initialize())
+    yield svc
+    asyncio.run(db_svc.close())
+
+
+def test_validation_checks_one_hash_and_then_uses_the_cache(service):
+    async def scenario():
+        keys = [await service.create_key(f"client-{i}") for i in range(5)]
+        first = await service.validate_key(keys[3]["key"])
+        assert first["id"] == keys[3]["id"]
+        assert service.get_validation_stats()["bcrypt_checks"] == 1  # Not one per active key
+
+        again = await service.validate_key(keys[3]["key"])
+        assert again == first and service.get_validation_stats()["cache_hits"] == 1
+        assert service.get_validation_stats()["bcrypt_checks"] == 1
+        return (await service.get_key_stats(keys[3]["id"]))["usage_count"]
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_unindexed_keys_are_found_by_prefix_and_reindexed(service):
+    async def scenario():
+        created = await service.create_key("legacy")
+        await service._db._db.execute("UPDATE api_keys SET key_index = NULL")
+        await service._db._db.commit()
+
+        assert (await service.validate_key(created["key"]))["id"] == created["id"]
+        assert service.get_validation_stats()["reindexed"] == 1
+
+        fresh = APIKeyService()
+        await fresh.initialize()
+        assert (await fresh.validate_key(created["key"]))["id"] == created["id"]
+        return fresh.get_validation_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["bcrypt_checks"] == 1 and stats["reindexed"] == 0
+
+
+def test_revoked_and_unknown_keys_are_rejected(service):
+    async def scenario():
+        created = await service.create_key("short-lived")
+        assert await service.validate_key(created["key"])
+        assert await service.revoke_key(created["id"])
+        assert await service.validate_key(created["key"]) is None  # Cache entry dropped on revoke
+        assert await service.validate_key("wr_" + "x" * 43) is None
+        assert await service.validate_key("not-a-key") is None
+
+    asyncio.run(scenario())
+    stats = service.get_validation_stats()
+    assert stats["rejected"] == 2 and stats["bcrypt_checks"] == 1
+
+
+def test_usage_is_batched_and_merged_into_reads(service):
+    async def scenario():
+        created = await service.create_key("busy")
+        for _ in range(3):
+            await service.validate_key(created["key"])
+        cursor = await service._db._db.execute("SELECT usage_count FROM api_keys WHERE id = ?", (created["id"],))
+        assert (await cursor.fetchone())[0] == 0  # Nothing written per request
+        assert (await service.get_key_stats(created["id"]))["usage_count"] == 3
+        assert (await service.list_keys())[0]["usage_count"] == 3
+
+        assert await service.flush_usage() == 1
+        cursor = await service._db._db.execute(
+            "SELECT usage_count, last_used_at FROM api_keys WHERE id = ?", (created["id"],)
+        )
+        persisted = await cursor.fetchone()
+        assert persisted[0] == 3 and persisted[1]
+        await service.validate_key(created["key"])
+        return await service.get_key_stats(created["id"])
+
+    assert asyncio.run(scenario())["usage_count"] == 4
+    assert service.get_validation_stats()["usage_flush"]["requests_flushed"] == 3
+
+
+def test_token_bucket_sets_rate_limit_headers(service, monkeypatch):
+    monkeypatch.setattr(api_key_service_module, "api_key_service", service)
+    created = asyncio.run(service.create_key("limited", rate_limit_rpm=2))
+    app = FastAPI()
+
+    @app.get("/v1/ping")
+    async def ping(key=Depends(auth_module.require_api_key)):
+        return {"id": key["id"]}
+
+    client = TestClient(app)
+    headers = {"X-API-Key": created["key"]}
+    first, second, third = (client.get("/v1/ping", headers=headers) for _ in range(3))
+    assert first.status_code == 200 and first.headers["X-RateLimit-Limit"] == "2"
+    assert first.headers["X-RateLimit-Remaining"] == "1"
+    assert second.headers["X-RateLimit-Remaining"] == "0"
+    assert third.status_code == 429
+    assert third.headers["X-RateLimit-Remaining"] == "0"
+    assert 1 <= int(third.headers["Retry-After"]) <= 30  # One token refills in 30s at 2 rpm
+    assert int(third.headers["X-RateLimit-Reset"]) <= 60
+
+
+def test_clients_receive_the_per_key_headers_through_the_app_middleware(service, monkeypatch):
+    from app.main import app
+    from app.models.schemas import ReconstructionSession
+    from app.services.firestore import firestore_service
+
+    monkeypatch.setattr(api_key_service_module, "api_key_service", service)
+
+    async def get_session(session_id):
+        return ReconstructionSession(id=session_id, title="API report")
+
+    monkeypatch.setattr(firestore_service, "get_session", get_session)
+    created = asyncio.run(service.create_key("partner", permissions=["read"], rate_limit_rpm=7))
+    client = TestClient(app)
+    headers = {"X-API-Key": created["key"]}
+
+    responses = [client.get("/api/v1/sessions/s1", headers=headers) for _ in range(8)]
+    assert [r.status_code for r in responses] == [200] * 7 + [429]
+    assert [r.headers["X-RateLimit-Limit"] for r in responses] == ["7"] * 8
+    assert [r.headers["X-RateLimit-Remaining"] for r in responses] == [str(n) for n in range(6, -1, -1)] + ["0"]
+    assert all(int(r.headers["X-RateLimit-Reset"]) <= 60 for r in responses)
@@ -0,0 +1,143 @@
+"""Tests for cooperative cancellation of abandoned LLM work."""
+
+import asyncio
+import time
+
+import pytest
+
+from app.config import settings
+from app.services.api_key_manager import APIKeyManager, GeminiAccountConfig
+from app.services.cancellation import (
+    CancellationToken,
+    OperationCancelled,
+    cancellation_scope,
+    get_cancellation_stats,
+)
+from app.services.executors import NamedExecutor
+from app.services.state_journal import StateJournal
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+@pytest.fixture
+def executor():
+    pool = NamedExecutor("test-cancel", max_workers=2, queue_limit=4)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def _stream(state, delay=0.005):
+    """A blocking chunk stream that records how far it was read and whether it was closed."""
+    try:
+        for i in range(50):
+            time.sleep(delay)  # Waiting on the network for the next chunk
+            state["pulled"] = i + 1
+            yield Chunk(f"chunk {i} " * 10)
+    finally:
+        state["closed"] = True
+
+
+def test_stream_stops_at_the_next_chunk_once_the_caller_cancels(executor):
+    state = {"pulled": 0, "closed": False}
+    before = get_cancellation_stats()
+
+    async def scenario():
+        received = []
+        with cancellation_scope() as token:
+            with pytest.raises(OperationCancelled):
+                async for chunk in executor.iterate(_stream, state):
+                    received.append(chunk.text)
+                    if len(received) == 2:
+                        token.cancel("client_disconnected")
+        await asyncio.sleep(0.05)
+        return received
+
+    received = asyncio.run(scenario())
+    assert len(received) >= 2 and state["closed"] and state["pulled"] < 50
+    after = get_cancellation_stats()
+    assert after["discarded_chunks"] == before["discarded_chunks"] + 1
+    assert after["wasted_tokens"] > before["wasted_tokens"]
+    assert after["cancelled_by_reason"]["client_disconnected"] >= 1
+
+
+def test_cancelling_the_consumer_task_closes_the_stream(executor):
+    state = {"pulled": 0, "closed": False}
+
+    async def scenario():
+        async def consume():
+            async for _ in executor.iterate(_stream, state):
+                pass
+
+        task = asyncio.create_task(consume())
+        while state["pulled"] < 3:
+            await asyncio.sleep(0.001)
+        task.cancel()  # The client goes away mid-stream
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        while not state["closed"]:
+            await asyncio.sleep(0.001)
+
+    asyncio.run(scenario())
+    assert state["closed"] and state["pulled"] < 10
+
+
+def test_queued_jobs_are_dropped_and_abandoned_thread_time_is_counted(executor):
+    before = get_cancellation_stats()
+
+    async def scenario():
+        token = CancellationToken()
+        token.cancel("request_timeout")
+        with cancellation_scope(token):
+            with pytest.raises(OperationCancelled):
+                await executor.run(lambda: "never runs")
+
+        task = asyncio.create_task(executor.run(time.sleep, 0.1))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        await asyncio.sleep(0.15)
+
+    asyncio.run(scenario())
+    after = get_cancellation_stats()
+    assert after["dropped_jobs"] == before["dropped_jobs"] + 1
+    assert after["abandoned_jobs"] == before["abandoned_jobs"] + 1
+    assert after["wasted_thread_seconds"] - before["wasted_thread_seconds"] == pytest.approx(0.08, abs=0.05)
+
+
+def test_failover_is_not_started_after_the_caller_cancels(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "database_path", str(tmp_path / "witnessreplay.db"))
+    monkeypatch.setattr(settings, "gemini_account_balancing", "priority")
+    monkeypatch.setattr("app.services.api_key_manager.state_journal", StateJournal())
+    manager = APIKeyManager([
+        GeminiAccountConfig(account_id="primary", label="Primary", priority=1, api_key="k1"),
+        GeminiAccountConfig(account_id="secondary", label="Secondary", priority=2, api_key="k2"),
+    ])
+    calls = []
+
+    class RateLimited(Exception):
+        code = 429
+
+    class FakeModels:
+        def __init__(self, account_id):
+            self.account_id = account_id
+
+        def generate_content(self, **kwargs):
+            calls.append(self.account_id)
+            token.cancel("client_disconnected")  # The client leaves while the first attempt is in flight
+            raise RateLimited("429 RESOURCE_EXHAUSTED")
+
+    class FakeClient:
+        def __init__(self, account_id):
+            self.models = FakeModels(account_id)
+
+    monkeypatch.setattr(manager, "get_raw_client", lambda account_id=None: FakeClient(account_id))
+    before = get_cancellation_stats()
+    with cancellation_scope() as token:
+        with pytest.raises(OperationCancelled):
+            manager.get_rotating_client().models.generate_content(model="gemini-2.5-flash", contents="hi")
+
+    assert calls == ["primary"]
+    assert get_cancellation_stats()["dropped_attempts"] == before["dropped_attempts"] + 1
+    assert manager.limiter.get_stats()["in_flight"] == 0
@@ -0,0 +1,162 @@
+"""Tests for concurrent report-to-case assignment."""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.schemas import Case, ReconstructionSession
+from app.services.case_manager import CaseManager
+from app.services.firestore import firestore_service
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """In-memory case store standing in for firestore_service."""
+    cases = {}
+    counter = {"next": 0}
+
+    async def list_cases(limit=0):
+        await asyncio.sleep(0)
+        return [case.model_copy(deep=True) for case in cases.values()]
+
+    async def get_case(case_id):
+        await asyncio.sleep(0)
+        case = cases.get(case_id)
+        return case.model_copy(deep=True) if case else None
+
+    async def update_case(case):
+        cases[case.id] = case.model_copy(deep=True)
+        return True
+
+    async def create_case(case):
+        cases[case.id] = case.model_copy(deep=True)
+        return True
+
+    async def next_case_number():
+        counter["next"] += 1
+        return f"CASE-2026-{counter['next']:04d}"
+
+    monkeypatch.setattr(firestore_service, "list_cases", list_cases)
+    monkeypatch.setattr(firestore_service, "get_case", get_case)
+    monkeypatch.setattr(firestore_service, "update_case", update_case)
+    monkeypatch.setattr(firestore_service, "create_case", create_case)
+    monkeypatch.setattr(firestore_service, "_next_case_number_unlocked", next_case_number)
+    monkeypatch.setattr(firestore_service, "_sequence_lock", asyncio.Lock(), raising=False)
+    return cases
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    manager = CaseManager()
+    manager.client = None
+
+    async def no_summary(case_id):
+        return None
+
+    monkeypatch.setattr(manager, "generate_case_summary", no_summary)
+    return manager
+
+
+def _report(report_id, location, title):
+    return ReconstructionSession(
+        id=report_id,
+        title=title,
+        metadata={"location": location, "incident_type": "accident", "incident_subtype": "traffic_collision"},
+    )
+
+
+def test_llm_adjudication_runs_concurrently_for_unrelated_reports(store, manager, monkeypatch):
+    manager.client = object()
+    active = {"now": 0, "peak": 0}
+
+    async def slow_llm(report, cases):
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.05)
+        active["now"] -= 1
+        return None
+
+    async def no_classification(report):
+        return None
+
+    monkeypatch.setattr(manager, "_find_matching_case", slow_llm)
+    monkeypatch.setattr(manager, "_classify_incident", no_classification)
+    store["existing"] = Case(id="existing", case_number="CASE-2026-0000", title="Old case", location="Elm Park")
+
+    async def scenario():
+        return await asyncio.gather(
+            manager.assign_report_to_case(_report("r1", "5th Avenue and Main Street", "Crash on 5th")),
+            manager.assign_report_to_case(_report("r2", "Harbor Road and Pier 9", "Crash at the harbor")),
+        )
+
+    first, second = asyncio.run(scenario())
+    assert active["peak"] == 2
+    assert first != second
+    assert manager.get_assignment_stats()["created"] == 2
+
+
+def test_concurrent_reports_of_same_incident_share_one_case(store, manager, monkeypatch):
+    list_cases = firestore_service.list_cases
+    arrived = []
+    both_listed = asyncio.Event()
+
+    async def racing_list_cases(limit=0):
+        # The first two lookups both see the empty store, as two reports finishing together would
+        snapshot = await list_cases(limit)
+        if len(arrived) < 2:
+            arrived.append(limit)
+            if len(arrived) == 2:
+                both_listed.set()
+            await both_listed.wait()
+        return snapshot
+
+    monkeypatch.setattr(firestore_service, "list_cases", racing_list_cases)
+
+    async def scenario():
+        return await asyncio.gather(
+            manager.assign_report_to_case(_report("r1", "5th Avenue and Main Street", "Crash at 5th and Main")),
+            manager.assign_report_to_case(_report("r2", "5th Avenue and Main Street", "Crash at 5th and Main")),
+        )
+
+    first, second = asyncio.run(scenario())
+    assert first == second
+    assert len(store) == 1
+    assert sorted(store[first].report_ids) == ["r1", "r2"]
+    stats = manager.get_assignment_stats()
+    assert stats["create_conflicts"] == 1
+    assert stats["in_flight"] == 0 and stats["reports_locked"] == 0
+
+
+def test_attach_rereads_case_and_skips_merged_targets(store, manager):
+    store["merged"] = Case(
+        id="merged", case_number="CASE-2026-0001", title="Crash at 5th and Main",
+        location="5th Avenue and Main Street", status="merged", metadata={"merged_into": "gone"},
+    )
+    store["live"] = Case(
+        id="live", case_number="CASE-2026-0002", title="Crash at 5th and Main",
+        location="5th Avenue and Main Street", report_ids=["r0"],
+    )
+    report = _report("r1", "5th Avenue and Main Street", "Crash at 5th and Main")
+
+    assert asyncio.run(manager._commit_report_to_case("merged", report, [], {})) is None
+    case_id = asyncio.run(manager.assign_report_to_case(report))
+    assert case_id == "live"
+    assert store["live"].report_ids == ["r0", "r1"]
+
+
+def test_llm_match_call_runs_off_the_event_loop(store, manager):
+    calls = []
+
+    def generate_content(**kwargs):
+        calls.append(threading.current_thread().name)
+        return SimpleNamespace(text="1")
+
+    manager.client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+    case = Case(id="main", case_number="CASE-2026-0001", title="Crash at 5th and Main")
+    report = _report("r1", "5th Avenue and Main Street", "Crash at 5th and Main")
+    report.metadata["summary"] = "A red car ran the light at 5th and Main."
+
+    assert asyncio.run(manager._find_matching_case_llm(report, [case])) == "main"
+    assert len(calls) == 1 and calls[0].startswith("llm-io")
@@ -0,0 +1,182 @@
+"""Tests for adaptive per-account/model concurrency limits on Gemini calls."""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.services.api_key_manager import APIKeyManager, GeminiAccountConfig
+from app.services.concurrency_limiter import (
+    CallPriority,
+    ConcurrencyLimiter,
+    ConcurrencyLimitTimeout,
+    call_priority,
+    current_priority,
+)
+from app.services.executors import NamedExecutor, llm_io
+from app.services.state_journal import StateJournal
+
+
+def _limiter(**kwargs):
+    options = dict(enabled=True, initial_limit=2, min_limit=1, max_limit=8, backoff_ratio=0.5,
+                   latency_tolerance=2.5, queue_timeout_seconds=5.0)
+    options.update(kwargs)
+    return ConcurrencyLimiter(**options)
+
+
+def test_limit_grows_additively_and_halves_on_429():
+    limiter = _limiter(latency_tolerance=1e9)  # Sub-millisecond jitter must not count as a slowdown
+    for _ in range(20):
+        permits = [limiter.acquire("primary", "m") for _ in range(2)]
+        for permit in permits:
+            permit.release()
+    grown = limiter.get_stats()["keys"]["primary:m"]["limit_exact"]
+    assert 4 < grown <= 8
+
+    limiter.acquire("primary", "m").release(rate_limited=True)
+    stats = limiter.get_stats()["keys"]["primary:m"]
+    assert stats["limit_exact"] == pytest.approx(grown / 2)
+    assert stats["rate_limited"] == 1 and stats["in_flight"] == 0
+
+
+def test_slow_call_shrinks_the_limit():
+    limiter = _limiter(initial_limit=4)
+    permit = limiter.acquire("primary", "m")
+    permit.release()
+    permit = limiter.acquire("primary", "m")
+    permit.started_at -= 10  # Far slower than the ~0ms average so far
+    permit.release()
+    stats = limiter.get_stats()["keys"]["primary:m"]
+    assert stats["latency_backoffs"] == 1 and stats["limit_exact"] == pytest.approx(3.6)
+
+
+def test_waiters_are_served_by_priority_and_timeouts_do_not_leak():
+    limiter = _limiter(initial_limit=1)
+    held = limiter.acquire("primary", "m")
+    order = []
+
+    def wait(priority):
+        permit = limiter.acquire("primary", "m", priority=priority)
+        order.append(priority)
+        permit.release(measure_latency=False)  # Keep the limit at 1 so grants stay sequential
+
+    threads = []
+    for priority in (CallPriority.IMAGE_GENERATION, CallPriority.ANALYTICS, CallPriority.LIVE_INTERVIEW):
+        thread = threading.Thread(target=wait, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        while limiter.get_stats()["keys"]["primary:m"]["queue_depth"] < len(threads):
+            time.sleep(0.001)
+
+    assert limiter.get_stats()["keys"]["primary:m"]["queued_by_priority"] == {
+        "live_interview": 1, "analytics": 1, "image_generation": 1,
+    }
+    with pytest.raises(ConcurrencyLimitTimeout):
+        limiter.acquire("primary", "m", priority=CallPriority.TRANSCRIPTION, timeout=0.01)
+
+    held.release(measure_latency=False)
+    for thread in threads:
+        thread.join(timeout=5)
+    assert order == [CallPriority.LIVE_INTERVIEW, CallPriority.ANALYTICS, CallPriority.IMAGE_GENERATION]
+    stats = limiter.get_stats()["keys"]["primary:m"]
+    assert stats["timeouts"] == 1 and stats["queue_depth"] == 0 and stats["in_flight"] == 0
+    assert limiter.has_capacity("primary", "m")
+
+
+def test_priority_follows_the_call_into_the_llm_pool():
+    async def scenario():
+        with call_priority("transcription"):
+            inside = await llm_io.run(current_priority, "gemini-2.5-flash")
+        outside = await llm_io.run(current_priority, "imagen-4-fast-generate")
+        return inside, outside
+
+    assert asyncio.run(scenario()) == (CallPriority.TRANSCRIPTION, CallPriority.IMAGE_GENERATION)
+
+
+def test_rotating_client_feeds_429s_to_the_limiter(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "database_path", str(tmp_path / "witnessreplay.db"))
+    monkeypatch.setattr(settings, "gemini_account_balancing", "priority")
+    monkeypatch.setattr("app.services.api_key_manager.state_journal", StateJournal())
+    manager = APIKeyManager([
+        GeminiAccountConfig(account_id="primary", label="Primary", priority=1, api_key="k1"),
+        GeminiAccountConfig(account_id="secondary", label="Secondary", priority=2, api_key="k2"),
+    ])
+    manager.limiter = _limiter(initial_limit=4)
+
+    class RateLimited(Exception):
+        code = 429
+
+    class FakeModels:
+        def __init__(self, account_id):
+            self.account_id = account_id
+
+        def generate_content(self, **kwargs):
+            if self.account_id == "primary":
+                raise RateLimited("429 RESOURCE_EXHAUSTED")
+            return "ok"
+
+    class FakeClient:
+        def __init__(self, account_id):
+            self.models = FakeModels(account_id)
+
+    monkeypatch.setattr(manager, "get_raw_client", lambda account_id=None: FakeClient(account_id))
+    assert manager.get_rotating_client().models.generate_content(model="gemini-2.5-flash", contents="hi") == "ok"
+
+    keys = manager.get_status()["concurrency"]["keys"]
+    assert keys["primary:gemini-2.5-flash"]["limit"] == 2
+    assert keys["secondary:gemini-2.5-flash"]["acquired"] == 1
+    assert all(item["in_flight"] == 0 for item in keys.values())
+
+
+def test_rotating_calls_wait_for_slots_on_the_loop_not_in_worker_threads(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "database_path", str(tmp_path / "witnessreplay.db"))
+    monkeypatch.setattr("app.services.api_key_manager.state_journal", StateJournal())
+    manager = APIKeyManager([GeminiAccountConfig(account_id="primary", label="Primary", priority=1, api_key="k1")])
+    manager.limiter = _limiter(initial_limit=1)
+    pool = NamedExecutor("test-llm", max_workers=2, queue_limit=8)
+    release = threading.Event()
+    served = []
+
+    class FakeModels:
+        def generate_content(self, **kwargs):
+            if kwargs["contents"] == "first":
+                release.wait(5)
+            served.append(kwargs["contents"])
+            return "ok"
+
+    monkeypatch.setattr(manager, "get_raw_client", lambda account_id=None: SimpleNamespace(models=FakeModels()))
+    models = manager.get_rotating_client().models
+
+    async def call(contents, priority):
+        with call_priority(priority):
+            return await pool.run(models.generate_content, model="gemini-2.5-flash", contents=contents)
+
+    async def scenario():
+        first = asyncio.create_task(call("first", "analysis"))
+        while not pool.get_stats()["active"]:
+            await asyncio.sleep(0.001)
+        background = [asyncio.create_task(call(f"bg{i}", "analysis")) for i in range(4)]
+        live = asyncio.create_task(call("live", "chat"))
+        abandoned = asyncio.create_task(call("abandoned", "analysis"))
+        await asyncio.sleep(0.05)
+
+        stats = pool.get_stats()
+        assert stats["active"] == 1 and stats["queued"] == 0  # Waiters hold no threads
+        assert manager.limiter.get_stats()["keys"]["primary:gemini-2.5-flash"]["queue_depth"] == 6
+        abandoned.cancel()
+        release.set()
+        await asyncio.gather(first, live, *background)
+        with pytest.raises(asyncio.CancelledError):
+            await abandoned
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown(wait=True)
+    assert served[:2] == ["first", "live"] and "abandoned" not in served
+    stats = manager.limiter.get_stats()["keys"]["primary:gemini-2.5-flash"]
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0 and stats["overflow"] == 0
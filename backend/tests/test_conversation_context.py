@@ -0,0 +1,105 @@
+"""Tests for the token-budgeted rolling interview context."""
+
+import asyncio
+
+import pytest
+
+from app.agents.scene_agent import SceneReconstructionAgent
+from app.config import settings
+from app.services.conversation_context import (
+    SUMMARY_PREFIX,
+    RollingContext,
+    history_budget_for_model,
+    summary_text,
+)
+
+
+@pytest.fixture(autouse=True)
+def budget(monkeypatch):
+    monkeypatch.setattr(settings, "context_keep_turns", 2)
+    monkeypatch.setattr(settings, "context_history_budget_tokens", 100)
+    monkeypatch.setattr(settings, "context_history_budget_overrides", "gemma=40")
+
+
+def _history(turns):
+    history = []
+    for index in range(turns):
+        history.append({"role": "user", "content": f"Witness detail {index}"})
+        history.append({"role": "assistant", "content": f"Follow-up question {index}"})
+    return history
+
+
+def test_budget_overrides_match_model_substrings():
+    assert history_budget_for_model("gemma-3-27b-it") == 40
+    assert history_budget_for_model("gemini-2.5-flash") == 100
+    assert history_budget_for_model(None) == 100
+
+
+def test_under_budget_history_is_left_alone():
+    context = RollingContext()
+    history = _history(6)
+
+    async def summarize(messages):
+        raise AssertionError("should not summarize")
+
+    async def scenario():
+        return context.schedule(history, summarize, history_tokens=50, model_name="gemini-2.5-flash")
+
+    assert asyncio.run(scenario()) is None
+    assert context.apply(history) is None
+
+
+def test_summary_replaces_older_turns_and_keeps_recent_ones():
+    context = RollingContext()
+    history = _history(6)
+    seen = []
+
+    async def summarize(messages):
+        seen.extend(messages)
+        await asyncio.sleep(0)
+        return "- Red car ran the light"
+
+    async def scenario():
+        task = context.schedule(history, summarize, history_tokens=500, model_name="gemini-2.5-flash")
+        # A second trigger while the first is in flight is ignored
+        assert context.schedule(history, summarize, history_tokens=500, model_name="x") is None
+        history.append({"role": "user", "content": "One more thing"})  # new turn meanwhile
+        await task
+
+    asyncio.run(scenario())
+    assert seen == history[:8]
+
+    compacted = context.apply(history)
+    assert compacted[0]["content"] == f"{SUMMARY_PREFIX}- Red car ran the light"
+    assert compacted[1:] == history[8:]
+    assert summary_text(compacted) == "- Red car ran the light"
+    assert context.apply(compacted) is None  # consumed
+
+
+def test_summary_is_dropped_if_history_was_replaced():
+    context = RollingContext()
+    history = _history(6)
+
+    async def summarize(messages):
+        return "summary"
+
+    async def scenario():
+        await context.schedule(history, summarize, history_tokens=500, model_name=None)
+
+    asyncio.run(scenario())
+    assert context.apply(_history(6)) is None
+    assert not context.pending
+
+
+def test_agent_moves_summary_into_system_prompt(monkeypatch):
+    monkeypatch.setattr(SceneReconstructionAgent, "_initialize_model", lambda self: None)
+    agent = SceneReconstructionAgent("ctx-session")
+    agent.conversation_history = [
+        {"role": "system", "content": f"{SUMMARY_PREFIX}- Blue van, two suspects"},
+        {"role": "user", "content": "They ran north."},
+        {"role": "assistant", "content": "Which street?"},
+    ]
+
+    assert "- Blue van, two suspects" in agent._build_selected_prompt()
+    rebuilt = agent._history_from_conversation()
+    assert [content.role for content in rebuilt] == ["user", "model"]
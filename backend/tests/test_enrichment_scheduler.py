@@ -0,0 +1,186 @@
+"""Tests for the debounced post-turn enrichment scheduler."""
+
+import asyncio
+
+import pytest
+
+from app.services.enrichment_scheduler import EnrichmentScheduler, EnrichmentStage
+
+
+def _stage(name, log, delay=0.0, deps=(), fail=False):
+    async def run(results):
+        log.append(("start", name))
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError(f"{name} failed")
+        log.append(("end", name))
+        return {dep: results.get(dep) for dep in deps} or name
+
+    return EnrichmentStage(name, run, tuple(deps))
+
+
+def test_independent_stages_run_concurrently_after_dependencies():
+    scheduler = EnrichmentScheduler(debounce_seconds=0)
+    log = []
+    stages = [
+        _stage("prepare", log),
+        _stage("report", log, delay=0.05, deps=("prepare",)),
+        _stage("case", log, delay=0.05, deps=("prepare",)),
+        _stage("persist", log, deps=("report", "case")),
+    ]
+
+    async def scenario():
+        return await scheduler.schedule("s1", stages)
+
+    results = asyncio.run(scenario())
+
+    assert log.index(("start", "case")) < log.index(("end", "report"))
+    assert log[-1] == ("end", "persist")
+    assert results["persist"] == {"report": {"prepare": "prepare"}, "case": {"prepare": "prepare"}}
+    run = scheduler.get_session_run("s1")
+    assert set(run["stages_ms"]) == {"prepare", "report", "case", "persist"}
+    assert run["total_ms"] < 100 + 50  # report and case overlapped
+    assert scheduler.get_stats()["stages"]["report"]["runs"] == 1
+
+
+def test_newer_turn_supersedes_pending_work_but_lets_started_work_finish():
+    scheduler = EnrichmentScheduler(debounce_seconds=0.02)
+    log = []
+
+    async def scenario():
+        first = scheduler.schedule("s1", [_stage("image", log, delay=0.2)])
+        await asyncio.sleep(0.05)  # first is now running
+        second = scheduler.schedule("s1", [_stage("image", log)])
+        third = scheduler.schedule("s1", [_stage("image", log)])  # supersedes second while debouncing
+        await third
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first.done() and not first.cancelled()
+    assert second.cancelled()
+    # The third run waited for the first to finish instead of overlapping it
+    assert log == [("start", "image"), ("end", "image"), ("start", "image"), ("end", "image")]
+    stats = scheduler.get_stats()
+    assert stats["superseded"] == 1
+    assert stats["completed"] == 2
+    assert stats["stages"]["image"]["cancelled"] == 0
+    assert stats["pending_sessions"] == 0
+
+
+def test_continuous_turns_cannot_defer_work_past_the_max_debounce():
+    scheduler = EnrichmentScheduler(debounce_seconds=0.1, max_debounce_seconds=0.15)
+    log = []
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        task = None
+        while not log:
+            task = scheduler.schedule("s1", [_stage("image", log)])  # a turn every 20ms
+            await asyncio.sleep(0.02)
+        await task
+        return loop.time() - started
+
+    elapsed = asyncio.run(scenario())
+
+    assert log == [("start", "image"), ("end", "image")]
+    assert elapsed < 0.3
+    assert scheduler.get_stats()["completed"] == 1
+
+
+def test_cancel_stops_started_and_waiting_runs():
+    scheduler = EnrichmentScheduler(debounce_seconds=0)
+    log = []
+
+    async def scenario():
+        first = scheduler.schedule("s1", [_stage("image", log, delay=1)])
+        await asyncio.sleep(0.01)
+        second = scheduler.schedule("s1", [_stage("image", log)])
+        await asyncio.sleep(0.01)  # second is waiting for first
+        assert scheduler.cancel("s1")
+        await asyncio.gather(first, second, return_exceptions=True)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.cancelled() and second.cancelled()
+    assert log == [("start", "image")]
+    assert not scheduler.is_pending("s1")
+
+
+def test_failed_stage_skips_dependents_only():
+    scheduler = EnrichmentScheduler(debounce_seconds=0)
+    log = []
+    stages = [
+        _stage("report", log, fail=True),
+        _stage("case", log),
+        _stage("persist", log, deps=("report",)),
+    ]
+
+    async def scenario():
+        await scheduler.schedule("s1", stages)
+
+    asyncio.run(scenario())
+
+    assert ("end", "case") in log
+    assert ("start", "persist") not in log
+    assert scheduler.get_session_run("s1")["failed"] == ["report", "persist"]
+    assert scheduler.get_stats()["stages"]["persist"]["skipped"] == 1
+
+
+def test_invalid_graphs_are_rejected():
+    scheduler = EnrichmentScheduler(debounce_seconds=0)
+    with pytest.raises(ValueError):
+        scheduler.schedule("s1", [_stage("a", [], deps=("missing",))])
+    with pytest.raises(ValueError):
+        scheduler.schedule("s1", [_stage("a", [], deps=("b",)), _stage("b", [], deps=("a",))])
+
+
+def test_case_scene_bookkeeping_is_written_with_the_case_image(monkeypatch):
+    from types import SimpleNamespace
+
+    from app.api import websocket as websocket_module
+
+    writes = []
+    case = SimpleNamespace(
+        id="c1", title="Crash", summary="Two cars collided at 5th and Main.", scene_image_url=None,
+        report_ids=[], metadata={},
+    )
+
+    async def get_case(case_id):
+        return case
+
+    async def update_case(updated):
+        writes.append(("case", updated.scene_image_url))
+        return True
+
+    async def update_session_metadata(session_id, key, value):
+        writes.append(("session", key))
+        return True
+
+    async def save_generated_image(record):
+        writes.append(("image", record["entity_type"]))
+
+    async def generate_case_scene(*args, **kwargs):
+        return {"path": "/static/case.png"}
+
+    firestore = websocket_module.firestore_service
+    monkeypatch.setattr(firestore, "get_case", get_case)
+    monkeypatch.setattr(firestore, "update_case", update_case)
+    monkeypatch.setattr(firestore, "update_session_metadata", update_session_metadata)
+    monkeypatch.setattr(firestore, "save_generated_image", save_generated_image)
+    monkeypatch.setattr(websocket_module.imagen_service, "generate_case_scene_with_fallback", generate_case_scene)
+
+    handler = websocket_module.WebSocketHandler.__new__(websocket_module.WebSocketHandler)
+    handler.session_id = "s1"
+    prep = {"metadata": {}, "statement_count": 5, "session": SimpleNamespace(case_id="c1")}
+    updates = asyncio.run(handler._auto_refresh_case_scene({"prepare": prep}))
+
+    assert updates["case_scene_statement_count"] == 5
+    # The throttling count lands right after the case write, not in a later stage
+    assert writes[:3] == [
+        ("case", "/static/case.png"),
+        ("session", "case_scene_statement_count"),
+        ("session", "case_scene_updated_at"),
+    ]
+    assert writes[-1] == ("image", "case")
@@ -0,0 +1,100 @@
+"""Tests for the named blocking-work executors."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.executors import NamedExecutor, get_executor, get_executor_stats, run_in
+
+
+def test_run_uses_named_worker_threads():
+    executor = NamedExecutor("test-pool", max_workers=2, queue_limit=4)
+
+    async def scenario():
+        return await executor.run(lambda: threading.current_thread().name)
+
+    try:
+        assert asyncio.run(scenario()).startswith("test-pool")
+        stats = executor.get_stats()
+        assert stats["submitted"] == 1
+        assert stats["completed"] == 1
+        assert stats["active"] == 0
+        assert stats["queued"] == 0
+    finally:
+        executor.shutdown(wait=True)
+
+
+def test_queue_limit_bounds_concurrent_submissions():
+    executor = NamedExecutor("test-bounded", max_workers=1, queue_limit=1)
+    release = threading.Event()
+    peak = {"queued": 0}
+
+    def blocking():
+        release.wait(timeout=5)
+        return True
+
+    async def scenario():
+        tasks = [asyncio.create_task(executor.run(blocking)) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        peak["queued"] = executor.get_stats()["submitted"]
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    try:
+        assert asyncio.run(scenario()) == [True] * 4
+        # One running plus one waiting; the other two waited on the event loop
+        assert peak["queued"] == 2
+        stats = executor.get_stats()
+        assert stats["completed"] == 4
+        assert stats["peak_queued"] <= 2
+        assert stats["queue_wait_ms"]["max"] > 0
+    finally:
+        executor.shutdown(wait=True)
+
+
+def test_failures_are_counted_and_reraised():
+    executor = NamedExecutor("test-fail", max_workers=1, queue_limit=0)
+
+    def boom():
+        raise ValueError("nope")
+
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(executor.run(boom))
+        assert executor.get_stats()["failed"] == 1
+    finally:
+        executor.shutdown(wait=True)
+
+
+def test_cancelling_a_queued_job_releases_its_backlog():
+    executor = NamedExecutor("test-withdrawn", max_workers=1, queue_limit=4)
+    release = threading.Event()
+    ran = []
+
+    async def scenario():
+        busy = asyncio.create_task(executor.run(release.wait, 5))
+        queued = [asyncio.create_task(executor.run(ran.append, i)) for i in range(3)]
+        await asyncio.sleep(0.05)
+        assert executor.backlog == 3
+        for task in queued:
+            task.cancel()  # The callers go away while their jobs wait for the one worker
+        await asyncio.gather(*queued, return_exceptions=True)
+        assert executor.backlog == 0
+        release.set()
+        await busy
+
+    try:
+        asyncio.run(scenario())
+        assert executor.backlog == 0 and ran == []
+        assert executor.get_stats()["active"] == 0
+    finally:
+        executor.shutdown(wait=True)
+
+
+def test_module_pools_are_registered():
+    assert set(get_executor_stats()) == {"llm-io", "cpu-render", "crypto", "disk"}
+    assert asyncio.run(run_in("disk", time.monotonic)) > 0
+    with pytest.raises(ValueError):
+        get_executor("gpu")
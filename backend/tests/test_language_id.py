@@ -0,0 +1,67 @@
+"""Tests for offline language identification."""
+
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.language_id import identify_language
+from app.services.translation_service import SUPPORTED_LANGUAGES, TranslationService
+
+TRANSCRIPTS = Path(__file__).resolve().parents[2] / "tests" / "audio_fixtures" / "transcripts.jsonl"
+
+
+def _transcripts():
+    with TRANSCRIPTS.open(encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+@pytest.mark.parametrize("item", _transcripts(), ids=lambda item: f"{item['language']}:{item['text'][:15]}")
+def test_confident_guesses_are_correct(item):
+    guess = identify_language(item["text"])
+
+    assert guess.language in SUPPORTED_LANGUAGES
+    if guess.confidence >= 0.85:
+        assert guess.language == item["language"]
+
+
+def test_every_supported_language_is_covered_by_fixtures():
+    assert {item["language"] for item in _transcripts()} == set(SUPPORTED_LANGUAGES)
+
+
+def test_short_or_empty_text_is_not_confident():
+    assert identify_language("Yes.").confidence < 0.5
+    assert identify_language("12:30 !!").confidence == 0.0
+
+
+@pytest.mark.parametrize("text", [
+    "Ik zag de rode auto heel snel door de straat rijden.",
+    "De bestuurder was een lange man met een donkere jas en hij stopte niet.",
+])
+def test_unsupported_latin_language_is_not_confident(text):
+    assert identify_language(text).confidence < 0.85
+
+
+def test_detect_language_only_calls_gemini_when_unsure():
+    calls = []
+
+    def generate_content(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(text='{"language_code": "en", "confidence": 0.9}')
+
+    service = TranslationService()
+    service.client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+
+    async def scenario():
+        assert (await service.detect_language("The car was red and he drove away fast."))[0] == "en"
+        assert (await service.detect_language("El carro era rojo y se fue muy rápido."))[0] == "es"
+        assert not calls
+        assert await service.detect_language("Yes.") == ("en", 0.9)
+        assert len(calls) == 1
+        await service.detect_language("Ik zag de rode auto heel snel door de straat rijden.")
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+    assert service.get_detection_stats()["local"] == 2
@@ -0,0 +1,170 @@
+"""Tests for latency hedging across a task's model chain."""
+
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services import model_selector as selector_module
+from app.services.model_metrics import model_metrics
+from app.services.model_selector import hedged_call
+from app.services.rpd_budget import rpd_budget
+
+
+@pytest.fixture(autouse=True)
+def hedging(monkeypatch):
+    recorded = []
+
+    async def fake_record(model_name, task_type, latency_ms, response):
+        recorded.append(model_name)
+
+    async def always_allowed(model_name):
+        return True
+
+    monkeypatch.setattr(selector_module, "_record_model_success", fake_record)
+    monkeypatch.setattr(selector_module, "_hedge_allowed", always_allowed)
+    monkeypatch.setattr(selector_module, "_hedge_stats", selector_module.defaultdict(
+        lambda: dict.fromkeys(
+            ("requests", "hedges_launched", "hedge_wins", "primary_wins", "skipped_no_data", "skipped_budget"), 0
+        )
+    ))
+    monkeypatch.setattr(rpd_budget, "record_request", lambda model, count=1: {})
+    monkeypatch.setattr(settings, "hedging_task_types", "transcription,chat")
+    monkeypatch.setattr(settings, "hedging_min_delay_ms", 0)
+    monkeypatch.setattr(model_metrics, "get_latency_percentile", lambda model, p, min_samples=20: 20.0)
+    return recorded
+
+
+def _attempt(log, name, delay, fail=False):
+    async def run():
+        log.append(("start", name))
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            log.append(("cancelled", name))
+            raise
+        if fail:
+            raise RuntimeError(f"{name} failed")
+        return f"{name}-response"
+
+    return run
+
+
+def test_slow_primary_is_hedged_and_cancelled(hedging):
+    log = []
+    response, model = asyncio.run(hedged_call(
+        "transcription",
+        ("primary", _attempt(log, "primary", 0.5)),
+        ("fallback", _attempt(log, "fallback", 0.01)),
+    ))
+
+    assert (response, model) == ("fallback-response", "fallback")
+    assert ("cancelled", "primary") in log
+    assert hedging == ["fallback"]
+    stats = selector_module.get_hedging_stats()["tasks"]["transcription"]
+    assert stats["hedges_launched"] == 1
+    assert stats["hedge_wins"] == 1
+
+
+def test_fast_primary_never_launches_hedge():
+    log = []
+    response, model = asyncio.run(hedged_call(
+        "chat",
+        ("primary", _attempt(log, "primary", 0.0)),
+        ("fallback", _attempt(log, "fallback", 0.0)),
+    ))
+
+    assert model == "primary"
+    assert ("start", "fallback") not in log
+
+
+def test_tasks_without_policy_or_history_are_not_hedged(monkeypatch):
+    log = []
+    asyncio.run(hedged_call(
+        "analysis",
+        ("primary", _attempt(log, "primary", 0.05)),
+        ("fallback", _attempt(log, "fallback", 0.0)),
+    ))
+    monkeypatch.setattr(model_metrics, "get_latency_percentile", lambda model, p, min_samples=20: None)
+    asyncio.run(hedged_call(
+        "chat",
+        ("primary", _attempt(log, "primary", 0.05)),
+        ("fallback", _attempt(log, "fallback", 0.0)),
+    ))
+
+    assert ("start", "fallback") not in log
+    assert selector_module.get_hedging_stats()["tasks"]["chat"]["skipped_no_data"] == 1
+
+
+def test_budget_blocks_hedge(monkeypatch):
+    async def no_headroom(model_name):
+        return False
+
+    monkeypatch.setattr(selector_module, "_hedge_allowed", no_headroom)
+    log = []
+    _, model = asyncio.run(hedged_call(
+        "chat",
+        ("primary", _attempt(log, "primary", 0.05)),
+        ("fallback", _attempt(log, "fallback", 0.0)),
+    ))
+
+    assert model == "primary"
+    assert selector_module.get_hedging_stats()["tasks"]["chat"]["skipped_budget"] == 1
+
+
+def test_primary_failure_falls_through_to_hedge_result():
+    log = []
+    _, model = asyncio.run(hedged_call(
+        "chat",
+        ("primary", _attempt(log, "primary", 0.05, fail=True)),
+        ("fallback", _attempt(log, "fallback", 0.1)),
+    ))
+    assert model == "fallback"
+
+    with pytest.raises(RuntimeError, match="primary failed"):
+        asyncio.run(hedged_call(
+            "chat",
+            ("primary", _attempt(log, "primary", 0.05, fail=True)),
+            ("fallback", _attempt(log, "fallback", 0.06, fail=True)),
+        ))
+
+
+def test_rpd_headroom_keeps_reserve(monkeypatch):
+    from app.services.rpd_budget import TimeWindow
+
+    window = TimeWindow(name="all_day", start_hour=0, end_hour=24, budget_percent=100)
+    monkeypatch.setattr(rpd_budget, "_get_current_window", lambda: window)
+    monkeypatch.setattr(rpd_budget, "_window_usage", selector_module.defaultdict(dict))
+    monkeypatch.setattr(rpd_budget, "get_model_rpd_limit", lambda model: 20)
+
+    assert rpd_budget.has_headroom("m", reserve_fraction=0.25)
+    rpd_budget._window_usage["m"]["all_day"].used = 15
+    assert not rpd_budget.has_headroom("m", reserve_fraction=0.25)
+    assert rpd_budget.has_headroom("m", reserve_fraction=0.0)
+
+
+def test_failed_attempts_are_recorded(monkeypatch):
+    failures, rate_limited = [], []
+
+    async def mark_rate_limited(model_name, error=None):
+        rate_limited.append(model_name)
+
+    monkeypatch.setattr(model_metrics, "record_request", lambda **kwargs: failures.append(
+        (kwargs["model"], kwargs["success"])
+    ))
+    monkeypatch.setattr(selector_module.model_selector, "mark_rate_limited", mark_rate_limited)
+
+    async def rate_limited_fallback():
+        await asyncio.sleep(0.04)
+        raise RuntimeError("429 RESOURCE_EXHAUSTED")
+
+    log = []
+    with pytest.raises(RuntimeError, match="primary failed"):
+        asyncio.run(hedged_call(
+            "chat",
+            ("primary", _attempt(log, "primary", 0.05, fail=True)),
+            ("fallback", rate_limited_fallback),
+        ))
+
+    assert failures == [("primary", False)]
+    assert rate_limited == ["fallback"]
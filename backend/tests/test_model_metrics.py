@@ -0,0 +1,59 @@
+"""Tests for streaming latency sketches in the model metrics collector."""
+
+import random
+
+import pytest
+
+from app.services.latency_sketch import LatencySketch, WindowedLatencySketch
+from app.services.model_metrics import ModelMetricsCollector
+
+
+def test_sketch_quantiles_stay_within_relative_accuracy():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(7, 0.8) for _ in range(20_000)]
+    sketch = LatencySketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.95, 0.99):
+        exact = ordered[int(len(ordered) * q)]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.02)
+    assert sketch.mean == pytest.approx(sum(values) / len(values))
+    assert (sketch.min, sketch.max) == (ordered[0], ordered[-1])
+    assert len(sketch.buckets) < 500  # Bounded by the value range, not the 20k samples
+
+
+def test_windowed_sketch_forgets_old_samples():
+    sketch = WindowedLatencySketch(window=100)
+    for _ in range(100):
+        sketch.add(5000.0)
+    for _ in range(100):
+        sketch.add(100.0)
+    assert sketch.count == 100
+    assert sketch.quantile(0.9) == pytest.approx(100.0, rel=0.01)
+
+
+def test_summaries_and_hints_come_from_running_state():
+    collector = ModelMetricsCollector(recent_window=50)
+    for i in range(1, 101):
+        collector.record_request("gemini-2.5-flash", "chat", latency_ms=float(i * 10), success=i % 10 != 0)
+    collector.record_request("gemma-3-27b-it", "chat", latency_ms=50.0, success=True)
+
+    summary = collector.get_model_summary("gemini-2.5-flash")
+    assert summary.total_requests == 100 and summary.failed_requests == 10
+    assert summary.p50_latency_ms == pytest.approx(510.0, rel=0.01)
+    assert summary.p95_latency_ms == pytest.approx(960.0, rel=0.01)
+
+    hints = collector.get_model_optimization_hints()
+    assert set(hints) == {"gemini-2.5-flash"}  # Fewer than 5 requests: no hint yet
+    assert hints["gemini-2.5-flash"]["avg_latency_ms"] == pytest.approx(505.0)
+    assert hints["gemini-2.5-flash"]["reliability_score"] == pytest.approx(0.9)
+
+    # Hedging reads only recent successes: two rotating halves of 25 hold the last 40 (560-990 ms)
+    assert collector.get_latency_percentile("gemini-2.5-flash", 0.5, min_samples=20) == pytest.approx(780.0, rel=0.01)
+    assert collector.get_latency_percentile("gemma-3-27b-it", 0.9, min_samples=20) is None
+
+    by_task = collector.get_task_metrics()["chat"]["gemini-2.5-flash"]
+    assert by_task["p95_latency_ms"] == pytest.approx(960.0, rel=0.01)
+    assert collector.get_dashboard_data()["summary"]["best_performing_model"] == "gemini-2.5-flash"
@@ -0,0 +1,187 @@
+"""Tests for the bulk orphan report assignment pipeline."""
+
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.models.schemas import Case, ReconstructionSession
+from app.services.cancellation import cancellation_scope, current_token
+from app.services.case_manager import case_manager
+from app.services.firestore import firestore_service
+from app.services.orphan_assignment import OrphanAssignmentPipeline
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """In-memory sessions and cases standing in for firestore_service."""
+    state = {"cases": {}, "sessions": {}, "next": 0}
+
+    async def list_orphan_sessions(limit=50, scan_limit=None):
+        return [s.model_copy(deep=True) for s in state["sessions"].values() if not s.case_id][:limit]
+
+    async def get_session(session_id):
+        session = state["sessions"].get(session_id)
+        return session.model_copy(deep=True) if session else None
+
+    async def update_session(session):
+        state["sessions"][session.id] = session.model_copy(deep=True)
+        return True
+
+    async def list_cases(limit=0):
+        return [case.model_copy(deep=True) for case in state["cases"].values()]
+
+    async def get_case(case_id):
+        case = state["cases"].get(case_id)
+        return case.model_copy(deep=True) if case else None
+
+    async def save_case(case):
+        state["cases"][case.id] = case.model_copy(deep=True)
+        return True
+
+    async def next_case_number():
+        state["next"] += 1
+        return f"CASE-2026-{state['next']:04d}"
+
+    async def no_summary(case_id):
+        return None
+
+    monkeypatch.setattr(firestore_service, "list_orphan_sessions", list_orphan_sessions)
+    monkeypatch.setattr(firestore_service, "get_session", get_session)
+    monkeypatch.setattr(firestore_service, "update_session", update_session)
+    monkeypatch.setattr(firestore_service, "list_cases", list_cases)
+    monkeypatch.setattr(firestore_service, "get_case", get_case)
+    monkeypatch.setattr(firestore_service, "update_case", save_case)
+    monkeypatch.setattr(firestore_service, "create_case", save_case)
+    monkeypatch.setattr(firestore_service, "_next_case_number_unlocked", next_case_number)
+    monkeypatch.setattr(firestore_service, "_sequence_lock", asyncio.Lock(), raising=False)
+    monkeypatch.setattr(case_manager, "client", None)
+    monkeypatch.setattr(case_manager, "generate_case_summary", no_summary)
+    return state
+
+
+def _orphan(report_id, location, title):
+    return ReconstructionSession(
+        id=report_id,
+        title=title,
+        metadata={"location": location, "incident_type": "accident", "incident_subtype": "traffic_collision"},
+    )
+
+
+def _run(pipeline, limit=50):
+    async def scenario():
+        job = pipeline.start(limit=limit)
+        assert pipeline.start(limit=limit) is job  # one run at a time
+        return await pipeline.wait(job.job_id)
+
+    return asyncio.run(scenario())
+
+
+def test_orphans_join_existing_and_newly_opened_cases(store):
+    store["cases"]["main"] = Case(
+        id="main", case_number="CASE-2026-0000", title="Crash at 5th and Main",
+        location="5th Avenue and Main Street",
+        metadata={"incident_type": "accident", "incident_subtype": "traffic_collision"},
+    )
+    for report_id, location, title in [
+        ("r1", "5th Avenue and Main Street", "Crash at 5th and Main"),
+        ("r2", "Harbor Road and Pier 9", "Crash at the harbor"),
+        ("r3", "Harbor Road and Pier 9", "Crash at the harbor"),
+    ]:
+        store["sessions"][report_id] = _orphan(report_id, location, title)
+
+    job = _run(OrphanAssignmentPipeline())
+
+    assert job.status == "completed"
+    assert job.to_dict()["progress_pct"] == 100.0
+    assert (job.assigned, job.cases_created, job.matched_directly, job.llm_calls) == (3, 1, 1, 0)
+    assert store["sessions"]["r1"].case_id == "main"
+    assert store["sessions"]["r2"].case_id == store["sessions"]["r3"].case_id != "main"
+    assert sorted(store["cases"][store["sessions"]["r2"].case_id].report_ids) == ["r2", "r3"]
+
+
+def test_ambiguous_orphans_are_adjudicated_in_batches(store, monkeypatch):
+    monkeypatch.setattr(settings, "orphan_assign_llm_batch_size", 3)
+    monkeypatch.setattr(case_manager, "client", object())
+    store["cases"]["main"] = Case(
+        id="main", case_number="CASE-2026-0000", title="Crash at 5th and Main",
+        location="5th Avenue and Main Street",
+    )
+    for index in range(7):
+        store["sessions"][f"r{index}"] = _orphan(f"r{index}", "5th Avenue and Main Street", "Crash")
+
+    batches = []
+
+    async def no_classification(report):
+        return None
+
+    async def batch_llm(items):
+        batches.append([report.id for report, _ in items])
+        return {report.id: "main" for report, candidates in items}
+
+    monkeypatch.setattr(case_manager, "_classify_incident", no_classification)
+    monkeypatch.setattr(case_manager, "_select_direct_match", lambda ranked: None)
+    monkeypatch.setattr(case_manager, "find_matching_cases_batch", batch_llm)
+
+    job = _run(OrphanAssignmentPipeline())
+
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert (job.llm_calls, job.matched_by_llm, job.assigned) == (3, 7, 7)
+    assert len(store["cases"]["main"].report_ids) == 7
+
+
+def test_run_survives_the_request_that_started_it_timing_out(store, monkeypatch):
+    store["sessions"]["r1"] = _orphan("r1", "Harbor Road and Pier 9", "Crash at the harbor")
+    seen_tokens = []
+    list_orphans = firestore_service.list_orphan_sessions
+
+    async def slow_list_orphans(limit=50, scan_limit=None):
+        seen_tokens.append(current_token())
+        await asyncio.sleep(0.05)
+        return await list_orphans(limit=limit)
+
+    monkeypatch.setattr(firestore_service, "list_orphan_sessions", slow_list_orphans)
+    pipeline = OrphanAssignmentPipeline()
+
+    async def scenario():
+        with cancellation_scope() as token:
+            job = pipeline.start()
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(pipeline.wait(job.job_id), 0.01)  # timeout_middleware gives up
+            token.cancel("request_timeout")
+        return await pipeline.wait(job.job_id)
+
+    job = asyncio.run(scenario())
+    assert job.status == "completed" and job.assigned == 1
+    assert seen_tokens == [None]
+
+
+def test_commits_wait_for_single_report_assignment_of_the_same_report(store):
+    store["cases"]["main"] = Case(
+        id="main", case_number="CASE-2026-0000", title="Crash at 5th and Main",
+        location="5th Avenue and Main Street",
+        metadata={"incident_type": "accident", "incident_subtype": "traffic_collision"},
+    )
+    store["sessions"]["r1"] = _orphan("r1", "5th Avenue and Main Street", "Crash at 5th and Main")
+    store["sessions"]["r2"] = _orphan("r2", "Harbor Road and Pier 9", "Crash at the harbor")
+    pipeline = OrphanAssignmentPipeline()
+
+    async def scenario():
+        async with case_manager._report_lock("r1"), case_manager._report_lock("r2"):
+            job = pipeline.start()
+            while job.stage != "committing":
+                await asyncio.sleep(0.001)
+            await asyncio.sleep(0.01)
+            assert job.committed == 0  # Blocked on the locks held by single-report assignment
+            # ...which places both reports before releasing them
+            for report_id in ("r1", "r2"):
+                store["sessions"][report_id].case_id = "elsewhere"
+        return await pipeline.wait(job.job_id)
+
+    job = asyncio.run(scenario())
+
+    assert job.status == "completed"
+    assert (job.skipped, job.assigned, job.cases_created) == (2, 0, 0)
+    assert job.to_dict()["progress_pct"] == 100.0
+    assert store["cases"]["main"].report_ids == []
+    assert all(session.case_id == "elsewhere" for session in store["sessions"].values())
@@ -0,0 +1,181 @@
+"""Tests for cached-content routing of stable prompt prefixes."""
+
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents.prompts import get_compiled_system_prompt
+from app.config import settings
+from app.services import prompt_cache as prompt_cache_module
+from app.services.api_key_manager import APIKeyManager, GeminiAccountConfig
+from app.services.prompt_cache import (
+    KIND_CONTENTS,
+    KIND_SYSTEM_INSTRUCTION,
+    get_prompt_prefixes,
+    register_prompt_prefix,
+)
+
+PREAMBLE = "You extract scene details. " * 50
+SYSTEM = "You are Detective Ray. " * 50
+
+
+class StubCaches:
+    def __init__(self, fail=False):
+        self.created = []
+        self.updated = []
+        self.fail = fail
+
+    def create(self, *, model, config):
+        if self.fail:
+            raise RuntimeError("model does not support caching")
+        self.created.append((model, config))
+        return SimpleNamespace(
+            name=f"cachedContents/{len(self.created)}",
+            expire_time=datetime.now(timezone.utc) + timedelta(seconds=settings.prompt_cache_ttl_seconds),
+        )
+
+    def update(self, *, name, config):
+        self.updated.append(name)
+        return SimpleNamespace(name=name, expire_time=datetime.now(timezone.utc) + timedelta(hours=1))
+
+
+class StubChat:
+    def __init__(self, model, config, history):
+        self.model, self.config = model, config
+        self._curated_history = list(history or [])
+
+    def send_message(self, message, config=None):
+        self._curated_history.append(message)
+        return _response(cached=400)
+
+
+class StubGenAIClient:
+    """Local stand-in for genai.Client covering the surfaces the rotating client uses."""
+
+    def __init__(self, fail_caching=False):
+        self.caches = StubCaches(fail=fail_caching)
+        self.requests = []
+        self.chats_created = []
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+        self.chats = SimpleNamespace(create=self._create_chat)
+
+    def _generate_content(self, *, model, contents, config=None):
+        self.requests.append((model, contents, config))
+        return _response(cached=500 if config and config.get("cached_content") else 0)
+
+    def _create_chat(self, *, model, config=None, history=None):
+        chat = StubChat(model, config, history)
+        self.chats_created.append(chat)
+        return chat
+
+
+def _response(cached):
+    return SimpleNamespace(
+        text="ok",
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=600, candidates_token_count=10, cached_content_token_count=cached,
+        ),
+    )
+
+
+@pytest.fixture
+def manager(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "database_path", str(tmp_path / "witnessreplay.db"))
+    monkeypatch.setattr(settings, "prompt_cache_min_tokens", 100)
+    register_prompt_prefix(PREAMBLE, label="test-extraction", kind=KIND_CONTENTS, token_count=500)
+    register_prompt_prefix(SYSTEM, label="test-system", kind=KIND_SYSTEM_INSTRUCTION, token_count=400)
+    manager = APIKeyManager([GeminiAccountConfig(account_id="primary", label="Primary", priority=1, api_key="k1")])
+    stub = StubGenAIClient()
+    manager._clients["primary"] = stub
+    return manager, stub
+
+
+def test_compiled_system_prompt_is_registered_as_prefix():
+    compiled = get_compiled_system_prompt("full")
+    assert any(p.text == compiled.text and p.kind == KIND_SYSTEM_INSTRUCTION for p in get_prompt_prefixes())
+
+
+def test_contents_prefix_is_cached_once_and_reused(manager):
+    manager, stub = manager
+    client = manager.get_rotating_client()
+    for turn in ("first", "second"):
+        client.models.generate_content(
+            model="gemini-2.5-flash", contents=f"{PREAMBLE}\nConversation: {turn}", config={"temperature": 0.3},
+        )
+
+    assert len(stub.caches.created) == 1
+    assert stub.caches.created[0][1]["contents"] == [PREAMBLE]
+    _, contents, config = stub.requests[-1]
+    assert contents == "\nConversation: second"
+    assert config == {"temperature": 0.3, "cached_content": "cachedContents/1"}
+
+    stats = manager.prompt_cache.get_stats()
+    assert stats["by_prefix"]["test-extraction"]["tokens_saved"] == 1000
+    assert stats["input_tokens_saved"] >= 1000
+
+
+def test_unsupported_models_and_failures_fall_back_to_plain_requests(manager, monkeypatch):
+    manager, stub = manager
+    client = manager.get_rotating_client()
+    client.models.generate_content(model="gemma-3-27b-it", contents=f"{PREAMBLE}x", config=None)
+    assert stub.caches.created == []
+    assert stub.requests[-1][1] == f"{PREAMBLE}x"
+
+    stub.caches.fail = True
+    client.models.generate_content(model="gemini-2.5-pro", contents=f"{PREAMBLE}y", config=None)
+    client.models.generate_content(model="gemini-2.5-pro", contents=f"{PREAMBLE}z", config=None)
+    assert stub.requests[-1][1] == f"{PREAMBLE}z"
+    assert manager.prompt_cache.get_stats()["unsupported"] == ["primary:gemini-2.5-pro"]
+    assert manager.prompt_cache.get_stats()["by_prefix"]["test-extraction"]["failures"] == 1
+
+
+def test_cache_is_extended_before_it_expires(manager, monkeypatch):
+    manager, stub = manager
+    client = manager.get_rotating_client()
+    client.models.generate_content(model="gemini-2.5-flash", contents=f"{PREAMBLE}a", config=None)
+
+    margin = settings.prompt_cache_refresh_margin_seconds
+    future = time.time() + settings.prompt_cache_ttl_seconds - margin + 5
+    monkeypatch.setattr(prompt_cache_module.time, "time", lambda: future)
+    client.models.generate_content(model="gemini-2.5-flash", contents=f"{PREAMBLE}b", config=None)
+
+    assert stub.caches.updated == ["cachedContents/1"]
+    assert len(stub.caches.created) == 1
+
+
+def test_chat_uses_cached_system_instruction(manager):
+    manager, stub = manager
+    chat = manager.get_rotating_client().chats.create(
+        model="gemini-2.5-flash", config={"system_instruction": SYSTEM, "temperature": 0.4},
+    )
+    chat.send_message("A red car ran the light.")
+    chat.send_message("It was around 9pm.")
+
+    assert len(stub.chats_created) == 1
+    assert stub.chats_created[0].config == {"temperature": 0.4, "cached_content": "cachedContents/1"}
+    assert manager.prompt_cache.get_stats()["by_prefix"]["test-system"]["requests"] == 2
+
+
+def test_creation_failures_back_off_briefly_then_retry(manager, monkeypatch):
+    manager, stub = manager
+    client = manager.get_rotating_client()
+    now = [time.time()]
+    monkeypatch.setattr(prompt_cache_module.time, "time", lambda: now[0])
+    monkeypatch.setattr(settings, "prompt_cache_retry_seconds", 30.0)
+
+    stub.caches.fail = True  # A transient error, e.g. a 503 from the caches API
+    client.models.generate_content(model="gemini-2.5-flash", contents=f"{PREAMBLE}a", config=None)
+    now[0] += 31
+    client.models.generate_content(model="gemini-2.5-flash", contents=f"{PREAMBLE}b", config=None)
+    now[0] += 31  # The second failure doubled the wait to 60s
+    client.models.generate_content(model="gemini-2.5-flash", contents=f"{PREAMBLE}c", config=None)
+    assert manager.prompt_cache.get_stats()["by_prefix"]["test-extraction"]["failures"] == 2
+
+    stub.caches.fail = False
+    now[0] += 30
+    client.models.generate_content(model="gemini-2.5-flash", contents=f"{PREAMBLE}d", config=None)
+    assert len(stub.caches.created) == 1
+    assert stub.requests[-1][1] == "d"
+    assert manager.prompt_cache.get_stats()["unsupported"] == []
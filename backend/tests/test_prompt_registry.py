@@ -0,0 +1,55 @@
+"""Tests for the compiled prompt registry."""
+
+from app.agents import prompts
+from app.agents.few_shot_examples import EXAMPLES, add_example
+from app.services.prompt_optimizer import PromptOptimizer
+from app.services.token_estimator import estimate_tokens
+
+
+def test_extraction_prompt_is_rendered_once_per_key():
+    prompts.invalidate_compiled_prompts()
+
+    first = prompts.get_compiled_extraction_prompt(incident_type="theft")
+    second = prompts.get_compiled_extraction_prompt(incident_type="THEFT")
+
+    assert first is second
+    assert first.text == prompts._render_scene_extraction_prompt(incident_type="theft")
+    assert first.token_count == estimate_tokens(first.text)
+    assert prompts.build_scene_extraction_prompt(incident_type="theft") == first.text
+
+
+def test_registry_keys_separate_compact_and_levels():
+    full = prompts.get_compiled_extraction_prompt(incident_type="assault")
+    compact = prompts.get_compiled_extraction_prompt(incident_type="assault", compact=True)
+    base = prompts.get_compiled_extraction_prompt(include_examples=False)
+
+    assert compact.text != full.text
+    assert base.text == prompts.SCENE_EXTRACTION_PROMPT
+    assert prompts.get_system_prompt("compact") == prompts.SYSTEM_PROMPT_COMPACT
+    assert prompts.get_system_prompt("unknown") == prompts.SYSTEM_PROMPT
+    assert prompts.get_compiled_system_prompt("compact").key[0] == prompts.PROMPT_VERSION
+
+
+def test_adding_example_invalidates_compiled_prompts():
+    prompts.get_compiled_system_prompt("full")
+    assert prompts.get_compiled_prompt_stats()["compiled"] > 0
+
+    example = EXAMPLES[0]
+    try:
+        add_example(type(example)(**{**example.__dict__, "id": "registry-test"}))
+        assert prompts.get_compiled_prompt_stats()["compiled"] == 0
+    finally:
+        EXAMPLES[:] = [ex for ex in EXAMPLES if ex.id != "registry-test"]
+        prompts.invalidate_compiled_prompts()
+
+
+def test_compressed_prompt_is_memoized_but_savings_still_counted():
+    optimizer = PromptOptimizer()
+    prompt = "Please note that it is important to  keep   answers short."
+
+    first = optimizer.compress_system_prompt(prompt, level="moderate")
+    second = optimizer.compress_system_prompt(prompt, level="moderate")
+
+    assert first.text == second.text
+    assert len(optimizer._compressed) == 1
+    assert optimizer.get_savings_stats()["total_compressions"] == 2
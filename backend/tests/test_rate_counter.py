@@ -0,0 +1,63 @@
+"""Tests for the bucketed sliding-window rate counters."""
+
+from app.services.rate_counter import RateCounter, SlidingWindowCounter, sliding_window_estimate
+from app.services.tts_service import TTSService
+
+
+def test_counter_never_drops_requests_inside_the_window():
+    counter = SlidingWindowCounter(window_seconds=60, buckets=12)
+    counter.add(1000.0)
+    counter.add(1030.0, amount=2)
+
+    assert counter.count(1059.9) == 3
+    assert counter.count(1064.9) == 3  # Up to one bucket of slack past the window
+    assert counter.count(1065.0) == 2
+    assert counter.count(1095.0) == 0
+    assert counter.count(5000.0) == 0
+
+
+def test_retry_after_points_at_the_bucket_that_frees_a_slot():
+    counter = SlidingWindowCounter(window_seconds=60, buckets=12)
+    counter.add(1000.0)
+    counter.add(1031.0)
+
+    assert counter.retry_after(limit=3, now=1040.0) == 0.0
+    assert counter.retry_after(limit=2, now=1040.0) == 25.0  # The 995-1000 bucket leaves at 1065
+    assert counter.retry_after(limit=1, now=1040.0) == 55.0
+    assert counter.count(1065.0) == 1
+
+
+def test_keyed_counter_acquire_restore_and_purge():
+    counters = RateCounter(window_seconds=60, clock=lambda: 1000.0)
+    assert counters.try_acquire("primary:gemini-2.5-flash", limit=2)
+    assert counters.try_acquire("primary:gemini-2.5-flash", limit=2)
+    assert not counters.try_acquire("primary:gemini-2.5-flash", limit=2)
+    assert counters.try_acquire("secondary:gemini-2.5-flash", limit=0, amount=5)
+
+    restored = RateCounter(window_seconds=60, clock=lambda: 1010.0)
+    restored.restore("primary:gemini-2.5-flash", counters.to_state("primary:gemini-2.5-flash"))
+    assert restored.count("primary:gemini-2.5-flash") == 2
+    restored.add("primary:gemini-2.5-flash", now=900.0)  # Already outside the window
+    assert restored.count("primary:gemini-2.5-flash") == 2
+
+    assert counters.purge_idle(now=2000.0) == 2
+    assert len(counters) == 0
+
+
+def test_sliding_window_estimate_weights_previous_window():
+    assert sliding_window_estimate(previous=100, current=10, window_seconds=60, now=60 * 10 + 15) == 85.0
+    assert sliding_window_estimate(previous=100, current=10, window_seconds=60, now=60 * 10) == 110.0
+
+
+def test_tts_minute_limit_uses_shared_counter(monkeypatch):
+    monkeypatch.setattr(TTSService, "_initialize", lambda self: None)
+    monkeypatch.setattr("app.services.tts_service.get_key_manager", lambda: None)
+    service = TTSService()
+    model = "gemini-2.5-flash-preview-tts"
+    for _ in range(3):
+        assert service._can_make_request(model)[0]
+        service._record_request(model)
+
+    allowed, reason = service._can_make_request(model)
+    assert not allowed and "/minute" in reason
+    assert service.get_quota_status()["per_model"][model]["rpm"]["used"] == 3
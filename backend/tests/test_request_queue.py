@@ -0,0 +1,98 @@
+"""Tests for the event-driven, per-model priority request queue."""
+
+import asyncio
+
+import pytest
+
+from app.services.request_queue import QueuedRequestStatus, RequestPriority, RequestQueue
+from app.services.usage_tracker import UsageTracker
+
+
+@pytest.fixture
+def tracker(monkeypatch, tmp_path):
+    tracker = UsageTracker(persistence_file=str(tmp_path / "usage.json"))
+    monkeypatch.setattr("app.services.usage_tracker.usage_tracker", tracker)
+    return tracker
+
+
+def _queue(**kwargs):
+    return RequestQueue(process_interval=120, **kwargs)
+
+
+def test_request_runs_as_soon_as_it_arrives_when_quota_is_free(tracker):
+    queue = _queue()
+    ran = []
+
+    async def callback():
+        ran.append("done")
+        return "ok"
+
+    async def scenario():
+        await queue.start()
+        _, request = queue.queue_request("/api/chat", "POST", "1.2.3.4", callback=callback, model="gemini-2.5-flash")
+        for _ in range(50):
+            if request.status == QueuedRequestStatus.COMPLETED:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return request
+
+    request = asyncio.run(scenario())
+    assert request.status == QueuedRequestStatus.COMPLETED  # Long before the 120s fallback wake-up
+    assert request.result == "ok" and ran == ["done"]
+
+
+def test_lazy_deletion_keeps_priority_order_per_model(tracker):
+    queue = _queue()
+    order = []
+
+    def make(name):
+        async def callback():
+            order.append(name)
+        return callback
+
+    _, low = queue.queue_request("/a", "POST", "ip", callback=make("low"), priority=RequestPriority.LOW, model="m1")
+    _, normal = queue.queue_request("/b", "POST", "ip", callback=make("normal"), model="m1")
+    _, cancelled = queue.queue_request("/c", "POST", "ip", callback=make("cancelled"), priority=RequestPriority.HIGH, model="m1")
+    queue.queue_request("/d", "POST", "ip", callback=make("other-model"), model="m2")
+    assert queue.cancel_request(cancelled.id)
+    assert queue.set_request_priority(low.id, RequestPriority.CRITICAL)
+
+    status = queue.get_queue_status()
+    assert status["pending_count"] == 3
+    assert status["queue_size"] == 5  # Cancelled and superseded entries stay until popped
+    assert status["pending_by_model"] == {"m1": 2, "m2": 1}
+    assert [r["id"] for r in queue.get_pending_requests()][:2] == [low.id, normal.id]
+
+    asyncio.run(queue._process_pending_requests())
+    assert order == ["low", "normal", "other-model"]
+    assert queue.get_queue_status()["statistics"]["stale_entries_skipped"] == 2
+
+
+def test_eta_and_wake_time_follow_the_rate_counters(tracker):
+    queue = _queue()
+    model = "gemini-2.5-flash"  # 5 RPM
+    for _ in range(5):
+        tracker.record_request(model)
+    _, first = queue.queue_request("/a", "POST", "ip", model=model)
+    _, second = queue.queue_request("/b", "POST", "ip", model=model)
+
+    wait = asyncio.run(queue._process_pending_requests())
+    assert 55 < wait <= 65  # When the minute window first loses a bucket
+    assert first.status == QueuedRequestStatus.PENDING
+
+    eta_first = queue.get_request_eta(first.id)
+    eta_second = queue.get_request_eta(second.id)
+    assert (eta_first["position"], eta_second["position"]) == (1, 2)
+    assert eta_second["eta_seconds"] == pytest.approx(eta_first["eta_seconds"] + 12, abs=0.2)
+
+
+def test_released_requests_hold_their_slot(tracker):
+    queue = _queue()
+    model = "gemini-2.5-flash"  # 5 RPM
+    for _ in range(3):
+        tracker.record_request(model)
+    requests = [queue.queue_request(f"/{i}", "POST", "ip", model=model)[1] for i in range(4)]
+
+    asyncio.run(queue._process_pending_requests())
+    assert [r.status for r in requests] == [QueuedRequestStatus.COMPLETED] * 2 + [QueuedRequestStatus.PENDING] * 2
@@ -0,0 +1,139 @@
+"""Tests for the bounded, SQLite-backed response cache."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import database as database_module
+from app.services.database import DatabaseService
+from app.services.response_cache import ResponseCache
+
+
+class _FakeEmbeddingService:
+    async def embed_text(self, text, task_type=None):
+        return [float(len(text)), 1.0], False
+
+    @staticmethod
+    def cosine_similarity(a, b):
+        return 1.0 if a == b else 0.0
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    db_svc = DatabaseService(str(tmp_path / "cache.db"))
+    asyncio.run(db_svc.initialize())
+    monkeypatch.setattr(database_module, "_db_instance", db_svc)
+    yield db_svc
+    asyncio.run(db_svc.close())
+
+
+def _make_cache(**kwargs):
+    cache = ResponseCache(flush_interval=kwargs.pop("flush_interval", 60), **kwargs)
+    cache._embedding_service = _FakeEmbeddingService()
+    return cache
+
+
+async def _row_count(db_svc):
+    async with db_svc._db.execute("SELECT COUNT(*) FROM response_cache") as cursor:
+        return (await cursor.fetchone())[0]
+
+
+def test_writes_are_batched_until_flush(database):
+    async def scenario():
+        cache = _make_cache()
+        await cache.set("q1", "a1", context_key="ctx")
+        await cache.set("q2", "a2", context_key="ctx")
+        assert await _row_count(database) == 0
+
+        assert await cache.flush() == 2
+        assert await _row_count(database) == 2
+        assert cache.get_stats()["pending_writes"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_flush_requeues_the_batch(database, monkeypatch):
+    async def scenario():
+        cache = _make_cache()
+        await cache.set("q1", "a1", context_key="ctx")
+
+        async def locked(*args, **kwargs):
+            raise RuntimeError("database is locked")
+
+        executemany = database._db.executemany
+        monkeypatch.setattr(database._db, "executemany", locked)
+        assert await cache.flush() == 0
+        monkeypatch.setattr(database._db, "executemany", executemany)
+        await cache.set("q2", "a2", context_key="ctx")
+        assert cache.get_stats()["pending_writes"] == 2
+
+        assert await cache.flush() == 2
+        assert await _row_count(database) == 2
+
+    asyncio.run(scenario())
+
+
+def test_misses_fall_back_to_sqlite(database):
+    async def scenario():
+        writer = _make_cache()
+        await writer.set("where was the car", "by the bank", context_key="ctx")
+        await writer.flush()
+
+        reader = _make_cache()
+        await reader.load_from_db(limit=0)
+        assert reader.get_stats()["entries"] == 0
+
+        assert await reader.get("where was the car", context_key="ctx") == ("by the bank", 1.0)
+        assert reader.get_stats()["entries"] == 1
+        assert reader.get_stats()["persistent_hits"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_startup_preloads_only_hottest_entries(database):
+    async def scenario():
+        writer = _make_cache()
+        for i in range(5):
+            await writer.set(f"query {i}", f"answer {i}")
+        await writer.flush()
+        for _ in range(3):
+            await writer.get("query 3")
+        await writer.flush()
+
+        reader = _make_cache()
+        await reader.load_from_db(limit=1)
+        assert list(reader._cache.values())[0].response == "answer 3"
+
+    asyncio.run(scenario())
+
+
+def test_cleanup_prunes_expired_rows_in_sql(database):
+    async def scenario():
+        cache = _make_cache()
+        await cache.set("fresh entry", "ok")
+        await cache.set("stale", "old", ttl_seconds=1)
+        cache._pending_writes[cache._compute_hash(":stale")].created_at = (
+            datetime.utcnow() - timedelta(minutes=5)
+        )
+        await cache.flush()
+
+        await cache.cleanup_expired()
+        assert await _row_count(database) == 1
+        assert await cache.get("stale") is None
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_removes_persisted_rows_for_context(database):
+    async def scenario():
+        cache = _make_cache()
+        await cache.set("q", "a", context_key="summarize")
+        await cache.set("q", "b", context_key="classify")
+        await cache.flush()
+
+        await cache.invalidate("summarize")
+        assert await _row_count(database) == 1
+        assert await _make_cache().get("q", context_key="summarize") is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,129 @@
+"""Tests for incremental scene extraction."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents import scene_agent as scene_agent_module
+from app.agents.scene_agent import SceneReconstructionAgent
+
+
+class _StubCache:
+    async def get(self, *args, **kwargs):
+        return None
+
+    async def set(self, *args, **kwargs):
+        return True
+
+
+class _ScriptedModels:
+    """Returns queued JSON replies and records the prompts it was sent."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    def generate_content(self, model, contents, config=None):
+        self.prompts.append(contents)
+        return SimpleNamespace(text=json.dumps(self.replies.pop(0)))
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(SceneReconstructionAgent, "_initialize_model", lambda self: None)
+    monkeypatch.setattr(scene_agent_module, "response_cache", _StubCache())
+    return SceneReconstructionAgent("extract-session")
+
+
+def _say(agent, user, assistant, ts):
+    agent.conversation_history.append({"role": "user", "content": user, "timestamp": f"2026-01-01T00:00:{ts:02d}"})
+    agent.conversation_history.append({"role": "assistant", "content": assistant, "timestamp": f"2026-01-01T00:00:{ts + 1:02d}"})
+
+
+FULL_REPLY = {
+    "scene_description": "A red car at an intersection.",
+    "elements": [
+        {"type": "vehicle", "description": "red sedan", "color": "red", "confidence": 0.9},
+        {"type": "person", "description": "tall man", "confidence": 0.8},
+    ],
+}
+
+
+def test_second_extraction_sends_only_new_turns_and_merges_patch(agent):
+    models = _ScriptedModels([
+        FULL_REPLY,
+        {
+            "elements": [
+                {"ref": "e1", "type": "person", "description": "tall man in a grey hoodie", "confidence": 0.9},
+                {"ref": None, "type": "object", "description": "black bag", "color": "black", "confidence": 0.85},
+            ],
+            "removed_elements": ["e0"],
+        },
+    ])
+    agent.client = SimpleNamespace(models=models)
+
+    async def scenario():
+        _say(agent, "A red sedan ran the light.", "Who was driving?", 0)
+        await agent._extract_scene_information()
+        _say(agent, "A tall man in a grey hoodie carrying a black bag. Actually no car.", "Which way did he go?", 10)
+        await agent._extract_scene_information()
+
+    asyncio.run(scenario())
+
+    incremental_prompt = models.prompts[1]
+    assert "grey hoodie" in incremental_prompt
+    assert "A red sedan ran the light." not in incremental_prompt
+    assert '"ref":"e1"' in incremental_prompt
+    assert [e.description for e in agent.current_elements] == ["tall man in a grey hoodie", "black bag"]
+    assert agent.current_elements[0].id == "elem_extract-session_1"
+    assert agent.current_elements[1].id == "elem_extract-session_2"
+
+
+def test_full_extraction_runs_periodically_and_when_nothing_is_known(agent):
+    agent.client = SimpleNamespace(models=_ScriptedModels([FULL_REPLY] * 10))
+    modes = []
+    original_full = agent._build_full_extraction_prompt
+
+    def tracking_full():
+        modes.append("full")
+        return original_full()
+
+    agent._build_full_extraction_prompt = tracking_full
+
+    async def scenario():
+        for turn in range(agent.FULL_EXTRACTION_INTERVAL + 1):
+            _say(agent, f"Detail number {turn}.", "Go on.", turn * 2)
+            before = len(modes)
+            await agent._extract_scene_information()
+            if len(modes) == before:
+                modes.append("incremental")
+
+    asyncio.run(scenario())
+
+    assert modes == ["full", "incremental", "incremental", "incremental", "incremental", "full"]
+
+
+def test_no_new_turns_skips_incremental_call(agent):
+    models = _ScriptedModels([FULL_REPLY])
+    agent.client = SimpleNamespace(models=models)
+
+    async def scenario():
+        _say(agent, "A red sedan ran the light.", "Who was driving?", 0)
+        await agent._extract_scene_information()
+        await agent._extract_scene_information()
+
+    asyncio.run(scenario())
+    assert len(models.prompts) == 1
+
+
+def test_extraction_marker_survives_state_round_trip(agent):
+    agent._scene_extracted_through = "2026-01-01T00:00:05"
+    agent._extractions_since_full = 2
+
+    clone = SceneReconstructionAgent.__new__(SceneReconstructionAgent)
+    clone.restore_state(agent.export_state())
+
+    assert clone._scene_extracted_through == "2026-01-01T00:00:05"
+    assert clone._extractions_since_full == 2
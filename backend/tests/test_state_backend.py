@@ -0,0 +1,148 @@
+"""Tests for the pluggable shared state backend."""
+
+import pytest
+
+from app.services import state_backend as state_backend_module
+from app.services.state_backend import (
+    InMemoryStateBackend,
+    SQLiteStateBackend,
+    run_state_io,
+    set_state_backend,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteStateBackend(str(tmp_path / "state.db"))
+    return InMemoryStateBackend()
+
+
+@pytest.fixture
+def shared_backend(tmp_path):
+    """Install a SQLite backend process-wide for the duration of a test."""
+    previous = state_backend_module._state_backend
+    backend = set_state_backend(SQLiteStateBackend(str(tmp_path / "shared.db")))
+    yield backend
+    set_state_backend(previous)
+
+
+def test_get_set_delete_round_trip(backend):
+    backend.set("ns", "a", {"value": 1})
+
+    assert backend.get("ns", "a") == {"value": 1}
+    assert backend.get("other", "a") is None
+    assert backend.delete("ns", "a") is True
+    assert backend.get("ns", "a", "missing") == "missing"
+
+
+def test_expired_entries_are_hidden_and_purged(backend, monkeypatch):
+    backend.set("ns", "short", 1, ttl_seconds=10)
+    backend.set("ns", "long", 2)
+    now = state_backend_module.time.time()
+    monkeypatch.setattr(state_backend_module.time, "time", lambda: now + 60)
+
+    assert backend.purge_expired("ns") == 1
+    assert backend.get("ns", "short") is None
+    assert backend.keys("ns") == ["long"]
+    assert backend.purge_expired("ns") == 0
+    assert backend.count("ns") == 1
+
+
+def test_incr_counts_within_window(backend):
+    assert backend.incr("rate", "ip:1", ttl_seconds=60) == 1
+    assert backend.incr("rate", "ip:1", ttl_seconds=60) == 2
+    assert backend.incr("rate", "ip:1", amount=3) == 5
+
+
+def test_edit_persists_mutations(backend):
+    with backend.edit("ns", "session", lambda: {"items": []}) as state:
+        state["items"].append("first")
+    with backend.edit("ns", "session") as state:
+        state["items"].append("second")
+
+    assert backend.get("ns", "session") == {"items": ["first", "second"]}
+
+
+def test_edit_without_factory_yields_none_for_missing_key(backend):
+    with backend.edit("ns", "missing") as state:
+        assert state is None
+
+    assert backend.get("ns", "missing") is None
+
+
+def test_edit_discards_changes_when_block_raises(backend):
+    backend.set("ns", "key", {"count": 1})
+
+    with pytest.raises(RuntimeError):
+        with backend.edit("ns", "key") as state:
+            state["count"] = 99
+            raise RuntimeError("boom")
+
+    assert backend.get("ns", "key") == {"count": 1}
+
+
+def test_events_are_read_in_publish_order(backend):
+    first = backend.publish("sse", "one")
+    backend.publish("sse", "two")
+    backend.publish("other", "ignored")
+
+    assert [payload for _, payload in backend.read_events("sse")] == ["one", "two"]
+    assert [payload for _, payload in backend.read_events("sse", after_id=first)] == ["two"]
+    assert backend.latest_event_id("sse") > first
+
+
+def test_sqlite_backend_is_visible_to_other_connections(tmp_path):
+    path = str(tmp_path / "state.db")
+    worker_a = SQLiteStateBackend(path)
+    worker_b = SQLiteStateBackend(path)
+
+    worker_a.set("admin_sessions", "token", {"user_id": "u1"})
+    worker_a.incr("rate", "ip", ttl_seconds=60)
+    worker_b.incr("rate", "ip", ttl_seconds=60)
+
+    assert worker_b.get("admin_sessions", "token") == {"user_id": "u1"}
+    assert worker_a.get("rate", "ip") == 2
+
+
+def test_contradiction_detector_state_survives_across_instances(shared_backend):
+    from app.services.contradiction_detector import ContradictionDetector
+
+    worker_a = ContradictionDetector()
+    worker_b = ContradictionDetector()
+    worker_a.track_element_mention("s1", "vehicle", "car", "color", "red", "The car was red")
+    worker_b.track_element_mention("s1", "vehicle", "car", "color", "blue", "Actually it was blue")
+
+    contradictions = worker_a.get_contradictions("s1")
+    assert len(contradictions) == 1
+    assert contradictions[0]["original_value"] == "red"
+    assert worker_a.resolve_contradiction("s1", contradictions[0]["id"], "Witness corrected")
+    assert worker_b.get_contradictions("s1", unresolved_only=True) == []
+
+
+def test_interview_branching_path_is_shared(shared_backend):
+    from app.services.interview_branching import InterviewBranchingService
+
+    worker_a = InterviewBranchingService()
+    worker_b = InterviewBranchingService()
+    question = worker_a.get_next_branching_question("s2", "He pulled out a gun", [], 0)
+
+    assert question is not None
+    path = worker_b.get_branching_path("s2")
+    assert [node["question_asked"] for node in path["nodes"]] == [question["question"]]
+
+
+def test_shared_backend_calls_run_on_the_disk_pool(shared_backend):
+    import asyncio
+    import threading
+
+    from app.api.auth import create_session, validate_session
+
+    async def scenario():
+        token = await create_session(user_id="u1", username="admin")
+        thread = await run_state_io(lambda: threading.current_thread().name)
+        return thread, await validate_session(token), await validate_session("missing")
+
+    thread, session, missing = asyncio.run(scenario())
+    assert thread.startswith("disk")
+    assert session["user_id"] == "u1" and missing is None
@@ -0,0 +1,179 @@
+"""Tests for journaled, debounced persistence of quota and key-rotation state."""
+
+import asyncio
+import json
+
+import pytest
+
+from app.config import settings
+from app.services.api_key_manager import APIKeyManager, GeminiAccountConfig
+from app.services.model_selector import QuotaTracker
+from app.services.rpd_budget import RPDBudgetAllocator
+from app.services.state_journal import StateJournal
+from app.services.usage_tracker import UsageTracker
+
+
+@pytest.fixture
+def journal(monkeypatch, tmp_path):
+    journal = StateJournal()
+    monkeypatch.setattr(settings, "database_path", str(tmp_path / "witnessreplay.db"))
+    monkeypatch.setattr(settings, "state_snapshot_interval_seconds", 3600.0)
+    for module in ("model_selector", "usage_tracker", "rpd_budget", "api_key_manager"):
+        monkeypatch.setattr(f"app.services.{module}.state_journal", journal)
+    return journal
+
+
+def _journal_file(tmp_path, state_file):
+    """The single per-worker journal written next to *state_file*."""
+    (path,) = tmp_path.glob(f"{state_file}.*.journal")
+    return path
+
+
+def _manager():
+    return APIKeyManager([GeminiAccountConfig(account_id="primary", label="Primary", priority=1, api_key="k1")])
+
+
+def test_requests_are_journaled_without_rewriting_state(journal, tmp_path):
+    tracker = QuotaTracker()
+
+    async def scenario():
+        await journal.flush()  # First-day reset asks for an initial snapshot
+        for _ in range(3):
+            await tracker.record_request("gemini-2.5-flash", tokens_used=100)
+        assert not list(tmp_path.glob("*.journal"))  # Nothing written on the request path
+        await journal.flush()
+
+    asyncio.run(scenario())
+    journal_file = _journal_file(tmp_path, "quota_tracker_state.json")
+    lines = journal_file.read_text().splitlines()
+    assert [json.loads(line)["s"] for line in lines] == [1, 2, 3]
+    assert json.loads((tmp_path / "quota_tracker_state.json").read_text())["daily_counts"] == {}
+
+    restored = QuotaTracker()
+    assert restored._daily_counts["gemini-2.5-flash"] == 3
+    assert restored._daily_tokens["gemini-2.5-flash"] == 300
+
+
+def test_snapshot_truncates_journal_and_replay_skips_included_entries(journal, tmp_path):
+    usage = UsageTracker()
+    budget = RPDBudgetAllocator()
+    usage.record_request("gemini-2.5-flash", input_tokens=10, output_tokens=5)
+    budget.record_request("gemini-2.5-flash")
+    asyncio.run(journal.flush())
+    journal_file = _journal_file(tmp_path, "usage_tracker.json")
+    stale_journal = journal_file.read_text()
+
+    usage.record_request("gemini-2.5-flash", input_tokens=10, output_tokens=5)
+    asyncio.run(journal.stop())  # Shutdown writes a snapshot of everything
+    assert journal_file.read_text() == ""
+    snapshot = json.loads((tmp_path / "usage_tracker.json").read_text())
+    assert snapshot["journal_seqs"] == {usage._state.worker_id: 2}
+
+    # A crash between the snapshot and the truncate leaves old entries behind
+    journal_file.write_text(stale_journal + '{"s": 3, "d": "to')
+    restored = UsageTracker()
+    assert restored._requests_today["gemini-2.5-flash"] == 2
+    assert restored._tokens_today["gemini-2.5-flash"] == 30
+    assert sum(u.used for u in RPDBudgetAllocator()._window_usage["gemini-2.5-flash"].values()) == 1
+
+
+def test_key_manager_journals_touched_records_only(journal, tmp_path):
+    manager = _manager()
+    asyncio.run(journal.flush())
+    manager.record_success("primary", "gemini-2.5-flash")
+    manager.record_failure("primary", "gemini-2.5-flash", RuntimeError("429 rate limit exceeded"))
+    asyncio.run(journal.flush())
+
+    entries = [json.loads(line) for line in _journal_file(tmp_path, "api_key_manager_state.json").read_text().splitlines()]
+    assert [entry["k"] for entry in entries] == ["primary:gemini-2.5-flash"] * 2
+    assert all("minute_requests" not in entry["mv"] for entry in entries)
+    assert "at" in entries[0] and "at" not in entries[1]
+
+    restored = _manager()
+    state = restored._model_state["primary:gemini-2.5-flash"]
+    assert state["daily_requests"] == 1
+    assert restored._minute_requests.count("primary:gemini-2.5-flash") == 1
+    assert state["cooldown_until"] is not None
+    assert restored._account_state["primary"]["error_count"] == 1
+
+
+def test_journal_snapshots_once_it_grows_past_the_limit(journal, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "state_journal_max_entries", 3)
+    usage = UsageTracker()
+    for _ in range(2):
+        usage.record_request("gemini-2.5-flash")
+    asyncio.run(journal.flush())
+    usage.record_request("gemini-2.5-flash")
+    asyncio.run(journal.flush())
+
+    stats = journal.get_stats()["states"]["usage_tracker"]
+    assert (stats["journal_writes"], stats["snapshots"], stats["journal_entries"]) == (1, 1, 0)
+    assert json.loads((tmp_path / "usage_tracker.json").read_text())["requests_today"] == {"gemini-2.5-flash": 3}
+
+
+def test_failed_journal_append_keeps_deltas_for_the_next_flush(journal, monkeypatch, tmp_path):
+    tracker = QuotaTracker()
+    state = tracker._state
+    append = state._append_journal
+
+    def failing_append(entries):
+        raise OSError("disk full")
+
+    async def scenario():
+        await journal.flush()  # Initial snapshot
+        await tracker.record_request("gemini-2.5-flash", tokens_used=100)
+        monkeypatch.setattr(state, "_append_journal", failing_append)
+        await journal.flush()  # Logged, not raised
+        assert state.get_stats()["pending"] == 1
+        await tracker.record_request("gemini-2.5-flash", tokens_used=100)
+        monkeypatch.setattr(state, "_append_journal", append)
+        await journal.flush()
+
+    asyncio.run(scenario())
+    lines = _journal_file(tmp_path, "quota_tracker_state.json").read_text().splitlines()
+    assert [json.loads(line)["s"] for line in lines] == [1, 2]
+    assert QuotaTracker()._daily_counts["gemini-2.5-flash"] == 2
+
+
+def test_workers_keep_separate_journals_and_never_truncate_each_other(journal, tmp_path):
+    first, second = UsageTracker(), UsageTracker()  # Two workers sharing the state file
+    assert first._state.journal_path != second._state.journal_path
+    for _ in range(2):
+        first.record_request("gemini-2.5-flash", input_tokens=10)
+    second.record_request("gemini-2.5-flash", input_tokens=10)
+
+    async def scenario():
+        await first._state.flush()
+        await second._state.flush()
+        # Both workers numbered their entries from 1; neither hides the other's
+        assert UsageTracker()._requests_today["gemini-2.5-flash"] == 3
+        second.record_request("gemini-2.5-flash", input_tokens=10)
+        await second._state.flush()
+        await first._state.flush(snapshot=True)  # Knows only its own two entries
+
+    asyncio.run(scenario())
+    assert first._state.journal_path.read_text() == ""
+    assert len(second._state.journal_path.read_text().splitlines()) == 2
+    restored = UsageTracker()
+    assert restored._requests_today["gemini-2.5-flash"] == 4
+    assert restored._tokens_today["gemini-2.5-flash"] == 40
+
+
+def test_journals_of_exited_workers_are_folded_into_the_next_snapshot(journal, tmp_path):
+    today = UsageTracker()._last_reset.isoformat()
+    exited = tmp_path / "usage_tracker.json.999999999-dead00.journal"
+    exited.write_text("".join(
+        json.dumps({"s": seq, "d": today, "m": "gemini-2.5-flash", "t": 5}) + "\n" for seq in (1, 2)
+    ))
+
+    usage = UsageTracker()
+    assert usage._requests_today["gemini-2.5-flash"] == 2
+    asyncio.run(usage._state.flush(snapshot=True))
+
+    assert not exited.exists()
+    # Kept in case a crash stopped the unlink; dropped once the file is gone
+    snapshot = json.loads((tmp_path / "usage_tracker.json").read_text())
+    assert snapshot["journal_seqs"] == {usage._state.worker_id: 0, "999999999-dead00": 2}
+    assert UsageTracker()._requests_today["gemini-2.5-flash"] == 2
+    asyncio.run(usage._state.flush(snapshot=True))
+    assert json.loads((tmp_path / "usage_tracker.json").read_text())["journal_seqs"] == {usage._state.worker_id: 0}
@@ -0,0 +1,63 @@
+"""Tests for incremental conversation token accounting."""
+
+from app.services import token_estimator as token_estimator_module
+from app.services.token_estimator import TokenLedger, count_special_chars, token_estimator
+
+
+def _message(text, role="user"):
+    return {"role": role, "content": text}
+
+
+def _full_count(history):
+    return sum(token_estimator.estimate_tokens(msg["content"], "english") for msg in history)
+
+
+def test_special_char_count_matches_per_character_scan():
+    text = 'He said: "stop!" (twice) at 10:45, then ran {north}? #2 & $5'
+    expected = sum(1 for c in text if c in token_estimator_module.SPECIAL_CHARS)
+    assert count_special_chars(text) == expected
+    assert count_special_chars("") == 0
+
+
+def test_ledger_only_estimates_appended_messages(monkeypatch):
+    history = [_message("A blue van stopped."), _message("What happened next?", "assistant")]
+    ledger = TokenLedger()
+    assert ledger.sync(history) == _full_count(history)
+
+    calls = []
+    original = token_estimator.estimate_tokens
+
+    def counting(text, content_type="default"):
+        calls.append(text)
+        return original(text, content_type)
+
+    history.append(_message("The driver got out and ran."))
+    expected = _full_count(history)
+    monkeypatch.setattr(token_estimator, "estimate_tokens", counting)
+    assert ledger.sync(history) == expected
+    assert ledger.sync(history) == expected
+    assert calls == ["The driver got out and ran."]
+    assert ledger.rebuilds == 0
+
+
+def test_ledger_rebuilds_when_history_is_replaced():
+    history = [_message(f"Turn {index} about the red car.") for index in range(8)]
+    ledger = TokenLedger()
+    ledger.sync(history)
+
+    summarized = [_message("Summary: red car ran the light.", "system")] + history[-4:]
+    assert ledger.sync(summarized) == _full_count(summarized)
+    assert ledger.rebuilds == 1
+
+    assert ledger.sync([]) == 0
+    assert ledger.rebuilds == 2
+
+
+def test_request_estimate_uses_precomputed_history_tokens():
+    history = [_message("The light was green.")]
+    full = token_estimator.estimate_request(prompt="Anything else?", history=history)
+    fast = token_estimator.estimate_request(
+        prompt="Anything else?", history_tokens=TokenLedger().sync(history),
+    )
+    assert fast.input_tokens == full.input_tokens
+    assert fast.breakdown["history"] == full.breakdown["history"]
@@ -0,0 +1,101 @@
+"""Tests for the translation memory and batched translation."""
+
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import database as database_module
+from app.services import translation_service as translation_module
+from app.services.database import DatabaseService
+from app.services.translation_memory import TranslationMemory
+from app.services.translation_service import TranslationService
+
+
+class _FakeModels:
+    def __init__(self):
+        self.calls = []
+
+    def generate_content(self, model, contents, config=None):
+        self.calls.append(contents)
+        payload = re.search(r"(\[.*\])\s*$", contents, re.S)
+        if payload:
+            texts = json.loads(payload.group(1))
+            return SimpleNamespace(text=json.dumps([f"ES:{t}" for t in texts]))
+        return SimpleNamespace(text="ES:" + contents.rsplit("\n", 1)[-1])
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    db_svc = DatabaseService(str(tmp_path / "translations.db"))
+    asyncio.run(db_svc.initialize())
+    monkeypatch.setattr(database_module, "_db_instance", db_svc)
+    yield db_svc
+    asyncio.run(db_svc.close())
+
+
+@pytest.fixture
+def service(monkeypatch):
+    memory = TranslationMemory()
+    monkeypatch.setattr(translation_module, "translation_memory", memory)
+    svc = TranslationService()
+    svc.client = SimpleNamespace(models=_FakeModels())
+    return svc
+
+
+def test_memory_survives_lru_eviction_via_sqlite(database):
+    async def scenario():
+        memory = TranslationMemory(max_entries=1)
+        await memory.put("Hello", "Hola", "en", "es", "lite")
+        await memory.put("Goodbye", "Adiós", "en", "es", "lite")
+
+        assert await memory.get("Hello", "en", "es", "lite") == "Hola"
+        assert await memory.get("Hello", "en", "fr", "lite") is None
+        stats = memory.get_stats()
+        assert stats["db_hits"] == 1 and stats["misses"] == 1
+
+        restarted = TranslationMemory()
+        assert await restarted.get("Goodbye", "en", "es", "lite") == "Adiós"
+
+    asyncio.run(scenario())
+
+
+def test_repeated_translation_uses_memory(service):
+    async def scenario():
+        first = await service.translate("What happened next?", "es", source_language="en")
+        second = await service.translate("What happened next?", "es", source_language="en")
+        assert first == second
+        assert len(service.client.models.calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_batch_sends_only_uncached_strings_in_one_call(service):
+    async def scenario():
+        await service.translate("Repeat that slowly.", "es", source_language="en")
+        texts = ["Repeat that slowly.", "What did you hear?", "Where were you standing?", "What did you hear?"]
+
+        result = await service.translate_batch(texts, target_language="es")
+
+        assert result == [f"ES:{t}" for t in texts]
+        assert len(service.client.models.calls) == 2
+        assert json.dumps(["What did you hear?", "Where were you standing?"]) in service.client.models.calls[-1]
+
+    asyncio.run(scenario())
+
+
+def test_prewarm_makes_greetings_free(service):
+    async def scenario():
+        from app.agents.prompts import INITIAL_GREETING
+
+        warmed = await service.prewarm(["Start from the beginning."], languages=["es", "fr"])
+        calls = len(service.client.models.calls)
+        translated = await service.translate_for_witness(INITIAL_GREETING, "es")
+
+        assert set(warmed) == {"es", "fr"} and calls == 2
+        assert translated["translated"] == f"ES:{INITIAL_GREETING}"
+        assert len(service.client.models.calls) == calls
+
+    asyncio.run(scenario())
@@ -4160,12 +4160,21 @@ class AdminPortal {
             btn.textContent = '⏳ Auto-Assigning...';
         }
         try {
-            const resp = await this.fetchWithTimeout('/api/reports/orphans/auto-assign', {
+            const resp = await this.fetchWithTimeout('/api/reports/orphans/auto-assign?background=true', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' }
             });
-            const data = await resp.json().catch(() => ({}));
+            let data = await resp.json().catch(() => ({}));
             if (!resp.ok) throw new Error(data.detail || 'Auto-assign failed');
+            // The run continues server-side; poll its progress
+            while (data.job_id && (data.status === 'queued' || data.status === 'running')) {
+                if (btn) btn.textContent = `⏳ ${data.stage || 'Working'}… ${Math.round(data.progress_pct || 0)}%`;
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                const poll = await this.fetchWithTimeout(`/api/reports/orphans/auto-assign/${data.job_id}`);
+                data = await poll.json().catch(() => ({}));
+                if (!poll.ok) throw new Error(data.detail || 'Auto-assign failed');
+            }
+            if (data.status === 'failed') throw new Error(data.error || 'Auto-assign failed');
             const assigned = data.assigned_count ?? data.assigned ?? data.updated ?? 0;
             const resultText = data.message || `Auto-assigned ${assigned} orphan report${assigned === 1 ? '' : 's'}`;
             this.showToast(resultText, 'success');
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Simulate Gemini account balancing policies under sustained load.
+
+Drives the real APIKeyManager on a simulated clock with the same
+candidates -> note_selection -> record_success/record_failure loop the
+rotating client uses. Each simulated account enforces its own sliding
+60-second RPM limit upstream, answers successes with rate-limit headers and
+over-limit requests with a 429 plus Retry-After, and takes a few seconds to
+respond so requests overlap. Requests arrive as a Poisson stream at a share
+of the combined capacity. Reports 429s, requests that failed on every
+account, and sustained throughput for each policy at each load.
+
+Because the rotating client fails over through every account, throughput
+only differs between policies once some requests fail everywhere; below
+saturation the difference shows up as 429s (each one a wasted round trip
+and a cooldown that hides capacity).
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import math
+import random
+import sys
+import tempfile
+from collections import deque
+from datetime import datetime as _datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "backend"))
+
+from app.config import settings  # noqa: E402
+from app.services import api_key_manager as akm  # noqa: E402
+from app.services.state_journal import StateJournal  # noqa: E402
+
+MODEL = "sim-model"  # No built-in quota table entry, so only upstream headers drive limits
+START = _datetime(2026, 3, 2, 18, 0, tzinfo=timezone.utc).timestamp()
+
+
+class SimClock:
+    def __init__(self):
+        self.now = START
+
+    def datetime_class(self):
+        clock = self
+
+        class SimDatetime(_datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return _datetime.fromtimestamp(clock.now, tz)
+
+        return SimDatetime
+
+
+class RateLimitError(Exception):
+    def __init__(self, headers: dict):
+        super().__init__("429 Too Many Requests: requests per minute exceeded")
+        self.code = 429
+        self.response = type("Response", (), {"headers": headers})()
+
+
+class Upstream:
+    """One account's server-side quota: a true sliding 60-second window."""
+
+    def __init__(self, rpm: int):
+        self.rpm = rpm
+        self.accepted: deque[float] = deque()
+
+    def call(self, now: float) -> dict:
+        while self.accepted and self.accepted[0] <= now - 60:
+            self.accepted.popleft()
+        if len(self.accepted) >= self.rpm:
+            retry_after = max(1, math.ceil(self.accepted[0] + 60 - now))
+            raise RateLimitError({
+                "x-ratelimit-limit-requests": str(self.rpm),
+                "x-ratelimit-remaining-requests": "0",
+                "retry-after": str(retry_after),
+            })
+        self.accepted.append(now)
+        return {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(self.rpm - len(self.accepted)),
+        }
+
+
+class Response:
+    def __init__(self, headers: dict):
+        self.sdk_http_response = type("HttpResponse", (), {"headers": headers})()
+        self.usage_metadata = None
+
+
+def simulate(policy: str, rpms: list[int], load: float, minutes: float, latency: tuple[float, float], seed: int) -> dict:
+    settings.gemini_account_balancing = policy
+    clock = SimClock()
+    akm.datetime = clock.datetime_class()
+    manager = akm.APIKeyManager([
+        akm.GeminiAccountConfig(account_id=f"acct{i + 1}", label=f"Account {i + 1}", priority=i + 1, api_key=f"key-{i}")
+        for i in range(len(rpms))
+    ])
+    manager._minute_requests._clock = lambda: clock.now
+    manager._rng.seed(seed)
+    upstream = {account.account_id: Upstream(rpm) for account, rpm in zip(manager.accounts, rpms)}
+
+    rng = random.Random(seed)
+    rate = load * sum(rpms) / 60.0
+    end = START + minutes * 60
+    events: list[tuple[float, int, str, object]] = []
+    seq = 0
+    t = START
+    while True:
+        t += rng.expovariate(rate)
+        if t >= end:
+            break
+        heapq.heappush(events, (t, seq, "arrival", None))
+        seq += 1
+
+    stats = {"requests": 0, "completed": 0, "rate_limited_429": 0, "failed": 0, "attempts": 0}
+    per_account = {account_id: 0 for account_id in upstream}
+    while events:
+        clock.now, _, kind, payload = heapq.heappop(events)
+        if kind == "complete":
+            account_id, headers = payload
+            manager.record_success(account_id, MODEL, response=Response(headers))
+            stats["completed"] += 1
+            continue
+
+        stats["requests"] += 1
+        for account in manager.get_account_candidates(MODEL):
+            stats["attempts"] += 1
+            manager.note_selection(account.account_id, MODEL)
+            try:
+                headers = upstream[account.account_id].call(clock.now)
+            except RateLimitError as exc:
+                stats["rate_limited_429"] += 1
+                manager.record_failure(account.account_id, MODEL, exc)
+                continue
+            per_account[account.account_id] += 1
+            heapq.heappush(events, (clock.now + rng.uniform(*latency), seq, "complete", (account.account_id, headers)))
+            seq += 1
+            break
+        else:
+            stats["failed"] += 1
+
+    stats["throughput_rpm"] = round(stats["completed"] / minutes, 2)
+    stats["success_rate"] = round(stats["completed"] / max(1, stats["requests"]), 4)
+    stats["per_account"] = per_account
+    return stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rpm", default="15,10,5", help="Comma-separated upstream RPM limit per account")
+    parser.add_argument("--load", default="0.5,0.7,0.9", help="Comma-separated offered loads as a share of combined RPM")
+    parser.add_argument("--minutes", type=float, default=60.0)
+    parser.add_argument("--latency", default="2,8", help="Min,max response time in seconds")
+    parser.add_argument("--policies", default="priority,p2c,wrr")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rpms = [int(value) for value in args.rpm.split(",")]
+    latency = tuple(float(value) for value in args.latency.split(","))
+    original_datetime = akm.datetime
+    original_journal = akm.state_journal
+    akm.logger.disabled = True
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.database_path = str(Path(tmp) / "witnessreplay.db")
+        try:
+            for load in (float(value) for value in args.load.split(",")):
+                runs = {}
+                for policy in args.policies.split(","):
+                    akm.state_journal = StateJournal()  # Fresh, never-flushed state per run
+                    runs[policy] = simulate(policy, rpms, load, args.minutes, latency, args.seed)
+                results[f"load_{load:g}"] = {"offered_rpm": round(load * sum(rpms), 2), **runs}
+        finally:
+            akm.datetime = original_datetime
+            akm.state_journal = original_journal
+
+    print(json.dumps({
+        "accounts_rpm": rpms,
+        "minutes": args.minutes,
+        "latency_seconds": list(latency),
+        "results": results,
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Benchmark public API key validation with many issued keys.
+
+Issues ``--keys`` API keys into a throwaway SQLite database, then validates
+random keys concurrently the way ``require_api_key`` does for each ``/v1/*``
+request. Compares:
+
+- ``linear_scan``: the previous approach, bcrypt-checking every active key
+  until one matches (on the crypto pool);
+- ``indexed_cold``: HMAC index lookup plus one bcrypt check (cache misses);
+- ``indexed_cached``: repeat requests served from the verified-key cache.
+
+bcrypt cost defaults to 10 rounds to keep the linear-scan baseline tolerable;
+the production default (12) makes every bcrypt check ~4x slower, which only
+widens the gap.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "backend"))
+
+import bcrypt  # noqa: E402
+
+from app.services import database as database_module  # noqa: E402
+from app.services.api_key_service import KEY_PREFIX_TAG, APIKeyService  # noqa: E402
+from app.services.database import DatabaseService  # noqa: E402
+from app.services.executors import crypto  # noqa: E402
+
+
+async def linear_scan_validate(service: APIKeyService, raw_key: str):
+    """The pre-index validate_key: every active key's hash is tried in turn."""
+    if not raw_key.startswith(KEY_PREFIX_TAG):
+        return None
+    cursor = await service._db._db.execute(
+        "SELECT id, name, key_hash FROM api_keys WHERE is_active = 1"
+    )
+    for row in await cursor.fetchall():
+        if await crypto.run(bcrypt.checkpw, raw_key.encode("utf-8"), row[2].encode("utf-8")):
+            return {"id": row[0], "name": row[1]}
+    return None
+
+
+async def measure(validate, keys: list[str], requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(raw_key: str):
+        async with semaphore:
+            started = time.perf_counter()
+            assert await validate(raw_key) is not None
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(raw_key) for raw_key in keys[:requests]))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+    }
+
+
+async def run(args) -> dict:
+    real_gensalt = bcrypt.gensalt
+    bcrypt.gensalt = lambda rounds=args.rounds: real_gensalt(args.rounds)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_svc = DatabaseService(str(Path(tmp) / "keys.db"))
+        await db_svc.initialize()
+        database_module._db_instance = db_svc
+        service = APIKeyService()
+        await service.initialize()
+
+        issued = await asyncio.gather(*(service.create_key(f"client-{i}") for i in range(args.keys)))
+        raw_keys = [item["key"] for item in issued]
+        rng = random.Random(args.seed)
+
+        def sample(count: int) -> list[str]:
+            return [rng.choice(raw_keys) for _ in range(count)]
+
+        result = {
+            "keys": args.keys,
+            "bcrypt_rounds": args.rounds,
+            "concurrency": args.concurrency,
+            "linear_scan": await measure(
+                lambda k: linear_scan_validate(service, k), sample(args.scan_requests), args.scan_requests, args.concurrency
+            ),
+            "indexed_cold": await measure(service.validate_key, raw_keys, args.keys, args.concurrency),
+            "indexed_cached": await measure(service.validate_key, sample(args.requests), args.requests, args.concurrency),
+            "validation_stats": service.get_validation_stats(),
+        }
+        await db_svc.close()
+    result["speedup_cold"] = round(
+        result["indexed_cold"]["requests_per_second"] / result["linear_scan"]["requests_per_second"], 1
+    )
+    result["speedup_cached"] = round(
+        result["indexed_cached"]["requests_per_second"] / result["linear_scan"]["requests_per_second"], 1
+    )
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor for issued keys")
+    parser.add_argument("--requests", type=int, default=2000, help="Cached-path validations")
+    parser.add_argument("--scan-requests", type=int, default=8, help="Linear-scan validations (slow)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Benchmark offline language identification against remote detection.
+
+Runs every labelled transcript in tests/audio_fixtures/transcripts.jsonl
+through the local identifier and reports accuracy, local latency, and how many
+Gemini detection calls the confidence threshold would skip. The remote
+latency used for the savings estimate is a parameter, since the benchmark
+makes no network calls.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_TRANSCRIPTS = ROOT / "tests" / "audio_fixtures" / "transcripts.jsonl"
+sys.path.insert(0, str(ROOT / "backend"))
+
+from app.services.language_id import identify_language  # noqa: E402
+
+
+def load_transcripts(path: Path) -> list[dict]:
+    with path.open(encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def run(transcripts: list[dict], threshold: float, remote_latency_ms: float, repeat: int) -> dict:
+    latencies_ms: list[float] = []
+    correct = local = local_correct = 0
+    misses: list[str] = []
+    for item in transcripts:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            guess = identify_language(item["text"])
+        latencies_ms.append((time.perf_counter() - started) * 1000 / repeat)
+
+        correct += guess.language == item["language"]
+        if guess.confidence >= threshold:
+            local += 1
+            local_correct += guess.language == item["language"]
+            if guess.language != item["language"]:
+                misses.append(f"{item['language']} -> {guess.language}: {item['text'][:40]}")
+
+    total = len(transcripts)
+    return {
+        "transcripts": total,
+        "threshold": threshold,
+        "accuracy": round(correct / total, 4),
+        "answered_locally": local,
+        "remote_calls_saved_pct": round(local / total * 100, 1),
+        "local_precision": round(local_correct / local, 4) if local else None,
+        "local_latency_ms_p50": round(statistics.median(latencies_ms), 4),
+        "local_latency_ms_max": round(max(latencies_ms), 4),
+        "estimated_latency_saved_ms": round(local * remote_latency_ms, 1),
+        "confident_misses": misses,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transcripts", type=Path, default=DEFAULT_TRANSCRIPTS)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--remote-latency-ms", type=float, default=450.0,
+                        help="Assumed latency of one Gemini detection call")
+    parser.add_argument("--repeat", type=int, default=50, help="Timing iterations per transcript")
+    args = parser.parse_args()
+
+    result = run(load_transcripts(args.transcripts), args.threshold, args.remote_latency_ms, args.repeat)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
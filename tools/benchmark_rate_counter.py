@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Benchmark the bucketed sliding-window counter against timestamp lists.
+
+Simulates per-minute rate checks over many keys (models, account/model pairs
+or client IPs): every operation records a request for a random key and then
+reads that key's count for the last minute, the way the quota trackers do.
+The baseline is the pattern the services used before, a list of timestamps
+per key rebuilt by a list comprehension on each check. Reports throughput and
+memory held after the run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "backend"))
+
+from app.services.rate_counter import RateCounter  # noqa: E402
+
+
+class TimestampListCounter:
+    """The previous approach: prune a per-key list of timestamps on every check."""
+
+    def __init__(self, window_seconds: float = 60.0):
+        self.window_seconds = window_seconds
+        self._requests: dict[str, list[float]] = {}
+
+    def add(self, key: str, now: float) -> int:
+        cutoff = now - self.window_seconds
+        requests = [ts for ts in self._requests.get(key, []) if ts > cutoff]
+        requests.append(now)
+        self._requests[key] = requests
+        return len(requests)
+
+    def count(self, key: str, now: float) -> int:
+        cutoff = now - self.window_seconds
+        self._requests[key] = [ts for ts in self._requests.get(key, []) if ts > cutoff]
+        return len(self._requests[key])
+
+
+def run(counter, keys: list[str], operations: int, rate_per_second: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    now = 1_700_000_000.0
+    step = 1.0 / rate_per_second
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(operations):
+        key = keys[rng.randrange(len(keys))]
+        now += step
+        counter.add(key, now=now)
+        counter.count(key, now=now)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "ops_per_second": round(operations / elapsed),
+        "us_per_op": round(elapsed / operations * 1e6, 3),
+        "memory_held_mb": round(current / 1e6, 2),
+        "memory_peak_mb": round(peak / 1e6, 2),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--operations", type=int, default=200_000)
+    parser.add_argument("--rate", type=float, default=2_000.0,
+                        help="Simulated requests per second across all keys")
+    parser.add_argument("--hot-keys", type=int, default=0,
+                        help="Restrict traffic to this many keys (0 = all) to model a few busy models")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    keys = [f"account-{i % 3}:model-{i}" for i in range(args.keys)]
+    if args.hot_keys:
+        keys = keys[:args.hot_keys]
+
+    result = {
+        "keys": len(keys),
+        "operations": args.operations,
+        "simulated_rps": args.rate,
+        "timestamp_lists": run(TimestampListCounter(), keys, args.operations, args.rate, args.seed),
+        "rate_counter": run(RateCounter(window_seconds=60), keys, args.operations, args.rate, args.seed),
+    }
+    result["speedup"] = round(
+        result["rate_counter"]["ops_per_second"] / result["timestamp_lists"]["ops_per_second"], 2
+    )
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Compare scene extraction prompt tokens per turn: full vs incremental.
+
+Replays a scripted witness interview through SceneReconstructionAgent's real
+prompt builders without calling any model. After each turn the scene grows by
+one element (as a successful extraction would), and history is summarized the
+same way the agent does once it passes 16 messages.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "backend"))
+os.environ.setdefault("GOOGLE_API_KEY", "")
+
+from app.agents.scene_agent import SceneReconstructionAgent  # noqa: E402
+from app.models.schemas import SceneElement  # noqa: E402
+
+WITNESS_TURNS = [
+    "I want to report a hit and run on Fifth and Main.",
+    "It was around nine at night on Tuesday, it had been raining.",
+    "A dark blue pickup truck ran the red light going north.",
+    "It hit a woman on a bicycle who was crossing with the walk signal.",
+    "The driver slowed down for a second and then sped off toward the highway.",
+    "I think the truck had a dent on the front bumper on the passenger side.",
+    "The driver was a man, maybe in his forties, with a beard and a baseball cap.",
+    "There was a bus stop on the corner and two people were waiting there.",
+    "The woman was conscious but her leg looked hurt and her bike was bent.",
+    "I called 911 and stayed with her until the ambulance came.",
+    "The plate started with 7K, I couldn't get the rest because of the spray.",
+    "The truck had one of those toolboxes across the bed, silver colored.",
+    "There was a gas station on the northeast corner with bright lights.",
+    "A guy from the gas station ran over with a first aid kit.",
+    "I heard the engine rev really loud when he took off.",
+    "The streetlight on our side was out so it was darker there.",
+    "I was about thirty feet away, standing under the awning of the pharmacy.",
+    "The truck might have had a lift kit, it sat pretty high.",
+    "The bike was a white road bike with a red light on the back.",
+    "That's everything I can remember right now.",
+]
+AGENT_REPLY = "Thank you, that helps. What else did you notice about that?"
+SUMMARY = (
+    "[Previous conversation summary]: Witness reports a hit and run at Fifth and Main around 9pm "
+    "in the rain; a dark blue pickup ran the light, hit a cyclist, and fled north toward the highway."
+)
+
+
+def _new_agent() -> SceneReconstructionAgent:
+    SceneReconstructionAgent._initialize_model = lambda self: None
+    return SceneReconstructionAgent("benchmark")
+
+
+def simulate(turns: list[str], incremental: bool) -> list[int]:
+    agent = _new_agent()
+    clock = datetime(2026, 1, 1)
+    tokens: list[int] = []
+    for index, statement in enumerate(turns):
+        for role, content in (("user", statement), ("assistant", AGENT_REPLY)):
+            clock += timedelta(seconds=5)
+            agent.conversation_history.append({"role": role, "content": content, "timestamp": clock.isoformat()})
+        if len(agent.conversation_history) > 16:
+            agent.conversation_history = [
+                {"role": "system", "content": SUMMARY, "timestamp": clock.isoformat()}
+            ] + agent.conversation_history[-8:]
+
+        if incremental and agent._should_extract_incrementally():
+            prompt, _ = agent._build_incremental_extraction_prompt(agent._turns_since_last_extraction())
+            agent._extractions_since_full += 1
+        else:
+            prompt, _ = agent._build_full_extraction_prompt()
+            agent._extractions_since_full = 0
+        tokens.append(agent._estimate_tokens(prompt))
+
+        # Pretend the extraction succeeded and found one new element
+        agent.scene_description = "A pickup truck struck a cyclist at an intersection at night."
+        agent.current_elements.append(SceneElement(
+            id=f"elem_benchmark_{index}", type="object", description=statement[:60], confidence=0.8,
+        ))
+        agent._scene_extracted_through = clock.isoformat()
+    return tokens
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=len(WITNESS_TURNS))
+    args = parser.parse_args()
+
+    turns = (WITNESS_TURNS * (args.turns // len(WITNESS_TURNS) + 1))[:args.turns]
+    full = simulate(turns, incremental=False)
+    incremental = simulate(turns, incremental=True)
+    print(json.dumps({
+        "turns": len(turns),
+        "full_interval": SceneReconstructionAgent.FULL_EXTRACTION_INTERVAL,
+        "full_tokens_per_turn": full,
+        "incremental_tokens_per_turn": incremental,
+        "full_total": sum(full),
+        "incremental_total": sum(incremental),
+        "saved_pct": round((1 - sum(incremental) / sum(full)) * 100, 1),
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())